@@ -9,8 +9,29 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 # -------------------------------------------------
 
-# We will import our backend logic later
-# from src.search.query import Searcher, get_important_contacts
+from src.search.client import SearchClient
+
+@st.cache_resource
+def get_searcher():
+    """Loads an in-process Searcher once per Streamlit server (used only when the search server is not running)."""
+    from src.search.query import Searcher
+    return Searcher()
+
+def run_search(query):
+    # Prefer the resident search server (python main.py serve); fall back to in-process search
+    results = SearchClient().search(query)
+    if results is None:
+        results = get_searcher().search(query)
+    return results
+
+def display_results(results):
+    if not results:
+        st.info("결과가 없습니다.")
+        return
+    for i, result in enumerate(results):
+        st.subheader(f"{i+1}. {result.get('subject')}")
+        st.caption(f"{result.get('sender')} · {result.get('sent_date')} · 점수 {result.get('final_score', 0):.4f}")
+        st.write((result.get('body_plain') or '')[:300])
 
 def main():
     st.title("AI 이메일 검색 시스템")
@@ -22,9 +43,8 @@ def main():
     if st.button("검색"):
         if query:
             st.write(f"'{query}'(으)로 검색을 실행합니다...")
-            # Placeholder for search results
-            # results = searcher.search(query)
-            # display_results(results)
+            results = run_search(query)
+            display_results(results)
         else:
             st.warning("검색어를 입력해주세요.")
 
@@ -0,0 +1,62 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import statistics
+from collections import Counter
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.ingestion.storage import contact_summary
+from benchmarks.bench_filtered_lookup import load
+
+def scan_contacts(conn, limit=10):
+    """
+    이전 방식(get_important_contacts)의 집계를 저장된 행으로 수행합니다.
+    이전에는 여기에 더해 모든 .eml과 첨부 파일을 다시 파싱했으므로 실제 비용은 이보다 훨씬 큼.
+    """
+    emails = [(sender, json.loads(receivers or "[]")) for sender, receivers in conn.execute("SELECT sender, receivers FROM emails;")]
+    sender_counts = Counter(sender for sender, _ in emails if sender)
+    ranked = [sender for sender, _ in sender_counts.most_common()]
+    main_user = next((sender for sender in ranked if "@" in sender), ranked[0] if ranked else None)
+    contacts = Counter()
+    for sender, receivers in emails:
+        if sender == main_user:
+            contacts.update(receivers)
+        elif main_user in receivers:
+            contacts[sender] += 1
+    return main_user, contacts.most_common(limit)
+
+def timed(func, repeat=5):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies), result
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    work_dir = tempfile.mkdtemp(prefix="bench_contacts_")
+    try:
+        print(f"합성 이메일 {count}개 적재 중 (연락처 통계 포함)...")
+        start = time.perf_counter()
+        storage = load(os.path.join(work_dir, "emails.db"), count)
+        load_seconds = time.perf_counter() - start
+        conn = storage.conn
+        addresses, pairs = (conn.execute(f"SELECT COUNT(*) FROM {table};").fetchone()[0]
+                            for table in ("contact_stats", "contact_pairs"))
+
+        scan_ms, (scan_user, _) = timed(lambda: scan_contacts(conn), repeat=3)
+        stats_ms, (stats_user, _) = timed(lambda: contact_summary(conn))
+        print(f"\n적재 시간: {load_seconds:.1f}s (연락처 {addresses}개, 발신자-수신자 쌍 {pairs}개)")
+        print(f"{'방식':<28} {'p50':>10}  메일함 소유자")
+        print(f"{'전체 행 집계 (파싱 제외)':<28} {scan_ms:>8.1f}ms  {scan_user}")
+        print(f"{'contact_stats 조회':<28} {stats_ms:>8.2f}ms  {stats_user}")
+        storage.close()
+    finally:
+        shutil.rmtree(work_dir)
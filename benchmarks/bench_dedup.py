@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import random
+import shutil
+import hashlib
+import tempfile
+import datetime
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+from src.common.models import Email
+from src.ingestion.dedup import MAX_DISTANCE
+from src.search.embedding_cache import EmbeddingCache
+from src.search.indexer import EmailIndexer
+from src.search.vector_store import NumpyVectorStore
+from benchmarks.synthetic import _load_seed_emails
+
+EMBEDDING_DIM = 384
+
+def thread_emails(thread_count, replies=6, copies=2, seed=42):
+    """
+    답장마다 이전 메일 전체를 인용하는 스레드를 만듭니다. 각 메일은 copies개의 사본(다른 폴더,
+    외부 메일 안내 문구가 붙은 전달본)으로도 저장되어 실제 메일함처럼 유사 중복이 생깁니다.
+    """
+    rng = random.Random(seed)
+    seeds = _load_seed_emails()
+    sentences = [s.strip() for e in seeds for s in e.get("body", "").split(". ") if s.strip()]
+    addresses = sorted({e.get("sender") for e in seeds})
+    start = datetime.datetime(2023, 1, 1)
+    for t in range(thread_count):
+        subject = rng.choice(seeds).get("subject", "")
+        quoted = ""
+        for r in range(replies):
+            sender = rng.choice(addresses)
+            sent = start + datetime.timedelta(hours=t * 24 + r)
+            new_text = ". ".join(rng.choice(sentences) for _ in range(rng.randint(3, 8)))
+            body = f"{new_text}\n\n-- \n{sender}\n조선사업부"
+            if quoted:
+                body += f"\n\nOn {sent:%Y-%m-%d %H:%M}, {sender} wrote:\n" + \
+                    "\n".join(f"> {line}" for line in quoted.splitlines())
+            quoted = body
+            for c in range(copies):
+                banner = "" if c == 0 else "[외부 메일] 발신자를 확인하세요.\n"
+                yield Email(
+                    message_id=f"thread_{t}_{r}_{c}", subject=("RE: " if r else "") + subject,
+                    body_plain=banner + body, body_html=None, sender=sender, receivers=[rng.choice(addresses)],
+                    sent_date=sent, folder_path="/Inbox" if c == 0 else "/Archive"
+                )
+
+def fake_encode(texts):
+    """텍스트 해시로 정한 무작위 벡터 (모델 대신 인코딩 횟수와 글자 수만 셈)."""
+    fake_encode.texts += len(texts)
+    fake_encode.chars += sum(len(text) for text in texts)
+    return np.stack([np.random.default_rng(int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little"))
+                     .standard_normal(EMBEDDING_DIM).astype(np.float32) for text in texts])
+
+def run(emails, work_dir, strip, near_duplicates, batch_size=100):
+    fake_encode.texts = fake_encode.chars = 0
+    cache = EmbeddingCache(os.path.join(work_dir, "cache"), model_name="fake",
+                           near_duplicate_distance=MAX_DISTANCE if near_duplicates else None)
+    store = NumpyVectorStore(os.path.join(work_dir, "vectors"), create=True)
+    text_seconds = 0.0
+    for start in range(0, len(emails), batch_size):
+        batch = emails[start:start + batch_size]
+        begin = time.perf_counter()
+        if strip:
+            texts = [EmailIndexer._embedding_text(None, email_obj) for email_obj in batch]
+        else:
+            texts = [f"{e.subject}\n{e.body_plain}\n" for e in batch]
+        text_seconds += time.perf_counter() - begin
+        begin = time.perf_counter()
+        embeddings = cache.encode(texts, fake_encode)
+        # 모델 호출을 뺀 캐시 조회/SimHash 시간
+        text_seconds += time.perf_counter() - begin
+        store.upsert([e.message_id for e in batch], embeddings)
+    vectors_mb = os.path.getsize(store.vectors_path) / 1024 / 1024
+    return fake_encode.texts, fake_encode.chars, store.unique_count(), vectors_mb, text_seconds
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    emails = list(thread_emails(threads))
+    print(f"스레드 {threads}개, 메일 {len(emails)}개 (답장마다 이전 메일 전체 인용, 메일마다 사본 2개)")
+
+    print(f"\n{'방식':<26} {'인코딩 텍스트':>12} {'인코딩 글자 수':>14} {'고유 벡터':>10} {'vectors.bin':>12} {'전처리':>8}")
+    for label, strip, near_duplicates in (("전체 본문", False, False), ("인용/서명 제거", True, False),
+                                          ("인용/서명 제거 + SimHash", True, True)):
+        work_dir = tempfile.mkdtemp(prefix="bench_dedup_")
+        try:
+            texts, chars, unique, vectors_mb, seconds = run(emails, work_dir, strip, near_duplicates)
+            print(f"{label:<26} {texts:>12} {chars:>14} {unique:>10} {vectors_mb:>10.2f}MB {seconds:>7.2f}s")
+        finally:
+            shutil.rmtree(work_dir)
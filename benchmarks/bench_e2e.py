@@ -0,0 +1,401 @@
+"""
+합성 메일함으로 수집(ingest), 색인 생성(index), 검색(search) 전체 과정을 측정하는 벤치마크입니다.
+
+    python benchmarks/bench_e2e.py --sizes 10000,100000 --output results.json
+    python benchmarks/bench_e2e.py --compare before.json after.json
+
+각 단계는 새 프로세스에서 실행하여 단계별 최대 RSS를 따로 측정하고, 결과(지연 시간 p50/p95/p99, QPS,
+처리량, 최대 RSS, 디스크 사용량)와 실행 환경(git 커밋, 파이썬/CPU)을 JSON으로 저장합니다.
+임베딩은 기본적으로 토큰 해시로 만든 벡터를 사용하므로 모델 없이 색인/검색 경로의 비용만 측정합니다
+(--model을 지정하면 SentenceTransformer 사용).
+
+합성 코퍼스는 work_dir/corpus_<크기>_<seed>에 만들고, --work-dir을 지정하면 다음 실행에서 다시 사용합니다
+(100만 통은 생성에 CPU 코어 하나로 약 1시간, 디스크 약 3.5GB).
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import datetime
+import subprocess
+import concurrent.futures
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+EMBEDDING_DIM = 384
+SEED_JSON = os.path.join(project_root, "shipyard_ultra_complex_100.json")
+SEARCH_LIMIT = 10
+
+def dir_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def size_mb(*paths):
+    """경로들의 디스크 사용량 (MB). SQLite DB는 -wal/-shm 파일도 포함합니다."""
+    total = 0
+    for path in paths:
+        for candidate in (path, path + "-wal", path + "-shm"):
+            if os.path.exists(candidate):
+                total += dir_size(candidate)
+    return total / 1024 / 1024
+
+def peak_rss():
+    """이 프로세스와 (종료된) 자식 프로세스 중 가장 큰 최대 RSS (MB)."""
+    return {"peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "peak_child_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024}
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))]
+
+class HashEncoder:
+    """
+    SentenceTransformer 대신 쓰는 인코더: 토큰마다 정해진 무작위 벡터를 더해서 정규화합니다.
+    같은 단어를 많이 공유하는 텍스트는 가까운 벡터가 되므로 벡터 검색 결과도 어느 정도 의미가 있습니다.
+    """
+    buckets = 4096
+
+    def __init__(self):
+        import numpy as np
+        self.table = np.random.default_rng(0).standard_normal((self.buckets, EMBEDDING_DIM)).astype(np.float32)
+
+    def encode(self, texts, **kwargs):
+        import numpy as np
+        vectors = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        for i, text in enumerate(texts):
+            rows = [zlib.crc32(token.encode("utf-8")) % self.buckets for token in text.lower().split()]
+            if rows:
+                vectors[i] = self.table[rows].sum(axis=0)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+def _paths(config):
+    work_dir = config["work_dir"]
+    return {
+        "corpus": config["corpus_dir"],
+        "ingest_db": os.path.join(work_dir, "ingest.db"),
+        "index_dir": os.path.join(work_dir, "index"),
+        "index_db": os.path.join(work_dir, "index.db"),
+        "chroma_dir": os.path.join(work_dir, "chroma"),
+        "vector_dir": os.path.join(work_dir, "vectors"),
+        "manifest": os.path.join(work_dir, "index_manifest.db"),
+        "embedding_cache": os.path.join(work_dir, "embedding_cache"),
+    }
+
+def phase_generate(config):
+    from generate_eml_files import generate_synthetic_emls
+    corpus_dir = config["corpus_dir"]
+    marker = os.path.join(corpus_dir, "corpus.json")
+    expected = {"count": config["size"], "seed": config["seed"]}
+    start = time.perf_counter()
+    reused = False
+    if os.path.exists(marker):
+        with open(marker, encoding="utf-8") as f:
+            reused = json.load(f) == expected
+    if not reused:
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+        generate_synthetic_emls(corpus_dir, config["size"], SEED_JSON, seed=config["seed"], workers=config["workers"])
+        with open(marker, "w", encoding="utf-8") as f:
+            json.dump(expected, f)
+    return {"seconds": time.perf_counter() - start, "reused": reused, "corpus_mb": size_mb(corpus_dir)}
+
+def phase_ingest(config, batch_size=1000):
+    """main.py ingest와 같은 방식으로 .eml을 파싱해서 SQLite DB에 대량 적재합니다."""
+    from src.ingestion.parser import parse_eml_paths, iter_eml_paths
+    from src.ingestion.storage import SQLiteStorage
+    paths = _paths(config)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(paths["ingest_db"] + suffix):
+            os.remove(paths["ingest_db"] + suffix)
+
+    start = time.perf_counter()
+    storage = SQLiteStorage(paths["ingest_db"], bulk_load=True, fts=config["keyword_engine"] == "fts5")
+    storage.connect()
+    storage.create_table()
+    count = 0
+    batch = []
+    for email_obj in parse_eml_paths(iter_eml_paths(paths["corpus"]), workers=config["workers"], ordered=False):
+        batch.append(email_obj)
+        if len(batch) >= batch_size:
+            storage.insert_emails(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        storage.insert_emails(batch)
+        count += len(batch)
+    storage.finish_bulk_load()
+    storage.refresh_importance()
+    threads = storage.conn.execute("SELECT COUNT(DISTINCT thread_id) FROM emails;").fetchone()[0]
+    storage.close()
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "emails": count, "emails_per_s": count / seconds, "threads": threads,
+            "db_mb": size_mb(paths["ingest_db"])}
+
+def phase_index(config):
+    """EmailIndexer로 키워드 색인과 벡터 저장소를 처음부터 만듭니다."""
+    from src.search.indexer import EmailIndexer
+    paths = _paths(config)
+    for key in ("index_dir", "chroma_dir", "vector_dir", "embedding_cache", "manifest", "index_db"):
+        if os.path.isdir(paths[key]):
+            shutil.rmtree(paths[key])
+        elif os.path.exists(paths[key]):
+            os.remove(paths[key])
+
+    start = time.perf_counter()
+    indexer = EmailIndexer(eml_dir=paths["corpus"], index_dir=paths["index_dir"], chroma_dir=paths["chroma_dir"],
+                           manifest_path=paths["manifest"], embedding_cache_dir=paths["embedding_cache"],
+                           keyword_engine=config["keyword_engine"], db_path=paths["index_db"],
+                           vector_store=config["vector_store"], vector_dir=paths["vector_dir"])
+    if not config["model"]:
+        indexer._encode = HashEncoder().encode
+    indexer.index_emails(rebuild=True, parse_workers=config["workers"])
+    seconds = time.perf_counter() - start
+
+    # 변경이 없을 때의 증분 색인 (manifest 비교만 하고 끝나야 함)
+    start = time.perf_counter()
+    indexer.index_emails()
+    noop_seconds = time.perf_counter() - start
+    keyword_path = paths["index_db"] if config["keyword_engine"] == "fts5" else paths["index_dir"]
+    vector_path = paths["chroma_dir"] if config["vector_store"] == "chroma" else paths["vector_dir"]
+    return {"seconds": seconds, "emails_per_s": config["size"] / seconds, "noop_reindex_s": noop_seconds,
+            "keyword_index_mb": size_mb(keyword_path), "vectors_mb": size_mb(vector_path),
+            "embedding_cache_mb": size_mb(paths["embedding_cache"]), "manifest_mb": size_mb(paths["manifest"])}
+
+def bench_queries(config, count):
+    """합성 메일과 같은 어휘(시드 문장의 단어, 약어, 호선 번호)로 만든 질의. 일부는 필터/스레드 묶기를 사용."""
+    import re
+    from generate_eml_files import SyntheticMailbox
+    mailbox = SyntheticMailbox(SEED_JSON, seed=config["seed"], count=config["size"])
+    rng = random.Random(config["seed"] + 1)
+    words = sorted({word for sentence in mailbox.sentences for word in re.findall(r"[가-힣]{2,}", sentence)})
+    terms = mailbox.terms + mailbox.hulls + ["inspection report", "steel plates", "erection", "delivery"]
+    frequent = mailbox.contacts[:20] + [mailbox.owner]
+    queries = []
+    for _ in range(count):
+        kind = rng.choices(("plain", "sender", "date", "collapse"), (0.6, 0.15, 0.15, 0.1))[0]
+        if rng.random() < 0.3:
+            text = rng.choice(terms)
+        else:
+            text = " ".join(rng.sample(words, rng.randint(1, 2)))
+        options = {}
+        if kind == "sender":
+            options["filters"] = {"sender": rng.choice(frequent)}
+        elif kind == "date":
+            date_from = datetime.date(2022, 1, 1) + datetime.timedelta(days=rng.randint(0, 700))
+            options["filters"] = {"date_from": date_from.isoformat(),
+                                  "date_to": (date_from + datetime.timedelta(days=30)).isoformat()}
+        elif kind == "collapse":
+            options["collapse_threads"] = True
+        queries.append((kind, text, options))
+    return queries
+
+def phase_search(config):
+    from src.search.query import Searcher
+    from src.search.vector_store import create_vector_store
+    paths = _paths(config)
+
+    class BenchSearcher(Searcher):
+        def _load_semantic_data(self, vector_store, vector_options):
+            if config["model"]:
+                return super()._load_semantic_data(vector_store, vector_options)
+            self.vector_store = create_vector_store(vector_store, chroma_dir=self.chroma_dir,
+                                                    vector_dir=self.vector_dir, **vector_options)
+            self.semantic_model = HashEncoder()
+
+    start = time.perf_counter()
+    # 같은 질의가 반복되어도 결과 캐시에서 꺼내지 않도록 결과 캐시를 끔
+    searcher = BenchSearcher(index_dir=paths["index_dir"], chroma_dir=paths["chroma_dir"],
+                             keyword_engine=config["keyword_engine"], db_path=paths["index_db"],
+                             vector_store=config["vector_store"], vector_dir=paths["vector_dir"], result_cache_size=0)
+    queries = bench_queries(config, config["queries"])
+    kind, text, options = queries[0]
+    searcher.search(text, limit=SEARCH_LIMIT, **options)
+    cold_start = time.perf_counter() - start
+    for kind, text, options in queries[1:6]:
+        searcher.search(text, limit=SEARCH_LIMIT, **options)
+
+    def run(query):
+        kind, text, options = query
+        query_start = time.perf_counter()
+        results = searcher.search(text, limit=SEARCH_LIMIT, **options)
+        return kind, (time.perf_counter() - query_start) * 1000, len(results)
+
+    start = time.perf_counter()
+    measured = [run(query) for query in queries]
+    sequential_seconds = time.perf_counter() - start
+    latencies = sorted(latency for _, latency, _ in measured)
+
+    result = {
+        "cold_start_ms": cold_start * 1000,
+        "queries": len(queries),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "qps": len(queries) / sequential_seconds,
+        "empty_results": sum(1 for _, _, hits in measured if hits == 0),
+        "by_kind_p50_ms": {kind: percentile(sorted(latency for k, latency, _ in measured if k == kind), 50)
+                           for kind in sorted({kind for kind, _, _ in measured})},
+    }
+    # 검색 서버처럼 여러 클라이언트가 한 Searcher를 동시에 사용할 때의 처리량
+    if config["clients"] > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=config["clients"]) as executor:
+            start = time.perf_counter()
+            concurrent_latencies = sorted(latency for _, latency, _ in executor.map(run, queries))
+            result[f"qps_{config['clients']}_clients"] = len(queries) / (time.perf_counter() - start)
+            result[f"p95_ms_{config['clients']}_clients"] = percentile(concurrent_latencies, 95)
+    return result
+
+PHASES = {"generate": phase_generate, "ingest": phase_ingest, "index": phase_index, "search": phase_search}
+
+def run_phase(name, config):
+    """단계를 새 프로세스에서 실행하고 결과 dict를 반환합니다 (출력의 마지막 줄이 결과 JSON)."""
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--phase", name, json.dumps(config)],
+                               capture_output=True, text=True, cwd=project_root)
+    if completed.returncode != 0:
+        print(completed.stdout[-2000:])
+        print(completed.stderr[-4000:], file=sys.stderr)
+        raise RuntimeError(f"'{name}' 단계가 실패했습니다 (종료 코드 {completed.returncode}).")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["wall_s"] = time.perf_counter() - start
+    return result
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=project_root).stdout.strip() or None
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                                    text=True, cwd=project_root).stdout.strip())
+    except OSError:
+        commit, dirty = None, None
+    import sqlite3
+    import numpy
+    import whoosh
+    return {
+        "git_commit": commit,
+        "git_dirty": dirty,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "sqlite": sqlite3.sqlite_version,
+        "numpy": numpy.__version__,
+        "whoosh": whoosh.versionstring(),
+    }
+
+def print_results(size, results):
+    generate, ingest, index, search = (results[name] for name in ("generate", "ingest", "index", "search"))
+    print(f"\n===== 메일 {size}통 =====")
+    source = "기존 코퍼스 사용" if generate["reused"] else f"생성 {generate['seconds']:.1f}s"
+    print(f"코퍼스: {generate['corpus_mb']:.1f}MB ({source})")
+    print(f"{'단계':<8} {'시간':>9} {'처리량':>12} {'최대 RSS':>10} {'자식 RSS':>10} {'디스크':>10}")
+    print(f"{'ingest':<8} {ingest['seconds']:>8.1f}s {ingest['emails_per_s']:>8.0f}통/s {ingest['peak_rss_mb']:>8.0f}MB "
+          f"{ingest['peak_child_rss_mb']:>8.0f}MB {ingest['db_mb']:>8.1f}MB")
+    index_mb = index["keyword_index_mb"] + index["vectors_mb"] + index["embedding_cache_mb"] + index["manifest_mb"]
+    print(f"{'index':<8} {index['seconds']:>8.1f}s {index['emails_per_s']:>8.0f}통/s {index['peak_rss_mb']:>8.0f}MB "
+          f"{index['peak_child_rss_mb']:>8.0f}MB {index_mb:>8.1f}MB")
+    print(f"  키워드 색인 {index['keyword_index_mb']:.1f}MB, 벡터 {index['vectors_mb']:.1f}MB, "
+          f"임베딩 캐시 {index['embedding_cache_mb']:.1f}MB, manifest {index['manifest_mb']:.1f}MB, "
+          f"변경 없는 증분 색인 {index['noop_reindex_s']:.2f}s")
+    print(f"검색 {search['queries']}회: p50 {search['p50_ms']:.1f}ms, p95 {search['p95_ms']:.1f}ms, "
+          f"p99 {search['p99_ms']:.1f}ms, {search['qps']:.1f} QPS, 첫 결과까지 {search['cold_start_ms']:.0f}ms, "
+          f"최대 RSS {search['peak_rss_mb']:.0f}MB")
+    for key, value in search.items():
+        if key.startswith("qps_") and key.endswith("_clients"):
+            print(f"  동시 클라이언트 {key[4:-8]}개: {value:.1f} QPS")
+    print("  질의 종류별 p50: " + ", ".join(f"{kind} {p50:.1f}ms" for kind, p50 in search["by_kind_p50_ms"].items()))
+
+# 비교할 지표 (단계, 키, 낮을수록 좋은지)
+COMPARE_METRICS = (
+    ("ingest", "seconds", True), ("ingest", "peak_rss_mb", True), ("ingest", "db_mb", True),
+    ("index", "seconds", True), ("index", "peak_rss_mb", True), ("index", "keyword_index_mb", True),
+    ("index", "vectors_mb", True), ("search", "cold_start_ms", True), ("search", "p50_ms", True),
+    ("search", "p95_ms", True), ("search", "p99_ms", True), ("search", "qps", False),
+    ("search", "peak_rss_mb", True),
+)
+
+def compare(old_path, new_path):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"이전: {old['env']['git_commit']} ({old['env']['timestamp']}), 새 결과: {new['env']['git_commit']} "
+          f"({new['env']['timestamp']})")
+    for key in ("keyword_engine", "vector_store", "model", "workers"):
+        if old["config"].get(key) != new["config"].get(key):
+            print(f"주의: 설정이 다릅니다 - {key}: {old['config'].get(key)} -> {new['config'].get(key)}")
+    for size in sorted(set(old["results"]) & set(new["results"]), key=int):
+        print(f"\n===== 메일 {size}통 =====")
+        print(f"{'지표':<26} {'이전':>12} {'새 결과':>12} {'변화':>9}")
+        for phase, key, lower_is_better in COMPARE_METRICS:
+            before = old["results"][size].get(phase, {}).get(key)
+            after = new["results"][size].get(phase, {}).get(key)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            worse = change > 5 if lower_is_better else change < -5
+            print(f"{phase + '.' + key:<26} {before:>12.2f} {after:>12.2f} {change:>+8.1f}%{' *' if worse else ''}")
+    print("\n(* 5% 넘게 나빠진 지표)")
+
+def main():
+    parser = argparse.ArgumentParser(description="합성 메일함으로 수집/색인/검색 전체 과정을 측정합니다.")
+    parser.add_argument("--sizes", default="10000", help="메일 수 목록 (쉼표로 구분, 예: 10000,100000,1000000)")
+    parser.add_argument("--queries", type=int, default=200, help="크기마다 측정할 검색 질의 수")
+    parser.add_argument("--clients", type=int, default=4, help="동시 검색 처리량을 잴 클라이언트 스레드 수 (1이면 생략)")
+    parser.add_argument("--keyword-engine", choices=("whoosh", "fts5"), default="whoosh", help="키워드 검색 엔진")
+    parser.add_argument("--vector-store", choices=("numpy", "ivfpq", "chroma"), default="numpy", help="벡터 저장소")
+    parser.add_argument("--model", action="store_true", help="해시 인코더 대신 SentenceTransformer 모델로 임베딩합니다.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="코퍼스 생성/파싱 프로세스 수")
+    parser.add_argument("--seed", type=int, default=42, help="합성 코퍼스 seed")
+    parser.add_argument("--work-dir", help="코퍼스와 색인을 만들 디렉터리 (지정하면 실행 후에도 남기고 코퍼스를 재사용)")
+    parser.add_argument("--output", help="결과 JSON 경로 (기본: bench_e2e_<시각>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="두 결과 JSON을 비교합니다.")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    work_dir = os.path.abspath(args.work_dir) if args.work_dir else tempfile.mkdtemp(prefix="bench_e2e_")
+    output = args.output or f"bench_e2e_{datetime.datetime.now():%Y%m%d_%H%M%S}.json"
+    config = {"keyword_engine": args.keyword_engine, "vector_store": args.vector_store, "model": args.model,
+              "workers": args.workers, "seed": args.seed, "queries": args.queries, "clients": args.clients}
+    report = {"env": environment(), "config": config, "results": {}}
+    try:
+        for size in (int(value) for value in args.sizes.split(",")):
+            size_dir = os.path.join(work_dir, str(size))
+            os.makedirs(size_dir, exist_ok=True)
+            phase_config = dict(config, size=size, work_dir=size_dir,
+                                corpus_dir=os.path.join(work_dir, f"corpus_{size}_{args.seed}"))
+            results = {}
+            for name in PHASES:
+                print(f"[{size}] {name} 단계 실행 중...", flush=True)
+                results[name] = run_phase(name, phase_config)
+            report["results"][str(size)] = results
+            print_results(size, results)
+            # 크기마다 저장해서 큰 크기에서 중단되어도 앞의 결과는 남김
+            with open(output, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n결과를 '{output}'에 저장했습니다.")
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--phase":
+        result = PHASES[sys.argv[2]](json.loads(sys.argv[3]))
+        result.update(peak_rss())
+        print(json.dumps(result))
+        sys.exit(0)
+    main()
@@ -0,0 +1,103 @@
+"""
+색인 임베딩 처리량(텍스트/초) 비교: 이전 방식 vs EmbeddingEngine.
+
+    python benchmarks/bench_embedding_engine.py --count 5000 --processes 1,2,4
+
+  - 이전 방식: 키워드 색인 묶음(100개)을 도착 순서대로 model.encode(batch)에 넘김 (내부 batch_size 32)
+  - engine: 텍스트를 토큰 길이 순으로 정렬하고 토큰 예산으로 배치 크기를 정함 (processes > 1이면 프로세스 풀)
+
+텍스트는 합성 메일함(generate_eml_files.SyntheticMailbox)의 제목 + 인용/서명을 뺀 본문으로,
+색인할 때 임베딩하는 텍스트와 같은 모양입니다. 모델 로드 시간은 빼고 측정하며,
+engine 결과가 이전 방식과 같은 순서의 같은 벡터인지도 확인합니다.
+"""
+import os
+import sys
+import time
+import argparse
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+from generate_eml_files import SyntheticMailbox
+from src.ingestion.dedup import strip_quoted_text
+from src.search.indexer import EMBEDDING_MODEL_NAME
+from src.search.embedding_engine import EmbeddingEngine, plan_batches, padded_tokens, DEFAULT_TOKEN_BUDGET
+
+SEED_JSON = os.path.join(project_root, "shipyard_ultra_complex_100.json")
+PIPELINE_BATCH = 100
+MODEL_BATCH = 32
+
+def embedding_texts(count, seed=42):
+    mailbox = SyntheticMailbox(SEED_JSON, seed=seed, count=count)
+    return [f"{email_dict['subject']}\n{strip_quoted_text(email_dict['body'])}\n" for email_dict in mailbox.emails(count)]
+
+def loop_batches(lengths):
+    """
+    이전 방식에서 모델이 실제로 만드는 배치: 100개 묶음마다 SentenceTransformer.encode가
+    길이 순으로 정렬해서 32개씩 나눔 (묶음을 넘어서는 정렬은 없음).
+    """
+    batches = []
+    for start in range(0, len(lengths), PIPELINE_BATCH):
+        chunk = sorted(range(start, min(start + PIPELINE_BATCH, len(lengths))), key=lambda i: -lengths[i])
+        batches.extend(chunk[i:i + MODEL_BATCH] for i in range(0, len(chunk), MODEL_BATCH))
+    return batches
+
+def run_loop(model, texts):
+    return np.vstack([model.encode(texts[start:start + PIPELINE_BATCH], show_progress_bar=False)
+                      for start in range(0, len(texts), PIPELINE_BATCH)])
+
+def timed(func, texts, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(texts)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, np.asarray(result, dtype=np.float32)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=2000, help="인코딩할 텍스트 수")
+    parser.add_argument("--processes", default=None,
+                        help="engine 프로세스 수 목록 (기본: 1과 CPU 코어 수)")
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET, help="engine 배치 하나의 토큰 수 상한")
+    parser.add_argument("--repeat", type=int, default=2, help="방식마다 반복 횟수 (가장 빠른 값 사용)")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="SentenceTransformer 모델 이름")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    process_counts = [int(value) for value in args.processes.split(",")] if args.processes else sorted({1, cpus})
+
+    print(f"텍스트 {args.count}개 생성 중...")
+    texts = embedding_texts(args.count)
+    engine = EmbeddingEngine(args.model, token_budget=args.token_budget)
+    model = engine.load()
+    lengths = engine.token_lengths(texts)
+    print(f"토큰 길이: 평균 {lengths.mean():.0f}, p50 {np.median(lengths):.0f}, 최대 {lengths.max()} "
+          f"(max_seq_length {model.max_seq_length}), CPU {cpus}개")
+
+    # 워밍업 (첫 호출의 초기화 비용 제외)
+    model.encode(texts[:MODEL_BATCH], show_progress_bar=False)
+
+    real_tokens = int(lengths.sum())
+    print(f"\n{'방식':<22} {'배치 수':>8} {'패딩 효율':>10} {'시간':>9} {'텍스트/초':>10} {'배속':>7} {'최대 오차':>10}")
+    batches = loop_batches(lengths)
+    loop_seconds, expected = timed(lambda items: run_loop(model, items), texts, args.repeat)
+    print(f"{'이전 방식 (100개씩)':<22} {len(batches):>8} {real_tokens / padded_tokens(batches, lengths):>10.1%} "
+          f"{loop_seconds:>8.2f}s {len(texts) / loop_seconds:>10.1f} {1.0:>6.2f}x {'-':>10}")
+
+    for processes in process_counts:
+        engine.processes = processes
+        if processes > 1:
+            # 작업자 프로세스의 모델 로드는 측정에서 제외
+            engine._get_pool()
+            engine.encode(texts[:MODEL_BATCH * processes * 2])
+        batches = plan_batches(lengths, args.token_budget, engine.max_batch_size)
+        seconds, vectors = timed(engine.encode, texts, args.repeat)
+        error = float(np.abs(vectors - expected).max())
+        label = f"engine (프로세스 {processes})"
+        print(f"{label:<22} {len(batches):>8} {real_tokens / padded_tokens(batches, lengths):>10.1%} "
+              f"{seconds:>8.2f}s {len(texts) / seconds:>10.1f} {loop_seconds / seconds:>6.2f}x {error:>10.2e}")
+        engine.close()
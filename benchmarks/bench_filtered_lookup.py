@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import time
+import shutil
+import datetime
+import tempfile
+import statistics
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.ingestion.storage import SQLiteStorage, normalize_address
+from benchmarks.synthetic import synthetic_emails
+
+MARCH = (datetime.date(2023, 3, 1), datetime.date(2023, 4, 1))
+
+def load(db_path, count):
+    storage = SQLiteStorage(db_path, bulk_load=True)
+    storage.connect()
+    storage.create_table()
+    batch = []
+    for email_obj in synthetic_emails(count):
+        batch.append(email_obj)
+        if len(batch) >= 1000:
+            storage.insert_emails(batch)
+            batch = []
+    if batch:
+        storage.insert_emails(batch)
+    storage.finish_bulk_load()
+    return storage
+
+def scan_to(conn, address):
+    """이전 방식: 전체 행을 읽고 receivers JSON을 Python에서 디코딩."""
+    return [message_id for message_id, receivers in conn.execute("SELECT message_id, receivers FROM emails;")
+            if address in {normalize_address(r) for r in json.loads(receivers or "[]")}]
+
+def scan_from_in_march(conn, address):
+    start, end = (d.isoformat() for d in MARCH)
+    return [message_id for message_id, sender, sent_date in conn.execute("SELECT message_id, sender, sent_date FROM emails;")
+            if normalize_address(sender) == address and sent_date and start <= sent_date < end]
+
+def timed(func, repeat=5):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies), len(result)
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    work_dir = tempfile.mkdtemp(prefix="bench_lookup_")
+    try:
+        print(f"합성 이메일 {count}개 적재 중...")
+        storage = load(os.path.join(work_dir, "emails.db"), count)
+        conn = storage.conn
+        # 가장 많이 받은 주소와 가장 많이 보낸 주소를 대상으로 측정
+        recipient = conn.execute("""
+            SELECT a.address FROM message_recipients AS r JOIN addresses AS a ON a.id = r.address_id
+            GROUP BY a.address ORDER BY COUNT(*) DESC LIMIT 1;""").fetchone()[0]
+        sender = conn.execute("""
+            SELECT a.address FROM emails AS e JOIN addresses AS a ON a.id = e.sender_id
+            GROUP BY a.address ORDER BY COUNT(*) DESC LIMIT 1;""").fetchone()[0]
+
+        cases = (
+            (f"'{recipient}'에게 온 메일", lambda: scan_to(conn, recipient),
+             lambda: storage.find_emails(recipient=recipient)),
+            (f"'{sender}'가 3월에 보낸 메일", lambda: scan_from_in_march(conn, sender),
+             lambda: storage.find_emails(sender=sender, date_from=MARCH[0], date_to=MARCH[1])),
+        )
+        for label, scan, indexed in cases:
+            scan_ms, scan_rows = timed(scan)
+            indexed_ms, indexed_rows = timed(indexed)
+            print(f"\n{label}")
+            print(f"  전체 스캔 + JSON: {scan_ms:8.1f} ms ({scan_rows}건)")
+            print(f"  인덱스 조회:      {indexed_ms:8.1f} ms ({indexed_rows}건)")
+        storage.close()
+    finally:
+        shutil.rmtree(work_dir)
@@ -0,0 +1,107 @@
+import os
+import sys
+import time
+import shutil
+import datetime
+import tempfile
+import statistics
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+from benchmarks.bench_keyword_engines import build_whoosh, build_fts, SEARCH_FIELDS
+from src.search.keyword_engine import WhooshKeywordEngine, SQLiteFTSKeywordEngine
+from src.search.filters import SearchFilters, vector_metadata
+from src.search.vector_store import ChromaVectorStore, NumpyVectorStore
+from benchmarks.synthetic import synthetic_emails
+
+QUERIES = ["delay", "NDT", "납기", "품질", "납기 지연"]
+EMBEDDING_DIM = 384
+
+def build_vectors(store, count, batch_size=1000):
+    """합성 이메일의 필터 메타데이터와 무작위 벡터로 벡터 저장소를 채웁니다 (모델 없이 측정)."""
+    rng = np.random.default_rng(0)
+    batch = []
+    for email_obj in synthetic_emails(count):
+        batch.append(email_obj)
+        if len(batch) >= batch_size:
+            _add_vectors(store, batch, rng)
+            batch = []
+    if batch:
+        _add_vectors(store, batch, rng)
+    return store
+
+def _add_vectors(store, batch, rng):
+    store.upsert([email_obj.message_id for email_obj in batch],
+                 rng.standard_normal((len(batch), EMBEDDING_DIM)).astype(np.float32),
+                 metadatas=[vector_metadata(email_obj) for email_obj in batch])
+
+def time_keyword(engine, filters, limit, repeat):
+    latencies = []
+    hits = 0
+    for _ in range(repeat):
+        for query_string in QUERIES:
+            start = time.perf_counter()
+            result = engine.search(query_string, SEARCH_FIELDS, limit, filters=filters)[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(result)
+    return statistics.median(latencies), hits / (repeat * len(QUERIES))
+
+def time_vectors(store, filters, limit, repeat):
+    rng = np.random.default_rng(1)
+    latencies = []
+    hits = exact = 0
+    for _ in range(repeat * len(QUERIES)):
+        query_embedding = rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+        start = time.perf_counter()
+        ids, _, used_exact = store.query(query_embedding, limit, filters=filters)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(ids)
+        exact += used_exact
+    return statistics.median(latencies), hits / (repeat * len(QUERIES)), exact
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with_vectors = "--no-vectors" not in sys.argv
+
+    work_dir = tempfile.mkdtemp(prefix="bench_filtered_")
+    try:
+        index_dir = os.path.join(work_dir, "index")
+        os.makedirs(index_dir)
+        db_path = os.path.join(work_dir, "emails.db")
+        print(f"합성 이메일 {count}개로 색인 생성 중...")
+        build_whoosh(index_dir, count)
+        build_fts(db_path, count)
+        engines = [WhooshKeywordEngine(index_dir), SQLiteFTSKeywordEngine(db_path)]
+        stores = []
+        if with_vectors:
+            stores = [build_vectors(ChromaVectorStore(os.path.join(work_dir, "chroma"), create=True), count),
+                      build_vectors(NumpyVectorStore(os.path.join(work_dir, "vectors"), create=True), count)]
+
+        sender = next(iter(synthetic_emails(1))).sender
+        march = (datetime.date(2023, 3, 1), datetime.date(2023, 4, 1))
+        cases = (
+            ("필터 없음", SearchFilters()),
+            ("발신자", SearchFilters(sender=sender)),
+            ("발신자 + 3월", SearchFilters(sender=sender, date_from=march[0], date_to=march[1])),
+            ("폴더 /Inbox/Projects", SearchFilters(folder="/Inbox/Projects")),
+            ("3월 + /Archive", SearchFilters(date_from=march[0], date_to=march[1], folder="/Archive")),
+        )
+
+        names = [engine.name for engine in engines + stores]
+        print(f"\np50 지연 시간(ms)과 평균 결과 수 (limit={limit}, 발신자={sender})")
+        print(f"{'조건':<22}" + "".join(f"{name:>20}" for name in names))
+        for label, filters in cases:
+            columns = [time_keyword(engine, filters, limit, repeat=5) for engine in engines]
+            note = ""
+            for store in stores:
+                p50, hits, exact = time_vectors(store, filters, limit, repeat=5)
+                columns.append((p50, hits))
+                if exact:
+                    note += f"  ({store.name}: {exact}/{5 * len(QUERIES)}회 직접 비교)"
+            print(f"{label:<22}" + "".join(f"{p50:>10.1f}ms {hits:>6.0f}건" for p50, hits in columns) + note)
+    finally:
+        shutil.rmtree(work_dir)
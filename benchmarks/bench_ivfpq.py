@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import statistics
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+from src.search.vector_store import NumpyVectorStore, IVFPQVectorStore
+
+EMBEDDING_DIM = 384
+NPROBES = (1, 2, 4, 8, 16, 32)
+RERANKS = (0, 50, 200)
+RECALL_AT = (10, 50)
+
+def clustered_unit_vectors(rng, centers, size, noise=1.0):
+    """
+    중심 주변에 모인 정규화된 벡터. 실제 임베딩처럼 주제별로 뭉쳐 있어야 IVF 분할이 의미가 있으므로
+    (완전히 무작위인 벡터는 모든 목록에 고르게 흩어져 근사 검색의 최악의 경우가 됨) 혼합 분포를 사용합니다.
+    """
+    vectors = centers[rng.integers(0, len(centers), size)] + \
+        noise * rng.standard_normal((size, EMBEDDING_DIM)).astype(np.float32) / np.sqrt(EMBEDDING_DIM)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def build(store, count, seed=0, batch_size=10000):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(count // 200, 16), EMBEDDING_DIM)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        store.upsert([f"synthetic_{i}" for i in range(start, start + size)], clustered_unit_vectors(rng, centers, size))
+    return centers
+
+def run(store, queries, limit):
+    """질의별 결과 ID와 p50 지연 시간(ms)."""
+    results, latencies = [], []
+    for vector in queries:
+        start = time.perf_counter()
+        ids = store.query(vector, limit)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(ids)
+    return results, statistics.median(latencies)
+
+def recall(results, truth, k):
+    return statistics.mean(len(set(found[:k]) & set(exact[:k])) / k for found, exact in zip(results, truth))
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    queries = 100
+    limit = max(RECALL_AT)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_ivfpq_")
+    try:
+        store_dir = os.path.join(work_dir, "vectors")
+        print(f"혼합 분포의 {EMBEDDING_DIM}차원 벡터 {count}개로 저장소 생성 중...")
+        start = time.perf_counter()
+        store = IVFPQVectorStore(store_dir, create=True)
+        centers = build(store, count)
+        build_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        store.finish_indexing()
+        train_seconds = time.perf_counter() - start
+        index = store.index
+
+        # 정답: 같은 저장소 파일을 전부 비교하는 정확한 검색
+        exact_store = NumpyVectorStore(store_dir)
+        query_vectors = clustered_unit_vectors(np.random.default_rng(1), centers, queries)
+        truth, exact_p50 = run(exact_store, query_vectors, limit)
+
+        ids_mb = sum(len(doc_id) + 1 for doc_id in store.ids) / 1024 / 1024
+        print(f"\n벡터 저장: {build_seconds:.1f}s, IVF-PQ 학습/인코딩: {train_seconds:.1f}s "
+              f"(목록 {index.nlist}개, 부분 공간 {index.m}개)")
+        print(f"행 단위 인덱스 메모리: {index.nbytes() / count:.1f}바이트/메일 ({index.nbytes() / 1024 / 1024:.1f}MB), "
+              f"전체 벡터(float16): {exact_store.vectors.nbytes / 1024 / 1024:.1f}MB, message_id 파일: {ids_mb:.1f}MB")
+        print(f"정확한 검색 p50: {exact_p50:.2f}ms")
+
+        print(f"\n{'nprobe':>6} {'rerank':>6} {'p50':>9} " + "".join(f"{f'recall@{k}':>11}" for k in RECALL_AT))
+        for nprobe in NPROBES:
+            for rerank in RERANKS:
+                store.nprobe, store.rerank = nprobe, rerank
+                results, p50 = run(store, query_vectors, limit)
+                print(f"{nprobe:>6} {rerank:>6} {p50:>7.2f}ms " + "".join(f"{recall(results, truth, k):>11.3f}" for k in RECALL_AT))
+    finally:
+        shutil.rmtree(work_dir)
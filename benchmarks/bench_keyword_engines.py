@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+import statistics
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from whoosh.index import create_in
+from src.ingestion.storage import SQLiteStorage, FTS_TABLE
+from src.search.indexer import EmailIndexer
+from src.search.keyword_engine import WhooshKeywordEngine, SQLiteFTSKeywordEngine
+from benchmarks.synthetic import synthetic_emails
+
+SEARCH_FIELDS = ["subject", "body_plain", "attachment_text", "sender"]
+QUERIES = ["delay", "NDT", "MCR", "납기", "품질", "납기 지연", "NDT 불합격"]
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def build_whoosh(index_dir, count):
+    ix = create_in(index_dir, EmailIndexer._create_schema())
+    writer = ix.writer(limitmb=256)
+    for email_obj in synthetic_emails(count):
+        writer.add_document(**EmailIndexer._whoosh_fields(email_obj))
+    writer.commit()
+
+def build_fts(db_path, count, batch_size=1000):
+    storage = SQLiteStorage(db_path, bulk_load=True, fts=True)
+    storage.connect()
+    storage.create_table()
+    batch = []
+    for email_obj in synthetic_emails(count):
+        batch.append(email_obj)
+        if len(batch) >= batch_size:
+            storage.insert_emails(batch)
+            batch = []
+    if batch:
+        storage.insert_emails(batch)
+    storage.finish_bulk_load()
+    storage.close()
+
+def fts_size(db_path):
+    """FTS5 색인 테이블(emails_fts_*)이 차지하는 바이트 수. dbstat이 없으면 None."""
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE ?;", (f"{FTS_TABLE}%",)).fetchone()
+        return row[0]
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+def time_queries(engine, queries, limit, repeat):
+    latencies = []
+    for _ in range(repeat):
+        for query_string in queries:
+            start = time.perf_counter()
+            engine.search(query_string, SEARCH_FIELDS, limit)
+            latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    work_dir = tempfile.mkdtemp(prefix="bench_keyword_")
+    try:
+        index_dir = os.path.join(work_dir, "index")
+        db_path = os.path.join(work_dir, "emails.db")
+        os.makedirs(index_dir)
+
+        print(f"합성 이메일 {count}개로 색인 생성 중...")
+        start = time.perf_counter()
+        build_whoosh(index_dir, count)
+        whoosh_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        build_fts(db_path, count)
+        fts_build = time.perf_counter() - start
+
+        whoosh = WhooshKeywordEngine(index_dir)
+        fts = SQLiteFTSKeywordEngine(db_path)
+
+        print(f"\n{'엔진':<8} {'색인 생성':>10} {'색인 크기':>12} {'p50':>10} {'p95':>10}")
+        for engine, build_seconds, size in (
+                (whoosh, whoosh_build, dir_size(index_dir)),
+                (fts, fts_build, os.path.getsize(db_path))):
+            p50, p95 = time_queries(engine, QUERIES, limit, repeat=5)
+            print(f"{engine.name:<8} {build_seconds:>9.1f}s {size / 1024 / 1024:>10.1f}MB {p50:>8.1f}ms {p95:>8.1f}ms")
+
+        fts_bytes = fts_size(db_path)
+        if fts_bytes is not None:
+            print(f"\n(fts5 크기는 emails 테이블을 포함한 DB 전체이며, 그중 FTS5 색인은 {fts_bytes / 1024 / 1024:.1f}MB)")
+        print("\n질의별 결과 수 (limit={}):".format(limit))
+        for query_string in QUERIES:
+            counts = [len(engine.search(query_string, SEARCH_FIELDS, limit)[0]) for engine in (whoosh, fts)]
+            print(f"  {query_string:<12} whoosh {counts[0]:>4}, fts5 {counts[1]:>4}")
+    finally:
+        shutil.rmtree(work_dir)
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import statistics
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from whoosh.index import create_in
+from whoosh.qparser import MultifieldParser
+from src.search.indexer import EmailIndexer
+from benchmarks.synthetic import synthetic_emails
+
+SEARCH_FIELDS = ["subject", "body_plain", "attachment_text", "sender"]
+
+def build_index(index_dir, count):
+    ix = create_in(index_dir, EmailIndexer._create_schema())
+    writer = ix.writer(limitmb=256)
+    for email_obj in synthetic_emails(count):
+        writer.add_document(
+            message_id=email_obj.message_id,
+            subject=email_obj.subject,
+            body_plain=email_obj.body_plain,
+            attachment_text=email_obj.attachment_text,
+            sender=email_obj.sender,
+            receivers=",".join(email_obj.receivers),
+            sent_date=email_obj.sent_date,
+            folder_path=email_obj.folder_path,
+            thread_topic=email_obj.thread_topic
+        )
+    writer.commit()
+    return ix
+
+def keyword_leg(ix, query_string, limit):
+    """Searcher.search의 키워드 경로와 같은 작업(검색 + 점수 dict 구성)을 수행합니다."""
+    parser = MultifieldParser(SEARCH_FIELDS, schema=ix.schema)
+    query = parser.parse(query_string)
+    scores = {}
+    with ix.searcher() as searcher:
+        results = searcher.search(query, limit=limit)
+        for hit in results:
+            scores[hit['message_id']] = hit.score
+    return scores
+
+def time_queries(ix, queries, limit, repeat):
+    latencies = []
+    for _ in range(repeat):
+        for query_string in queries:
+            start = time.perf_counter()
+            keyword_leg(ix, query_string, limit)
+            latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    queries = ["delay", "NDT", "MCR", "납기", "품질"]
+
+    index_dir = tempfile.mkdtemp(prefix="bench_topk_")
+    try:
+        print(f"합성 이메일 {count}개로 Whoosh 색인 생성 중...")
+        start = time.perf_counter()
+        ix = build_index(index_dir, count)
+        print(f"색인 생성 {time.perf_counter() - start:.1f}초")
+
+        for name, limit in (("limit=None", None), (f"limit={depth}", depth)):
+            p50, p95 = time_queries(ix, queries, limit, repeat=5)
+            print(f"  {name:>12}: p50 {p50:.1f} ms, p95 {p95:.1f} ms")
+    finally:
+        shutil.rmtree(index_dir)
@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+import resource
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.ingestion.parser import parse_pst_file
+
+def bench_pst_ingest(pst_file_path, repeat=3):
+    """
+    parse_pst_file의 처리량(초당 메시지 수, 초당 MB)과 최대 RSS를 측정합니다.
+    """
+    size_mb = os.path.getsize(pst_file_path) / (1024 * 1024)
+    best = None
+    message_count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        message_count = sum(1 for _ in parse_pst_file(pst_file_path))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "pst_file": pst_file_path,
+        "size_mb": size_mb,
+        "messages": message_count,
+        "seconds": best,
+        "messages_per_sec": message_count / best if best else 0.0,
+        "mb_per_sec": size_mb / best if best else 0.0,
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+if __name__ == "__main__":
+    pst_path = sys.argv[1] if len(sys.argv) > 1 else "Shipyard_H1004_Project_V2.pst"
+    result = bench_pst_ingest(pst_path)
+    print("\n--- PST 수집 처리량 ---")
+    print(f"  파일: {result['pst_file']} ({result['size_mb']:.2f} MB)")
+    print(f"  메시지 수: {result['messages']}")
+    print(f"  소요 시간(최소): {result['seconds']:.3f}초")
+    print(f"  처리량: {result['messages_per_sec']:.1f} msg/s, {result['mb_per_sec']:.2f} MB/s")
+    print(f"  최대 RSS: {result['peak_rss_mb']:.1f} MB")
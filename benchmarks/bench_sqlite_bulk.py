@@ -0,0 +1,107 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import sqlite3
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.ingestion.storage import SQLiteStorage
+from benchmarks.synthetic import synthetic_emails
+
+BATCH_SIZE = 1000
+
+# 이전 방식: 기본 rollback journal, UNIQUE 없는 테이블, 배치(100개)마다 커밋
+_LEGACY_CREATE_SQL = """
+CREATE TABLE emails (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id TEXT NOT NULL,
+    subject TEXT, body_plain TEXT, body_html TEXT, sender TEXT, receivers TEXT,
+    sent_date TIMESTAMP, folder_path TEXT, thread_topic TEXT,
+    ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+_LEGACY_INSERT_SQL = """
+INSERT INTO emails (message_id, subject, body_plain, body_html, sender, receivers, sent_date, folder_path, thread_topic)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+
+def _batches(count, batch_size):
+    batch = []
+    for email_obj in synthetic_emails(count):
+        batch.append(email_obj)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def time_generation(count):
+    start = time.perf_counter()
+    for _ in _batches(count, BATCH_SIZE):
+        pass
+    return time.perf_counter() - start
+
+def load_legacy(db_path, count):
+    conn = sqlite3.connect(db_path)
+    conn.execute(_LEGACY_CREATE_SQL)
+    conn.execute("CREATE INDEX idx_message_id ON emails (message_id);")
+    start = time.perf_counter()
+    for batch in _batches(count, 100):
+        rows = [(e.message_id, e.subject, e.body_plain, e.body_html, e.sender, json.dumps(e.receivers),
+                 e.sent_date.isoformat(), e.folder_path, e.thread_topic) for e in batch]
+        conn.executemany(_LEGACY_INSERT_SQL, rows)
+        conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+def load_bulk(db_path, count):
+    storage = SQLiteStorage(db_path, bulk_load=True)
+    storage.connect()
+    storage.create_table()
+    start = time.perf_counter()
+    for batch in _batches(count, BATCH_SIZE):
+        storage.insert_emails(batch)
+    storage.finish_bulk_load()
+    elapsed = time.perf_counter() - start
+    storage.close()
+    return elapsed
+
+def run(count, modes):
+    gen_seconds = time_generation(count)
+    results = {"rows": count, "generation_seconds": gen_seconds}
+    for name, loader in modes:
+        work_dir = tempfile.mkdtemp(prefix="bench_sqlite_")
+        try:
+            db_path = os.path.join(work_dir, "emails.db")
+            seconds = loader(db_path, count)
+            # 합성 데이터 생성 시간은 두 방식에 공통이므로 제외한 순수 적재 속도도 함께 기록
+            net = max(seconds - gen_seconds, 1e-9)
+            results[name] = {
+                "seconds": seconds,
+                "rows_per_sec": count / seconds,
+                "net_rows_per_sec": count / net,
+                "db_mb": sum(os.path.getsize(os.path.join(work_dir, f)) for f in os.listdir(work_dir)) / (1024 * 1024),
+            }
+        finally:
+            shutil.rmtree(work_dir)
+    return results
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100000, 1000000]
+    modes = [("legacy", load_legacy), ("bulk", load_bulk)]
+    all_results = []
+    for count in sizes:
+        result = run(count, modes)
+        all_results.append(result)
+        print(f"\n--- {count}건 (합성 데이터 생성 {result['generation_seconds']:.1f}초 포함) ---")
+        for name, _ in modes:
+            r = result[name]
+            print(f"  {name:>6}: {r['seconds']:.1f}초, {r['rows_per_sec']:.0f} rows/s "
+                  f"(생성 제외 {r['net_rows_per_sec']:.0f} rows/s), DB {r['db_mb']:.0f} MB")
+    print(json.dumps(all_results, indent=2))
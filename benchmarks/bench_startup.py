@@ -0,0 +1,81 @@
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+SUBCOMMANDS = ["ingest", "index", "search", "serve"]
+
+# '--help'만으로는 로드되면 안 되는 무거운 패키지
+HEAVY_MODULES = ["torch", "sentence_transformers", "chromadb", "fitz", "pymupdf", "docx", "numpy", "whoosh", "pypff"]
+
+# 하위 명령별 임포트 시간 예산 (ms)
+DEFAULT_BUDGET_MS = 100.0
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)")
+
+def parse_importtime(stderr):
+    """
+    '-X importtime' 출력을 파싱합니다.
+    반환값: (최상위 임포트의 누적 시간 합(ms), 임포트된 모듈 이름 집합)
+    """
+    total_us = 0
+    modules = set()
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        modules.add(name)
+        # 들여쓰기가 없는 항목이 최상위 임포트. site(.pth 처리)는 설치 환경에 따라 달라지므로 제외
+        if len(indent) == 1 and name != "site":
+            total_us += int(cumulative)
+    return total_us / 1000, modules
+
+def measure_subcommand(subcommand, repeat=5):
+    import_ms = []
+    modules = set()
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "main.py", subcommand, "--help"],
+            cwd=project_root, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"'main.py {subcommand} --help' 실행 실패:\n{completed.stderr[-2000:]}")
+        total_ms, modules = parse_importtime(completed.stderr)
+        import_ms.append(total_ms)
+    heavy = sorted({m.split(".")[0] for m in modules} & set(HEAVY_MODULES))
+    return {"import_ms": statistics.median(import_ms), "heavy_modules": heavy}
+
+def main():
+    parser = argparse.ArgumentParser(description="main.py 하위 명령별 임포트 시간을 측정하고 예산 초과 시 실패합니다.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="하위 명령별 임포트 시간 예산(ms)")
+    parser.add_argument("--repeat", type=int, default=5, help="반복 측정 횟수 (중앙값 사용)")
+    parser.add_argument("--json", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    results = {}
+    failed = False
+    for subcommand in SUBCOMMANDS:
+        result = measure_subcommand(subcommand, repeat=args.repeat)
+        result["budget_ms"] = args.budget_ms
+        result["ok"] = result["import_ms"] <= args.budget_ms and not result["heavy_modules"]
+        results[subcommand] = result
+        failed = failed or not result["ok"]
+
+        status = "OK" if result["ok"] else "FAIL"
+        print(f"[{status}] main.py {subcommand} --help: 임포트 {result['import_ms']:.1f} ms (예산 {args.budget_ms:.0f} ms)")
+        if result["heavy_modules"]:
+            print(f"       무거운 모듈이 로드됨: {', '.join(result['heavy_modules'])}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+import statistics
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from whoosh.index import create_in
+from src.ingestion.storage import SQLiteStorage
+from src.ingestion.threads import ThreadIndex
+from src.search.indexer import EmailIndexer
+from src.search.keyword_engine import WhooshKeywordEngine, SQLiteFTSKeywordEngine
+from benchmarks.bench_dedup import thread_emails
+
+SEARCH_FIELDS = ["subject", "body_plain", "attachment_text", "sender"]
+QUERIES = ["납기", "품질", "검사", "블록", "설계 변경", "납기 지연"]
+LIMIT = 10
+OVERFETCH = (1, 5, 20)
+
+def threaded_emails(thread_count, batch_size=1000):
+    """bench_dedup의 인용 스레드에 Message-ID/In-Reply-To/References를 붙임 (사본은 같은 Message-ID)."""
+    batch = []
+    for email_obj in thread_emails(thread_count):
+        _, t, r, _ = email_obj.message_id.split("_")
+        email_obj.internet_message_id = f"t{t}r{r}@bench"
+        if int(r):
+            email_obj.in_reply_to = f"t{t}r{int(r) - 1}@bench"
+            email_obj.references = [f"t{t}r{i}@bench" for i in range(int(r))]
+        batch.append(email_obj)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def build(work_dir, thread_count):
+    index_dir = os.path.join(work_dir, "index")
+    os.makedirs(index_dir)
+    ix = create_in(index_dir, EmailIndexer._create_schema())
+    writer = ix.writer(limitmb=256)
+    threads = ThreadIndex(sqlite3.connect(os.path.join(work_dir, "threads.db")))
+    threads.create_tables()
+    storage = SQLiteStorage(os.path.join(work_dir, "emails.db"), bulk_load=True, fts=True)
+    storage.connect()
+    storage.create_table()
+    for batch in threaded_emails(thread_count):
+        threads.assign(batch)
+        for email_obj in batch:
+            writer.add_document(**EmailIndexer._whoosh_fields(email_obj))
+        storage.insert_emails(batch)
+    writer.commit()
+    threads.conn.commit()
+    storage.finish_bulk_load()
+    storage.close()
+    return WhooshKeywordEngine(index_dir), SQLiteFTSKeywordEngine(os.path.join(work_dir, "emails.db"))
+
+def top_threads(engine, query_string, factor):
+    """
+    factor=None이면 엔진 안에서 스레드별로 묶고 (collapse), 아니면 LIMIT * factor개를 가져와서
+    thread_id로 중복을 뺀 뒤 상위 LIMIT개를 남깁니다 (이전 방식).
+    """
+    if factor is None:
+        hits = engine.search(query_string, SEARCH_FIELDS, LIMIT, collapse=True)[0]
+        with engine.reader() as reader:
+            return {reader.load_fields(handle, ("thread_id",))["thread_id"] for _, handle in hits.values()}
+    hits = engine.search(query_string, SEARCH_FIELDS, LIMIT * factor)[0]
+    threads = []
+    with engine.reader() as reader:
+        for _, handle in sorted(hits.values(), key=lambda hit: -hit[0]):
+            thread_id = reader.load_fields(handle, ("thread_id",))["thread_id"]
+            if thread_id not in threads:
+                threads.append(thread_id)
+            if len(threads) >= LIMIT:
+                break
+    return set(threads)
+
+def measure(engine, factor, repeat=5):
+    latencies, distinct = [], []
+    for _ in range(repeat):
+        for query_string in QUERIES:
+            start = time.perf_counter()
+            threads = top_threads(engine, query_string, factor)
+            latencies.append((time.perf_counter() - start) * 1000)
+            distinct.append(len(threads))
+    return statistics.median(latencies), statistics.mean(distinct)
+
+if __name__ == "__main__":
+    thread_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    work_dir = tempfile.mkdtemp(prefix="bench_threads_")
+    try:
+        print(f"스레드 {thread_count}개 (답장 6통, 메일마다 사본 2개 = 스레드당 12통) 색인 생성 중...")
+        start = time.perf_counter()
+        engines = build(work_dir, thread_count)
+        print(f"색인 생성: {time.perf_counter() - start:.1f}s")
+
+        print(f"\n상위 {LIMIT}개 결과의 서로 다른 스레드 수 (질의 {len(QUERIES)}개 평균)와 p50 지연 시간")
+        print(f"{'엔진':<8} {'방식':<24} {'p50':>9} {'스레드 수':>10}")
+        for engine in engines:
+            for factor in OVERFETCH:
+                p50, distinct = measure(engine, factor)
+                label = "상위 결과 그대로" if factor == 1 else f"{factor}배 가져와서 중복 제거"
+                print(f"{engine.name:<8} {label:<24} {p50:>7.2f}ms {distinct:>10.1f}")
+            p50, distinct = measure(engine, None)
+            print(f"{engine.name:<8} {'엔진 collapse':<24} {p50:>7.2f}ms {distinct:>10.1f}")
+    finally:
+        shutil.rmtree(work_dir)
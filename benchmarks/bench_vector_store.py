@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+EMBEDDING_DIM = 384
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def rss_mb():
+    """현재 프로세스의 RSS (MB)."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+# (이름, 저장소 종류, numpy 저장소 dtype)
+STORES = (("chroma", "chroma", None), ("numpy", "numpy", "float16"), ("numpy-f32", "numpy", "float32"))
+
+def random_unit_vectors(rng, size):
+    """정규화된 무작위 벡터 (chroma의 L2 거리와 numpy의 코사인 순위가 같아지도록)."""
+    import numpy as np
+    vectors = rng.standard_normal((size, EMBEDDING_DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def build(store_name, store_dir, count, dtype=None, batch_size=2000):
+    import numpy as np
+    from src.search.vector_store import ChromaVectorStore, NumpyVectorStore
+    if store_name == "chroma":
+        store = ChromaVectorStore(store_dir, create=True)
+    else:
+        store = NumpyVectorStore(store_dir, create=True, dtype=np.dtype(dtype))
+    rng = np.random.default_rng(0)
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        store.upsert([f"synthetic_{i}" for i in range(start, start + size)],
+                     random_unit_vectors(rng, size),
+                     metadatas=[{"sent_ts": i} for i in range(start, start + size)],
+                     documents=[f"문서 {i}" for i in range(start, start + size)] if store_name == "chroma" else None)
+
+def measure(store_name, store_dir, queries, limit):
+    """새 프로세스에서 실행: 임포트부터 첫 결과까지의 시간, 질의 지연 시간, RSS를 JSON으로 출력합니다."""
+    start = time.perf_counter()
+    import numpy as np
+    from src.search.vector_store import create_vector_store
+    store = create_vector_store(store_name, chroma_dir=store_dir, vector_dir=store_dir)
+    rng = np.random.default_rng(1)
+    vectors = random_unit_vectors(rng, queries + 1)
+    store.query(vectors[0], limit)
+    cold_start = time.perf_counter() - start
+
+    latencies = []
+    for vector in vectors[1:]:
+        query_start = time.perf_counter()
+        store.query(vector, limit)
+        latencies.append((time.perf_counter() - query_start) * 1000)
+    latencies.sort()
+    print(json.dumps({
+        "cold_start_ms": cold_start * 1000,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "rss_mb": rss_mb(),
+    }))
+
+def recall(work_dir, limit, queries=20):
+    """chroma(HNSW) 결과가 numpy(정확한 코사인) 결과와 얼마나 겹치는지 비교합니다."""
+    import numpy as np
+    from src.search.vector_store import create_vector_store
+    stores = [create_vector_store(name, chroma_dir=os.path.join(work_dir, name), vector_dir=os.path.join(work_dir, name))
+              for name in ("chroma", "numpy")]
+    rng = np.random.default_rng(2)
+    overlaps = []
+    for vector in random_unit_vectors(rng, queries):
+        chroma_ids, numpy_ids = (set(store.query(vector, limit)[0]) for store in stores)
+        overlaps.append(len(chroma_ids & numpy_ids) / limit)
+    return sum(overlaps) / len(overlaps)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--measure":
+        measure(sys.argv[2], sys.argv[3], int(sys.argv[4]), int(sys.argv[5]))
+        sys.exit(0)
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    queries = 50
+
+    work_dir = tempfile.mkdtemp(prefix="bench_vectors_")
+    try:
+        print(f"무작위 {EMBEDDING_DIM}차원 벡터 {count}개로 저장소 생성 중...")
+        results = {}
+        for name, store_name, dtype in STORES:
+            store_dir = os.path.join(work_dir, name)
+            start = time.perf_counter()
+            build(store_name, store_dir, count, dtype)
+            build_seconds = time.perf_counter() - start
+            # 캐시된 모듈/객체 없이 측정하도록 새 프로세스에서 실행
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", store_name, store_dir,
+                                     str(queries), str(limit)], capture_output=True, text=True, check=True).stdout
+            results[name] = dict(json.loads(output.strip().splitlines()[-1]),
+                                 build_s=build_seconds, size_mb=dir_size(store_dir) / 1024 / 1024)
+
+        print(f"\n{'저장소':<10} {'생성':>8} {'크기':>10} {'첫 결과까지':>12} {'RSS':>10} {'p50':>9} {'p95':>9}  (n_results={limit})")
+        for name, r in results.items():
+            print(f"{name:<10} {r['build_s']:>7.1f}s {r['size_mb']:>8.1f}MB {r['cold_start_ms']:>10.0f}ms "
+                  f"{r['rss_mb']:>8.1f}MB {r['p50_ms']:>7.2f}ms {r['p95_ms']:>7.2f}ms")
+        print(f"\nchroma 결과와 정확한 상위 {limit}개의 평균 일치율: {recall(work_dir, limit):.3f}")
+    finally:
+        shutil.rmtree(work_dir)
@@ -0,0 +1,39 @@
+import json
+import random
+import datetime
+from src.common.models import Email
+
+# 폴더 필터 벤치마크용 폴더 (하위 폴더 포함 조건을 확인할 수 있도록 중첩 폴더를 섞음)
+FOLDERS = ("/Inbox", "/Inbox/Projects", "/Inbox/Projects/H-1004", "/Sent Items", "/Archive")
+
+def _load_seed_emails(json_path="shipyard_ultra_complex_100.json"):
+    with open(json_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def synthetic_emails(count, json_path="shipyard_ultra_complex_100.json", seed=42):
+    """
+    shipyard_ultra_complex_100.json의 문장, 제목, 주소를 무작위로 섞어서
+    벤치마크용 Email 객체 count개를 생성합니다.
+    """
+    rng = random.Random(seed)
+    seeds = _load_seed_emails(json_path)
+    sentences = [s.strip() for e in seeds for s in e.get("body", "").split(". ") if s.strip()]
+    subjects = [e.get("subject", "") for e in seeds]
+    addresses = sorted({e.get("sender") for e in seeds} | {r for e in seeds for r in e.get("receiver", [])})
+    start = datetime.datetime(2023, 1, 1)
+
+    for i in range(count):
+        body = ". ".join(rng.choice(sentences) for _ in range(rng.randint(3, 12)))
+        subject = rng.choice(subjects)
+        yield Email(
+            message_id=f"synthetic_{i}",
+            subject=subject,
+            body_plain=body,
+            body_html=None,
+            sender=rng.choice(addresses),
+            receivers=rng.sample(addresses, rng.randint(1, 3)),
+            sent_date=start + datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+            folder_path=rng.choice(FOLDERS),
+            attachment_text="",
+            thread_topic=subject
+        )
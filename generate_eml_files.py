@@ -1,14 +1,93 @@
+import io
+import re
 import json
 import os
+import random
+import zipfile
+import argparse
+import multiprocessing
 from email.message import EmailMessage
-from datetime import datetime
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+PDF_MIME_TYPE = ("application", "pdf")
+DOCX_MIME_TYPE = ("application", "vnd.openxmlformats-officedocument.wordprocessingml.document")
+
+# 합성 메일함의 폴더 (parser는 .eml이 들어 있는 디렉터리 이름을 folder_path로 사용)
+SYNTHETIC_FOLDERS = (("Inbox", 0.55), ("Projects", 0.2), ("Archive", 0.15), ("Deleted Items", 0.1))
+SENT_FOLDER = "Sent Items"
+INTERNAL_DOMAIN = "shipyard.com"
+EXTERNAL_DOMAINS = ("supplier.com", "steelworks.co.kr", "classsociety.org", "owner-shipping.com",
+                    "paintech.co.kr", "marine-engine.com", "logistics.co.kr", "imo.org")
+FAMILY_NAMES = ("kim", "lee", "park", "choi", "jung", "kang", "cho", "yoon", "jang", "lim", "han", "oh", "seo", "shin")
+GIVEN_NAMES = ("minsu", "jiyoung", "seojun", "hyunwoo", "eunji", "dongho", "sujin", "jaehyun", "yuna", "taeho",
+               "minji", "sangwoo", "hana", "junho", "soyeon", "youngsoo")
+DEPARTMENTS = ("선체설계팀", "생산관리팀", "품질보증팀", "구매팀", "의장설계팀", "안전환경팀", "기본설계팀")
+# 영어 본문 문장 ({term}은 시드 메일의 약어, {hull}/{block}은 호선/블록 번호)
+ENGLISH_TEMPLATES = (
+    "Please review the attached {doc} for {hull} before the next design review.",
+    "The {term} inspection for block {block} has been delayed by {days} days.",
+    "We need confirmation of the {term} schedule from the owner's representative.",
+    "Could you share the updated {doc} by {weekday}?",
+    "The class surveyor raised a comment on {term} compliance for {hull}.",
+    "Cost impact of the {term} change is estimated at USD {amount}k.",
+    "Following up on the {term} issue discussed at yesterday's meeting.",
+    "Please find the revised {doc} attached for your reference.",
+    "Block {block} erection is on hold until the {term} result is confirmed.",
+    "The supplier confirmed delivery of the steel plates for block {block} next week.",
+    "Let me know if the {term} test can be moved to {weekday} morning.",
+    "We expect the {term} report for {hull} to be finalized by the end of this month.",
+)
+DOCUMENTS = ("inspection report", "drawing", "test procedure", "meeting minutes", "cost estimate", "schedule")
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday")
+# 본문 언어 비율 (한국어, 한영 혼용, 영어)
+LANGUAGE_WEIGHTS = (0.6, 0.25, 0.15)
+
+def build_eml_message(email_dict):
+    """
+    email dict를 EmailMessage로 만듭니다.
+    subject, sender, receiver(To), cc, date('YYYY-MM-DD' 문자열 또는 datetime), body와
+    선택적으로 message_id, in_reply_to, references(Message-ID 목록), attachments([(파일 이름, bytes)])를 사용합니다.
+    """
+    msg = EmailMessage()
+    msg['Subject'] = email_dict.get('subject', 'No Subject')
+    msg['From'] = email_dict.get('sender', 'No Sender')
+    receivers = email_dict.get('receiver', [])
+    if receivers:
+        msg['To'] = ", ".join(receivers)
+    if email_dict.get('cc'):
+        msg['Cc'] = ", ".join(email_dict['cc'])
+
+    date = email_dict.get("date")
+    if isinstance(date, datetime):
+        msg['Date'] = format_datetime(date)
+    else:
+        try:
+            # The email library expects a specific date format
+            dt = datetime.strptime(date, "%Y-%m-%d")
+            msg['Date'] = dt.strftime("%a, %d %b %Y %H:%M:%S +0000")
+        except (ValueError, TypeError):
+            pass # Leave date unset if format is wrong
+
+    if email_dict.get('message_id'):
+        msg['Message-ID'] = f"<{email_dict['message_id']}>"
+    if email_dict.get('in_reply_to'):
+        msg['In-Reply-To'] = f"<{email_dict['in_reply_to']}>"
+    if email_dict.get('references'):
+        msg['References'] = " ".join(f"<{ref}>" for ref in email_dict['references'])
+
+    msg.set_content(email_dict.get('body', ''))
+    for filename, content in email_dict.get('attachments', ()):
+        maintype, subtype = PDF_MIME_TYPE if filename.endswith(".pdf") else DOCX_MIME_TYPE
+        msg.add_attachment(content, maintype=maintype, subtype=subtype, filename=filename)
+    return msg
 
 def generate_emls_from_json(json_path, output_dir):
     """
     Reads email data from a JSON file and writes each email as a separate .eml file.
     """
     print(f"'{json_path}'에서 데이터를 읽어 '.eml' 파일 생성을 시작합니다...")
-    
+
     try:
         with open(json_path, 'r', encoding='utf-8') as f:
             emails_data = json.load(f)
@@ -21,29 +100,7 @@ def generate_emls_from_json(json_path, output_dir):
 
     count = 0
     for i, email_dict in enumerate(emails_data):
-        msg = EmailMessage()
-        
-        # Set headers
-        msg['Subject'] = email_dict.get('subject', 'No Subject')
-        msg['From'] = email_dict.get('sender', 'No Sender')
-        
-        # For simplicity, we'll add all receivers to the 'To' field.
-        # A more complex setup could distinguish To/Cc if the JSON provided it.
-        receivers = email_dict.get('receiver', [])
-        if receivers:
-            msg['To'] = ", ".join(receivers)
-            
-        # Set date
-        try:
-            date_str = email_dict.get("date")
-            # The email library expects a specific date format
-            dt = datetime.strptime(date_str, "%Y-%m-%d")
-            msg['Date'] = dt.strftime("%a, %d %b %Y %H:%M:%S +0000")
-        except (ValueError, TypeError):
-            pass # Leave date unset if format is wrong
-
-        # Set body
-        msg.set_content(email_dict.get('body', ''))
+        msg = build_eml_message(email_dict)
 
         # Write to .eml file
         file_name = f"email_{i+1}.eml"
@@ -54,5 +111,269 @@ def generate_emls_from_json(json_path, output_dir):
 
     print(f"총 {count}개의 '.eml' 파일을 '{output_dir}'에 성공적으로 생성했습니다.")
 
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def build_pdf(lines):
+    """텍스트 줄(ASCII)을 한 페이지에 쓴 최소한의 PDF (Helvetica, xref 포함)."""
+    content = "BT /F1 11 Tf 14 TL 50 800 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        "/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+    ]
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii"))
+    out.write("".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("ascii"))
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii"))
+    return out.getvalue()
+
+def _xml_escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def build_docx(paragraphs):
+    """문단 목록으로 만든 최소한의 DOCX ([Content_Types].xml, _rels/.rels, word/document.xml)."""
+    parts = {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="word/document.xml"/></Relationships>'),
+        "word/document.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+            + "".join(f'<w:p><w:r><w:t xml:space="preserve">{_xml_escape(p)}</w:t></w:r></w:p>' for p in paragraphs)
+            + '</w:body></w:document>'),
+    }
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, xml in parts.items():
+            # 같은 seed로 만든 코퍼스가 바이트 단위로 같도록 시각을 고정
+            archive.writestr(zipfile.ZipInfo(name, date_time=(2023, 1, 1, 0, 0, 0)), xml)
+    return out.getvalue()
+
+def _zipf_weights(count, exponent=1.1):
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+def _references(previous, limit=10):
+    """답장의 References: 이전 메일의 References + 이전 메일. 길어지면 메일 프로그램처럼 첫 메일과 최근 메일만 남김."""
+    if previous is None:
+        return []
+    references = previous["references"] + [previous["message_id"]]
+    return references if len(references) <= limit else references[:1] + references[-(limit - 1):]
+
+class SyntheticMailbox:
+    """
+    shipyard_ultra_complex_100.json을 시드로 한 사람(메일함 소유자)의 메일함을 흉내 낸 합성 메일을 만듭니다.
+
+      - 본문: 시드 메일의 한국어 문장과 시드의 약어(NDT, MCR, IMO/MARPOL 등)를 넣은 영어 문장을 섞음
+      - 스레드: 크기가 한쪽으로 치우친 분포 (대부분 1~3통, 일부는 수십 통). 답장은 'RE: ' 제목,
+        Message-ID/In-Reply-To/References 헤더, 이전 메일 인용('On ... wrote:'와 '> ' 줄)과 서명을 가짐
+      - 주소: 시드 주소와 생성한 주소에 Zipf 분포로 빈도를 줌 (소수의 주소가 대부분의 메일에 등장)
+      - 첨부파일: 일부 메일에 재사용되는 PDF/DOCX (같은 도면/보고서가 여러 메일에 다시 첨부되는 경우)
+      - 사본: 일부 메일은 외부 메일 안내 문구가 붙은 사본으로 다른 폴더에도 저장
+    """
+
+    def __init__(self, json_path="shipyard_ultra_complex_100.json", seed=42, count=10000,
+                 attachment_rate=0.04, copy_rate=0.05):
+        with open(json_path, 'r', encoding='utf-8') as f:
+            seeds = json.load(f)
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.attachment_rate = attachment_rate
+        self.copy_rate = copy_rate
+        self.sentences = [s.strip() for e in seeds for s in re.split(r"(?<=[.?!])\s+", e.get("body", "")) if len(s.strip()) > 5]
+        self.subjects = [e.get("subject", "") for e in seeds if e.get("subject")]
+        text = " ".join(e.get("subject", "") + " " + e.get("body", "") for e in seeds)
+        self.terms = sorted({term for term in re.findall(r"\b[A-Z][A-Z0-9/]{1,}\b", text) if term not in ("PM", "VI")})
+        self.hulls = sorted(set(re.findall(r"\bH-\d{4}\b", text))) + [f"H-{number}" for number in range(1001, 1013)]
+
+        # 시드의 sender/receiver에는 주소와 이름('김철수', 'Project Manager' 등)이 섞여 있으므로 이름은 표시 이름으로 사용
+        people = {a for e in seeds for a in [e.get("sender"), *e.get("receiver", [])] if a}
+        names = sorted(a for a in people if "@" not in a)
+        # 메일함 소유자는 시드에서 가장 많이 보낸 주소, 나머지 주소는 빈도 순위 (시드 주소가 상위)
+        senders = [e.get("sender") for e in seeds if "@" in e.get("sender", "")]
+        self.owner = max(set(senders), key=lambda address: (senders.count(address), address))
+        seed_addresses = sorted(a for a in people if "@" in a and a != self.owner)
+        # 메일 수가 늘면 연락처도 늘어남 (1만 통: 약 250명, 100만 통: 약 4000명)
+        generated = []
+        for number in range(max(50, int(count ** 0.6))):
+            name = f"{self.rng.choice(GIVEN_NAMES)}.{self.rng.choice(FAMILY_NAMES)}{number}"
+            domain = INTERNAL_DOMAIN if self.rng.random() < 0.6 else self.rng.choice(EXTERNAL_DOMAINS)
+            generated.append(f"{name}@{domain}")
+        # 빈도 순위는 시드 주소와 생성한 주소를 섞어서 정함
+        self.contacts = seed_addresses + generated
+        self.rng.shuffle(self.contacts)
+        self.contact_weights = _zipf_weights(len(self.contacts))
+        self.names = {address: self.rng.choice(names) for address in self.contacts + [self.owner]}
+        self.departments = {address: self.rng.choice(DEPARTMENTS) for address in self.contacts + [self.owner]}
+        self.attachments = self._attachment_pool(max(20, count // 200))
+
+    def _english_sentence(self):
+        return self.rng.choice(ENGLISH_TEMPLATES).format(
+            term=self.rng.choice(self.terms), hull=self.rng.choice(self.hulls), doc=self.rng.choice(DOCUMENTS),
+            block=f"B{self.rng.randint(1, 60):02d}", days=self.rng.randint(2, 21), weekday=self.rng.choice(WEEKDAYS),
+            amount=self.rng.randint(5, 900))
+
+    def _body_text(self):
+        language = self.rng.choices(("ko", "mixed", "en"), LANGUAGE_WEIGHTS)[0]
+        sentences = []
+        for _ in range(self.rng.randint(2, 9)):
+            english = language == "en" or (language == "mixed" and self.rng.random() < 0.5)
+            sentences.append(self._english_sentence() if english else self.rng.choice(self.sentences))
+        # 두세 문장마다 문단을 나눔
+        paragraphs, paragraph = [], []
+        for sentence in sentences:
+            paragraph.append(sentence)
+            if len(paragraph) >= self.rng.randint(2, 3):
+                paragraphs.append(" ".join(paragraph))
+                paragraph = []
+        if paragraph:
+            paragraphs.append(" ".join(paragraph))
+        return "\n\n".join(paragraphs)
+
+    def _attachment_pool(self, size):
+        pool = []
+        for number in range(size):
+            hull = self.rng.choice(self.hulls)
+            if self.rng.random() < 0.6:
+                lines = [f"{hull} {self.rng.choice(DOCUMENTS).title()} No. {number:04d}"]
+                lines += [self._english_sentence() for _ in range(self.rng.randint(5, 20))]
+                pool.append((f"{hull}_report_{number:04d}.pdf", build_pdf(lines)))
+            else:
+                paragraphs = [f"{hull} 회의록 / Meeting Minutes No. {number:04d}"]
+                paragraphs += [self.rng.choice(self.sentences) if self.rng.random() < 0.6 else self._english_sentence()
+                               for _ in range(self.rng.randint(5, 20))]
+                pool.append((f"{hull}_minutes_{number:04d}.docx", build_docx(paragraphs)))
+        return pool
+
+    def _contacts(self, low, high, exclude=()):
+        chosen = []
+        for _ in range(self.rng.randint(low, high)):
+            address = self.rng.choices(self.contacts, self.contact_weights)[0]
+            if address not in chosen and address not in exclude:
+                chosen.append(address)
+        return chosen
+
+    def _thread_size(self):
+        # 대부분 1~3통이고 일부 스레드는 수십 통까지 이어지는 분포 (평균 약 3통)
+        return min(60, int(self.rng.paretovariate(1.3)))
+
+    def threads(self, start=datetime(2022, 1, 1, tzinfo=timezone.utc), days=730):
+        """스레드마다 [email dict, ...]를 끝없이 만듭니다. dict에는 build_eml_message 키와 folder가 있음."""
+        number = 0
+        while True:
+            subject = self.rng.choice(self.subjects)
+            if self.rng.random() < 0.5:
+                subject += f" ({self.rng.choice(self.hulls)} B{self.rng.randint(1, 60):02d})"
+            sent = start + timedelta(minutes=self.rng.randint(0, days * 24 * 60))
+            participants = [self.owner] + self._contacts(1, 4, exclude=(self.owner,))
+            messages = []
+            previous = None
+            for reply in range(self._thread_size()):
+                sender = self.rng.choice(participants)
+                receivers = [address for address in participants if address != sender]
+                cc = self._contacts(0, 2, exclude=participants) if self.rng.random() < 0.3 else []
+                body = f"{self._body_text()}\n\n-- \n{self.names[sender]}\n{self.departments[sender]}"
+                if previous:
+                    quoted = "\n".join(f"> {line}" if line else ">" for line in previous["body"].splitlines()[:40])
+                    body += f"\n\nOn {format_datetime(previous['date'])}, {previous['sender']} wrote:\n{quoted}"
+                message_id = f"{number:08d}.{reply:02d}.{self.seed}@{sender.split('@')[1]}"
+                email_dict = {
+                    "subject": subject if reply == 0 else ("FW: " if self.rng.random() < 0.1 else "RE: ") + subject,
+                    "sender": f"{self.names[sender]} <{sender}>",
+                    "receiver": receivers,
+                    "cc": cc,
+                    "date": sent,
+                    "body": body,
+                    "message_id": message_id,
+                    "in_reply_to": previous["message_id"] if previous else None,
+                    "references": _references(previous),
+                    "attachments": [self.rng.choice(self.attachments)] if self.rng.random() < self.attachment_rate else [],
+                    "folder": SENT_FOLDER if sender == self.owner else
+                    self.rng.choices([f for f, _ in SYNTHETIC_FOLDERS], [w for _, w in SYNTHETIC_FOLDERS])[0],
+                }
+                messages.append(email_dict)
+                if self.rng.random() < self.copy_rate:
+                    copy = dict(email_dict, folder="Archive", body="[외부 메일] 발신자를 확인하세요.\n" + body)
+                    messages.append(copy)
+                previous = email_dict
+                sent += timedelta(minutes=int(self.rng.expovariate(1 / 600)) + 1)
+            number += 1
+            yield messages
+
+    def emails(self, count):
+        """email dict를 정확히 count개 만듭니다 (마지막 스레드는 중간에서 끊길 수 있음)."""
+        produced = 0
+        for messages in self.threads():
+            for email_dict in messages:
+                if produced >= count:
+                    return
+                produced += 1
+                yield email_dict
+
+def _write_eml(item):
+    file_path, email_dict = item
+    with open(file_path, 'wb') as f:
+        f.write(build_eml_message(email_dict).as_bytes())
+    return file_path
+
+def generate_synthetic_emls(output_dir, count, json_path="shipyard_ultra_complex_100.json", seed=42,
+                            workers=None, attachment_rate=0.04, copy_rate=0.05):
+    """
+    SyntheticMailbox로 만든 합성 메일 count개를 output_dir/<폴더>/synthetic_<번호>.eml로 저장합니다.
+    메일 내용은 한 프로세스에서 순서대로 만들고 (같은 seed면 같은 코퍼스), .eml 직렬화와
+    파일 쓰기는 workers개의 프로세스로 나눕니다 (None이면 CPU 코어 수).
+    """
+    print(f"'{json_path}'를 시드로 합성 이메일 {count}개를 '{output_dir}'에 생성합니다...")
+    mailbox = SyntheticMailbox(json_path, seed=seed, count=count, attachment_rate=attachment_rate, copy_rate=copy_rate)
+    for folder in [f for f, _ in SYNTHETIC_FOLDERS] + [SENT_FOLDER]:
+        os.makedirs(os.path.join(output_dir, folder), exist_ok=True)
+
+    items = ((os.path.join(output_dir, email_dict.pop("folder"), f"synthetic_{i:07d}.eml"), email_dict)
+             for i, email_dict in enumerate(mailbox.emails(count)))
+    workers = workers or os.cpu_count() or 1
+    written = 0
+    if workers <= 1:
+        for item in items:
+            _write_eml(item)
+            written += 1
+    else:
+        with multiprocessing.Pool(processes=workers) as pool:
+            for _ in pool.imap_unordered(_write_eml, items, chunksize=200):
+                written += 1
+    print(f"총 {written}개의 '.eml' 파일을 '{output_dir}'에 생성했습니다 (연락처 {len(mailbox.contacts)}명, "
+          f"첨부파일 {len(mailbox.attachments)}종).")
+    return written
+
 if __name__ == "__main__":
-    generate_emls_from_json("shipyard_ultra_complex_100.json", "eml_output")
+    parser = argparse.ArgumentParser(description="JSON 시드에서 .eml 파일을 생성합니다.")
+    parser.add_argument("--json-path", default="shipyard_ultra_complex_100.json", help="시드 JSON 파일 경로")
+    parser.add_argument("--output-dir", default="eml_output", help=".eml 파일을 저장할 디렉터리")
+    parser.add_argument("--synthetic", type=int, metavar="N",
+                        help="시드 메일을 그대로 쓰는 대신 스레드/첨부파일이 있는 합성 메일 N개를 생성합니다.")
+    parser.add_argument("--seed", type=int, default=42, help="합성 메일 난수 seed")
+    parser.add_argument("--workers", type=int, help="합성 메일을 쓸 프로세스 수 (기본: CPU 코어 수)")
+    args = parser.parse_args()
+    if args.synthetic:
+        generate_synthetic_emls(args.output_dir, args.synthetic, args.json_path, seed=args.seed, workers=args.workers)
+    else:
+        generate_emls_from_json(args.json_path, args.output_dir)
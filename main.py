@@ -1,13 +1,40 @@
 import argparse
 import os
 import sys
-from src.ingestion.parser import parse_pst_file
-from src.ingestion.storage import SQLiteStorage
-from src.search.indexer import EmailIndexer
-from src.search.query import Searcher
+import time
+from src.search.backends import KEYWORD_ENGINES, VECTOR_STORES
+from src.search.client import SearchClient, DEFAULT_HOST, DEFAULT_PORT
+
+# 각 하위 명령에 필요한 모듈은 해당 처리 함수 안에서 임포트합니다.
+# (색인/검색 모듈은 sentence_transformers, chromadb, whoosh 등을 불러오므로 '--help'나
+#  서버를 통한 검색에서는 로드하지 않음. benchmarks/bench_startup.py로 시작 시간 예산을 확인)
+
+# 수집 진행 상황을 출력하는 최소 간격(초). 배치마다 출력하지 않음
+PROGRESS_INTERVAL = 5.0
+
+def use_bulk_load(db_path, pst_file_path):
+    """
+    '--bulk-load auto'의 판단: DB가 비어 있거나 PST 파일이 기존 DB보다 크면 대량 적재 모드를 씁니다.
+    대량 적재 모드는 보조 인덱스/FTS5 색인을 지웠다가 끝난 뒤 전체를 다시 만드므로,
+    기존 데이터에 비해 작은 증분 수집에서는 행마다 인덱스를 갱신하는 편이 빠릅니다.
+    """
+    import sqlite3
+
+    if not os.path.exists(db_path):
+        return True
+    try:
+        with sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) as conn:
+            has_rows = conn.execute("SELECT 1 FROM emails LIMIT 1;").fetchone() is not None
+    except sqlite3.Error:
+        # emails 테이블이 아직 없는 DB
+        return True
+    return not has_rows or os.path.getsize(pst_file_path) >= os.path.getsize(db_path)
 
 def handle_ingest(args):
     """'ingest' 명령어 처리 함수"""
+    from src.ingestion.parser import parse_pst_file
+    from src.ingestion.storage import SQLiteStorage
+
     print("===== 데이터 수집 파이프라인 시작 =====")
 
     db_path = args.db_path
@@ -22,11 +49,14 @@ def handle_ingest(args):
         os.makedirs(os.path.dirname(db_path))
         print(f"'{os.path.dirname(db_path)}' 디렉토리 생성 완료.")
 
-    if os.path.exists(db_path):
-        os.remove(db_path)
-        print(f"기존 '{db_path}' 파일 삭제 완료.")
-
-    storage = SQLiteStorage(db_path)
+    # 기존 DB는 유지하고, 같은 message_id는 upsert로 갱신
+    if args.bulk_load == "auto":
+        bulk_load = use_bulk_load(db_path, pst_file_path)
+    else:
+        bulk_load = args.bulk_load == "on"
+    print(f"대량 적재 모드: {'사용' if bulk_load else '사용 안 함'}")
+    storage = SQLiteStorage(db_path, bulk_load=bulk_load, transaction_size=args.transaction_size,
+                            fts=args.keyword_engine == "fts5")
     storage.connect()
     if not storage.conn:
         print("오류: 데이터베이스 연결에 실패하여 파이프라인을 중단합니다.")
@@ -39,21 +69,38 @@ def handle_ingest(args):
         email_generator = parse_pst_file(pst_file_path)
         batch = []
         total_inserted = 0
+        total_failed = 0
+        failed_batches = 0
+        last_report = time.monotonic()
+
+        def insert(batch):
+            nonlocal total_inserted, total_failed, failed_batches
+            # 실패한 배치는 롤백되므로 해당 이메일은 저장되지 않음
+            if storage.insert_emails(batch):
+                total_inserted += len(batch)
+            else:
+                total_failed += len(batch)
+                failed_batches += 1
 
         for email_obj in email_generator:
             batch.append(email_obj)
             if len(batch) >= args.batch_size:
-                storage.insert_emails(batch)
-                total_inserted += len(batch)
-                print(f"{len(batch)}개 이메일 삽입 완료 (총 {total_inserted}개).")
+                insert(batch)
                 batch = []
+                if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    print(f"이메일 {total_inserted}개 삽입 완료...")
+                    last_report = time.monotonic()
 
         if batch:
-            storage.insert_emails(batch)
-            total_inserted += len(batch)
-            print(f"{len(batch)}개 이메일 삽입 완료 (총 {total_inserted}개).")
+            insert(batch)
 
+        if bulk_load:
+            storage.finish_bulk_load()
+        # 연락처 통계가 바뀌어 메인 사용자/중요 연락처가 달라졌으면 영향을 받는 이메일의 중요도만 다시 계산
+        storage.refresh_importance()
         print(f"\n총 {total_inserted}개의 이메일이 데이터베이스에 성공적으로 저장되었습니다.")
+        if total_failed:
+            print(f"경고: 배치 {failed_batches}개의 이메일 {total_failed}개를 저장하지 못했습니다 (위의 오류 메시지 참고).")
     except Exception as e:
         print(f"파이프라인 실행 중 오류가 발생했습니다: {e}")
     finally:
@@ -62,18 +109,55 @@ def handle_ingest(args):
 
 def handle_index(args):
     """'index' 명령어 처리 함수"""
-    print("===== Whoosh 검색 색인 구축 시작 =====")
-    indexer = EmailIndexer(db_path=args.db_path, index_dir=args.index_dir)
-    indexer.index_emails()
-    print("===== Whoosh 검색 색인 구축 완료 =====")
+    from src.search.indexer import EmailIndexer
+
+    print(f"===== 검색 색인 구축 시작 (키워드 엔진: {args.keyword_engine}, 벡터 저장소: {args.vector_store}) =====")
+    indexer = EmailIndexer(eml_dir=args.eml_dir, index_dir=args.index_dir,
+                           keyword_engine=args.keyword_engine, db_path=args.db_path,
+                           vector_store=args.vector_store, vector_dir=args.vector_dir,
+                           embedding_processes=args.embed_processes, embedding_token_budget=args.embed_token_budget)
+    indexer.index_emails(rebuild=args.rebuild, whoosh_procs=args.whoosh_procs, embed_batch_size=args.embed_batch_size)
+    print("===== 검색 색인 구축 완료 =====")
+
+def _iso_date(value):
+    """--date-from/--date-to 값 검사 (YYYY-MM-DD 또는 YYYY-MM-DDTHH:MM:SS)"""
+    import datetime
+    try:
+        datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"날짜 형식이 올바르지 않습니다: {value} (예: 2024-03-01)")
+    return value
+
+def _vector_options(args):
+    """ivfpq 저장소의 --nprobe/--rerank 값 (지정한 것만)"""
+    return {key: getattr(args, key) for key in ("nprobe", "rerank") if getattr(args, key) is not None}
 
 def handle_search(args):
     """'search' 명령어 처리 함수"""
     query_text = args.query
+    filters = {key: getattr(args, key) for key in ("sender", "recipient", "date_from", "date_to", "folder")
+               if getattr(args, key) is not None}
 
     print(f"===== '{query_text}' 검색 시작 =====")
-    searcher = Searcher(index_dir=args.index_dir)
-    search_results = searcher.search(query_text, limit=args.limit)
+    search_results = None
+    if not args.no_server:
+        # 상주 검색 서버가 있으면 모델/색인 로드 없이 바로 질의
+        # 명령줄에서 지정한 엔진 설정과 데이터 경로는 서버에 넘겨서, 서버 설정과 다르면 직접 검색함
+        engine = {key: getattr(args, key) for key in ("keyword_engine", "vector_store", "nprobe", "rerank")
+                  if getattr(args, key) is not None}
+        engine.update({key: os.path.abspath(getattr(args, key)) for key in ("index_dir", "db_path", "vector_dir")})
+        search_results = SearchClient(host=args.host, port=args.port).search(
+            query_text, limit=args.limit, filters=filters, collapse_threads=args.collapse_threads, engine=engine)
+        if search_results is not None:
+            print(f"검색 서버(http://{args.host}:{args.port})의 결과입니다.")
+    if search_results is None:
+        # 서버가 없으면 직접 검색 (Searcher는 무거운 모델을 로드하므로 필요할 때만 임포트)
+        from src.search.query import Searcher
+        with Searcher(index_dir=args.index_dir, keyword_engine=args.keyword_engine or "whoosh", db_path=args.db_path,
+                      vector_store=args.vector_store or "chroma", vector_dir=args.vector_dir,
+                      vector_options=_vector_options(args)) as searcher:
+            search_results = searcher.search(query_text, limit=args.limit, filters=filters,
+                                             collapse_threads=args.collapse_threads)
 
     print("\n--- 검색 결과 ---")
     if not search_results:
@@ -86,8 +170,52 @@ def handle_search(args):
             print(f"  Date: {result.get('sent_date')}")
             body_snippet = result.get('body_plain', '')[:150].replace('\n', ' ') + "..."
             print(f"  Body: {body_snippet}")
+    timings = getattr(search_results, 'timings', {})
+    if timings:
+        print("\n단계별 소요 시간: " + ", ".join(
+            f"{name} {value:.1f}ms" for name, value in timings.items() if not isinstance(value, bool)
+        ))
     print("\n===== 검색 종료 =====")
 
+def handle_serve(args):
+    """'serve' 명령어 처리 함수"""
+    from src.search.server import serve
+
+    serve(index_dir=args.index_dir, chroma_dir=args.chroma_dir, host=args.host, port=args.port,
+          keyword_engine=args.keyword_engine, db_path=args.db_path,
+          vector_store=args.vector_store, vector_dir=args.vector_dir, vector_options=_vector_options(args))
+
+def _add_profile_arguments(subparser):
+    subparser.add_argument("--profile", action="store_true",
+                           help="끝난 뒤 단계별 소요 시간(파싱, 첨부파일, SQLite, Whoosh, 임베딩, 검색 경로 등)을 출력합니다.")
+    subparser.add_argument("--profile-output", metavar="PATH",
+                           help="cProfile 결과를 PATH에 저장합니다 (--profile 포함, 'python -m pstats PATH'로 확인). "
+                                "cProfile은 메인 스레드만 측정합니다.")
+
+def _run_profiled(args):
+    """--profile: 계측을 켜고 명령을 실행한 뒤 단계별 소요 시간 (--profile-output이면 cProfile 결과도) 출력"""
+    from src.common.instrumentation import instrumentation
+
+    instrumentation.enable()
+    profiler = None
+    if args.profile_output:
+        import cProfile
+        profiler = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        if profiler is not None:
+            profiler.runcall(args.func, args)
+        else:
+            args.func(args)
+    finally:
+        print("\n===== 단계별 소요 시간 (--profile) =====")
+        print(instrumentation.report(time.perf_counter() - start))
+        if profiler is not None:
+            import pstats
+            profiler.dump_stats(args.profile_output)
+            print(f"\ncProfile 결과를 '{args.profile_output}'에 저장했습니다. 누적 시간 상위 함수:")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+
 def main():
     parser = argparse.ArgumentParser(description="PST 이메일 처리 및 검색 시스템")
     subparsers = parser.add_subparsers(dest="command", required=True, help="실행할 명령어")
@@ -98,15 +226,34 @@ def main():
     )
     parser_ingest.add_argument("pst_file", help="파싱할 PST 파일의 경로")
     parser_ingest.add_argument("--db-path", default="data/emails.db", help="SQLite DB 파일 경로")
-    parser_ingest.add_argument("--batch-size", type=int, default=100, help="DB 삽입 배치 크기")
+    parser_ingest.add_argument("--batch-size", type=int, default=1000, help="DB 삽입 배치 크기")
+    parser_ingest.add_argument("--transaction-size", type=int, default=50000, help="커밋 한 번에 포함할 최대 행 수")
+    parser_ingest.add_argument("--bulk-load", choices=("auto", "on", "off"), default="auto",
+                               help="대량 적재 모드 (인덱스를 적재 후 한 번에 생성). auto는 DB가 비어 있거나 "
+                                    "PST 파일이 기존 DB보다 클 때만 사용")
+    parser_ingest.add_argument("--keyword-engine", choices=KEYWORD_ENGINES, default="whoosh",
+                               help="fts5이면 검색용 FTS5 색인도 함께 생성합니다 (이미 있으면 항상 갱신)")
     parser_ingest.set_defaults(func=handle_ingest)
 
     # 'index' 명령어 파서
     parser_index = subparsers.add_parser(
         "index", help="DB의 이메일을 검색할 수 있도록 색인을 생성합니다."
     )
-    parser_index.add_argument("--db-path", default="data/emails.db", help="SQLite DB 파일 경로")
+    parser_index.add_argument("--eml-dir", default="eml_output", help="색인할 .eml 파일 디렉토리 경로")
     parser_index.add_argument("--index-dir", default="data/index", help="Whoosh 색인 디렉토리 경로")
+    parser_index.add_argument("--rebuild", action="store_true", help="증분 색인 대신 기존 색인을 지우고 처음부터 다시 생성합니다.")
+    parser_index.add_argument("--whoosh-procs", type=int, default=1, help="Whoosh 색인 쓰기에 사용할 프로세스 수")
+    parser_index.add_argument("--keyword-engine", choices=KEYWORD_ENGINES, default="whoosh",
+                              help="키워드 색인 엔진 (fts5: --db-path의 SQLite FTS5 색인)")
+    parser_index.add_argument("--db-path", default="data/emails.db", help="fts5 엔진이 사용할 SQLite DB 파일 경로")
+    parser_index.add_argument("--vector-store", choices=VECTOR_STORES, default="chroma",
+                              help="임베딩 저장소 (numpy: --vector-dir의 memory-map 벡터 저장소, ivfpq: numpy + IVF-PQ 근사 검색 인덱스)")
+    parser_index.add_argument("--vector-dir", default="data/vectors", help="numpy 벡터 저장소 디렉토리 경로")
+    parser_index.add_argument("--embed-processes", type=int, default=1,
+                              help="임베딩에 사용할 프로세스 수 (프로세스마다 모델을 하나씩 로드하고 CPU 코어를 나눠 씀)")
+    parser_index.add_argument("--embed-token-budget", type=int, default=8192,
+                              help="임베딩 배치 하나의 토큰 수 상한 (텍스트 수 × 가장 긴 텍스트의 토큰 수)")
+    parser_index.add_argument("--embed-batch-size", type=int, default=1000, help="한번에 모아서 인코딩할 텍스트 수")
     parser_index.set_defaults(func=handle_index)
 
     # 'search' 명령어 파서
@@ -116,10 +263,50 @@ def main():
     parser_search.add_argument("query", help="검색할 키워드")
     parser_search.add_argument("--index-dir", default="data/index", help="Whoosh 색인 디렉토리 경로")
     parser_search.add_argument("--limit", type=int, default=10, help="최대 검색 결과 수")
+    parser_search.add_argument("--host", default=DEFAULT_HOST, help="검색 서버 주소")
+    parser_search.add_argument("--port", type=int, default=DEFAULT_PORT, help="검색 서버 포트")
+    parser_search.add_argument("--no-server", action="store_true", help="검색 서버를 사용하지 않고 직접 검색합니다.")
+    parser_search.add_argument("--keyword-engine", choices=KEYWORD_ENGINES,
+                               help="키워드 엔진 (기본 whoosh). 지정하면 검색 서버의 엔진이 다를 때 직접 검색합니다.")
+    parser_search.add_argument("--db-path", default="data/emails.db", help="fts5 엔진이 사용할 SQLite DB 파일 경로")
+    parser_search.add_argument("--vector-store", choices=VECTOR_STORES,
+                               help="벡터 저장소 (기본 chroma). 지정하면 검색 서버의 저장소가 다를 때 직접 검색합니다.")
+    parser_search.add_argument("--vector-dir", default="data/vectors", help="numpy 벡터 저장소 디렉토리 경로")
+    parser_search.add_argument("--nprobe", type=int, help="ivfpq: 질의마다 살펴볼 목록 수 (기본 8, 클수록 정확하고 느림)")
+    parser_search.add_argument("--rerank", type=int, help="ivfpq: 원본 벡터로 다시 계산할 후보 수 (기본 100, 0이면 근사 점수)")
+    parser_search.add_argument("--sender", help="이 주소가 보낸 메일만 검색")
+    parser_search.add_argument("--recipient", help="이 주소가 받은(To/Cc) 메일만 검색")
+    parser_search.add_argument("--date-from", type=_iso_date, help="이 날짜(포함) 이후의 메일만 검색 (예: 2024-03-01)")
+    parser_search.add_argument("--date-to", type=_iso_date, help="이 날짜(미포함) 이전의 메일만 검색 (예: 2024-04-01)")
+    parser_search.add_argument("--folder", help="이 폴더와 하위 폴더의 메일만 검색 (예: /Inbox)")
+    parser_search.add_argument("--collapse-threads", action="store_true", help="같은 스레드의 메일은 가장 관련 있는 한 건만 보여줍니다.")
     parser_search.set_defaults(func=handle_search)
 
+    # 'serve' 명령어 파서
+    parser_serve = subparsers.add_parser(
+        "serve", help="모델과 색인을 메모리에 유지하는 검색 서버를 실행합니다."
+    )
+    parser_serve.add_argument("--index-dir", default="data/index", help="Whoosh 색인 디렉토리 경로")
+    parser_serve.add_argument("--chroma-dir", default="data/chroma", help="ChromaDB 디렉토리 경로")
+    parser_serve.add_argument("--host", default=DEFAULT_HOST, help="서버 주소")
+    parser_serve.add_argument("--port", type=int, default=DEFAULT_PORT, help="서버 포트")
+    parser_serve.add_argument("--keyword-engine", choices=KEYWORD_ENGINES, default="whoosh", help="키워드 검색 엔진")
+    parser_serve.add_argument("--db-path", default="data/emails.db", help="fts5 엔진이 사용할 SQLite DB 파일 경로")
+    parser_serve.add_argument("--vector-store", choices=VECTOR_STORES, default="chroma", help="벡터 저장소")
+    parser_serve.add_argument("--vector-dir", default="data/vectors", help="numpy 벡터 저장소 디렉토리 경로")
+    parser_serve.add_argument("--nprobe", type=int, help="ivfpq: 질의마다 살펴볼 목록 수 (기본 8, 클수록 정확하고 느림)")
+    parser_serve.add_argument("--rerank", type=int, help="ivfpq: 원본 벡터로 다시 계산할 후보 수 (기본 100, 0이면 근사 점수)")
+    parser_serve.set_defaults(func=handle_serve)
+
+    for subparser in (parser_ingest, parser_index, parser_search, parser_serve):
+        _add_profile_arguments(subparser)
+
     args = parser.parse_args()
-    if 'func' in args:
+    if 'func' not in args:
+        return
+    if args.profile or args.profile_output:
+        _run_profiled(args)
+    else:
         args.func(args)
 
 if __name__ == '__main__':
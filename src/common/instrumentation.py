@@ -0,0 +1,127 @@
+import time
+import threading
+
+class _NullSpan:
+    """계측이 꺼져 있을 때 span()이 반환하는 아무 일도 하지 않는 컨텍스트 매니저 (하나를 공유)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("recorder", "name", "items", "start")
+
+    def __init__(self, recorder, name, items):
+        self.recorder = recorder
+        self.name = name
+        self.items = items
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.recorder.add(self.name, time.perf_counter() - self.start, self.items)
+        return False
+
+class Instrumentation:
+    """
+    단계별 소요 시간(span)과 카운터를 모읍니다.
+
+        with instrumentation.span("sqlite.insert", len(emails)):
+            ...
+        instrumentation.count("parse.attachments")
+
+    꺼져 있으면 (기본값) span()은 공유하는 빈 컨텍스트 매니저를 반환하고 count()/add()는 바로 돌아가므로
+    자주 호출되는 경로에 넣어도 비용이 거의 없습니다. 여러 스레드(색인 파이프라인, 검색 경로)에서 호출해도 됩니다.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.spans = {}     # 이름 -> [호출 수, 합계(초), 최대(초), 처리 항목 수]
+        self.counters = {}  # 이름 -> 값
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self.spans = {}
+            self.counters = {}
+
+    def span(self, name, items=None):
+        """with 블록의 소요 시간을 name에 더합니다. items는 처리한 항목 수나 바이트 수 (처리량 계산용)."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, items)
+
+    def add(self, name, seconds, items=None):
+        """이미 잰 소요 시간(초)을 name에 더합니다."""
+        if not self.enabled:
+            return
+        with self._lock:
+            stat = self.spans.get(name)
+            if stat is None:
+                stat = self.spans[name] = [0, 0.0, 0.0, 0]
+            stat[0] += 1
+            stat[1] += seconds
+            stat[2] = max(stat[2], seconds)
+            stat[3] += items or 0
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self, reset=False):
+        """지금까지 모은 값 {'spans': ..., 'counters': ...}. 다른 프로세스의 값을 merge()로 합칠 때 사용."""
+        with self._lock:
+            data = {"spans": {name: list(stat) for name, stat in self.spans.items()},
+                    "counters": dict(self.counters)}
+            if reset:
+                self.spans = {}
+                self.counters = {}
+        return data
+
+    def merge(self, data):
+        """snapshot()으로 받은 값(예: 파싱 작업자 프로세스)을 더합니다."""
+        if not self.enabled or not data:
+            return
+        with self._lock:
+            for name, (calls, total, longest, items) in data["spans"].items():
+                stat = self.spans.get(name)
+                if stat is None:
+                    stat = self.spans[name] = [0, 0.0, 0.0, 0]
+                stat[0] += calls
+                stat[1] += total
+                stat[2] = max(stat[2], longest)
+                stat[3] += items
+            for name, value in data["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self, wall_seconds=None):
+        """단계별 표 (문자열). 합계 시간이 긴 순서로 정렬합니다."""
+        data = self.snapshot()
+        lines = []
+        if wall_seconds is not None:
+            lines.append(f"전체 실행 시간: {wall_seconds:.2f}초")
+        if data["spans"]:
+            lines.append(f"{'단계':<28} {'호출':>8} {'합계':>10} {'평균':>10} {'최대':>10} {'항목':>9} {'항목/초':>10}")
+            for name, (calls, total, longest, items) in sorted(data["spans"].items(), key=lambda entry: -entry[1][1]):
+                rate = f"{items / total:>10.0f}" if items and total > 0 else f"{'-':>10}"
+                lines.append(f"{name:<28} {calls:>8} {total:>9.3f}s {total / calls * 1000:>8.2f}ms "
+                             f"{longest * 1000:>8.2f}ms {items or '-':>9} {rate}")
+        if data["counters"]:
+            lines.append("카운터: " + ", ".join(f"{name}={value}" for name, value in sorted(data["counters"].items())))
+        if not data["spans"] and not data["counters"]:
+            lines.append("기록된 단계가 없습니다.")
+        return "\n".join(lines)
+
+# 프로세스 전체에서 공유하는 계측 객체 (main.py --profile에서 켬)
+instrumentation = Instrumentation()
@@ -14,3 +14,9 @@ class Email:
     folder_path: str
     attachment_text: Optional[str] = None
     thread_topic: Optional[str] = None
+    cc: List[str] = field(default_factory=list)  # receivers 중 참조(Cc)로 받은 주소
+    # 스레드 재구성용 헤더 (.eml은 message_id가 파일 이름이므로 Message-ID 헤더를 따로 보관)
+    internet_message_id: Optional[str] = None
+    in_reply_to: Optional[str] = None
+    references: List[str] = field(default_factory=list)
+    thread_id: Optional[str] = None  # ThreadIndex가 정한 스레드 ID
@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import hashlib
+import time
+
+DEFAULT_CACHE_PATH = "data/attachment_cache.db"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512MB
+# 히트마다 쓰기 트랜잭션을 열지 않도록 사용 시각/통계 갱신을 모아서 반영하는 기준
+ACCESS_FLUSH_SIZE = 256
+ACCESS_FLUSH_SECONDS = 5.0
+
+class AttachmentTextCache:
+    """
+    첨부파일 바이트의 해시(SHA-256)를 키로 추출된 텍스트를 저장하는 디스크 캐시입니다.
+    같은 PDF/DOCX가 여러 메일에 첨부되거나 색인을 다시 만들 때 PyMuPDF/python-docx를
+    다시 실행하지 않도록 합니다. 저장된 텍스트의 총 크기가 max_bytes를 넘으면
+    가장 오래 사용되지 않은 항목부터 제거합니다(LRU).
+
+    히트/미스 횟수는 DB에 함께 누적되므로 여러 파서 프로세스가 같은 캐시 파일을
+    사용해도 stats()가 전체 합계를 보여줍니다. 히트의 사용 시각(last_access)과
+    히트/미스 횟수는 메모리에 모았다가 ACCESS_FLUSH_SIZE개 또는 ACCESS_FLUSH_SECONDS초마다,
+    그리고 put()/stats()/close() 때 한 번에 반영하므로 캐시 히트는 읽기만 합니다.
+
+    추출에 실패한 첨부파일(extract가 None을 반환)은 저장하지 않으므로, 일시적인 오류나
+    파서 수정 이후 다음 색인에서 다시 추출을 시도합니다.
+    """
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._pending_access = {}
+        self._pending_hits = 0
+        self._pending_misses = 0
+        self._last_flush = time.monotonic()
+
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(cache_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("PRAGMA synchronous=NORMAL;")
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.conn:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS attachment_text (
+                content_hash TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_attachment_text_last_access ON attachment_text (last_access);"
+            )
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_stats (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0,
+                total_bytes INTEGER NOT NULL DEFAULT 0
+            );
+            """)
+            self.conn.execute("INSERT OR IGNORE INTO cache_stats (id) VALUES (1);")
+
+    @staticmethod
+    def make_key(kind, content_bytes):
+        """첨부파일 종류와 내용으로 캐시 키를 만듭니다."""
+        digest = hashlib.sha256(content_bytes).hexdigest()
+        return f"{kind}:{digest}"
+
+    def get(self, key):
+        """캐시된 텍스트를 반환합니다. 없으면 None을 반환합니다."""
+        row = self.conn.execute(
+            "SELECT text FROM attachment_text WHERE content_hash = ?;", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            self._pending_misses += 1
+        else:
+            self.hits += 1
+            self._pending_hits += 1
+            self._pending_access[key] = time.time()
+        if (len(self._pending_access) >= ACCESS_FLUSH_SIZE
+                or time.monotonic() - self._last_flush >= ACCESS_FLUSH_SECONDS):
+            with self.conn:
+                self._flush_access()
+        return row[0] if row else None
+
+    def _flush_access(self):
+        # 호출하는 쪽의 트랜잭션 안에서 모아 둔 사용 시각과 히트/미스 횟수를 반영합니다.
+        if self._pending_access:
+            self.conn.executemany(
+                "UPDATE attachment_text SET last_access = ? WHERE content_hash = ?;",
+                [(accessed, key) for key, accessed in self._pending_access.items()]
+            )
+        if self._pending_hits or self._pending_misses:
+            self.conn.execute(
+                "UPDATE cache_stats SET hits = hits + ?, misses = misses + ? WHERE id = 1;",
+                (self._pending_hits, self._pending_misses)
+            )
+        self._pending_access = {}
+        self._pending_hits = 0
+        self._pending_misses = 0
+        self._last_flush = time.monotonic()
+
+    def put(self, key, text):
+        """추출된 텍스트를 저장하고, 용량을 넘으면 오래된 항목을 제거합니다."""
+        size = len(text.encode("utf-8"))
+        with self.conn:
+            # 제거 순서가 최근 사용 시각을 반영하도록 먼저 모아 둔 갱신을 씀
+            self._flush_access()
+            old = self.conn.execute(
+                "SELECT size FROM attachment_text WHERE content_hash = ?;", (key,)
+            ).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO attachment_text (content_hash, text, size, last_access) VALUES (?, ?, ?, ?);",
+                (key, text, size, time.time())
+            )
+            delta = size - (old[0] if old else 0)
+            self.conn.execute("UPDATE cache_stats SET total_bytes = total_bytes + ? WHERE id = 1;", (delta,))
+            total_bytes = self.conn.execute("SELECT total_bytes FROM cache_stats WHERE id = 1;").fetchone()[0]
+            if total_bytes > self.max_bytes:
+                self._evict(total_bytes)
+
+    def _evict(self, total_bytes):
+        # 한 번에 용량의 90%까지 줄여서 삽입할 때마다 제거가 반복되지 않도록 합니다.
+        target = int(self.max_bytes * 0.9)
+        freed = 0
+        rows = self.conn.execute(
+            "SELECT content_hash, size FROM attachment_text ORDER BY last_access ASC;"
+        )
+        victims = []
+        for content_hash, size in rows:
+            if total_bytes - freed <= target:
+                break
+            victims.append((content_hash,))
+            freed += size
+        self.conn.executemany("DELETE FROM attachment_text WHERE content_hash = ?;", victims)
+        self.conn.execute("UPDATE cache_stats SET total_bytes = total_bytes - ? WHERE id = 1;", (freed,))
+
+    def get_or_extract(self, kind, content_bytes, extract):
+        """
+        캐시에 있으면 저장된 텍스트를, 없으면 extract(content_bytes) 결과를 저장 후 반환합니다.
+        extract가 None(추출 실패)을 반환하면 저장하지 않고 None을 반환합니다.
+        """
+        key = self.make_key(kind, content_bytes)
+        text = self.get(key)
+        if text is None:
+            text = extract(content_bytes)
+            if text is not None:
+                self.put(key, text)
+        return text
+
+    def stats(self):
+        """이 인스턴스와 캐시 파일 전체의 히트/미스 통계를 반환합니다."""
+        with self.conn:
+            self._flush_access()
+        hits, misses, total_bytes = self.conn.execute(
+            "SELECT hits, misses, total_bytes FROM cache_stats WHERE id = 1;"
+        ).fetchone()
+        entries = self.conn.execute("SELECT COUNT(*) FROM attachment_text;").fetchone()[0]
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "session_hits": self.hits,
+            "session_misses": self.misses,
+        }
+
+    def close(self):
+        if self.conn:
+            try:
+                with self.conn:
+                    self._flush_access()
+            except sqlite3.Error:
+                pass
+            self.conn.close()
+            self.conn = None
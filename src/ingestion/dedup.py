@@ -0,0 +1,184 @@
+import re
+import hashlib
+import unicodedata
+import numpy as np
+
+# 인용된 이전 메일이 시작되는 줄 (Outlook/Gmail/네이버 등의 답장/전달 머리글)
+_QUOTE_SEPARATOR = re.compile(
+    r"^\s*-{2,}\s*(?:original message|forwarded message|원본\s*메시지|전달된\s*메시지)\s*-{2,}\s*$", re.I)
+_QUOTE_ATTRIBUTION = re.compile(r"^\s*(?:on\s.+\swrote:|.+님이\s*작성:)\s*$", re.I)
+_QUOTE_HEADER_FROM = re.compile(r"^\s*\**(?:from|보낸\s*사람)\s*:", re.I)
+_QUOTE_HEADER_NEXT = re.compile(r"^\s*\**(?:sent|date|to|subject|보낸\s*날짜|받는\s*사람|제목)\s*:", re.I)
+# 서명 구분선('-- ')과 모바일 메일 앱이 붙이는 꼬리말
+_SIGNATURE = re.compile(r"^(?:--\s?|sent from my .+)$", re.I)
+# 'iPhone에서 보냄'처럼 알려진 메일 앱의 꼬리말. 일반 문장('... 사무소에서 보냄')과 구분하기 위해
+# 새로 쓴 본문의 마지막 SIGNATURE_TAIL_LINES줄 안에 있을 때만 서명으로 봄
+_CLIENT_SIGNATURE = re.compile(
+    r"^(?:내|나의|삼성|samsung)?\s*(?:iphone|ipad|galaxy|android|갤럭시|모바일|outlook)[^\n]{0,20}에서 보냄$", re.I)
+SIGNATURE_TAIL_LINES = 3
+
+# SimHash: 문자 shingle 길이와 유사 중복으로 볼 최대 해밍 거리 (64비트 중)
+SHINGLE_SIZE = 5
+MAX_DISTANCE = 5
+# shingle이 이보다 적은 짧은 텍스트는 서명이 불안정하므로 유사 중복으로 묶지 않음
+MIN_SHINGLES = 100
+# 숫자가 들어간 토큰 (호선 번호 'H-1001', 금액 '1,200,000원', 날짜 '2024-03-05' 등)
+_DETAIL_TOKEN = re.compile(r"\w*\d[\w.,:/-]*")
+
+_HASH_BASE = np.uint64(0x100000001B3)
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def _is_quote_start(lines, i):
+    line = lines[i]
+    if _QUOTE_SEPARATOR.match(line):
+        return True
+    if _QUOTE_ATTRIBUTION.match(line):
+        return True
+    # Gmail은 긴 'On ... wrote:'를 두 줄로 나누기도 함
+    if line.lstrip().lower().startswith("on ") and i + 1 < len(lines) and lines[i + 1].rstrip().endswith("wrote:"):
+        return True
+    # 'From: ...' 다음 몇 줄 안에 'Sent:'/'To:' 등이 이어지면 Outlook 답장 머리글
+    return bool(_QUOTE_HEADER_FROM.match(line)) and any(_QUOTE_HEADER_NEXT.match(next_line)
+                                                        for next_line in lines[i + 1:i + 4])
+
+def strip_quoted_text(text):
+    """
+    답장/전달 메일 본문에서 인용된 이전 메일('>'로 시작하는 줄, 'On ... wrote:'/'-----Original Message-----'/
+    'From: ... Sent: ...' 머리글 이후)과 서명('-- ' 이후, 'Sent from my iPhone'/끝부분의 'iPhone에서 보냄' 등)을 뺀 본문을 반환합니다.
+    새로 쓴 내용이 없으면 (본문 없이 전달한 메일 등) 원래 텍스트를 그대로 반환합니다.
+    """
+    if not text:
+        return text
+    lines = text.splitlines()
+    end = next((i for i in range(len(lines)) if _is_quote_start(lines, i)), len(lines))
+    # 인용 머리글 앞의 마지막 몇 줄 (빈 줄과 '>' 인용 줄 제외)
+    tail = [i for i in range(end) if lines[i].strip() and not lines[i].lstrip().startswith(">")]
+    tail = set(tail[-SIGNATURE_TAIL_LINES:])
+    kept = []
+    for i, line in enumerate(lines[:end]):
+        if _SIGNATURE.match(line.strip()) or (i in tail and _CLIENT_SIGNATURE.match(line.strip())):
+            break
+        if line.lstrip().startswith(">"):
+            continue
+        kept.append(line)
+    stripped = "\n".join(kept).strip()
+    return stripped if stripped else text
+
+def _mix64(x):
+    """splitmix64 마무리 함수: shingle 해시의 비트를 고르게 섞음."""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def _shingle_hashes(text, size=SHINGLE_SIZE):
+    """정규화한 텍스트의 길이 size인 문자 shingle마다 64비트 해시 (shingle 수가 적으면 빈 배열)."""
+    text = " ".join(unicodedata.normalize("NFC", text or "").lower().split())
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype="<u4").astype(np.uint64)
+    count = len(codes) - size + 1
+    if count < MIN_SHINGLES:
+        return np.zeros(0, dtype=np.uint64)
+    hashes = np.zeros(count, dtype=np.uint64)
+    for j in range(size):
+        hashes = hashes * _HASH_BASE + codes[j:j + count]
+    return _mix64(hashes)
+
+def simhash(text):
+    """
+    텍스트의 64비트 SimHash (문자 5-gram shingle). 한국어처럼 띄어쓰기 단위가 큰 텍스트에서도
+    몇 단어만 바뀐 사본은 비트 몇 개만 다르게 됩니다. 텍스트가 짧으면 None.
+    """
+    hashes = _shingle_hashes(text)
+    if len(hashes) == 0:
+        return None
+    # bits[i, k]: i번째 shingle 해시의 k번째 비트. 과반수의 shingle에서 1인 비트를 1로 둠
+    bits = np.unpackbits(hashes.astype("<u8").view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(hashes)
+    return int(np.packbits(majority, bitorder="little").view("<u8")[0])
+
+def detail_hash(text):
+    """
+    텍스트에 나오는 숫자가 들어간 토큰(호선 번호, 금액, 날짜 등)의 순서열을 64비트로 요약합니다.
+    SimHash로는 구분되지 않는 사본이라도 이 값이 다르면 유사 중복으로 묶지 않습니다.
+    """
+    text = unicodedata.normalize("NFC", text or "").lower()
+    tokens = [token.rstrip(".,:/-") for token in _DETAIL_TOKEN.findall(text)]
+    digest = hashlib.blake2b("\n".join(tokens).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+def hamming_distances(signatures, signature):
+    """uint64 배열의 각 값과 signature의 다른 비트 수."""
+    xor = np.asarray(signatures, dtype="<u8") ^ np.uint64(signature)
+    return _POPCOUNT8[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int64)
+
+class SimHashIndex:
+    """
+    SimHash 서명 중 해밍 거리가 max_distance 이하이고 detail_hash 값이 같은 것을 찾는 색인입니다.
+    64비트를 max_distance + 1개의 밴드로 나누면 거리가 max_distance 이하인 두 서명은
+    적어도 한 밴드가 같으므로 (비둘기집 원리), 같은 밴드 값을 가진 후보만 비교합니다.
+    밴드 값별로 정렬한 배열에서 후보를 찾고, 마지막 정렬 이후에 추가한 서명은 dict로 찾습니다.
+    추가한 서명이 정렬된 서명 수(최소 recent_limit)를 넘으면 다시 정렬합니다.
+    """
+    recent_limit = 4096
+
+    def __init__(self, max_distance=MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.band_bits = 64 // (max_distance + 1)
+        self.signatures = np.zeros(0, dtype=np.uint64)
+        self.values = np.zeros(0, dtype=np.int64) # 서명마다 호출자가 붙인 값 (예: 임베딩 캐시 행 번호)
+        self.details = np.zeros(0, dtype=np.uint64) # 서명마다 detail_hash 값
+        self._sorted_count = 0
+        self._bands = []
+        self._recent = {} # (밴드, 밴드 값) -> 정렬 이후에 추가한 서명의 위치
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def add(self, signatures, values, details):
+        start = len(self.signatures)
+        self.signatures = np.concatenate([self.signatures, np.asarray(signatures, dtype=np.uint64)])
+        self.values = np.concatenate([self.values, np.asarray(values, dtype=np.int64)])
+        self.details = np.concatenate([self.details, np.asarray(details, dtype=np.uint64)])
+        if len(self.signatures) - self._sorted_count > max(self.recent_limit, self._sorted_count):
+            self._sort()
+            return
+        for position in range(start, len(self.signatures)):
+            for band, key in enumerate(self._band_keys(int(self.signatures[position]))):
+                self._recent.setdefault((band, key), []).append(position)
+
+    def _band_keys(self, signature):
+        mask = (1 << self.band_bits) - 1
+        return [(signature >> (band * self.band_bits)) & mask for band in range(self.max_distance + 1)]
+
+    def _sort(self):
+        self._bands = []
+        mask = np.uint64((1 << self.band_bits) - 1)
+        for band in range(self.max_distance + 1):
+            keys = (self.signatures >> np.uint64(band * self.band_bits)) & mask
+            order = np.argsort(keys, kind="stable")
+            self._bands.append((keys[order], order))
+        self._sorted_count = len(self.signatures)
+        self._recent = {}
+
+    def find(self, signature, detail):
+        """detail이 같고 signature와 해밍 거리가 max_distance 이하인 가장 가까운 서명의 값. 없으면 None."""
+        if signature is None or not len(self.signatures):
+            return None
+        candidates = []
+        for band, key in enumerate(self._band_keys(signature)):
+            if self._bands:
+                keys, order = self._bands[band]
+                # 파이썬 int로 찾으면 numpy가 배열 전체를 변환하므로 같은 dtype으로 찾음
+                lo, hi = keys.searchsorted(np.uint64(key), side="left"), keys.searchsorted(np.uint64(key), side="right")
+                candidates.append(order[lo:hi])
+            candidates.append(np.asarray(self._recent.get((band, key), ()), dtype=np.int64))
+        candidates = np.unique(np.concatenate(candidates))
+        candidates = candidates[self.details[candidates] == np.uint64(detail)]
+        if not len(candidates):
+            return None
+        distances = hamming_distances(self.signatures[candidates], signature)
+        best = int(np.argmin(distances))
+        if distances[best] > self.max_distance:
+            return None
+        return int(self.values[candidates[best]])
@@ -1,121 +1,459 @@
 import os
 import sys
 import io
-import fitz  # PyMuPDF
-import docx
+import atexit
+import re
+import multiprocessing
+import multiprocessing.util
 from email import policy
 from email.parser import BytesParser
 from email.utils import parsedate_to_datetime, getaddresses
 from datetime import datetime
 from src.common.models import Email
+from src.common.instrumentation import instrumentation
+from src.ingestion.attachment_cache import AttachmentTextCache, DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES
+
+# 프로세스 풀 작업자 하나에 한 번에 넘기는 파일 수
+DEFAULT_CHUNKSIZE = 16
+
+PDF_MIME_TYPE = 'application/pdf'
+DOCX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+# PST(MAPI) 속성 태그
+PR_SENDER_EMAIL_ADDRESS = 0x0C1F
+PR_SENT_REPRESENTING_EMAIL_ADDRESS = 0x0065
+PR_INTERNET_MESSAGE_ID = 0x1035
+PR_INTERNET_REFERENCES = 0x1039
+PR_IN_REPLY_TO_ID = 0x1042
+PR_RECIPIENT_TYPE = 0x0C15
+PR_EMAIL_ADDRESS = 0x3003
+PR_SMTP_ADDRESS = 0x39FE
+PR_ATTACH_FILENAME = 0x3704
+PR_ATTACH_LONG_FILENAME = 0x3707
+PR_ATTACH_MIME_TAG = 0x370E
+MAPI_TO = 1
+MAPI_CC = 2
 
 def _extract_text_from_pdf(content_bytes):
-    """Extracts text from PDF bytes."""
+    """Extracts text from PDF bytes. Returns None if extraction fails."""
+    import fitz  # PyMuPDF (무거운 의존성이므로 첨부파일을 처리할 때만 임포트)
     try:
         with fitz.open(stream=content_bytes, filetype="pdf") as doc:
             return "".join(page.get_text() for page in doc)
     except Exception as e:
         print(f"PDF 텍스트 추출 중 오류 발생: {e}", file=sys.stderr)
-        return ""
+        return None
 
 def _extract_text_from_docx(content_bytes):
-    """Extracts text from DOCX bytes."""
+    """Extracts text from DOCX bytes. Returns None if extraction fails."""
+    import docx  # python-docx
     try:
         stream = io.BytesIO(content_bytes)
         doc = docx.Document(stream)
         return "\n".join([para.text for para in doc.paragraphs])
     except Exception as e:
         print(f"DOCX 텍스트 추출 중 오류 발생: {e}", file=sys.stderr)
+        return None
+
+def _attachment_kind(content_type, filename=None):
+    """Returns 'pdf', 'docx' or None depending on the MIME type or file extension."""
+    filename = (filename or "").lower()
+    if content_type == PDF_MIME_TYPE or filename.endswith(".pdf"):
+        return "pdf"
+    if content_type == DOCX_MIME_TYPE or filename.endswith(".docx"):
+        return "docx"
+    return None
+
+_ATTACHMENT_EXTRACTORS = {
+    "pdf": _extract_text_from_pdf,
+    "docx": _extract_text_from_docx,
+}
+
+# 첨부파일 텍스트 캐시 설정. 프로세스 풀 작업자는 fork 시 이 설정을 물려받고,
+# SQLite 연결은 프로세스마다 따로 엽니다.
+_attachment_cache_settings = {"cache_path": DEFAULT_CACHE_PATH, "max_bytes": DEFAULT_MAX_BYTES}
+_attachment_cache = None
+_attachment_cache_pid = None
+
+def _close_attachment_cache():
+    # 모아 둔 사용 시각/통계 갱신도 이때 반영됨
+    global _attachment_cache, _attachment_cache_pid
+    if _attachment_cache is not None and _attachment_cache_pid == os.getpid():
+        _attachment_cache.close()
+    _attachment_cache = None
+    _attachment_cache_pid = None
+
+atexit.register(_close_attachment_cache)
+
+def configure_attachment_cache(cache_path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Sets the on-disk attachment text cache used by the parsers.
+    Pass cache_path=None to disable caching.
+    """
+    _close_attachment_cache()
+    _attachment_cache_settings["cache_path"] = cache_path
+    _attachment_cache_settings["max_bytes"] = max_bytes
+
+def get_attachment_cache():
+    """Returns this process's AttachmentTextCache, or None if caching is disabled."""
+    global _attachment_cache, _attachment_cache_pid
+    if _attachment_cache_settings["cache_path"] is None:
+        return None
+    if _attachment_cache is None or _attachment_cache_pid != os.getpid():
+        try:
+            _attachment_cache = AttachmentTextCache(**_attachment_cache_settings)
+            _attachment_cache_pid = os.getpid()
+        except Exception as e:
+            print(f"첨부파일 캐시를 여는 중 오류 발생, 캐시 없이 진행합니다: {e}", file=sys.stderr)
+            _attachment_cache_settings["cache_path"] = None
+            return None
+    return _attachment_cache
+
+def _extract_attachment_text(content_type, content_bytes, filename=None):
+    """
+    Extracts text from a PDF or DOCX attachment; other attachments and failed
+    extractions yield an empty string. Failures are not cached, so they are retried
+    the next time the attachment is parsed.
+    """
+    kind = _attachment_kind(content_type, filename)
+    if kind is None:
         return ""
+    extract = _ATTACHMENT_EXTRACTORS[kind]
+    instrumentation.count(f"attachment.{kind}")
+    with instrumentation.span("parse.attachment", len(content_bytes)):
+        cache = get_attachment_cache()
+        if cache is None:
+            return extract(content_bytes) or ""
+        try:
+            text = cache.get_or_extract(kind, content_bytes, extract)
+        except Exception as e:
+            print(f"첨부파일 캐시 사용 중 오류 발생: {e}", file=sys.stderr)
+            text = extract(content_bytes)
+        return text or ""
+
+_MESSAGE_ID = re.compile(r"<([^<>\s]+)>")
+
+def _message_ids(value):
+    """Returns the message ids ('<...>') in a Message-ID/In-Reply-To/References value, without brackets."""
+    if not value:
+        return []
+    ids = _MESSAGE_ID.findall(str(value))
+    if not ids and str(value).strip():
+        # 꺾쇠괄호 없이 적은 메일 클라이언트도 있음
+        ids = str(value).split()
+    return ids
+
+def iter_eml_paths(eml_directory):
+    """Yields the paths of all .eml files under a directory."""
+    for root, _, files in os.walk(eml_directory):
+        for filename in files:
+            if filename.endswith(".eml"):
+                yield os.path.join(root, filename)
+
+def _parse_eml_file(file_path):
+    """Parses a single .eml file into an Email object, including attachment text."""
+    with instrumentation.span("parse.eml"):
+        return _read_eml_file(file_path)
+
+def _parse_eml_file_instrumented(file_path):
+    """Pool worker variant that also returns the worker's spans/counters for this file."""
+    email_obj = _parse_eml_file(file_path)
+    return email_obj, instrumentation.snapshot(reset=True)
+
+def _init_parse_worker(instrumented):
+    # fork로 복사된 부모의 값은 버리고 이 작업자에서 잰 값만 돌려보냄
+    instrumentation.enable(instrumented)
+    instrumentation.reset()
+    # 풀 작업자는 os._exit로 끝나 atexit가 실행되지 않으므로, 작업자 종료 시 실행되는 finalizer로
+    # 모아 둔 첨부파일 캐시의 사용 시각/통계 갱신을 반영함
+    multiprocessing.util.Finalize(None, _close_attachment_cache, exitpriority=10)
+
+def _header_fields(msg):
+    """Returns the subject, sender, receivers (To + Cc), cc and sent date of a parsed message."""
+    subject = msg.get('subject', 'No Subject')
+    sender_tuple = getaddresses([msg.get('from', '')])
+    sender = sender_tuple[0][1] if sender_tuple else 'No Sender'
+
+    to_tuple = getaddresses(msg.get_all('to', []))
+    cc_tuple = getaddresses(msg.get_all('cc', []))
+    receivers = [addr for name, addr in to_tuple + cc_tuple]
+
+    date_str = msg.get('date')
+    sent_date = None
+    if date_str:
+        try:
+            sent_date = parsedate_to_datetime(date_str)
+        except Exception:
+            sent_date = datetime.now() # Fallback
+    return subject, sender, receivers, [addr for name, addr in cc_tuple], sent_date
+
+def _read_eml_file(file_path):
+    with open(file_path, 'rb') as f:
+        msg = BytesParser(policy=policy.default).parse(f)
+
+    # Extract headers
+    subject, sender, receivers, cc, sent_date = _header_fields(msg)
+
+    # Extract body
+    body_plain = ""
+    if msg.is_multipart():
+        for part in msg.walk():
+            ctype = part.get_content_type()
+            cdispo = str(part.get('Content-Disposition'))
+            if ctype == 'text/plain' and 'attachment' not in cdispo:
+                body_plain = part.get_payload(decode=True).decode('utf-8', errors='ignore')
+                break
+    else:
+        body_plain = msg.get_payload(decode=True).decode('utf-8', errors='ignore')
+
+    # Extract attachment text
+    attachment_texts = []
+    if msg.is_multipart():
+        for part in msg.iter_attachments():
+            content_type = part.get_content_type()
+            content_bytes = part.get_payload(decode=True)
+
+            if content_bytes is None:
+                continue
+
+            attachment_texts.append(
+                _extract_attachment_text(content_type, content_bytes, part.get_filename())
+            )
+
+    attachment_text_combined = "\n".join(filter(None, attachment_texts))
+
+    internet_message_id = next(iter(_message_ids(msg.get('message-id'))), None)
+    in_reply_to = next(iter(_message_ids(msg.get('in-reply-to'))), None)
 
-def parse_eml_files(eml_directory):
+    return Email(
+        message_id=os.path.basename(file_path),
+        subject=subject,
+        body_plain=body_plain,
+        body_html=None,
+        sender=sender,
+        receivers=receivers,
+        sent_date=sent_date,
+        folder_path=os.path.basename(os.path.dirname(file_path)),
+        attachment_text=attachment_text_combined,
+        thread_topic=subject,
+        cc=cc,
+        internet_message_id=internet_message_id,
+        in_reply_to=in_reply_to,
+        references=_message_ids(msg.get('references'))
+    )
+
+def parse_eml_headers(file_paths):
+    """
+    Yields Email objects with only the header fields (subject, sender, receivers, date) filled in.
+    Bodies and attachments are not decoded, so this is much cheaper than `parse_eml_paths`
+    when only the contacts are needed.
+    """
+    for file_path in file_paths:
+        with open(file_path, 'rb') as f:
+            msg = BytesParser(policy=policy.default).parse(f, headersonly=True)
+        subject, sender, receivers, cc, sent_date = _header_fields(msg)
+        yield Email(
+            message_id=os.path.basename(file_path), subject=subject, body_plain=None, body_html=None,
+            sender=sender, receivers=receivers, sent_date=sent_date,
+            folder_path=os.path.basename(os.path.dirname(file_path)), thread_topic=subject, cc=cc
+        )
+
+def parse_eml_paths(file_paths, workers=None, chunksize=DEFAULT_CHUNKSIZE, ordered=True):
+    """
+    Parses the given .eml files and yields Email objects.
+
+    With more than one worker, parsing and attachment extraction are spread
+    across a process pool and results are streamed back as they complete.
+    `workers=None` uses every CPU core; `workers=1` parses in-process.
+    `ordered=False` yields emails in completion order, which keeps all
+    workers busy when some files (large attachments) are much slower.
+    """
+    file_paths = list(file_paths)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, max(1, len(file_paths) // max(1, chunksize)))
+
+    if workers <= 1:
+        for file_path in file_paths:
+            yield _parse_eml_file(file_path)
+        return
+
+    instrumented = instrumentation.enabled
+    with multiprocessing.Pool(processes=workers, initializer=_init_parse_worker, initargs=(instrumented,)) as pool:
+        mapper = pool.imap if ordered else pool.imap_unordered
+        if not instrumented:
+            yield from mapper(_parse_eml_file, file_paths, chunksize=chunksize)
+        else:
+            # 작업자 프로세스에서 잰 파싱/첨부파일 시간을 이 프로세스의 계측에 합침
+            for email_obj, stats in mapper(_parse_eml_file_instrumented, file_paths, chunksize=chunksize):
+                instrumentation.merge(stats)
+                yield email_obj
+        # with 블록의 terminate()는 작업자를 SIGTERM으로 끝내 finalizer가 실행되지 않으므로 정상 종료를 기다림
+        pool.close()
+        pool.join()
+
+def parse_eml_files(eml_directory, workers=None, chunksize=DEFAULT_CHUNKSIZE, ordered=True):
     """
     Walks through a directory, parses all .eml files, and yields Email objects,
     including text from attachments.
+
+    See `parse_eml_paths` for the meaning of `workers`, `chunksize` and `ordered`.
     """
     print(f"'{eml_directory}' 디렉터리에서 .eml 파일 파싱을 시작합니다...")
-    
+
     file_count = 0
-    for root, _, files in os.walk(eml_directory):
-        for filename in files:
-            if not filename.endswith(".eml"):
+    for email_obj in parse_eml_paths(iter_eml_paths(eml_directory), workers=workers,
+                                     chunksize=chunksize, ordered=ordered):
+        file_count += 1
+        yield email_obj
+    print(f"총 {file_count}개의 .eml 파일을 파싱했습니다.")
+
+def _record_entries(item):
+    """Returns the MAPI properties of the first record set of a PST item as {entry_type: entry}."""
+    if item.number_of_record_sets == 0:
+        return {}
+    return {entry.entry_type: entry for entry in item.get_record_set(0).entries}
+
+def _entry_string(entries, *entry_types):
+    """Returns the first non-empty string value among the given MAPI properties."""
+    for entry_type in entry_types:
+        entry = entries.get(entry_type)
+        if entry is None or entry.data is None:
+            continue
+        try:
+            value = entry.data_as_string
+        except Exception:
+            continue
+        if value:
+            return value.strip()
+    return None
+
+def _decode_body(body):
+    if body is None:
+        return ""
+    if isinstance(body, bytes):
+        return body.decode('utf-8', errors='ignore').rstrip('\x00')
+    return body
+
+def _pst_receivers(message):
+    """
+    Returns the To/Cc addresses of a PST message (BCC is excluded, as for .eml)
+    and the subset of them that are Cc.
+    """
+    receivers = []
+    cc = []
+    recipients = message.recipients
+    if recipients is None:
+        return receivers, cc
+    for i in range(recipients.number_of_record_sets):
+        entries = {entry.entry_type: entry for entry in recipients.get_record_set(i).entries}
+        recipient_type = entries.get(PR_RECIPIENT_TYPE)
+        if recipient_type is not None and recipient_type.data_as_integer not in (MAPI_TO, MAPI_CC):
+            continue
+        address = _entry_string(entries, PR_SMTP_ADDRESS, PR_EMAIL_ADDRESS)
+        if address:
+            receivers.append(address)
+            if recipient_type is not None and recipient_type.data_as_integer == MAPI_CC:
+                cc.append(address)
+    return receivers, cc
+
+def _pst_attachment_text(message):
+    attachment_texts = []
+    for i in range(message.number_of_attachments):
+        try:
+            attachment = message.get_attachment(i)
+            size = attachment.size
+            if not size:
                 continue
+            entries = _record_entries(attachment)
+            filename = _entry_string(entries, PR_ATTACH_LONG_FILENAME, PR_ATTACH_FILENAME)
+            content_type = _entry_string(entries, PR_ATTACH_MIME_TAG)
+            if _attachment_kind(content_type, filename) is None:
+                continue
+            content_bytes = attachment.read_buffer(size)
+        except Exception as e:
+            print(f"PST 첨부파일 읽기 중 오류 발생: {e}", file=sys.stderr)
+            continue
+        attachment_texts.append(_extract_attachment_text(content_type, content_bytes, filename))
+    return "\n".join(filter(None, attachment_texts))
 
-            file_path = os.path.join(root, filename)
-            file_count += 1
-            
-            with open(file_path, 'rb') as f:
-                msg = BytesParser(policy=policy.default).parse(f)
-
-            # Extract headers
-            subject = msg.get('subject', 'No Subject')
-            sender_tuple = getaddresses([msg.get('from', '')])
-            sender = sender_tuple[0][1] if sender_tuple else 'No Sender'
-
-            to_tuple = getaddresses(msg.get_all('to', []))
-            cc_tuple = getaddresses(msg.get_all('cc', []))
-            receivers = [addr for name, addr in to_tuple + cc_tuple]
-
-            date_str = msg.get('date')
-            sent_date = None
-            if date_str:
-                try:
-                    sent_date = parsedate_to_datetime(date_str)
-                except Exception:
-                    sent_date = datetime.now() # Fallback
-
-            # Extract body
-            body_plain = ""
-            if msg.is_multipart():
-                for part in msg.walk():
-                    ctype = part.get_content_type()
-                    cdispo = str(part.get('Content-Disposition'))
-                    if ctype == 'text/plain' and 'attachment' not in cdispo:
-                        body_plain = part.get_payload(decode=True).decode('utf-8', errors='ignore')
-                        break
-            else:
-                body_plain = msg.get_payload(decode=True).decode('utf-8', errors='ignore')
-
-            # Extract attachment text
-            attachment_texts = []
-            if msg.is_multipart():
-                for part in msg.iter_attachments():
-                    content_type = part.get_content_type()
-                    content_bytes = part.get_payload(decode=True)
-                    
-                    if content_bytes is None:
-                        continue
-
-                    if content_type == 'application/pdf':
-                        attachment_texts.append(_extract_text_from_pdf(content_bytes))
-                    elif content_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
-                        attachment_texts.append(_extract_text_from_docx(content_bytes))
-            
-            attachment_text_combined = "\n".join(filter(None, attachment_texts))
-
-            yield Email(
-                message_id=filename,
-                subject=subject,
-                body_plain=body_plain,
-                body_html=None,
-                sender=sender,
-                receivers=receivers,
-                sent_date=sent_date,
-                folder_path=os.path.basename(root),
-                attachment_text=attachment_text_combined,
-                thread_topic=subject
-            )
-    print(f"총 {file_count}개의 .eml 파일을 파싱했습니다.")
+def _pst_message_to_email(message, folder_path):
+    entries = _record_entries(message)
+
+    subject = message.subject or 'No Subject'
+    sender = _entry_string(entries, PR_SENDER_EMAIL_ADDRESS, PR_SENT_REPRESENTING_EMAIL_ADDRESS) \
+        or message.sender_name or 'No Sender'
+    internet_message_id = next(iter(_message_ids(_entry_string(entries, PR_INTERNET_MESSAGE_ID))), None)
+    message_id = _entry_string(entries, PR_INTERNET_MESSAGE_ID) or str(message.identifier)
+    receivers, cc = _pst_receivers(message)
+
+    return Email(
+        message_id=message_id,
+        subject=subject,
+        body_plain=_decode_body(message.plain_text_body),
+        body_html=_decode_body(message.html_body) or None,
+        sender=sender,
+        receivers=receivers,
+        sent_date=message.client_submit_time or message.delivery_time,
+        folder_path=folder_path,
+        attachment_text=_pst_attachment_text(message),
+        thread_topic=message.conversation_topic or subject,
+        cc=cc,
+        internet_message_id=internet_message_id,
+        in_reply_to=next(iter(_message_ids(_entry_string(entries, PR_IN_REPLY_TO_ID))), None),
+        references=_message_ids(_entry_string(entries, PR_INTERNET_REFERENCES))
+    )
+
+def _walk_pst_folder(folder, parent_path):
+    """Recursively yields Email objects from a PST folder, one message at a time."""
+    name = folder.name
+    folder_path = f"{parent_path}/{name}" if name else parent_path
+
+    for i in range(folder.number_of_sub_messages):
+        try:
+            with instrumentation.span("parse.pst_message"):
+                message = folder.get_sub_message(i)
+                email_obj = _pst_message_to_email(message, folder_path or "/")
+        except Exception as e:
+            print(f"PST 메시지 파싱 중 오류 발생 ({folder_path}, #{i}): {e}", file=sys.stderr)
+            continue
+        yield email_obj
+
+    for i in range(folder.number_of_sub_folders):
+        yield from _walk_pst_folder(folder.get_sub_folder(i), folder_path)
+
+def parse_pst_file(pst_file_path):
+    """
+    Streams every message of a PST file as Email objects, walking the folder
+    hierarchy recursively. Messages are read lazily through libpff, so memory
+    stays bounded regardless of the PST size and nothing is written to disk.
+    `folder_path` is the PST folder path, e.g. '/Top of Personal Folders/Inbox'.
+    """
+    import pypff  # libpff-python
+
+    print(f"'{pst_file_path}' PST 파일 파싱을 시작합니다...")
+    pst_file = pypff.file()
+    pst_file.open(pst_file_path)
+
+    message_count = 0
+    try:
+        for email_obj in _walk_pst_folder(pst_file.root_folder, ""):
+            message_count += 1
+            yield email_obj
+    finally:
+        pst_file.close()
+    print(f"총 {message_count}개의 PST 메시지를 파싱했습니다.")
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("사용법: python3 -m src.ingestion.parser <eml_디렉터리_경로>")
+        print("사용법: python3 -m src.ingestion.parser <eml_디렉터리_경로> [작업자 수]")
         sys.exit(1)
     
     eml_dir = sys.argv[1]
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
     
     print("EML 파싱 테스트 시작...")
-    email_generator = parse_eml_files(eml_dir)
+    email_generator = parse_eml_files(eml_dir, workers=workers)
     
     if email_generator:
         for i, email_obj in enumerate(email_generator):
@@ -1,13 +1,159 @@
 import sqlite3
 import json
 import os
+import time
 from datetime import datetime
 from src.common.models import Email # Email 클래스 임포트
+from src.ingestion.threads import ThreadIndex
+from src.common.instrumentation import instrumentation
+
+# 대량 적재 모드에서 사용하는 PRAGMA 설정
+BULK_LOAD_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",   # WAL에서는 체크포인트 시에만 fsync
+    "PRAGMA cache_size=-262144;",   # 256MB 페이지 캐시
+    "PRAGMA temp_store=MEMORY;",
+)
+
+# PRAGMA user_version으로 기록하는 스키마 버전
+# (2: addresses/message_recipients, attachment_text 추가, 3: contact_stats/contact_pairs 추가,
+#  4: emails.importance, storage_meta 추가, 5: emails.thread_id, thread_nodes 추가)
+SCHEMA_VERSION = 5
+
+# 조회용 보조 인덱스. 대량 적재 모드에서는 적재가 끝난 뒤 finish_bulk_load()에서 한 번에 생성합니다.
+SECONDARY_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_emails_sender_id ON emails (sender_id, sent_date);",
+    "CREATE INDEX IF NOT EXISTS idx_emails_sent_date ON emails (sent_date);",
+    "CREATE INDEX IF NOT EXISTS idx_emails_folder_path ON emails (folder_path, sent_date);",
+    "CREATE INDEX IF NOT EXISTS idx_message_recipients_address ON message_recipients (address_id, email_id);",
+)
+
+# 연락처 통계. 수집할 때 insert_emails/delete_emails에서 증감분만 반영합니다.
+#   - contact_stats: 주소별 보낸/받은(To/Cc) 메일 수와 마지막으로 주고받은 날짜
+#   - contact_pairs: (발신자, 수신자) 쌍별 메일 수. 메일함 소유자와 주고받은 횟수를 여기서 계산
+# last_seen은 메일이 삭제되어도 줄이지 않습니다 (가장 최근에 본 날짜).
+CONTACT_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS contact_stats (
+        address_id INTEGER PRIMARY KEY REFERENCES addresses (id),
+        sent_count INTEGER NOT NULL DEFAULT 0,
+        received_count INTEGER NOT NULL DEFAULT 0,
+        last_seen TIMESTAMP
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS contact_pairs (
+        sender_id INTEGER NOT NULL REFERENCES addresses (id),
+        recipient_id INTEGER NOT NULL REFERENCES addresses (id),
+        message_count INTEGER NOT NULL DEFAULT 0,
+        last_seen TIMESTAMP,
+        PRIMARY KEY (sender_id, recipient_id)
+    ) WITHOUT ROWID;
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_contact_stats_sent ON contact_stats (sent_count);",
+    "CREATE INDEX IF NOT EXISTS idx_contact_pairs_recipient ON contact_pairs (recipient_id, sender_id);",
+)
+
+# 정규화된 이메일 주소마다 한 행 (emails.sender_id, message_recipients, 연락처 통계가 참조)
+ADDRESSES_TABLE = """
+CREATE TABLE IF NOT EXISTS addresses (
+    id INTEGER PRIMARY KEY,
+    address TEXT NOT NULL UNIQUE
+);
+"""
+
+# ContactStats가 메일마다 기록하는 연락처 (다시 색인하거나 삭제할 때 통계에서 뺄 값)
+CONTACT_MESSAGES_TABLE = """
+CREATE TABLE IF NOT EXISTS contact_messages (
+    message_id TEXT PRIMARY KEY,
+    sender_id INTEGER REFERENCES addresses (id),
+    recipient_ids TEXT NOT NULL, -- JSON 배열
+    sent_date TIMESTAMP
+) WITHOUT ROWID;
+"""
+
+# 저장소 설정 값 (key -> JSON 문자열). 'contact_ranking': emails.importance 계산에 반영된 ContactRanking
+STORAGE_META_TABLE = "CREATE TABLE IF NOT EXISTS storage_meta (key TEXT PRIMARY KEY, value TEXT);"
+
+# 두 last_seen 중 늦은 날짜 (SQLite의 max()는 인자 중 하나가 NULL이면 NULL을 반환하므로 coalesce로 감쌈)
+_LATER_LAST_SEEN = "max(coalesce(last_seen, excluded.last_seen), coalesce(excluded.last_seen, last_seen))"
+
+def normalize_address(address):
+    """주소 비교에 사용하는 정규화된 형태 (앞뒤 공백과 꺾쇠 제거, 소문자). 빈 주소는 None."""
+    if not address:
+        return None
+    address = address.strip(" <>").lower()
+    return address or None
+
+# 키워드 검색(fts5 엔진)용 FTS5 색인. emails 테이블을 외부 콘텐츠로 사용하므로 텍스트를 중복 저장하지 않고,
+# trigram 토크나이저로 띄어쓰기와 조사에 관계없이 한국어 부분 문자열을 찾을 수 있습니다.
+FTS_TABLE = "emails_fts"
+FTS_COLUMNS = ("subject", "body_plain", "attachment_text", "sender", "receivers", "folder_path", "thread_topic")
+
+def _fts_trigger_sql():
+    columns = ", ".join(FTS_COLUMNS)
+    new_values = ", ".join(f"new.{column}" for column in FTS_COLUMNS)
+    old_values = ", ".join(f"old.{column}" for column in FTS_COLUMNS)
+    insert_new = f"INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES (new.id, {new_values});"
+    delete_old = f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    return {
+        "emails_fts_ai": f"CREATE TRIGGER IF NOT EXISTS emails_fts_ai AFTER INSERT ON emails BEGIN {insert_new} END;",
+        "emails_fts_ad": f"CREATE TRIGGER IF NOT EXISTS emails_fts_ad AFTER DELETE ON emails BEGIN {delete_old} END;",
+        # 색인하는 컬럼이 바뀔 때만 갱신 (importance 등 다른 컬럼만 바꾸는 UPDATE는 FTS5 색인을 건드리지 않음)
+        "emails_fts_au": f"CREATE TRIGGER IF NOT EXISTS emails_fts_au AFTER UPDATE OF {columns} ON emails "
+                         f"BEGIN {delete_old} {insert_new} END;",
+    }
+
+FTS_TRIGGERS = _fts_trigger_sql()
+
+def update_contact_stats(cursor, rows, sign):
+    """
+    rows [(발신자 id, 수신자 id 집합, sent_date), ...]를 연락처 통계에 더하거나(sign=1) 뺍니다(sign=-1).
+    """
+    stats = {}  # address_id -> [sent, received, last_seen]
+    pairs = {}  # (sender_id, recipient_id) -> [count, last_seen]
+    for sender_id, recipient_ids, sent_date in rows:
+        for address_id, column in ([(sender_id, 0)] if sender_id is not None else []) + \
+                                  [(recipient_id, 1) for recipient_id in recipient_ids]:
+            entry = stats.setdefault(address_id, [0, 0, None])
+            entry[column] += sign
+            if sent_date and (entry[2] is None or sent_date > entry[2]):
+                entry[2] = sent_date
+        if sender_id is None:
+            continue
+        for recipient_id in recipient_ids:
+            entry = pairs.setdefault((sender_id, recipient_id), [0, None])
+            entry[0] += sign
+            if sent_date and (entry[1] is None or sent_date > entry[1]):
+                entry[1] = sent_date
+    last_seen = lambda value: value if sign > 0 else None
+    cursor.executemany(f"""
+    INSERT INTO contact_stats (address_id, sent_count, received_count, last_seen) VALUES (?, ?, ?, ?)
+    ON CONFLICT(address_id) DO UPDATE SET
+        sent_count = sent_count + excluded.sent_count,
+        received_count = received_count + excluded.received_count,
+        last_seen = {_LATER_LAST_SEEN};
+    """, [(address_id, sent, received, last_seen(seen)) for address_id, (sent, received, seen) in stats.items()])
+    cursor.executemany(f"""
+    INSERT INTO contact_pairs (sender_id, recipient_id, message_count, last_seen) VALUES (?, ?, ?, ?)
+    ON CONFLICT(sender_id, recipient_id) DO UPDATE SET
+        message_count = message_count + excluded.message_count,
+        last_seen = {_LATER_LAST_SEEN};
+    """, [(sender_id, recipient_id, count, last_seen(seen)) for (sender_id, recipient_id), (count, seen) in pairs.items()])
+
 
 class SQLiteStorage:
-    def __init__(self, db_path):
+    def __init__(self, db_path, bulk_load=False, transaction_size=50000, fts=False):
         """
         데이터베이스 경로를 인자로 받아 초기화합니다.
+
+        bulk_load=True이면 WAL과 대량 적재용 PRAGMA를 사용하고, insert_emails 호출마다
+        커밋하는 대신 transaction_size개 행마다 커밋합니다. 보조 인덱스와 FTS5 색인은
+        적재가 끝난 뒤 finish_bulk_load()에서 한 번에 생성합니다.
+
+        fts=True이면 키워드 엔진 'fts5'용 FTS5 색인을 만듭니다. trigram 색인은 적재 시간과
+        DB 크기를 크게 늘리므로 기본값은 False이며, DB에 이미 색인이 있으면 fts=False여도
+        트리거로 계속 동기화합니다.
         """
         # db_path가 디렉토리만 포함하는 경우, 파일 이름을 추가합니다.
         if os.path.isdir(db_path):
@@ -15,6 +161,14 @@ class SQLiteStorage:
             
         self.db_path = db_path
         self.conn = None
+        self.bulk_load = bulk_load
+        self.transaction_size = transaction_size
+        self._pending_rows = 0
+        self.fts = fts
+        self.fts_enabled = False
+        self._address_ids = {}  # 정규화된 주소 -> addresses.id
+        self._ranking = None  # importance 계산에 반영된 ContactRanking (storage_meta에서 읽음)
+        self.threads = None  # emails.thread_id를 정하는 ThreadIndex (connect()에서 생성)
         print(f"데이터베이스 경로가 '{self.db_path}'로 설정되었습니다.")
 
     def connect(self):
@@ -22,7 +176,13 @@ class SQLiteStorage:
         데이터베이스에 연결합니다.
         """
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            # 색인 파이프라인처럼 연결을 연 스레드와 다른 스레드에서 삽입할 수 있도록 허용
+            # (한 번에 한 스레드만 사용하며, SQLite 자체는 serialized 모드로 빌드됨)
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.threads = ThreadIndex(self.conn, members_table="emails")
+            if self.bulk_load:
+                for pragma in BULK_LOAD_PRAGMAS:
+                    self.conn.execute(pragma)
             print("데이터베이스에 성공적으로 연결되었습니다.")
         except sqlite3.Error as e:
             print(f"데이터베이스 연결 중 오류가 발생했습니다: {e}")
@@ -30,15 +190,28 @@ class SQLiteStorage:
 
     def close(self):
         """
-        데이터베이스 연결을 닫습니다.
+        데이터베이스 연결을 닫습니다. 커밋되지 않은 적재 중인 행은 커밋합니다.
         """
         if self.conn:
+            if self._pending_rows:
+                self.conn.commit()
+                self._pending_rows = 0
             self.conn.close()
             print("데이터베이스 연결이 닫혔습니다.")
 
     def create_table(self):
         """
-        'emails' 테이블을 생성합니다. 테이블이 이미 존재하면 생성하지 않습니다.
+        'emails' 테이블과 주소 테이블(addresses, message_recipients)을 생성합니다.
+        테이블이 이미 존재하면 생성하지 않고, 이전 스키마의 DB는 현재 스키마로 변환합니다.
+
+          - addresses: 정규화된 이메일 주소마다 한 행
+          - message_recipients: 이메일과 수신자 주소의 관계 (role: 'to' 또는 'cc')
+          - emails.sender_id: 발신자의 addresses.id
+          - contact_stats / contact_pairs: 연락처 통계 (CONTACT_TABLES 참고)
+          - emails.importance: 검색 병합 단계에서 더하는 정적 중요도 (refresh_importance 참고)
+          - emails.thread_id / thread_nodes: Message-ID/In-Reply-To/References와 제목으로 재구성한 스레드
+            (src.ingestion.threads.ThreadIndex)
+        receivers 컬럼(JSON 배열)은 원본 주소를 그대로 보여주기 위해 함께 유지합니다.
         """
         if not self.conn:
             print("오류: 데이터베이스에 연결되지 않았습니다.")
@@ -56,57 +229,781 @@ class SQLiteStorage:
             sent_date TIMESTAMP,
             folder_path TEXT,
             thread_topic TEXT,
-            ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            attachment_text TEXT,
+            sender_id INTEGER REFERENCES addresses (id),
+            importance INTEGER, -- ContactRanking으로 계산한 정적 중요도 (NULL은 0)
+            thread_id TEXT
         );
         """
+        create_address_tables_sql = (
+            ADDRESSES_TABLE,
+            """
+            CREATE TABLE IF NOT EXISTS message_recipients (
+                email_id INTEGER NOT NULL REFERENCES emails (id),
+                address_id INTEGER NOT NULL REFERENCES addresses (id),
+                role TEXT NOT NULL CHECK (role IN ('to', 'cc')),
+                PRIMARY KEY (email_id, address_id, role)
+            ) WITHOUT ROWID;
+            """,
+            # 이메일이 삭제되면 수신자 관계도 함께 삭제
+            """
+            CREATE TRIGGER IF NOT EXISTS emails_recipients_ad AFTER DELETE ON emails BEGIN
+                DELETE FROM message_recipients WHERE email_id = old.id;
+            END;
+            """,
+        )
         try:
             cursor = self.conn.cursor()
             cursor.execute(create_table_sql)
-            # message_id에 대한 인덱스 생성 (검색 성능 향상)
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_message_id ON emails (message_id);")
+            for sql in create_address_tables_sql + CONTACT_TABLES + (STORAGE_META_TABLE,):
+                cursor.execute(sql)
+            self._ensure_unique_message_id(cursor)
+            self._migrate_schema(cursor)
+            self.threads.create_tables(cursor)
+            self._assign_missing_threads(cursor)
+            if not self.bulk_load:
+                for index_sql in SECONDARY_INDEXES:
+                    cursor.execute(index_sql)
             self.conn.commit()
             print("'emails' 테이블이 성공적으로 준비되었습니다.")
         except sqlite3.Error as e:
             print(f"테이블 생성 중 오류가 발생했습니다: {e}")
+            return
+        self._create_fts()
 
-    def insert_emails(self, emails):
+    def _migrate_schema(self, cursor):
+        """
+        이전 스키마(버전 0/1)의 emails 테이블에 attachment_text, sender_id 컬럼을 추가하고
+        sender/receivers 값으로 addresses와 message_recipients를 채웁니다.
+        이전 버전은 To/Cc를 구분하지 않았으므로 기존 수신자는 모두 'to'로 기록합니다.
+        버전 2 이하의 DB는 저장된 이메일로 연락처 통계를 새로 계산하고,
+        버전 3 이하의 DB에는 importance 컬럼을, 버전 4 이하의 DB에는 thread_id 컬럼을 추가합니다
+        (값은 refresh_importance, _assign_missing_threads에서 채움).
+        """
+        version = cursor.execute("PRAGMA user_version;").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(emails);")}
+        migrating = "sender_id" not in columns
+        if "attachment_text" not in columns:
+            cursor.execute("ALTER TABLE emails ADD COLUMN attachment_text TEXT;")
+        if "sender_id" not in columns:
+            cursor.execute("ALTER TABLE emails ADD COLUMN sender_id INTEGER REFERENCES addresses (id);")
+        if "importance" not in columns:
+            cursor.execute("ALTER TABLE emails ADD COLUMN importance INTEGER;")
+            if cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'emails_fts_au';").fetchone():
+                # importance만 바꾸는 UPDATE가 FTS5 색인을 갱신하지 않도록 트리거를 교체
+                cursor.execute("DROP TRIGGER emails_fts_au;")
+                cursor.execute(FTS_TRIGGERS["emails_fts_au"])
+        if "thread_id" not in columns:
+            cursor.execute("ALTER TABLE emails ADD COLUMN thread_id TEXT;")
+
+        if migrating:
+            # 행마다 FTS5 색인을 갱신하지 않도록 트리거를 제거 (_create_fts에서 색인을 다시 만듦)
+            for name in FTS_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name};")
+            cursor.execute("DROP INDEX IF EXISTS idx_emails_sender;")
+            cursor.execute("""
+            INSERT OR IGNORE INTO addresses (address)
+            SELECT lower(trim(sender, ' <>')) FROM emails WHERE trim(sender, ' <>') != '';
+            """)
+            cursor.execute("""
+            INSERT OR IGNORE INTO addresses (address)
+            SELECT lower(trim(r.value, ' <>'))
+            FROM emails AS e, json_each(e.receivers) AS r
+            WHERE json_valid(e.receivers) AND trim(r.value, ' <>') != '';
+            """)
+            cursor.execute("""
+            UPDATE emails SET sender_id = (
+                SELECT id FROM addresses WHERE address = lower(trim(emails.sender, ' <>'))
+            );
+            """)
+            cursor.execute("""
+            INSERT OR IGNORE INTO message_recipients (email_id, address_id, role)
+            SELECT e.id, a.id, 'to'
+            FROM emails AS e, json_each(e.receivers) AS r
+            JOIN addresses AS a ON a.address = lower(trim(r.value, ' <>'))
+            WHERE json_valid(e.receivers);
+            """)
+            migrated = cursor.execute("SELECT COUNT(*) FROM emails;").fetchone()[0]
+            if migrated:
+                print(f"기존 이메일 {migrated}개의 발신자/수신자 주소를 정규화된 테이블로 옮겼습니다.")
+        if version < 3:
+            self._rebuild_contact_stats(cursor)
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+
+    def _assign_missing_threads(self, cursor, batch_size=10000):
+        """
+        thread_id가 없는 행(이전 스키마에서 수집한 이메일)의 스레드를 정합니다.
+        저장된 행에는 답장 헤더가 없으므로 제목 대체 규칙으로만 묶입니다.
+        """
+        assigned = 0
+        while True:
+            rows = cursor.execute(
+                "SELECT message_id, subject, thread_topic FROM emails WHERE thread_id IS NULL LIMIT ?;", (batch_size,)
+            ).fetchall()
+            if not rows:
+                break
+            emails = [Email(message_id=message_id, subject=subject, body_plain=None, body_html=None, sender="",
+                            receivers=[], sent_date=None, folder_path="", thread_topic=thread_topic)
+                      for message_id, subject, thread_topic in rows]
+            with instrumentation.span("threads.assign", len(emails)):
+                self.threads.assign(emails, cursor)
+            cursor.executemany("UPDATE emails SET thread_id = ? WHERE message_id = ?;",
+                               [(email.thread_id, email.message_id) for email in emails])
+            assigned += len(emails)
+        if assigned:
+            print(f"기존 이메일 {assigned}개의 스레드를 제목으로 재구성했습니다.")
+
+    def _rebuild_contact_stats(self, cursor):
+        """emails와 message_recipients 전체로 contact_stats와 contact_pairs를 다시 계산합니다."""
+        cursor.execute("DELETE FROM contact_stats;")
+        cursor.execute("DELETE FROM contact_pairs;")
+        # 같은 주소가 To와 Cc에 모두 있어도 메일 한 통으로 셈
+        recipients_sql = "SELECT DISTINCT email_id, address_id FROM message_recipients"
+        cursor.execute(f"""
+        INSERT INTO contact_stats (address_id, sent_count, received_count, last_seen)
+        SELECT address_id, SUM(sent), SUM(received), MAX(sent_date) FROM (
+            SELECT sender_id AS address_id, 1 AS sent, 0 AS received, sent_date FROM emails WHERE sender_id IS NOT NULL
+            UNION ALL
+            SELECT r.address_id, 0, 1, e.sent_date FROM ({recipients_sql}) AS r JOIN emails AS e ON e.id = r.email_id
+        ) GROUP BY address_id;
+        """)
+        cursor.execute(f"""
+        INSERT INTO contact_pairs (sender_id, recipient_id, message_count, last_seen)
+        SELECT e.sender_id, r.address_id, COUNT(*), MAX(e.sent_date)
+        FROM ({recipients_sql}) AS r JOIN emails AS e ON e.id = r.email_id
+        WHERE e.sender_id IS NOT NULL
+        GROUP BY e.sender_id, r.address_id;
+        """)
+
+    def _contact_rows(self, cursor, email_ids):
+        """저장된 이메일들의 (발신자 id, 수신자 id 집합, sent_date) (연락처 통계에서 뺄 값)."""
+        rows = {}
+        email_ids = list(email_ids)
+        for chunk_start in range(0, len(email_ids), 500):
+            chunk = email_ids[chunk_start:chunk_start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            for email_id, sender_id, sent_date in cursor.execute(
+                    f"SELECT id, sender_id, sent_date FROM emails WHERE id IN ({placeholders});", chunk):
+                rows[email_id] = (sender_id, set(), sent_date)
+            for email_id, address_id in cursor.execute(
+                    f"SELECT email_id, address_id FROM message_recipients WHERE email_id IN ({placeholders});", chunk):
+                rows[email_id][1].add(address_id)
+        return list(rows.values())
+
+    def _create_fts(self):
+        """
+        FTS5 색인과 동기화 트리거를 준비합니다.
+        대량 적재 모드에서는 행마다 색인을 갱신하지 않도록 트리거를 제거하고,
+        finish_bulk_load()에서 색인을 다시 만든 뒤 트리거를 복원합니다.
+        """
+        columns = ", ".join(FTS_COLUMNS)
+        try:
+            cursor = self.conn.cursor()
+            existing_columns = tuple(row[1] for row in cursor.execute(f"PRAGMA table_info({FTS_TABLE});"))
+            if not existing_columns and not self.fts:
+                return
+            if existing_columns and existing_columns != FTS_COLUMNS:
+                # 색인할 컬럼이 바뀐 경우 (예: attachment_text 추가) 새로 만들고 다시 색인
+                for name in FTS_TRIGGERS:
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {name};")
+                cursor.execute(f"DROP TABLE {FTS_TABLE};")
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"{columns}, content='emails', content_rowid='id', tokenize='trigram');"
+            )
+            if self.bulk_load:
+                for name in FTS_TRIGGERS:
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {name};")
+            else:
+                existing = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger';")}
+                if not set(FTS_TRIGGERS) <= existing:
+                    # 새로 만들었거나 대량 적재가 중간에 끊긴 경우: 기존 행으로 색인을 다시 만듦
+                    self._sync_fts(cursor)
+            self.conn.commit()
+            self.fts_enabled = True
+        except sqlite3.Error as e:
+            print(f"FTS5 색인을 준비하지 못했습니다 (키워드 엔진 'fts5'를 사용할 수 없음): {e}")
+
+    def _sync_fts(self, cursor):
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild');")
+        for trigger_sql in FTS_TRIGGERS.values():
+            cursor.execute(trigger_sql)
+
+    def _ensure_unique_message_id(self, cursor):
         """
-        Email 객체 리스트를 데이터베이스에 삽입합니다.
+        message_id에 UNIQUE 인덱스를 만듭니다 (upsert의 충돌 대상).
+        이전 버전에서 만든 DB는 같은 message_id가 중복 저장되었을 수 있으므로,
+        가장 최근에 삽입된 행만 남기고 기존의 일반 인덱스를 대체합니다.
+        """
+        existing = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_emails_message_id';"
+        ).fetchone()
+        if existing:
+            return
+        cursor.execute("DELETE FROM emails WHERE id NOT IN (SELECT MAX(id) FROM emails GROUP BY message_id);")
+        if cursor.rowcount > 0:
+            print(f"중복된 message_id 행 {cursor.rowcount}개를 정리했습니다.")
+        cursor.execute("DROP INDEX IF EXISTS idx_message_id;")
+        cursor.execute("CREATE UNIQUE INDEX idx_emails_message_id ON emails (message_id);")
+
+    def finish_bulk_load(self):
+        """
+        대량 적재를 마무리합니다: 남은 행을 커밋하고, 보조 인덱스와 FTS5 색인을 생성한 뒤
+        통계(ANALYZE)를 갱신하고 WAL을 체크포인트합니다.
         """
         if not self.conn:
             print("오류: 데이터베이스에 연결되지 않았습니다.")
             return
+        try:
+            self.conn.commit()
+            self._pending_rows = 0
+            cursor = self.conn.cursor()
+            with instrumentation.span("sqlite.secondary_indexes"):
+                for index_sql in SECONDARY_INDEXES:
+                    cursor.execute(index_sql)
+            if self.fts_enabled:
+                with instrumentation.span("sqlite.fts_rebuild"):
+                    self._sync_fts(cursor)
+            cursor.execute("ANALYZE;")
+            self.conn.commit()
+            cursor.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+            print("대량 적재 후 인덱스 생성을 완료했습니다.")
+        except sqlite3.Error as e:
+            print(f"인덱스 생성 중 오류가 발생했습니다: {e}")
+
+    def _address_id_map(self, cursor, addresses):
+        """정규화된 주소들의 addresses.id를 반환합니다. 없는 주소는 추가합니다."""
+        missing = [address for address in addresses if address not in self._address_ids]
+        if missing:
+            cursor.executemany("INSERT OR IGNORE INTO addresses (address) VALUES (?);", [(a,) for a in missing])
+            for chunk_start in range(0, len(missing), 500):
+                chunk = missing[chunk_start:chunk_start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                for address_id, address in cursor.execute(
+                        f"SELECT id, address FROM addresses WHERE address IN ({placeholders});", chunk):
+                    self._address_ids[address] = address_id
+        return self._address_ids
+
+    def _email_id_map(self, cursor, message_ids):
+        email_ids = {}
+        for chunk_start in range(0, len(message_ids), 500):
+            chunk = message_ids[chunk_start:chunk_start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            for email_id, message_id in cursor.execute(
+                    f"SELECT id, message_id FROM emails WHERE message_id IN ({placeholders});", chunk):
+                email_ids[message_id] = email_id
+        return email_ids
+
+    def insert_emails(self, emails):
+        """
+        Email 객체 리스트를 데이터베이스에 삽입합니다. 성공하면 True를 반환합니다.
+        발신자/수신자 주소는 addresses와 message_recipients에도 함께 기록하고,
+        스레드 색인(ThreadIndex)으로 정한 thread_id를 각 Email 객체와 행에 설정합니다.
+        실패하면 이 배치의 변경만 되돌리고 False를 반환합니다 (대량 적재 모드에서 아직
+        커밋되지 않은 이전 배치는 유지).
+        """
+        if not self.conn:
+            print("오류: 데이터베이스에 연결되지 않았습니다.")
+            return False
 
+        # 같은 message_id가 다시 수집되면 새 행을 추가하지 않고 기존 행을 갱신 (upsert)
         insert_sql = """
         INSERT INTO emails (
             message_id, subject, body_plain, body_html, sender,
-            receivers, sent_date, folder_path, thread_topic
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
+            receivers, sent_date, folder_path, thread_topic, attachment_text, sender_id, importance, thread_id
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(message_id) DO UPDATE SET
+            subject = excluded.subject,
+            body_plain = excluded.body_plain,
+            body_html = excluded.body_html,
+            sender = excluded.sender,
+            receivers = excluded.receivers,
+            sent_date = excluded.sent_date,
+            folder_path = excluded.folder_path,
+            thread_topic = excluded.thread_topic,
+            attachment_text = excluded.attachment_text,
+            sender_id = excluded.sender_id,
+            importance = excluded.importance,
+            thread_id = excluded.thread_id,
+            ingested_at = CURRENT_TIMESTAMP;
         """
-        data_to_insert = []
+        addresses = set()
+        recipients = []  # (message_id, 정규화된 주소, role)
         for email in emails:
-            # datetime 객체를 ISO 8601 문자열로 변환하여 저장
-            sent_date_str = email.sent_date.isoformat() if email.sent_date else None
-            receivers_json = json.dumps(email.receivers) if email.receivers else "[]"
-            data_to_insert.append((
-                email.message_id,
-                email.subject,
-                email.body_plain,
-                email.body_html,
-                email.sender,
-                receivers_json,
-                sent_date_str, 
-                email.folder_path,
-                email.thread_topic
-            ))
-        
+            sender = normalize_address(email.sender)
+            if sender:
+                addresses.add(sender)
+            cc = {normalize_address(address) for address in email.cc or ()}
+            for receiver in email.receivers or ():
+                receiver = normalize_address(receiver)
+                if receiver:
+                    addresses.add(receiver)
+                    recipients.append((email.message_id, receiver, "cc" if receiver in cc else "to"))
+
+        start = time.perf_counter()
+        cursor = self.conn.cursor()
         try:
-            cursor = self.conn.cursor()
+            # 배치 단위로 되돌릴 수 있도록 savepoint 사용. 트랜잭션 밖에서 만든 savepoint는
+            # RELEASE할 때 커밋되므로 먼저 트랜잭션을 시작함
+            if not self.conn.in_transaction:
+                cursor.execute("BEGIN;")
+            cursor.execute("SAVEPOINT insert_emails;")
+        except sqlite3.Error as e:
+            print(f"이메일 삽입 중 오류가 발생했습니다: {e}")
+            return False
+        try:
+            address_ids = self._address_id_map(cursor, list(addresses))
+            ranking = self.applied_ranking(cursor)
+            # 다시 수집되는 이메일의 이전 값은 연락처 통계에서 뺌
+            email_ids = self._email_id_map(cursor, [email.message_id for email in emails])
+            update_contact_stats(cursor, self._contact_rows(cursor, email_ids.values()), -1)
+            # 이 배치로 이어진 기존 스레드는 emails.thread_id를 함께 고침
+            with instrumentation.span("threads.assign", len(emails)):
+                self.threads.assign(emails, cursor)
+
+            data_to_insert = []
+            for email in emails:
+                # datetime 객체를 ISO 8601 문자열로 변환하여 저장
+                sent_date_str = email.sent_date.isoformat() if email.sent_date else None
+                receivers_json = json.dumps(email.receivers) if email.receivers else "[]"
+                data_to_insert.append((
+                    email.message_id,
+                    email.subject,
+                    email.body_plain,
+                    email.body_html,
+                    email.sender,
+                    receivers_json,
+                    sent_date_str,
+                    email.folder_path,
+                    email.thread_topic,
+                    email.attachment_text,
+                    address_ids.get(normalize_address(email.sender)),
+                    ranking.score_email(email),
+                    email.thread_id
+                ))
             cursor.executemany(insert_sql, data_to_insert)
-            self.conn.commit()
-            print(f"{len(emails)}개의 이메일이 성공적으로 삽입되었습니다.")
+
+            # 갱신된 이메일의 이전 수신자 관계를 지우고 새로 기록
+            email_ids = self._email_id_map(cursor, [email.message_id for email in emails])
+            cursor.executemany("DELETE FROM message_recipients WHERE email_id = ?;",
+                               [(email_id,) for email_id in email_ids.values()])
+            cursor.executemany(
+                "INSERT OR IGNORE INTO message_recipients (email_id, address_id, role) VALUES (?, ?, ?);",
+                [(email_ids[message_id], address_ids[address], role) for message_id, address, role in recipients]
+            )
+            # 새 값을 연락처 통계에 더함 (같은 배치에 같은 message_id가 있으면 마지막 것만 저장됨)
+            contact_rows = {}
+            for email, row in zip(emails, data_to_insert):
+                contact_rows[email.message_id] = (row[10], set(), row[6])
+            for message_id, address, _ in recipients:
+                contact_rows[message_id][1].add(address_ids[address])
+            update_contact_stats(cursor, contact_rows.values(), 1)
+            cursor.execute("RELEASE insert_emails;")
+
+            if self.bulk_load:
+                # 대량 적재 모드에서는 transaction_size개 행마다 커밋
+                self._pending_rows += len(data_to_insert)
+                if self._pending_rows >= self.transaction_size:
+                    self.conn.commit()
+                    self._pending_rows = 0
+            else:
+                self.conn.commit()
+            # 배치마다 출력하지 않고 계측(--profile)에만 기록
+            instrumentation.add("sqlite.insert", time.perf_counter() - start, len(emails))
+            return True
         except sqlite3.Error as e:
             print(f"이메일 삽입 중 오류가 발생했습니다: {e}")
+            try:
+                cursor.execute("ROLLBACK TO insert_emails;")
+                cursor.execute("RELEASE insert_emails;")
+            except sqlite3.Error:
+                pass
+            # 롤백된 주소 ID는 다시 조회하도록 비움
+            self._address_ids.clear()
+            return False
+
+    def delete_emails(self, message_ids):
+        """
+        message_id 목록에 해당하는 이메일을 삭제합니다. (FTS5 색인은 트리거로 함께 갱신)
+        """
+        if not self.conn:
+            print("오류: 데이터베이스에 연결되지 않았습니다.")
+            return
+        try:
+            cursor = self.conn.cursor()
+            email_ids = self._email_id_map(cursor, list(message_ids))
+            update_contact_stats(cursor, self._contact_rows(cursor, email_ids.values()), -1)
+            self.conn.executemany("DELETE FROM emails WHERE message_id = ?;", [(m,) for m in message_ids])
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"이메일 삭제 중 오류가 발생했습니다: {e}")
+
+    def get_meta(self, key, cursor=None):
+        row = (cursor or self.conn).execute("SELECT value FROM storage_meta WHERE key = ?;", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value, cursor=None):
+        (cursor or self.conn).execute("INSERT OR REPLACE INTO storage_meta (key, value) VALUES (?, ?);", (key, value))
+
+    def applied_ranking(self, cursor=None):
+        """emails.importance 값이 계산된 기준 ContactRanking (처음에는 빈 기준이며 importance는 모두 0/NULL)."""
+        if self._ranking is None:
+            self._ranking = ContactRanking.from_json(self.get_meta("contact_ranking", cursor))
+        return self._ranking
+
+    def _address_ids_of(self, cursor, addresses):
+        addresses = [address for address in addresses if address]
+        if not addresses:
+            return {}
+        placeholders = ", ".join("?" for _ in addresses)
+        return dict(cursor.execute(f"SELECT address, id FROM addresses WHERE address IN ({placeholders});", addresses))
+
+    def _importance_affected_sql(self, cursor, old, new):
+        """old에서 new로 기준이 바뀔 때 importance가 달라질 수 있는 이메일의 WHERE 조건 (인덱스 사용)."""
+        senders = list(self._address_ids_of(cursor, old.changed_senders(new)).values())
+        recipients = list(self._address_ids_of(cursor, old.changed_recipients(new)).values())
+        conditions = []
+        if senders:
+            conditions.append(f"sender_id IN ({', '.join('?' for _ in senders)})")
+        if recipients:
+            conditions.append(f"id IN (SELECT email_id FROM message_recipients WHERE address_id IN "
+                              f"({', '.join('?' for _ in recipients)}))")
+        return " OR ".join(conditions) or "0", senders + recipients
+
+    def _importance_expression(self, cursor, ranking):
+        """ranking.score()와 같은 값을 계산하는 SQL 식 (emails 테이블 기준)."""
+        ids = self._address_ids_of(cursor, [ranking.main_user, *ranking.important_contacts])
+        main_id = ids.get(ranking.main_user, -1)
+        important_ids = [ids[address] for address in ranking.important_contacts if address in ids] or [-1]
+        sql = (f"(CASE WHEN sender_id = ? THEN {ContactRanking.SENT_BY_MAIN_USER} ELSE 0 END"
+               f" + CASE WHEN EXISTS (SELECT 1 FROM message_recipients AS r WHERE r.email_id = emails.id AND r.address_id = ?)"
+               f" THEN {ContactRanking.RECEIVED_BY_MAIN_USER} ELSE 0 END"
+               f" + CASE WHEN sender_id IN ({', '.join('?' for _ in important_ids)})"
+               f" THEN {ContactRanking.SENT_BY_IMPORTANT_CONTACT} ELSE 0 END)")
+        return sql, [main_id, main_id, *important_ids]
+
+    def refresh_importance(self, limit=10):
+        """
+        연락처 통계로 계산한 현재 ContactRanking이 importance에 반영된 기준과 다르면
+        값이 달라질 수 있는 이메일(바뀐 소유자/중요 연락처가 보냈거나 소유자가 받은 메일)만 다시 계산합니다.
+        수집이나 색인이 끝난 뒤 호출합니다. 반환값: 다시 계산한 이메일 수
+        """
+        if not self.conn:
+            print("오류: 데이터베이스에 연결되지 않았습니다.")
+            return 0
+        try:
+            cursor = self.conn.cursor()
+            current = ContactRanking.from_summary(*contact_summary(self.conn, limit))
+            applied = self.applied_ranking(cursor)
+            if current == applied:
+                return 0
+            where_sql, where_params = self._importance_affected_sql(cursor, applied, current)
+            score_sql, score_params = self._importance_expression(cursor, current)
+            cursor.execute(f"UPDATE emails SET importance = {score_sql} WHERE {where_sql};", score_params + where_params)
+            updated = cursor.rowcount
+            self.set_meta("contact_ranking", current.to_json(), cursor)
+            self.conn.commit()
+            self._pending_rows = 0
+            self._ranking = current
+            print(f"메인 사용자/중요 연락처가 바뀌어 이메일 {updated}개의 중요도를 다시 계산했습니다.")
+            return updated
+        except sqlite3.Error as e:
+            print(f"중요도 갱신 중 오류가 발생했습니다: {e}")
+            return 0
+
+    def affected_importance(self, old, new):
+        """
+        기준이 old에서 new로 바뀔 때 영향을 받는 이메일의 {message_id: 저장된 importance}.
+        (색인기가 벡터 저장소 메타데이터처럼 따로 저장한 중요도를 맞출 때 사용)
+        """
+        cursor = self.conn.cursor()
+        where_sql, params = self._importance_affected_sql(cursor, old, new)
+        return dict(cursor.execute(f"SELECT message_id, coalesce(importance, 0) FROM emails WHERE {where_sql};", params))
+
+    def contact_summary(self, limit=10):
+        """메일함 소유자와 주요 연락처 (모듈 함수 contact_summary 참고)."""
+        if not self.conn:
+            print("오류: 데이터베이스에 연결되지 않았습니다.")
+            return None, []
+        try:
+            return contact_summary(self.conn, limit)
+        except sqlite3.Error as e:
+            print(f"연락처 통계 조회 중 오류가 발생했습니다: {e}")
+            return None, []
+
+    def find_emails(self, sender=None, recipient=None, recipient_role=None, date_from=None, date_to=None,
+                    folder=None, limit=None):
+        """
+        조건에 맞는 이메일의 message_id를 최신순으로 반환합니다. 조건은 email_filter_sql()을 참고하세요.
+        """
+        if not self.conn:
+            print("오류: 데이터베이스에 연결되지 않았습니다.")
+            return []
+        where_sql, params = email_filter_sql(sender=sender, recipient=recipient, recipient_role=recipient_role,
+                                             date_from=date_from, date_to=date_to, folder=folder)
+        sql = f"SELECT e.message_id FROM emails AS e WHERE {where_sql} ORDER BY e.sent_date DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        try:
+            return [row[0] for row in self.conn.execute(sql + ";", params)]
+        except sqlite3.Error as e:
+            print(f"이메일 조회 중 오류가 발생했습니다: {e}")
+            return []
+
+class ContactRanking:
+    """
+    문서별 정적 중요도(importance)의 기준인 메일함 소유자와 중요 연락처입니다 (contact_summary의 결과).
+      - 소유자가 보낸 메일 +50, 소유자가 받은(To/Cc) 메일 +20, 중요 연락처가 보낸 메일 +30
+    주소는 정규화해서 정확히 비교하므로 다른 주소의 일부분과 겹쳐도 일치로 보지 않습니다.
+    """
+    SENT_BY_MAIN_USER = 50
+    RECEIVED_BY_MAIN_USER = 20
+    SENT_BY_IMPORTANT_CONTACT = 30
+
+    def __init__(self, main_user=None, important_contacts=()):
+        self.main_user = normalize_address(main_user)
+        self.important_contacts = frozenset(filter(None, (normalize_address(c) for c in important_contacts)))
+
+    @classmethod
+    def from_summary(cls, main_user, contacts):
+        return cls(main_user, [address for address, _, _ in contacts])
+
+    @classmethod
+    def from_json(cls, value):
+        if not value:
+            return cls()
+        data = json.loads(value)
+        return cls(data.get("main_user"), data.get("important_contacts", ()))
+
+    def to_json(self):
+        return json.dumps({"main_user": self.main_user, "important_contacts": sorted(self.important_contacts)},
+                          ensure_ascii=False)
+
+    def __eq__(self, other):
+        return (isinstance(other, ContactRanking) and self.main_user == other.main_user
+                and self.important_contacts == other.important_contacts)
+
+    def __bool__(self):
+        return bool(self.main_user or self.important_contacts)
+
+    def score(self, sender, receivers):
+        """sender(주소)와 receivers(주소 목록)의 중요도."""
+        sender = normalize_address(sender)
+        score = 0
+        if self.main_user:
+            if sender == self.main_user:
+                score += self.SENT_BY_MAIN_USER
+            if any(normalize_address(receiver) == self.main_user for receiver in receivers or ()):
+                score += self.RECEIVED_BY_MAIN_USER
+        if sender in self.important_contacts:
+            score += self.SENT_BY_IMPORTANT_CONTACT
+        return score
+
+    def score_email(self, email_obj):
+        return self.score(email_obj.sender, email_obj.receivers)
+
+    def changed_senders(self, other):
+        """이 기준과 other에서 보낸 메일의 점수가 다른 주소."""
+        changed = set(self.important_contacts ^ other.important_contacts)
+        if self.main_user != other.main_user:
+            changed.update(address for address in (self.main_user, other.main_user) if address)
+        return changed
+
+    def changed_recipients(self, other):
+        """이 기준과 other에서 받은 메일의 점수가 다른 주소."""
+        if self.main_user == other.main_user:
+            return set()
+        return {address for address in (self.main_user, other.main_user) if address}
+
+def contact_summary(conn, limit=10):
+    """
+    연락처 통계로 메일함 소유자와 주요 연락처를 찾습니다 (인덱스만 사용하므로 수 ms).
+      - 메일함 소유자: 가장 많이 보낸 주소 ('@'가 있는 주소를 우선)
+      - 주요 연락처: 소유자가 보낸 메일의 수신자와 소유자에게 보낸 발신자 중 주고받은 메일이 많은 limit개
+    반환값: (소유자 주소 또는 None, [(주소, 주고받은 메일 수, 마지막 날짜), ...])
+    """
+    main_user = None
+    for condition in ("instr(a.address, '@') > 0", "1"):
+        row = conn.execute(f"""
+        SELECT s.address_id, a.address FROM contact_stats AS s JOIN addresses AS a ON a.id = s.address_id
+        WHERE s.sent_count > 0 AND {condition} ORDER BY s.sent_count DESC LIMIT 1;
+        """).fetchone()
+        if row:
+            main_user = row
+            break
+    if not main_user:
+        return None, []
+    contacts = conn.execute("""
+    SELECT a.address, SUM(p.message_count) AS interactions, MAX(p.last_seen) FROM (
+        SELECT recipient_id AS address_id, message_count, last_seen FROM contact_pairs WHERE sender_id = :user
+        UNION ALL
+        SELECT sender_id, message_count, last_seen FROM contact_pairs WHERE recipient_id = :user
+    ) AS p JOIN addresses AS a ON a.id = p.address_id
+    WHERE p.address_id != :user
+    GROUP BY p.address_id HAVING interactions > 0
+    ORDER BY interactions DESC, a.address LIMIT :limit;
+    """, {"user": main_user[0], "limit": limit}).fetchall()
+    return main_user[1], contacts
+
+def load_contact_ranking(db_path, limit=10):
+    """
+    db_path의 연락처 통계로 현재 ContactRanking을 읽습니다 (읽기 전용 연결, DB를 변경하지 않음).
+    DB가 없거나 연락처 통계가 없는 이전 스키마이면 빈 기준을 반환합니다.
+    """
+    if not os.path.exists(db_path):
+        return ContactRanking()
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            return ContactRanking.from_summary(*contact_summary(conn, limit))
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        # 연락처 통계가 없는 이전 스키마의 DB (ingest를 한 번 실행하면 변환됨)
+        print(f"연락처 통계를 읽지 못했습니다: {e}")
+        return ContactRanking()
+
+class ContactStats:
+    """
+    emails 테이블이 없는 DB에서 연락처 통계를 관리합니다 (whoosh 엔진의 색인 manifest DB).
+    addresses, contact_stats, contact_pairs는 SQLiteStorage와 같은 테이블이므로 contact_summary()와
+    load_contact_ranking()으로 그대로 읽을 수 있고, 통계에서 뺄 값은 메일마다 contact_messages에 기록합니다.
+    커밋은 호출하는 쪽에서 합니다.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def create_tables(self, cursor=None):
+        cursor = cursor or self.conn.cursor()
+        for sql in (ADDRESSES_TABLE, CONTACT_MESSAGES_TABLE) + CONTACT_TABLES:
+            cursor.execute(sql)
+
+    def _address_ids(self, cursor, addresses):
+        """정규화된 주소들의 addresses.id (없는 주소는 추가)."""
+        addresses = list(addresses)
+        cursor.executemany("INSERT OR IGNORE INTO addresses (address) VALUES (?);", [(a,) for a in addresses])
+        ids = {}
+        for chunk_start in range(0, len(addresses), 500):
+            chunk = addresses[chunk_start:chunk_start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            ids.update(cursor.execute(f"SELECT address, id FROM addresses WHERE address IN ({placeholders});", chunk))
+        return ids
+
+    def _stored_rows(self, cursor, message_ids):
+        rows = []
+        for chunk_start in range(0, len(message_ids), 500):
+            chunk = message_ids[chunk_start:chunk_start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            for sender_id, recipient_ids, sent_date in cursor.execute(
+                    f"SELECT sender_id, recipient_ids, sent_date FROM contact_messages "
+                    f"WHERE message_id IN ({placeholders});", chunk):
+                rows.append((sender_id, set(json.loads(recipient_ids)), sent_date))
+        return rows
+
+    def add(self, emails, cursor=None):
+        """emails의 발신자/수신자를 통계에 더합니다. 이미 기록된 message_id는 이전 값을 빼고 다시 더합니다."""
+        cursor = cursor or self.conn.cursor()
+        update_contact_stats(cursor, self._stored_rows(cursor, [email.message_id for email in emails]), -1)
+        addresses = set()
+        for email in emails:
+            addresses.update(filter(None, map(normalize_address, [email.sender, *(email.receivers or ())])))
+        address_ids = self._address_ids(cursor, addresses)
+        # 같은 배치에 같은 message_id가 있으면 마지막 것만 남김 (SQLiteStorage.insert_emails와 같음)
+        rows = {}
+        for email in emails:
+            rows[email.message_id] = (
+                address_ids.get(normalize_address(email.sender)),
+                {address_ids[address] for address in map(normalize_address, email.receivers or ()) if address},
+                email.sent_date.isoformat() if email.sent_date else None
+            )
+        cursor.executemany(
+            "INSERT OR REPLACE INTO contact_messages (message_id, sender_id, recipient_ids, sent_date) VALUES (?, ?, ?, ?);",
+            [(message_id, sender_id, json.dumps(sorted(recipient_ids)), sent_date)
+             for message_id, (sender_id, recipient_ids, sent_date) in rows.items()]
+        )
+        update_contact_stats(cursor, rows.values(), 1)
+
+    def remove(self, message_ids, cursor=None):
+        cursor = cursor or self.conn.cursor()
+        message_ids = list(message_ids)
+        update_contact_stats(cursor, self._stored_rows(cursor, message_ids), -1)
+        cursor.executemany("DELETE FROM contact_messages WHERE message_id = ?;", [(m,) for m in message_ids])
+
+    def clear(self, cursor=None):
+        cursor = cursor or self.conn.cursor()
+        for table in ("contact_messages", "contact_stats", "contact_pairs"):
+            cursor.execute(f"DELETE FROM {table};")
+
+    def ranking(self, limit=10):
+        """현재 통계로 계산한 ContactRanking (load_contact_ranking과 같은 기준)."""
+        return ContactRanking.from_summary(*contact_summary(self.conn, limit))
+
+def contact_ranking_from_emails(emails, limit=10, batch_size=1000):
+    """
+    emails(Email 객체를 내는 iterable)로 메모리 DB에 연락처 통계를 만들어 ContactRanking을 계산합니다.
+    발신자/수신자만 사용하므로 헤더만 읽은 Email 객체(parse_eml_headers)로 충분합니다.
+    """
+    conn = sqlite3.connect(":memory:")
+    try:
+        contacts = ContactStats(conn)
+        contacts.create_tables()
+        batch = []
+        for email in emails:
+            batch.append(email)
+            if len(batch) >= batch_size:
+                contacts.add(batch)
+                batch = []
+        if batch:
+            contacts.add(batch)
+        return contacts.ranking(limit)
+    finally:
+        conn.close()
+
+def _date_bound(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+def email_filter_sql(sender=None, recipient=None, recipient_role=None, date_from=None, date_to=None,
+                     folder=None, alias="e"):
+    """
+    emails 테이블(별칭 alias)에 대한 WHERE 조건과 매개변수를 만듭니다. 모든 조건은 인덱스를 사용합니다.
+      - sender / recipient: 이메일 주소 (대소문자 무시). recipient_role로 'to'나 'cc'만 볼 수 있음
+      - date_from <= sent_date < date_to: datetime, date 또는 ISO 8601 문자열
+      - folder: 해당 폴더와 그 하위 폴더
+    반환값: (where_sql, params)
+    """
+    conditions = []
+    params = []
+    if sender:
+        conditions.append(f"{alias}.sender_id = (SELECT id FROM addresses WHERE address = ?)")
+        params.append(normalize_address(sender))
+    if recipient:
+        role_sql = ""
+        if recipient_role:
+            role_sql = " AND r.role = ?"
+        conditions.append(
+            f"{alias}.id IN (SELECT r.email_id FROM message_recipients AS r"
+            f" WHERE r.address_id = (SELECT id FROM addresses WHERE address = ?){role_sql})"
+        )
+        params.append(normalize_address(recipient))
+        if recipient_role:
+            params.append(recipient_role)
+    if date_from is not None:
+        conditions.append(f"{alias}.sent_date >= ?")
+        params.append(_date_bound(date_from))
+    if date_to is not None:
+        conditions.append(f"{alias}.sent_date < ?")
+        params.append(_date_bound(date_to))
+    if folder:
+        folder = folder.rstrip("/")
+        # 'folder/'로 시작하는 범위 조건으로 하위 폴더까지 인덱스로 찾음 ('0'은 '/' 다음 문자)
+        conditions.append(f"({alias}.folder_path = ? OR ({alias}.folder_path >= ? AND {alias}.folder_path < ?))")
+        params.extend([folder, folder + "/", folder + "0"])
+    return (" AND ".join(conditions) if conditions else "1"), params
 
 if __name__ == '__main__':
     # 이 스크립트를 직접 실행하면, 'data' 폴더에 DB를 생성하고 테이블을 만드는 테스트를 수행합니다.
@@ -0,0 +1,187 @@
+import re
+import hashlib
+import unicodedata
+
+# 제목 앞의 답장/전달 표시 ('RE: FW: ', 'RE[2]: ', '회신: ' 등이 여러 번 겹친 경우 포함)
+_REPLY_PREFIX = re.compile(
+    r"^\s*(?:(?:re|fw|fwd|aw|wg|sv|답장|회신|전달|답변)\s*(?:\[\d+\]|\(\d+\))?\s*[:：]\s*)+", re.I)
+# 제목이 없는 메일끼리 한 스레드로 묶이지 않도록 제목 대체 규칙에서 제외하는 값
+_EMPTY_SUBJECTS = {"", "no subject", "(no subject)", "제목 없음", "(제목 없음)"}
+
+THREAD_NODES_TABLE = """
+CREATE TABLE IF NOT EXISTS thread_nodes (
+    node TEXT PRIMARY KEY,
+    thread_id TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+THREAD_MEMBERS_TABLE = """
+CREATE TABLE IF NOT EXISTS thread_members (
+    message_id TEXT PRIMARY KEY,
+    thread_id TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+def normalize_subject(subject):
+    """스레드 비교용 제목: 답장/전달 표시를 떼고 소문자로 바꾸고 공백을 하나로 줄입니다."""
+    subject = _REPLY_PREFIX.sub("", unicodedata.normalize("NFC", subject or ""))
+    subject = " ".join(subject.lower().split())
+    return "" if subject in _EMPTY_SUBJECTS else subject
+
+def thread_nodes(email_obj):
+    """
+    메일의 스레드 노드 (자신, 같은 스레드로 묶을 노드 목록).
+      - '<Message-ID>': Message-ID 헤더가 있는 메일 자신과 In-Reply-To/References로 가리킨 메일
+      - 'doc:<message_id>': Message-ID 헤더가 없는 메일 자신
+      - 'subject:<정규화한 제목>': 답장 헤더가 없는 메일의 대체 규칙 (같은 제목의 메일끼리 묶음)
+    """
+    own_id = email_obj.internet_message_id
+    own = f"<{own_id}>" if own_id else f"doc:{email_obj.message_id}"
+    parents = [*(email_obj.references or ()), email_obj.in_reply_to]
+    links = [f"<{parent}>" for parent in dict.fromkeys(parents) if parent and parent != own_id]
+    if not links:
+        subject = normalize_subject(email_obj.thread_topic or email_obj.subject)
+        if subject:
+            links.append(f"subject:{subject}")
+    return own, links
+
+def _new_thread_id(node):
+    return "t" + hashlib.blake2b(node.encode("utf-8"), digest_size=8).hexdigest()
+
+class ThreadIndex:
+    """
+    메일을 스레드로 묶는 색인입니다 (SQLite 테이블에 저장하는 union-find).
+
+      - thread_nodes: 노드(thread_nodes() 참고) -> thread_id
+      - members_table: message_id -> thread_id. 기본값은 이 클래스가 관리하는 thread_members이고,
+        SQLiteStorage는 emails.thread_id 컬럼을 사용합니다 (행은 호출하는 쪽에서 저장).
+
+    assign()은 배치 안의 노드를 메모리에서 합친 뒤, 이미 저장된 스레드와 이어지면 그 스레드 ID를 쓰고,
+    여러 스레드를 잇는 메일(예: 먼저 들어온 답장들의 원본)이 들어오면 메일이 가장 많은 스레드로 합칩니다.
+    커밋은 호출하는 쪽에서 합니다.
+    """
+
+    def __init__(self, conn, members_table="thread_members"):
+        self.conn = conn
+        self.members_table = members_table
+        self.owns_members = members_table == "thread_members"
+
+    def create_tables(self, cursor=None):
+        cursor = cursor or self.conn.cursor()
+        cursor.execute(THREAD_NODES_TABLE)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_thread_nodes_thread ON thread_nodes (thread_id);")
+        if self.owns_members:
+            cursor.execute(THREAD_MEMBERS_TABLE)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.members_table}_thread_id "
+                       f"ON {self.members_table} (thread_id);")
+
+    def _node_threads(self, cursor, nodes):
+        threads = {}
+        nodes = list(nodes)
+        for chunk_start in range(0, len(nodes), 500):
+            chunk = nodes[chunk_start:chunk_start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            threads.update(cursor.execute(
+                f"SELECT node, thread_id FROM thread_nodes WHERE node IN ({placeholders});", chunk))
+        return threads
+
+    def thread_sizes(self, thread_ids, cursor=None):
+        """{thread_id: 저장된 메일 수}"""
+        cursor = cursor or self.conn.cursor()
+        sizes = {}
+        thread_ids = list(thread_ids)
+        for chunk_start in range(0, len(thread_ids), 500):
+            chunk = thread_ids[chunk_start:chunk_start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            sizes.update(cursor.execute(
+                f"SELECT thread_id, COUNT(*) FROM {self.members_table} "
+                f"WHERE thread_id IN ({placeholders}) GROUP BY thread_id;", chunk))
+        return sizes
+
+    def members(self, thread_id, cursor=None):
+        """스레드에 속한 message_id 목록."""
+        cursor = cursor or self.conn.cursor()
+        return [row[0] for row in cursor.execute(
+            f"SELECT message_id FROM {self.members_table} WHERE thread_id = ?;", (thread_id,))]
+
+    def assign(self, emails, cursor=None):
+        """
+        emails의 thread_id를 정하고 (email.thread_id에 설정) 노드와 스레드 구성을 저장합니다.
+        반환값: 스레드가 합쳐져서 thread_id가 바뀐, 이미 저장된 메일의 {message_id: 새 thread_id}
+        """
+        cursor = cursor or self.conn.cursor()
+        email_nodes = [thread_nodes(email_obj) for email_obj in emails]
+        nodes = {node for own, links in email_nodes for node in (own, *links)}
+        stored = self._node_threads(cursor, nodes)
+
+        parent = {}
+
+        def find(item):
+            parent.setdefault(item, item)
+            while parent[item] != item:
+                parent[item] = parent[parent[item]]
+                item = parent[item]
+            return item
+
+        def union(a, b):
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+        for own, links in email_nodes:
+            find(own)
+            for link in links:
+                union(own, link)
+        # 같은 스레드에 저장된 노드는 배치 안에서 이어지지 않았어도 한 그룹으로 모음 (노드와 겹치지 않는 키)
+        for node, thread_id in stored.items():
+            union(node, ("thread", thread_id))
+
+        groups = {}
+        for node in nodes:
+            groups.setdefault(find(node), []).append(node)
+
+        group_threads = [(group_nodes, {stored[node] for node in group_nodes if node in stored})
+                         for group_nodes in groups.values()]
+        merged = set().union(*(thread_ids for _, thread_ids in group_threads if len(thread_ids) > 1))
+        sizes = self.thread_sizes(merged, cursor) if merged else {}
+
+        relabeled = {}
+        node_thread = {}
+        node_rows = []
+        for group_nodes, thread_ids in group_threads:
+            if not thread_ids:
+                thread_id = _new_thread_id(min(group_nodes))
+            else:
+                # 메일이 가장 많은 스레드로 합쳐서 다시 쓰는 행을 줄임
+                thread_id = max(thread_ids, key=lambda value: (sizes.get(value, 0), value))
+                for old_id in thread_ids - {thread_id}:
+                    cursor.execute("UPDATE thread_nodes SET thread_id = ? WHERE thread_id = ?;", (thread_id, old_id))
+                    for (message_id,) in cursor.execute(
+                            f"SELECT message_id FROM {self.members_table} WHERE thread_id = ?;", (old_id,)).fetchall():
+                        relabeled[message_id] = thread_id
+                    cursor.execute(f"UPDATE {self.members_table} SET thread_id = ? WHERE thread_id = ?;",
+                                   (thread_id, old_id))
+            for node in group_nodes:
+                node_thread[node] = thread_id
+                if stored.get(node) != thread_id:
+                    node_rows.append((node, thread_id))
+        cursor.executemany("INSERT OR REPLACE INTO thread_nodes (node, thread_id) VALUES (?, ?);", node_rows)
+
+        for email_obj, (own, _) in zip(emails, email_nodes):
+            email_obj.thread_id = node_thread[own]
+        if self.owns_members:
+            cursor.executemany("INSERT OR REPLACE INTO thread_members (message_id, thread_id) VALUES (?, ?);",
+                               [(email_obj.message_id, email_obj.thread_id) for email_obj in emails])
+        return relabeled
+
+    def remove(self, message_ids, cursor=None):
+        """삭제된 메일을 thread_members에서 뺍니다 (노드는 남겨두어 나중에 들어오는 답장을 같은 스레드로 묶음)."""
+        if not self.owns_members:
+            return
+        cursor = cursor or self.conn.cursor()
+        cursor.executemany("DELETE FROM thread_members WHERE message_id = ?;", [(m,) for m in message_ids])
+
+    def clear(self, cursor=None):
+        cursor = cursor or self.conn.cursor()
+        cursor.execute("DELETE FROM thread_nodes;")
+        if self.owns_members:
+            cursor.execute("DELETE FROM thread_members;")
@@ -0,0 +1,10 @@
+"""
+색인/검색에서 선택할 수 있는 백엔드 이름입니다.
+무거운 패키지를 임포트하지 않으므로 CLI 인자 파서(main.py)에서도 바로 불러올 수 있습니다.
+새 백엔드를 추가하면 이 목록과 해당 모듈의 create_* 함수만 고치면 됩니다.
+"""
+
+# src.search.keyword_engine.create_keyword_engine이 만드는 키워드 엔진
+KEYWORD_ENGINES = ("whoosh", "fts5")
+# src.search.vector_store.create_vector_store가 만드는 벡터 저장소
+VECTOR_STORES = ("chroma", "numpy", "ivfpq")
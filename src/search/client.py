@@ -0,0 +1,88 @@
+import json
+import socket
+import urllib.request
+import urllib.error
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+class SearchClient:
+    """
+    상주 검색 서버(src.search.server)에 질의하는 가벼운 클라이언트입니다.
+    모델이나 색인을 로드하지 않으므로 무거운 패키지를 임포트하지 않습니다.
+    서버에 연결할 수 없으면 search()가 None을 반환하므로 호출하는 쪽에서 직접 검색으로 대체합니다.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=30.0, connect_timeout=0.5):
+        self.base_url = f"http://{host}:{port}"
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+
+    def is_available(self):
+        """서버 포트에 연결할 수 있는지 빠르게 확인합니다."""
+        try:
+            with socket.create_connection((self.host, self.port), timeout=self.connect_timeout):
+                return True
+        except OSError:
+            return False
+
+    def _request(self, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=data, headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def health(self):
+        try:
+            return self._request("/health")
+        except (OSError, urllib.error.URLError, ValueError):
+            return None
+
+    def search(self, query_string, limit=10, semantic_weight=0.5, search_fields=None, filters=None, collapse_threads=False,
+               engine=None):
+        """
+        서버에 검색을 요청합니다. 결과는 Searcher.search와 같은 필드를 가진 dict 리스트이며
+        (sent_date는 ISO 8601 문자열), timings 속성을 가집니다. 서버를 사용할 수 없으면 None을 반환합니다.
+        filters는 SearchFilters와 같은 키(sender, recipient, date_from, date_to, folder)의 dict이며
+        날짜는 ISO 8601 문자열로 지정합니다. collapse_threads=True이면 스레드마다 한 건만 받습니다.
+        engine은 필요한 엔진 설정(keyword_engine, vector_store, nprobe, rerank와 데이터 경로 index_dir, db_path,
+        vector_dir(절대 경로) 중 일부)이며, 서버 설정과 다르면 서버가 거절하므로 None을 반환합니다.
+        """
+        if not self.is_available():
+            return None
+        payload = {"query": query_string, "limit": limit, "semantic_weight": semantic_weight}
+        if search_fields is not None:
+            payload["search_fields"] = list(search_fields)
+        if filters:
+            payload["filters"] = dict(filters)
+        if collapse_threads:
+            payload["collapse_threads"] = True
+        if engine:
+            payload["engine"] = dict(engine)
+        try:
+            response = self._request("/search", payload)
+        except urllib.error.HTTPError as e:
+            if e.code != 409:
+                print(f"검색 서버 요청 중 오류 발생: {e}")
+                return None
+            detail = json.loads(e.read().decode("utf-8") or "{}")
+            print(f"검색 서버의 엔진 설정 {detail.get('engine')}이(가) 요청한 설정 {detail.get('requested')}과(와) 다릅니다.")
+            return None
+        except (OSError, urllib.error.URLError, ValueError) as e:
+            print(f"검색 서버 요청 중 오류 발생: {e}")
+            return None
+
+        results = RemoteSearchResults(response.get("results", []))
+        results.timings = response.get("timings", {})
+        return results
+
+class RemoteSearchResults(list):
+    """서버에서 받은 검색 결과. Searcher의 SearchResults와 같이 timings 속성을 가집니다."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.timings = {}
@@ -0,0 +1,241 @@
+import os
+import json
+import hashlib
+import unicodedata
+import numpy as np
+from src.ingestion.dedup import simhash, detail_hash, SimHashIndex, MAX_DISTANCE
+
+def normalize_text(text):
+    """임베딩 캐시 키를 만들기 위해 유니코드 정규화(NFC)와 공백 정리를 합니다."""
+    text = unicodedata.normalize("NFC", text or "")
+    return " ".join(text.split())
+
+def text_key(text):
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    정규화된 텍스트의 해시를 키로 임베딩 벡터를 보관하는 디스크 캐시입니다.
+
+    벡터는 float16 행렬(vectors.bin)에 행 단위로 덧붙이고, 행 번호와 키의
+    대응은 keys.txt에 한 줄씩 기록합니다. meta.json의 모델 이름이나 차원이
+    현재 모델과 다르면 캐시 전체를 자동으로 비웁니다.
+
+    near_duplicate_distance가 None이 아니면 캐시에 없는 텍스트도 SimHash(src.ingestion.dedup)가
+    그 거리 이하이고 숫자가 들어간 토큰(호선 번호, 금액, 날짜 등, detail_hash)이 같은 텍스트가 이미
+    인코딩되어 있으면 그 행의 벡터를 함께 씁니다 (유사 중복 클러스터).
+    인코딩한 행의 서명은 simhash.bin에 (행 번호, 서명, detail_hash)로, 그렇게 묶인 키는 aliases.txt에
+    '키 행번호'로 기록합니다. 유사 중복 기준이 바뀌면(NEAR_DUPLICATE_FORMAT) 이전 기준으로 묶은
+    키와 서명을 버리고 해당 텍스트는 다시 인코딩합니다.
+    """
+
+    # 유사 중복 판단 기준이나 simhash.bin 형식이 바뀌면 올림 (2: detail_hash가 같아야 묶음)
+    NEAR_DUPLICATE_FORMAT = 2
+
+    def __init__(self, cache_dir="data/embedding_cache", model_name=None, dtype=np.float16,
+                 near_duplicate_distance=MAX_DISTANCE):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.near_duplicate_distance = near_duplicate_distance
+        self.meta_path = os.path.join(cache_dir, "meta.json")
+        self.vectors_path = os.path.join(cache_dir, "vectors.bin")
+        self.keys_path = os.path.join(cache_dir, "keys.txt")
+        self.simhash_path = os.path.join(cache_dir, "simhash.bin")
+        self.aliases_path = os.path.join(cache_dir, "aliases.txt")
+
+        self.dim = None
+        self.rows = 0 # vectors.bin의 행 수 (key_to_row에는 유사 중복으로 묶인 키도 들어 있음)
+        self.key_to_row = {}
+        self.vectors = None
+        self.simhash_index = None
+        self.hits = 0
+        self.near_duplicates = 0
+        self.misses = 0
+
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self._load()
+
+    def _load(self):
+        meta = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        if meta is None or meta.get("model_name") != self.model_name or meta.get("dtype") != self.dtype.name:
+            if meta is not None:
+                print(f"임베딩 모델이 '{meta.get('model_name')}'에서 '{self.model_name}'(으)로 바뀌어 임베딩 캐시를 비웁니다.")
+            self._reset()
+            return
+        if meta.get("near_duplicate_format") != self.NEAR_DUPLICATE_FORMAT:
+            # 이전 기준으로 묶은 유사 중복은 서로 다른 메일일 수 있으므로 버림 (인코딩한 벡터는 유지)
+            for path in (self.simhash_path, self.aliases_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        self.dim = meta["dim"]
+        keys = []
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "r", encoding="utf-8") as f:
+                keys = f.read().split()
+
+        # 쓰기 도중 중단된 경우 벡터와 키 중 짧은 쪽에 맞춥니다.
+        row_bytes = self.dim * self.dtype.itemsize
+        rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        count = min(rows, len(keys))
+        if rows != count or len(keys) != count:
+            self._truncate(count, keys[:count])
+        self.rows = count
+        self.key_to_row = {key: row for row, key in enumerate(keys[:count])}
+        self._load_near_duplicates()
+        self._map_vectors()
+        if meta.get("near_duplicate_format") != self.NEAR_DUPLICATE_FORMAT:
+            self._write_meta()
+
+    def _load_near_duplicates(self):
+        self.simhash_index = None
+        if self.near_duplicate_distance is None:
+            return
+        self.simhash_index = SimHashIndex(self.near_duplicate_distance)
+        if os.path.exists(self.simhash_path):
+            records = np.fromfile(self.simhash_path, dtype=self.SIMHASH_RECORD)
+            records = records[records["row"] < self.rows]
+            self.simhash_index.add(records["signature"], records["row"], records["detail"])
+        if os.path.exists(self.aliases_path):
+            with open(self.aliases_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    key, _, row = line.partition(" ")
+                    if row.strip().isdigit() and int(row) < self.rows:
+                        self.key_to_row.setdefault(key, int(row))
+
+    def _reset(self):
+        for path in (self.vectors_path, self.keys_path, self.simhash_path, self.aliases_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.dim = None
+        self.rows = 0
+        self.key_to_row = {}
+        self.vectors = None
+        self._load_near_duplicates()
+        self._write_meta()
+
+    def _write_meta(self):
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump({"model_name": self.model_name, "dim": self.dim, "dtype": self.dtype.name,
+                       "near_duplicate_format": self.NEAR_DUPLICATE_FORMAT}, f)
+
+    def _truncate(self, count, keys):
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(count * self.dim * self.dtype.itemsize)
+        with open(self.keys_path, "w", encoding="utf-8") as f:
+            f.write("".join(f"{key}\n" for key in keys))
+
+    def _map_vectors(self):
+        if self.rows:
+            self.vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(self.rows, self.dim))
+        else:
+            self.vectors = None
+
+    def __len__(self):
+        return self.rows
+
+    # simhash.bin의 레코드: 인코딩한 행 번호와 그 텍스트의 SimHash, detail_hash
+    SIMHASH_RECORD = np.dtype([("row", "<i8"), ("signature", "<u8"), ("detail", "<u8")])
+
+    def _append(self, keys, embeddings, signatures=None):
+        embeddings = np.asarray(embeddings)
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+            self._write_meta()
+        elif embeddings.shape[1] != self.dim:
+            print(f"임베딩 차원이 {self.dim}에서 {embeddings.shape[1]}(으)로 바뀌어 임베딩 캐시를 비웁니다.")
+            self._reset()
+            self.dim = embeddings.shape[1]
+            self._write_meta()
+
+        signatures = signatures if signatures is not None else [None] * len(keys)
+        new_rows = []
+        for key, vector, signature in zip(keys, embeddings, signatures):
+            if key in self.key_to_row:
+                continue
+            self.key_to_row[key] = self.rows + len(new_rows)
+            new_rows.append((key, vector, signature))
+        if not new_rows:
+            return
+
+        with open(self.vectors_path, "ab") as f:
+            f.write(np.stack([vector for _, vector, _ in new_rows]).astype(self.dtype).tobytes())
+        with open(self.keys_path, "a", encoding="utf-8") as f:
+            f.write("".join(f"{key}\n" for key, _, _ in new_rows))
+        records = np.array([(self.rows + i, *signature) for i, (_, _, signature) in enumerate(new_rows)
+                            if signature is not None], dtype=self.SIMHASH_RECORD)
+        self.rows += len(new_rows)
+        if self.simhash_index is not None and len(records):
+            with open(self.simhash_path, "ab") as f:
+                f.write(records.tobytes())
+            self.simhash_index.add(records["signature"], records["row"], records["detail"])
+        self._map_vectors()
+
+    def _add_aliases(self, aliases):
+        """유사 중복으로 묶인 키를 대표 텍스트의 행에 연결합니다."""
+        for key, row in aliases.items():
+            self.key_to_row[key] = row
+        with open(self.aliases_path, "a", encoding="utf-8") as f:
+            f.write("".join(f"{key} {row}\n" for key, row in aliases.items()))
+
+    def encode(self, texts, encode_fn):
+        """
+        texts의 임베딩을 float32 행렬로 반환합니다.
+        캐시에 없는 텍스트만 encode_fn(list_of_texts)으로 계산하고 캐시에 추가합니다.
+        유사 중복 텍스트는 인코딩하지 않고 이미 인코딩한 (또는 같은 배치에서 먼저 나온) 대표 텍스트의 벡터를 씁니다.
+        """
+        keys = [text_key(text) for text in texts]
+        missing = {}
+        for i, key in enumerate(keys):
+            if key not in self.key_to_row and key not in missing:
+                missing[key] = i
+        self.hits += len(keys) - len(missing)
+
+        # 캐시에 없는 텍스트를 유사 중복(기존 행 또는 배치 안의 대표 키)과 새로 인코딩할 것으로 나눔
+        aliases, batch_aliases, to_encode, signatures = {}, {}, {}, {}
+        encode_keys = []
+        batch_index = SimHashIndex(self.near_duplicate_distance) if self.simhash_index is not None else None
+        for key, i in missing.items():
+            signature = simhash(texts[i]) if self.simhash_index is not None else None
+            detail = None
+            if signature is not None:
+                detail = detail_hash(texts[i])
+                row = self.simhash_index.find(signature, detail)
+                if row is not None:
+                    aliases[key] = row
+                    continue
+                position = batch_index.find(signature, detail)
+                if position is not None:
+                    batch_aliases[key] = encode_keys[position]
+                    continue
+                batch_index.add([signature], [len(encode_keys)], [detail])
+            encode_keys.append(key)
+            to_encode[key] = i
+            signatures[key] = (signature, detail) if signature is not None else None
+        self.near_duplicates += len(aliases) + len(batch_aliases)
+        self.misses += len(to_encode)
+
+        if to_encode:
+            new_embeddings = encode_fn([texts[i] for i in to_encode.values()])
+            self._append(list(to_encode), new_embeddings, [signatures[key] for key in to_encode])
+        aliases.update((key, self.key_to_row[representative]) for key, representative in batch_aliases.items())
+        if aliases:
+            self._add_aliases(aliases)
+
+        rows = [self.key_to_row[key] for key in keys]
+        return np.asarray(self.vectors[rows], dtype=np.float32)
+
+    def stats(self):
+        lookups = self.hits + self.near_duplicates + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "near_duplicates": self.near_duplicates,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.near_duplicates) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,174 @@
+import os
+import json
+import multiprocessing
+import numpy as np
+from src.common.instrumentation import instrumentation
+
+# 배치 하나에서 모델이 계산하는 토큰 수 상한 (텍스트 수 × 배치에서 가장 긴 텍스트의 토큰 수, 패딩 포함)
+DEFAULT_TOKEN_BUDGET = 8192
+DEFAULT_MAX_BATCH_SIZE = 256
+# 토큰 길이를 셀 때 텍스트를 max_seq_length × 이 글자 수까지만 토크나이저에 넘김 (어차피 잘리는 긴 본문 전체를 토큰화하지 않음)
+CHARS_PER_TOKEN = 8
+
+def plan_batches(lengths, token_budget=DEFAULT_TOKEN_BUDGET, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+    """
+    텍스트를 토큰 길이 순으로 정렬해서 배치로 나눕니다. 배치마다 (텍스트 수 × 가장 긴 텍스트의 토큰 수)가
+    token_budget을 넘지 않으므로 짧은 텍스트는 큰 배치로, 긴 텍스트는 작은 배치로 묶이고,
+    비슷한 길이끼리 묶여서 패딩으로 버리는 계산이 줄어듭니다.
+    반환값: 배치마다 원래 텍스트 인덱스 목록
+    """
+    order = np.argsort(np.asarray(lengths), kind="stable")
+    batches, batch = [], []
+    for index in order:
+        length = max(1, int(lengths[index]))
+        # 길이 순으로 보므로 새 텍스트가 배치에서 가장 긺
+        if batch and (len(batch) >= max_batch_size or (len(batch) + 1) * length > token_budget):
+            batches.append(batch)
+            batch = []
+        batch.append(int(index))
+    if batch:
+        batches.append(batch)
+    return batches
+
+def padded_tokens(batches, lengths):
+    """배치들을 인코딩할 때 모델이 계산하는 토큰 수 (각 배치는 가장 긴 텍스트 길이로 패딩됨)."""
+    return sum(len(batch) * max(int(lengths[i]) for i in batch) for batch in batches)
+
+def _model_path(model_name):
+    # SentenceTransformer와 같은 규칙: 디렉터리나 'org/name' 형식이 아니면 sentence-transformers의 모델
+    if os.path.isdir(model_name) or "/" in model_name:
+        return model_name
+    return f"sentence-transformers/{model_name}"
+
+def load_tokenizer(model_name):
+    """
+    모델 가중치 없이 토크나이저만 로드합니다. 반환값: (tokenizer, max_seq_length)
+    max_seq_length는 sentence_bert_config.json의 값 (없으면 토크나이저의 최대 길이, 최대 512).
+    """
+    from transformers import AutoTokenizer
+    path = _model_path(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(path)
+    max_seq_length = None
+    try:
+        if os.path.isdir(path):
+            config_path = os.path.join(path, "sentence_bert_config.json")
+        else:
+            from huggingface_hub import hf_hub_download
+            config_path = hf_hub_download(path, "sentence_bert_config.json")
+        with open(config_path, "r", encoding="utf-8") as f:
+            max_seq_length = json.load(f).get("max_seq_length")
+    except Exception as e:
+        print(f"sentence_bert_config.json을 읽지 못해 토크나이저의 최대 길이를 사용합니다: {e}")
+    return tokenizer, min(max_seq_length or 512, tokenizer.model_max_length or 512)
+
+_worker_model = None
+
+def _init_worker(model_name, threads):
+    global _worker_model
+    import torch
+    # 프로세스마다 코어를 나눠 쓰도록 torch 스레드 수를 제한
+    torch.set_num_threads(threads)
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+def _encode_in_worker(item):
+    batch_number, texts = item
+    return batch_number, _worker_model.encode(texts, batch_size=len(texts), show_progress_bar=False)
+
+class EmbeddingEngine:
+    """
+    SentenceTransformer 인코딩을 길이별 배치로 실행합니다.
+
+      - 텍스트의 토큰 길이(모델 토크나이저, max_seq_length에서 자름)를 세고 plan_batches()로 배치를 나눠서
+        모델을 배치마다 batch_size=배치 크기로 호출합니다 (고정된 100개 묶음을 도착 순서대로 넘기는 대신).
+      - processes > 1이면 CPU 코어를 나눠 쓰는 프로세스 풀(프로세스마다 모델 하나)에 배치를 나눠 보냅니다.
+        SentenceTransformer.start_multi_process_pool과 같은 구성이지만 배치 크기가 배치마다 다를 수 있습니다.
+      - 결과는 입력 순서대로 돌려줍니다.
+    """
+
+    def __init__(self, model_name, token_budget=DEFAULT_TOKEN_BUDGET, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 processes=1):
+        if processes < 1:
+            raise ValueError(f"processes는 1 이상이어야 합니다: {processes}")
+        self.model_name = model_name
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.processes = processes
+        self.model = None
+        self.pool = None
+        self._tokenizer = None # (tokenizer, max_seq_length)
+
+    def load(self):
+        """모델을 처음 필요할 때 로드합니다 (토큰 길이 계산과 한 프로세스 인코딩에 사용)."""
+        if self.model is None:
+            print("이 작업은 모델 다운로드를 포함하여 몇 분 정도 소요될 수 있습니다.")
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(self.model_name)
+        return self.model
+
+    def load_tokenizer(self):
+        """
+        토큰 길이 계산에 쓰는 (tokenizer, max_seq_length).
+        한 프로세스로 인코딩하면 어차피 필요한 모델의 토크나이저를 쓰고, 프로세스 풀로 인코딩하면
+        모델은 작업자마다 로드되므로 이 프로세스에는 토크나이저만 로드합니다.
+        """
+        if self._tokenizer is None:
+            if self.processes > 1:
+                self._tokenizer = load_tokenizer(self.model_name)
+            else:
+                model = self.load()
+                self._tokenizer = (getattr(model, "tokenizer", None), model.max_seq_length or 512)
+        return self._tokenizer
+
+    def token_lengths(self, texts):
+        """특수 토큰을 포함한 텍스트별 토큰 수 (max_seq_length에서 자름)."""
+        tokenizer, limit = self.load_tokenizer()
+        clipped = [text[:limit * CHARS_PER_TOKEN] for text in texts]
+        if tokenizer is None:
+            return np.array([min(limit, len(text) // 4 + 2) for text in clipped], dtype=np.int64)
+        input_ids = tokenizer(clipped, add_special_tokens=True, truncation=True, max_length=limit)["input_ids"]
+        return np.array([min(limit, len(ids)) for ids in input_ids], dtype=np.int64)
+
+    def _get_pool(self):
+        if self.pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.processes)
+            # torch는 fork 이후 스레드 풀이 망가질 수 있으므로 spawn으로 작업자를 시작
+            context = multiprocessing.get_context("spawn")
+            self.pool = context.Pool(self.processes, initializer=_init_worker, initargs=(self.model_name, threads))
+        return self.pool
+
+    def encode(self, texts):
+        """texts의 임베딩을 입력 순서대로 float32 행렬로 반환합니다."""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        with instrumentation.span("encode.plan", len(texts)):
+            lengths = self.token_lengths(texts)
+            batches = plan_batches(lengths, self.token_budget, self.max_batch_size)
+        if instrumentation.enabled:
+            instrumentation.count("encode.tokens", int(lengths.sum()))
+            instrumentation.count("encode.padded_tokens", padded_tokens(batches, lengths))
+            instrumentation.count("encode.batches", len(batches))
+
+        if self.processes > 1 and len(batches) > 1:
+            # 긴 배치부터 보내서 마지막에 한 프로세스만 일하는 시간을 줄임
+            work = sorted(enumerate(batches), key=lambda entry: -len(entry[1]) * int(lengths[entry[1][-1]]))
+            results = self._get_pool().imap_unordered(
+                _encode_in_worker, [(number, [texts[i] for i in batch]) for number, batch in work])
+        else:
+            model = self.load()
+            results = ((number, model.encode([texts[i] for i in batch], batch_size=len(batch), show_progress_bar=False))
+                       for number, batch in enumerate(batches))
+
+        embeddings = None
+        for number, vectors in results:
+            vectors = np.asarray(vectors, dtype=np.float32)
+            if embeddings is None:
+                embeddings = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            embeddings[batches[number]] = vectors
+        return embeddings
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
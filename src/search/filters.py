@@ -0,0 +1,145 @@
+import datetime
+from src.ingestion.storage import normalize_address, email_filter_sql
+
+# Whoosh 색인에서 필터에 사용하는 필드 (EmailIndexer._create_schema 참고)
+FILTER_FIELDS = ("sender_addr", "receiver_addrs", "folder", "sent_date", "sent_day")
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+def _to_datetime(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime(value.year, value.month, value.day)
+    # 모든 엔진에서 메일에 적힌 시각(벽시계 시각) 그대로 비교 (Whoosh DATETIME, SQLite ISO 문자열과 동일)
+    return value.replace(tzinfo=None)
+
+def wall_clock_timestamp(value):
+    """datetime의 벽시계 시각을 1970-01-01 기준 초로 바꿉니다 (시간대는 무시)."""
+    value = _to_datetime(value)
+    return int((value - _EPOCH).total_seconds()) if value is not None else None
+
+def wall_clock_day(value):
+    """벽시계 시각의 날짜를 1970-01-01 기준 일수로 바꿉니다."""
+    timestamp = wall_clock_timestamp(value)
+    return timestamp // 86400 if timestamp is not None else None
+
+def _folder_matches(folder_path, folder):
+    """folder_path가 folder이거나 그 하위 폴더인지 (folder는 끝의 '/'를 뺀 경로)."""
+    folder_path = (folder_path or "").rstrip("/")
+    return folder_path == folder or folder_path.startswith(folder + "/")
+
+def folder_ancestors(folder_path):
+    """'/Top/Inbox/Sub' -> ['/Top', '/Top/Inbox', '/Top/Inbox/Sub']"""
+    folder_path = (folder_path or "").rstrip("/")
+    if not folder_path:
+        return []
+    parts = folder_path.split("/")
+    return ["/".join(parts[:i]) for i in range(1, len(parts) + 1) if "/".join(parts[:i])]
+
+def whoosh_filter_fields(email_obj):
+    """필터용 Whoosh 필드 값 (정규화된 주소, 폴더, 날짜 단위 발송일)."""
+    receivers = (normalize_address(receiver) for receiver in email_obj.receivers or ())
+    return dict(
+        sender_addr=normalize_address(email_obj.sender) or "",
+        receiver_addrs=",".join(receiver for receiver in receivers if receiver),
+        folder=(email_obj.folder_path or "").rstrip("/"),
+        sent_day=wall_clock_day(email_obj.sent_date),
+    )
+
+def vector_metadata(email_obj, importance=None):
+    """
+    벡터 저장소(ChromaDB)에 함께 저장하는 필터용 메타데이터와 정적 중요도(importance)입니다.
+    ChromaDB 메타데이터는 리스트를 지원하지 않으므로 수신자는 Whoosh의 receiver_addrs처럼
+    ','로 이은 문자열 하나('recipients')로, 폴더는 경로('folder')로 저장합니다.
+    (주소/폴더마다 키를 만들면 메타데이터 키 수가 메일함 크기에 따라 계속 늘어남)
+    ChromaDB는 빈 dict를 허용하지 않으므로 저장할 값이 없으면 None을 반환합니다.
+    """
+    metadata = {}
+    if importance is not None:
+        metadata["importance"] = importance
+    sender = normalize_address(email_obj.sender)
+    if sender:
+        metadata["sender"] = sender
+    sent_ts = wall_clock_timestamp(email_obj.sent_date)
+    if sent_ts is not None:
+        metadata["sent_ts"] = sent_ts
+    filter_fields = whoosh_filter_fields(email_obj)
+    if filter_fields["receiver_addrs"]:
+        metadata["recipients"] = filter_fields["receiver_addrs"]
+    if filter_fields["folder"]:
+        metadata["folder"] = filter_fields["folder"]
+    return metadata or None
+
+class SearchFilters:
+    """
+    검색 필터: 발신자, 수신자(To/Cc), 기간 [date_from, date_to), 폴더(하위 폴더 포함).
+    각 검색 엔진은 이 조건을 검색 전에 적용합니다 (Whoosh filter=, ChromaDB where=, SQL WHERE).
+    """
+
+    def __init__(self, sender=None, recipient=None, date_from=None, date_to=None, folder=None):
+        self.sender = normalize_address(sender)
+        self.recipient = normalize_address(recipient)
+        self.date_from = _to_datetime(date_from)
+        self.date_to = _to_datetime(date_to)
+        self.folder = folder.rstrip("/") if folder else None
+
+    @classmethod
+    def from_value(cls, value):
+        """None, dict 또는 SearchFilters를 SearchFilters로 바꿉니다."""
+        if value is None or isinstance(value, cls):
+            return value if value is not None else cls()
+        return cls(**value)
+
+    def __bool__(self):
+        return any(value is not None for value in self.cache_key())
+
+    def cache_key(self):
+        return (self.sender, self.recipient, self.date_from, self.date_to, self.folder)
+
+    def to_dict(self):
+        """JSON으로 보낼 수 있는 dict (검색 서버 요청에 사용)."""
+        values = {
+            "sender": self.sender,
+            "recipient": self.recipient,
+            "date_from": self.date_from.isoformat() if self.date_from else None,
+            "date_to": self.date_to.isoformat() if self.date_to else None,
+            "folder": self.folder,
+        }
+        return {key: value for key, value in values.items() if value is not None}
+
+    def chroma_where(self):
+        """
+        ChromaDB query()의 where 조건 (발신자, 기간). 필터가 없으면 None.
+        수신자와 폴더는 where로 표현할 수 없으므로 metadata_matches()로 결과를 거릅니다.
+        """
+        conditions = []
+        if self.sender:
+            conditions.append({"sender": self.sender})
+        if self.date_from is not None:
+            conditions.append({"sent_ts": {"$gte": wall_clock_timestamp(self.date_from)}})
+        if self.date_to is not None:
+            conditions.append({"sent_ts": {"$lt": wall_clock_timestamp(self.date_to)}})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    def has_metadata_filter(self):
+        """chroma_where() 밖에서 거르는 조건(수신자, 폴더)이 있는지."""
+        return bool(self.recipient or self.folder)
+
+    def metadata_matches(self, metadata):
+        """vector_metadata()로 저장한 메타데이터가 수신자/폴더 조건에 맞는지 (하위 폴더 포함)."""
+        metadata = metadata or {}
+        if self.recipient and self.recipient not in (metadata.get("recipients") or "").split(","):
+            return False
+        if self.folder and not _folder_matches(metadata.get("folder"), self.folder):
+            return False
+        return True
+
+    def sql(self, alias="e"):
+        """emails 테이블에 대한 WHERE 조건과 매개변수 (src.ingestion.storage.email_filter_sql)."""
+        return email_filter_sql(sender=self.sender, recipient=self.recipient, date_from=self.date_from,
+                                date_to=self.date_to, folder=self.folder, alias=alias)
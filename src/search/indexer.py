@@ -1,138 +1,449 @@
 import sys
 import os
 import shutil
-import numpy as np
-import pickle
-from whoosh.index import create_in
-from whoosh.fields import Schema, TEXT, DATETIME, ID
-from src.ingestion.parser import parse_eml_files
-from sentence_transformers import SentenceTransformer
-import chromadb
+from whoosh.index import create_in, open_dir, exists_in
+from whoosh.fields import Schema, TEXT, DATETIME, ID, KEYWORD, NUMERIC
+from whoosh.query import Or, Term
+from src.common.models import Email
+from src.common.instrumentation import instrumentation
+from src.ingestion.parser import parse_eml_paths, parse_eml_headers, iter_eml_paths
+from src.ingestion.storage import SQLiteStorage, ContactRanking, contact_ranking_from_emails
+from src.ingestion.dedup import strip_quoted_text
+from src.search.manifest import SourceManifest
+from src.search.embedding_cache import EmbeddingCache
+from src.search.embedding_engine import EmbeddingEngine, DEFAULT_TOKEN_BUDGET
+from src.search.pipeline import Pipeline
+from src.search.filters import FILTER_FIELDS, whoosh_filter_fields, vector_metadata
+from src.search.backends import KEYWORD_ENGINES, VECTOR_STORES
+from src.search.vector_store import create_vector_store
+
+EMBEDDING_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+# 색인에 저장하는 필드 구성이 바뀌면 올림 (manifest에 기록된 버전과 다르면 색인을 다시 만듦)
+# (6: whoosh 엔진의 연락처 통계를 manifest DB에 저장,
+#  7: 숫자 토큰이 다른 유사 중복 메일에 같은 임베딩을 쓰지 않도록 벡터를 다시 계산,
+#  8: 벡터 메타데이터의 수신자/폴더를 주소별 키 대신 'recipients'/'folder' 필드 하나로 저장)
+INDEX_FORMAT_VERSION = 8
+# Whoosh 색인에 있어야 하는 필드 (없으면 이전 형식의 색인이므로 다시 만듦)
+REQUIRED_FIELDS = FILTER_FIELDS + ("importance", "thread_id")
 
 class EmailIndexer:
-    def __init__(self, eml_dir="eml_output", index_dir="data/index", chroma_dir="data/chroma"):
+    def __init__(self, eml_dir="eml_output", index_dir="data/index", chroma_dir="data/chroma",
+                 manifest_path="data/index_manifest.db", embedding_cache_dir="data/embedding_cache",
+                 keyword_engine="whoosh", db_path="data/emails.db", vector_store="chroma", vector_dir="data/vectors",
+                 vector_options=None, embedding_processes=1, embedding_token_budget=DEFAULT_TOKEN_BUDGET):
+        """
+        keyword_engine은 키워드 검색용으로 갱신할 색인입니다.
+          - 'whoosh': index_dir의 Whoosh 색인
+          - 'fts5': db_path의 emails 테이블 (FTS5 색인은 SQLiteStorage의 트리거로 함께 갱신)
+        vector_store는 임베딩을 저장할 곳입니다.
+          - 'chroma': chroma_dir의 ChromaDB 컬렉션
+          - 'numpy': vector_dir의 memory-map 벡터 저장소 (src.search.vector_store.NumpyVectorStore)
+          - 'ivfpq': numpy 저장소 + IVF-PQ 근사 검색 인덱스 (vector_options의 nlist, m으로 학습)
+        임베딩은 토큰 길이별 배치로 계산합니다 (src.search.embedding_engine.EmbeddingEngine).
+        embedding_processes > 1이면 모델을 프로세스마다 하나씩 올려서 CPU 코어를 나눠 씁니다.
+        """
+        if keyword_engine not in KEYWORD_ENGINES:
+            raise ValueError(f"알 수 없는 키워드 엔진입니다: {keyword_engine} (사용 가능: {', '.join(KEYWORD_ENGINES)})")
+        if vector_store not in VECTOR_STORES:
+            raise ValueError(f"알 수 없는 벡터 저장소입니다: {vector_store} (사용 가능: {', '.join(VECTOR_STORES)})")
         self.eml_dir = eml_dir
         self.index_dir = index_dir
         self.chroma_dir = chroma_dir
-        if not os.path.exists(self.index_dir):
+        self.vector_dir = vector_dir
+        self.keyword_engine = keyword_engine
+        self.db_path = db_path
+        # 키워드 엔진이나 벡터 저장소를 바꾸면 이전 manifest로는 증분 색인을 할 수 없으므로 다시 만듦
+        self.manifest = SourceManifest(manifest_path, target=f"{keyword_engine}+{vector_store}:{INDEX_FORMAT_VERSION}")
+        self.embedding_cache = EmbeddingCache(embedding_cache_dir, model_name=EMBEDDING_MODEL_NAME)
+        self.embedding_engine = EmbeddingEngine(EMBEDDING_MODEL_NAME, token_budget=embedding_token_budget,
+                                                processes=embedding_processes)
+        if keyword_engine == "whoosh" and not os.path.exists(self.index_dir):
             os.makedirs(self.index_dir)
-        if not os.path.exists(self.chroma_dir):
-            os.makedirs(self.chroma_dir)
 
-        self.chroma_client = None
-        self.chroma_collection = None
-        self._init_chroma()
+        self.vector_store = create_vector_store(vector_store, chroma_dir=chroma_dir, vector_dir=vector_dir, create=True,
+                                                **(vector_options or {}))
 
-    def _init_chroma(self):
-        try:
-            self.chroma_client = chromadb.PersistentClient(path=self.chroma_dir)
-            self.chroma_collection = self.chroma_client.get_or_create_collection(name="email_embeddings")
-            print(f"ChromaDB 컬렉션 'email_embeddings' 초기화 완료. 저장 경로: {self.chroma_dir}")
-        except Exception as e:
-            print(f"ChromaDB 초기화 중 오류 발생: {e}")
+    def _encode(self, texts):
+        """캐시에 없는 텍스트만 SentenceTransformer로 인코딩합니다. 모델은 처음 필요할 때 로드합니다."""
+        with instrumentation.span("encode", len(texts)):
+            return self.embedding_engine.encode(texts)
 
-    def _create_schema(self):
+    @staticmethod
+    def _create_schema():
         return Schema(
-            message_id=ID(stored=True, unique=True),
+            # sortable=True 필드는 컬럼으로도 저장되어, 검색 시 본문 등 큰 저장 필드를 읽지 않고 값을 얻을 수 있음
+            message_id=ID(stored=True, unique=True, sortable=True),
             subject=TEXT(stored=True),
             body_plain=TEXT(stored=True),
             attachment_text=TEXT(stored=True),
-            sender=TEXT(stored=True),
+            sender=TEXT(stored=True, sortable=True),
             folder_path=TEXT(stored=True),
-            receivers=TEXT(stored=True),
+            receivers=TEXT(stored=True, sortable=True),
             sent_date=DATETIME(stored=True),
-            thread_topic=TEXT(stored=True)
+            thread_topic=TEXT(stored=True),
+            # 검색 필터용 필드 (정규화된 발신자/수신자 주소, 폴더 경로, 1970-01-01 기준 발송 일수)
+            # 날짜 단위 필터는 분 단위 값이 많은 sent_date보다 sent_day의 범위 질의가 훨씬 적은 term을 읽음
+            sender_addr=ID(),
+            receiver_addrs=KEYWORD(commas=True),
+            folder=ID(),
+            sent_day=NUMERIC(bits=32),
+            # 메일함 소유자/중요 연락처 기준의 정적 중요도 (ContactRanking). 병합 단계에서 컬럼으로 읽음
+            importance=NUMERIC(bits=32, stored=True, sortable=True),
+            # ThreadIndex로 재구성한 스레드 ID. 검색 시 collapse(스레드마다 한 건)의 기준 컬럼
+            thread_id=ID(stored=True, sortable=True)
         )
 
-    def index_emails(self):
-        print(f"'{self.eml_dir}'에서 이메일 데이터를 로드하여 색인을 시작합니다...")
-        
-        # 1. Whoosh 색인 생성
+    def _open_or_create_index(self, rebuild):
         schema = self._create_schema()
+        if not rebuild and exists_in(self.index_dir):
+            ix = open_dir(self.index_dir)
+            if set(REQUIRED_FIELDS) <= set(ix.schema.names()):
+                return ix, False
+            print("기존 Whoosh 색인에 검색 필터/중요도/스레드 필드가 없어 색인을 다시 만듭니다.")
+
         if os.path.exists(self.index_dir):
             shutil.rmtree(self.index_dir)
         os.makedirs(self.index_dir)
+        return create_in(self.index_dir, schema), True
+
+    @staticmethod
+    def _whoosh_fields(email_obj, importance=0):
+        receivers_str = ",".join(email_obj.receivers) if email_obj.receivers else ""
+        return dict(
+            message_id=email_obj.message_id,
+            subject=email_obj.subject if email_obj.subject else "",
+            body_plain=email_obj.body_plain if email_obj.body_plain else "",
+            attachment_text=email_obj.attachment_text if email_obj.attachment_text else "",
+            sender=email_obj.sender if email_obj.sender else "",
+            receivers=receivers_str,
+            sent_date=email_obj.sent_date,
+            folder_path=email_obj.folder_path if email_obj.folder_path else "",
+            thread_topic=email_obj.thread_topic if email_obj.thread_topic else "",
+            importance=importance,
+            # 스레드 색인을 거치지 않은 문서는 혼자인 스레드로 취급
+            thread_id=email_obj.thread_id or email_obj.message_id,
+            **whoosh_filter_fields(email_obj)
+        )
+
+    @staticmethod
+    def _stored_email(fields):
+        """Whoosh 저장 필드로 Email 객체를 다시 구성합니다 (필터 필드는 저장 필드에서 다시 계산)."""
+        return Email(
+            message_id=fields["message_id"], subject=fields.get("subject"), body_plain=fields.get("body_plain"),
+            body_html=None, sender=fields.get("sender") or "",
+            receivers=[receiver for receiver in (fields.get("receivers") or "").split(",") if receiver],
+            sent_date=fields.get("sent_date"), folder_path=fields.get("folder_path") or "",
+            attachment_text=fields.get("attachment_text"), thread_topic=fields.get("thread_topic"),
+            thread_id=fields.get("thread_id")
+        )
+
+    def _sync_importance(self, ix, storage):
+        """
+        키워드 색인과 벡터 메타데이터의 importance를 연락처 통계로 계산한 현재 ContactRanking에 맞춥니다.
+        manifest에 기록된 기준과 같으면 아무것도 하지 않고, 다르면 점수가 달라질 수 있는 문서만 갱신합니다.
+        반환값: 새로 색인하는 문서에 사용할 ContactRanking
+        """
+        if storage is not None:
+            # fts5: emails.importance는 SQLiteStorage가 갱신하고, 같은 기준을 벡터 메타데이터에 반영
+            storage.refresh_importance()
+            ranking = storage.applied_ranking()
+        else:
+            # whoosh: 색인한 메일의 연락처 통계 (manifest DB, 색인 파이프라인에서 갱신)
+            ranking = self.manifest.contacts.ranking()
+        applied = ContactRanking.from_json(self.manifest.get_meta("contact_ranking"))
+        if ranking == applied:
+            return ranking
+        if ix is not None:
+            updated = self._update_whoosh_importance(ix, applied, ranking)
+        else:
+            updated = storage.affected_importance(applied, ranking)
+        if updated and self.vector_store.is_ready():
+            self.vector_store.update_metadata(list(updated), [{"importance": value} for value in updated.values()])
+        self.manifest.set_meta("contact_ranking", ranking.to_json())
+        print(f"메인 사용자/중요 연락처가 바뀌어 문서 {len(updated)}개의 중요도를 확인하고 갱신했습니다.")
+        return ranking
 
-        ix = create_in(self.index_dir, schema)
+    def _update_whoosh_importance(self, ix, old, new):
+        """기준이 old에서 new로 바뀔 때 점수가 달라지는 Whoosh 문서만 다시 씁니다. 반환값: {message_id: importance}"""
+        terms = [Term("sender_addr", address) for address in old.changed_senders(new)] + \
+                [Term("receiver_addrs", address) for address in old.changed_recipients(new)]
+        if not terms:
+            return {}
+        with ix.searcher() as searcher:
+            documents = [searcher.stored_fields(docnum) for docnum in searcher.docs_for_query(Or(terms))]
+        updated = {}
         writer = ix.writer()
+        for fields in documents:
+            email_obj = self._stored_email(fields)
+            importance = new.score_email(email_obj)
+            if importance != fields.get("importance"):
+                writer.update_document(**self._whoosh_fields(email_obj, importance))
+                updated[email_obj.message_id] = importance
+        if updated:
+            writer.commit()
+        else:
+            writer.cancel()
+        return updated
+
+    def _update_whoosh_threads(self, ix, relabeled, chunk_size=1000):
+        """스레드가 합쳐져서 thread_id가 바뀐 Whoosh 문서를 다시 씁니다. relabeled: {message_id: thread_id}"""
+        message_ids = list(relabeled)
+        documents = []
+        with ix.searcher() as searcher:
+            for chunk_start in range(0, len(message_ids), chunk_size):
+                id_query = Or([Term("message_id", doc_id) for doc_id in message_ids[chunk_start:chunk_start + chunk_size]])
+                for docnum in searcher.docs_for_query(id_query):
+                    fields = searcher.stored_fields(docnum)
+                    if fields.get("thread_id") != relabeled[fields["message_id"]]:
+                        documents.append(fields)
+        if not documents:
+            return 0
+        writer = ix.writer()
+        for fields in documents:
+            email_obj = self._stored_email(fields)
+            email_obj.thread_id = relabeled[email_obj.message_id]
+            writer.update_document(**self._whoosh_fields(email_obj, fields.get("importance") or 0))
+        writer.commit()
+        return len(documents)
+
+    def _embedding_text(self, email_obj):
+        # 인용된 이전 메일과 서명은 같은 스레드의 다른 메일에서 이미 임베딩되므로 새로 쓴 본문만 사용
+        # (키워드 색인에는 전체 본문을 그대로 저장)
+        return (
+            f"{email_obj.subject if email_obj.subject else ''}\n"
+            f"{strip_quoted_text(email_obj.body_plain) if email_obj.body_plain else ''}\n"
+            f"{email_obj.attachment_text if email_obj.attachment_text else ''}"
+        )
+
+    def _open_storage(self, rebuild):
+        """fts5 엔진용 SQLite 저장소를 엽니다. 반환값: (storage, 처음부터 다시 만드는지 여부)"""
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        known_ids = [entry[3] for entry in self.manifest.entries().values()]
+        # 처음부터 다시 만들 때는 FTS5 색인을 행마다 갱신하지 않고 마지막에 한 번에 생성
+        storage = SQLiteStorage(self.db_path, bulk_load=rebuild or not known_ids, fts=True)
+        storage.connect()
+        if not storage.conn:
+            return None, False
+        storage.create_table()
+        if not rebuild and known_ids:
+            return storage, False
+        # 이전에 색인한 .eml의 행만 지움 (PST에서 수집한 행은 유지)
+        storage.delete_emails(known_ids)
+        return storage, True
+
+    def index_emails(self, rebuild=False, whoosh_procs=1, parse_workers=None, batch_size=100, queue_size=256,
+                     embed_batch_size=1000):
+        """
+        eml_dir의 이메일을 키워드 색인(Whoosh 또는 SQLite FTS5)과 ChromaDB에 반영합니다.
+
+        기본값은 증분 색인입니다. manifest에 기록된 원본 파일 목록과 비교해서
+        추가/변경된 파일만 파싱하여 update_document/upsert로 반영하고,
+        사라진 파일의 문서는 두 색인에서 삭제합니다.
+        rebuild=True이면 기존 색인과 컬렉션을 지우고 처음부터 다시 만듭니다.
+
+        파싱, 키워드 색인 쓰기, 임베딩, ChromaDB 저장은 문서 약 queue_size개씩만 담는 큐로 연결된
+        파이프라인에서 동시에 실행되므로 전체 텍스트를 메모리에 모으지 않습니다.
+        whoosh_procs > 1이면 Whoosh의 멀티프로세스 writer를 사용합니다.
+        임베딩 단계는 키워드 색인 묶음을 약 embed_batch_size개까지 모아서 인코딩합니다
+        (한번에 넘기는 텍스트가 많을수록 길이가 비슷한 텍스트끼리 배치를 만들기 좋음).
+        """
+        print(f"'{self.eml_dir}'에서 이메일 데이터를 로드하여 색인을 시작합니다...")
+        rebuild = rebuild or self.manifest.reset
+
+        # 1. 키워드 색인 열기 (없거나 rebuild이면 새로 생성)
+        ix = storage = None
+        if self.keyword_engine == "fts5":
+            storage, created = self._open_storage(rebuild)
+            if storage is None:
+                print("오류: 데이터베이스 연결에 실패하여 색인을 중단합니다.")
+                return
+        else:
+            ix, created = self._open_or_create_index(rebuild)
+        if created:
+            self.manifest.clear()
+            if self.vector_store.is_ready():
+                self.vector_store.reset()
+
+        try:
+            ranking = self._sync_importance(ix, storage)
+            self._index_changes(ix, storage, ranking, whoosh_procs, parse_workers, batch_size, queue_size,
+                                embed_batch_size)
+            # 새로 색인한 이메일로 연락처 통계가 바뀌었으면 중요도를 다시 맞춤
+            self._sync_importance(ix, storage)
+        finally:
+            self.embedding_engine.close()
+            if storage is not None:
+                storage.close()
+
+    def _index_changes(self, ix, storage, ranking, whoosh_procs, parse_workers, batch_size, queue_size,
+                       embed_batch_size):
+        changed, touched, deleted = self.manifest.diff(iter_eml_paths(self.eml_dir))
+        print(f"변경 사항: 추가/변경 {len(changed)}개, 삭제 {len(deleted)}개")
+        if touched:
+            self.manifest.record([(path, *entry) for path, entry in touched.items()])
+
+        use_vectors = self.vector_store.is_ready()
+        if not use_vectors:
+            print(f"벡터 저장소({self.vector_store.name})가 초기화되지 않아 임베딩을 저장할 수 없습니다.")
+            pending = {}
+        else:
+            # 이전 실행에서 키워드 색인에만 반영한 파일은 임베딩만 다시 계산 (바뀐 파일은 어차피 다시 색인)
+            pending = {path: entry[:3] for path, entry in self.manifest.pending_vectors().items()
+                       if path not in changed and path not in deleted}
+            if pending:
+                print(f"임베딩하지 못했던 파일 {len(pending)}개의 임베딩을 계산합니다.")
+        if not changed and not deleted and not pending:
+            print("색인이 이미 최신 상태입니다.")
+            return
+
+        estimated = False
+        if ix is not None and not ranking and changed:
+            # 연락처 통계가 아직 없으면 (처음 색인) 바뀐 파일의 헤더만 읽어서 기준을 먼저 계산함.
+            # 색인이 끝난 뒤 통계로 계산한 기준과 같으므로 Whoosh 문서를 중요도 때문에 다시 쓰지 않음
+            ranking = contact_ranking_from_emails(parse_eml_headers(changed))
+            estimated = bool(ranking)
+
+        writer = None
+        if ix is not None:
+            if whoosh_procs > 1:
+                writer = ix.writer(procs=whoosh_procs, limitmb=256, multisegment=True)
+            else:
+                writer = ix.writer()
 
         email_count = 0
-        texts_to_embed = []
-        doc_ids_for_chroma = []
-        
+        manifest_entries = []
+
+        relabeled = {}  # 스레드가 합쳐져서 thread_id가 바뀐 기존 Whoosh 문서 {message_id: thread_id}
+
+        def write_whoosh(batch):
+            nonlocal email_count
+            # 임베딩만 다시 계산할 파일(pending)은 키워드 색인, 스레드, 연락처 통계에 이미 반영되어 있음
+            new_emails = [email_obj for path, email_obj in batch if path in changed]
+            # 스레드 색인과 연락처 통계(manifest DB)는 Whoosh writer와 함께 커밋하거나 취소함
+            with instrumentation.span("threads.assign", len(new_emails)):
+                relabeled.update(self.manifest.threads.assign(new_emails))
+            with instrumentation.span("contacts.add", len(new_emails)):
+                self.manifest.contacts.add(new_emails)
+            results = []
+            with instrumentation.span("whoosh.add", len(new_emails)):
+                for path, email_obj in batch:
+                    importance = ranking.score_email(email_obj)
+                    if path in changed:
+                        writer.update_document(**self._whoosh_fields(email_obj, importance))
+                    manifest_entries.append((path, *(changed.get(path) or pending[path]), email_obj.message_id))
+                    if use_vectors:
+                        # 시맨틱 검색을 위한 ID, 텍스트, 필터용 메타데이터를 임베딩 단계로 넘김 (ChromaDB용 ID는 문자열이어야 함)
+                        results.append((email_obj.message_id, self._embedding_text(email_obj),
+                                        vector_metadata(email_obj, importance)))
+            email_count += len(new_emails)
+            return results if use_vectors else None
+
+        def write_sqlite(batch):
+            nonlocal email_count
+            # 같은 message_id는 upsert로 갱신되고, FTS5 색인은 트리거(대량 적재 시에는 마지막 재생성)로 반영
+            new_emails = [email_obj for path, email_obj in batch if path in changed]
+            if new_emails and not storage.insert_emails(new_emails):
+                raise RuntimeError("SQLite에 이메일을 저장하지 못했습니다.")
+            for path, email_obj in batch:
+                manifest_entries.append((path, *(changed.get(path) or pending[path]), email_obj.message_id))
+            email_count += len(new_emails)
+            if use_vectors:
+                # emails.importance와 같은 기준 (SQLiteStorage.applied_ranking)으로 계산
+                sqlite_ranking = storage.applied_ranking()
+                return [(email_obj.message_id, self._embedding_text(email_obj),
+                         vector_metadata(email_obj, sqlite_ranking.score_email(email_obj)))
+                        for _, email_obj in batch]
+            return None
+
+        def embed_batch(batches):
+            batch = [entry for entries in batches for entry in entries]
+            batch_ids = [doc_id for doc_id, _, _ in batch]
+            batch_texts = [text for _, text, _ in batch]
+            batch_metadatas = [metadata for _, _, metadata in batch]
+            # 이전에 인코딩한 적 없는 텍스트만 모델로 계산
+            with instrumentation.span("embed", len(batch_texts)):
+                batch_embeddings = self.embedding_cache.encode(batch_texts, self._encode)
+            return batch_ids, batch_texts, batch_embeddings, batch_metadatas
+
+        def store_vectors(item):
+            batch_ids, batch_texts, batch_embeddings, batch_metadatas = item
+            with instrumentation.span(f"{self.vector_store.name}.add", len(batch_ids)):
+                self.vector_store.upsert(batch_ids, batch_embeddings, metadatas=batch_metadatas, documents=batch_texts)
+
         try:
-            print("Whoosh 색인을 생성하는 중...")
-            for email_obj in parse_eml_files(self.eml_dir):
-                receivers_str = ",".join(email_obj.receivers) if email_obj.receivers else ""
-                
-                writer.add_document(
-                    message_id=email_obj.message_id,
-                    subject=email_obj.subject if email_obj.subject else "",
-                    body_plain=email_obj.body_plain if email_obj.body_plain else "",
-                    attachment_text=email_obj.attachment_text if email_obj.attachment_text else "",
-                    sender=email_obj.sender if email_obj.sender else "",
-                    receivers=receivers_str,
-                    sent_date=email_obj.sent_date,
-                    folder_path=email_obj.folder_path if email_obj.folder_path else "",
-                    thread_topic=email_obj.thread_topic if email_obj.thread_topic else ""
-                )
-                
-                # 시맨틱 검색을 위한 텍스트와 ID 저장 (Whoosh와 ChromaDB 동시 사용)
-                text_content = (
-                    f"{email_obj.subject if email_obj.subject else ''}\n"
-                    f"{email_obj.body_plain if email_obj.body_plain else ''}\n"
-                    f"{email_obj.attachment_text if email_obj.attachment_text else ''}"
-                )
-                texts_to_embed.append(text_content)
-                doc_ids_for_chroma.append(email_obj.message_id) # ChromaDB용 ID는 문자열이어야 함
-                
-                email_count += 1
+            print(f"키워드 색인({self.keyword_engine})과 임베딩을 파이프라인으로 갱신하는 중...")
+            if writer is not None:
+                for doc_id in deleted.values():
+                    writer.delete_by_term('message_id', doc_id)
+                self.manifest.threads.remove(list(deleted.values()))
+                self.manifest.contacts.remove(list(deleted.values()))
+            elif deleted:
+                storage.delete_emails(list(deleted.values()))
+            if use_vectors and deleted:
+                self.vector_store.delete(list(deleted.values()))
 
-            writer.commit()
-            print(f"{email_count}개의 이메일이 Whoosh 색인에 성공적으로 추가되었습니다.")
+            # 파싱 -> 키워드 색인 쓰기 -> 임베딩 -> 벡터 저장 단계를 동시에 실행
+            parse_paths = list(changed) + list(pending)
+            pipeline = Pipeline(queue_size=queue_size)
+            parsed_q = pipeline.source(
+                "parse", zip(parse_paths, parse_eml_paths(parse_paths, workers=parse_workers))
+            )
+            # 키워드 색인 단계는 batch_size개씩 스레드를 정해서 쓰고, 임베딩 단계는 그 묶음을 embed_batch_size개 정도로 모아서 인코딩
+            if writer is not None:
+                embed_q = pipeline.stage("whoosh", write_whoosh, parsed_q, batch_size=batch_size, output=use_vectors)
+            else:
+                embed_q = pipeline.stage("sqlite", write_sqlite, parsed_q, batch_size=batch_size, output=use_vectors)
+            if use_vectors:
+                # 벡터 저장소는 한번에 많은 문서를 추가할 때 Batch 처리하는 것이 효율적
+                vector_q = pipeline.stage("embed", embed_batch, embed_q,
+                                          batch_size=max(1, embed_batch_size // batch_size))
+                pipeline.sink(self.vector_store.name, store_vectors, vector_q)
+            pipeline.join()
+
+            if writer is not None:
+                with instrumentation.span("whoosh.commit"):
+                    writer.commit()
+                self.manifest.conn.commit()
+                if estimated:
+                    self.manifest.set_meta("contact_ranking", ranking.to_json())
+                if relabeled:
+                    rewritten = self._update_whoosh_threads(ix, relabeled)
+                    print(f"스레드가 합쳐져서 기존 문서 {rewritten}개의 thread_id를 갱신했습니다.")
+            elif storage.bulk_load:
+                with instrumentation.span("sqlite.finish_bulk_load"):
+                    storage.finish_bulk_load()
+            print(f"{email_count}개의 이메일이 키워드 색인에 반영되고 {len(deleted)}개가 삭제되었습니다.")
+            print("단계별 처리 시간: " + ", ".join(
+                f"{name} {seconds:.2f}초" for name, seconds in pipeline.busy_seconds.items()
+            ))
         except Exception as e:
+            # manifest를 갱신하지 않으므로 다음 실행에서 같은 파일을 다시 반영합니다.
             print(f"이메일 색인 중 오류가 발생했습니다: {e}")
-            writer.cancel()
+            if writer is not None:
+                writer.cancel()
+                self.manifest.conn.rollback()
             return
 
-        # 2. 시맨틱 검색을 위한 임베딩 생성 및 ChromaDB 저장
-        if self.chroma_collection is not None:
-            try:
-                print("\n시맨틱 검색을 위한 임베딩 벡터를 생성하고 ChromaDB에 저장합니다...")
-                print("이 작업은 모델 다운로드를 포함하여 몇 분 정도 소요될 수 있습니다.")
-                model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-                
-                # 기존 ChromaDB 컬렉션 비우기 (새로운 색인을 위해)
-                if self.chroma_collection.count() > 0:
-                    self.chroma_client.delete_collection(name="email_embeddings")
-                    self.chroma_collection = self.chroma_client.create_collection(name="email_embeddings")
-                    print("기존 ChromaDB 컬렉션을 삭제하고 새로 생성했습니다.")
-
-                # ChromaDB는 한번에 많은 문서를 추가할 때 Batch 처리하는 것이 효율적
-                BATCH_SIZE = 100
-                for i in range(0, len(texts_to_embed), BATCH_SIZE):
-                    batch_texts = texts_to_embed[i:i+BATCH_SIZE]
-                    batch_ids = doc_ids_for_chroma[i:i+BATCH_SIZE]
-                    
-                    batch_embeddings = model.encode(batch_texts, show_progress_bar=False).tolist() # ChromaDB는 리스트 형태를 선호
-                    
-                    self.chroma_collection.add(
-                        embeddings=batch_embeddings,
-                        documents=batch_texts, # 원본 텍스트도 저장 (선택 사항이지만 유용)
-                        ids=batch_ids
-                    )
-                    print(f"ChromaDB에 {i+len(batch_texts)}개 문서 추가 완료.")
-                
-                print(f"총 {self.chroma_collection.count()}개의 임베딩이 ChromaDB에 저장되었습니다.")
-                
-            except Exception as e:
-                print(f"임베딩 생성 또는 ChromaDB 저장 중 오류가 발생했습니다: {e}")
-        else:
-            print("ChromaDB 컬렉션이 초기화되지 않아 임베딩을 저장할 수 없습니다.")
+        if use_vectors:
+            # 갱신/삭제로 삭제 표시된 벡터가 많으면 정리하고 (numpy) 근사 검색 인덱스를 갱신 (ivfpq)
+            with instrumentation.span(f"{self.vector_store.name}.finish"):
+                self.vector_store.finish_indexing()
+            print(f"총 {self.vector_store.count()}개의 임베딩이 벡터 저장소({self.vector_store.name})에 저장되어 있습니다 "
+                  f"(서로 다른 벡터 {self.vector_store.unique_count()}개).")
+            cache_stats = self.embedding_cache.stats()
+            print(f"임베딩 캐시: 히트 {cache_stats['hits']}개, 유사 중복 {cache_stats['near_duplicates']}개, "
+                  f"새로 인코딩 {cache_stats['misses']}개 (저장된 벡터 {cache_stats['entries']}개)")
+
+        # 3. 색인에 반영된 뒤 manifest 갱신 (벡터 저장소를 쓸 수 없을 때도 키워드 색인은 증분으로 유지하고,
+        #    임베딩하지 못한 파일은 표시해 두었다가 벡터 저장소를 쓸 수 있는 다음 실행에서 임베딩)
+        self.manifest.remove(list(deleted))
+        self.manifest.record(manifest_entries, vectors_pending=not use_vectors)
 
 
 if __name__ == '__main__':
     print("===== Whoosh 검색 색인 및 시맨틱 임베딩 (ChromaDB) 구축 시작 =====")
     indexer = EmailIndexer()
-    indexer.index_emails()
+    indexer.index_emails(rebuild="--rebuild" in sys.argv)
     print("===== 모든 색인 작업 완료 =====")
\ No newline at end of file
@@ -0,0 +1,179 @@
+import os
+import json
+import numpy as np
+
+# 코드북 하나의 중심 수 (코드 한 개 = 1바이트)
+PQ_CENTROIDS = 256
+
+def _nearest(vectors, centroids, batch_rows=8192):
+    """각 벡터에서 L2 거리가 가장 가까운 중심의 번호. ||x-c||^2 = ||x||^2 - 2x·c + ||c||^2 이므로 x·c - ||c||^2/2의 최댓값."""
+    half_norms = 0.5 * (centroids ** 2).sum(axis=1)
+    assign = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch_rows):
+        scores = vectors[start:start + batch_rows] @ centroids.T - half_norms
+        assign[start:start + batch_rows] = scores.argmax(axis=1)
+    return assign
+
+def kmeans(vectors, k, iterations=10, seed=0):
+    """Lloyd k-means. 빈 클러스터는 무작위 벡터로 다시 시작합니다."""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(vectors, centroids)
+        counts = np.bincount(assign, minlength=k)
+        order = np.argsort(assign, kind="stable")
+        starts = np.searchsorted(assign[order], np.arange(k))
+        nonempty = counts > 0
+        sums = np.add.reduceat(vectors[order], starts[nonempty], axis=0)
+        centroids[nonempty] = sums / counts[nonempty, None]
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+    return centroids
+
+class IVFPQIndex:
+    """
+    IVF(거친 k-means 분할) + PQ(곱 양자화) 근사 내적 검색 인덱스입니다.
+
+    각 벡터는 가장 가까운 거친 중심(centroids)의 목록에 들어가고, 중심과의 차이(residual)를
+    m개의 부분 공간으로 나눠 부분 공간마다 256개 코드북 중 가장 가까운 번호(1바이트)로 저장합니다.
+    따라서 벡터 하나에 m바이트 코드와 4바이트 목록 번호만 메모리에 둡니다.
+
+    검색은 질의와 내적이 큰 nprobe개 목록의 벡터만 본다. 내적은 q·c + Σ q_j·codebook_j[code_j]로
+    근사하며, 부분 공간별 표(m x 256)를 질의마다 한 번 계산해 코드로 찾아 더합니다.
+    """
+
+    def __init__(self, centroids, codebooks, assign=None, codes=None, trained_rows=0):
+        self.trained_rows = trained_rows # 학습할 때 저장소의 (살아 있는) 행 수. 많이 늘면 다시 학습
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.codebooks = np.asarray(codebooks, dtype=np.float32) # (m, 256, dsub)
+        self.assign = np.zeros(0, dtype=np.int32) if assign is None else np.asarray(assign, dtype=np.int32)
+        self.codes = np.zeros((0, self.m), dtype=np.uint8) if codes is None else np.asarray(codes, dtype=np.uint8)
+        self._build_lists()
+
+    @property
+    def m(self):
+        return self.codebooks.shape[0]
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    @property
+    def rows(self):
+        """인코딩된 행 수 (저장소의 0..rows-1 행)."""
+        return len(self.assign)
+
+    def nbytes(self):
+        """행 단위 데이터(코드, 목록 번호, 목록 순서)가 차지하는 메모리."""
+        return self.codes.nbytes + self.assign.nbytes + self.order.nbytes
+
+    @classmethod
+    def train(cls, vectors, nlist, m, trained_rows=0, iterations=10, seed=0):
+        """vectors(정규화된 표본)로 거친 중심과 부분 공간별 코드북을 학습합니다. 행은 add()로 추가합니다."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dim = vectors.shape[1]
+        if dim % m:
+            raise ValueError(f"벡터 차원({dim})이 부분 공간 수({m})로 나누어떨어지지 않습니다.")
+        centroids = kmeans(vectors, nlist, iterations, seed)
+        residuals = vectors - centroids[_nearest(vectors, centroids)]
+        dsub = dim // m
+        codebooks = np.zeros((m, PQ_CENTROIDS, dsub), dtype=np.float32)
+        for j in range(m):
+            sub = residuals[:, j * dsub:(j + 1) * dsub]
+            trained = kmeans(sub, PQ_CENTROIDS, iterations, seed + j + 1)
+            codebooks[j, :len(trained)] = trained
+        return cls(centroids, codebooks, trained_rows=trained_rows)
+
+    def encode(self, vectors, batch_rows=16384):
+        """벡터들의 (목록 번호, PQ 코드)를 계산합니다."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        assign = _nearest(vectors, self.centroids)
+        dsub = self.codebooks.shape[2]
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for start in range(0, len(vectors), batch_rows):
+            residuals = vectors[start:start + batch_rows] - self.centroids[assign[start:start + batch_rows]]
+            for j in range(self.m):
+                codes[start:start + batch_rows, j] = _nearest(residuals[:, j * dsub:(j + 1) * dsub], self.codebooks[j])
+        return assign, codes
+
+    def add(self, vectors, slots=None, batch_rows=65536):
+        """
+        다음 행 번호부터 벡터를 추가합니다 (코드북은 다시 학습하지 않음). vectors는 memory-map이어도 됩니다.
+        slots가 있으면 vectors[slots]를 차례로 추가합니다 (여러 행이 같은 벡터를 공유하는 저장소).
+        """
+        count = len(vectors) if slots is None else len(slots)
+        assigns, codes = [self.assign], [self.codes]
+        for start in range(0, count, batch_rows):
+            batch = vectors[start:start + batch_rows] if slots is None else vectors[slots[start:start + batch_rows]]
+            assign, code = self.encode(np.asarray(batch, dtype=np.float32))
+            assigns.append(assign)
+            codes.append(code)
+        self.assign = np.concatenate(assigns)
+        self.codes = np.concatenate(codes)
+        self._build_lists()
+
+    def select(self, rows):
+        """행 번호가 rows(오름차순)만 남기고 0부터 다시 번호를 매깁니다 (저장소 정리 후)."""
+        rows = rows[rows < self.rows]
+        self.assign = self.assign[rows]
+        self.codes = self.codes[rows]
+        self._build_lists()
+
+    def _build_lists(self):
+        # 목록 번호 순으로 정렬한 행 번호와 목록별 시작 위치 (역색인)
+        self.order = np.argsort(self.assign, kind="stable").astype(np.int32)
+        self.offsets = np.searchsorted(self.assign[self.order], np.arange(self.nlist + 1)).astype(np.int64)
+
+    def search(self, query_vector, nprobe, depth, allowed=None):
+        """
+        query_vector(정규화된 float32)와 근사 내적이 큰 행을 최대 depth개 찾습니다.
+        allowed가 있으면 allowed[row]가 True인 행만 봅니다.
+        반환값: (행 번호 배열, 근사 내적 배열) - 내적이 큰 순서
+        """
+        coarse = self.centroids @ query_vector
+        nprobe = min(nprobe, self.nlist)
+        probe = np.argpartition(-coarse, nprobe - 1)[:nprobe]
+        rows = np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in probe])
+        if allowed is not None:
+            rows = rows[allowed[rows]]
+        if len(rows) == 0:
+            return rows, np.zeros(0, dtype=np.float32)
+
+        dsub = self.codebooks.shape[2]
+        # table[j, k] = q_j · codebook_j[k]
+        table = np.einsum("jkd,jd->jk", self.codebooks, query_vector.reshape(self.m, dsub))
+        scores = coarse[self.assign[rows]] + table[np.arange(self.m), self.codes[rows]].sum(axis=1)
+        depth = min(depth, len(rows))
+        top = np.argpartition(-scores, depth - 1)[:depth]
+        top = top[np.argsort(-scores[top])]
+        return rows[top], scores[top]
+
+    def save(self, index_dir):
+        if not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+        for name in ("centroids", "codebooks", "assign", "codes"):
+            # 임시 파일에 쓴 뒤 교체 (meta.json을 마지막에 써서 완성된 인덱스만 읽히도록 함)
+            path = os.path.join(index_dir, f"{name}.npy")
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, getattr(self, name))
+            os.replace(path + ".tmp", path)
+        meta_path = os.path.join(index_dir, "meta.json")
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"nlist": self.nlist, "m": self.m, "rows": self.rows, "trained_rows": self.trained_rows}, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    @classmethod
+    def load(cls, index_dir):
+        """저장된 인덱스를 읽습니다. 없거나 파일이 맞지 않으면 None."""
+        meta_path = os.path.join(index_dir, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(index_dir, f"{name}.npy"))
+                  for name in ("centroids", "codebooks", "assign", "codes")}
+        if len(arrays["assign"]) != meta["rows"] or len(arrays["codes"]) != meta["rows"]:
+            return None
+        return cls(trained_rows=meta.get("trained_rows", 0), **arrays)
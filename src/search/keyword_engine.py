@@ -0,0 +1,389 @@
+import os
+import json
+import sqlite3
+import threading
+import datetime
+from contextlib import contextmanager
+from whoosh.index import open_dir
+from whoosh.qparser import MultifieldParser
+from whoosh.query import And, Or, Term, Prefix, DateRange, NumericRange
+from src.ingestion.storage import FTS_TABLE, FTS_COLUMNS
+from src.search.backends import KEYWORD_ENGINES
+from src.search.cache import LRUCache
+from src.search.filters import FILTER_FIELDS, wall_clock_day
+
+# 결과에 포함하는 필드 (Whoosh 저장 필드와 같은 이름)
+DOCUMENT_FIELDS = ("message_id", "subject", "body_plain", "attachment_text", "sender", "receivers",
+                   "sent_date", "folder_path", "thread_topic", "importance", "thread_id")
+
+# fts5 엔진의 bm25 컬럼 가중치. 제목/발신자에서 일치한 경우를 본문보다 높게 평가
+DEFAULT_FTS_WEIGHTS = {
+    "subject": 3.0,
+    "body_plain": 1.0,
+    "attachment_text": 0.5,
+    "sender": 2.0,
+    "receivers": 1.0,
+    "folder_path": 0.5,
+    "thread_topic": 1.5,
+}
+
+class KeywordEngine:
+    """
+    Searcher의 키워드 검색 경로가 사용하는 엔진 인터페이스입니다.
+
+    search()는 {message_id: (score, handle)}를 반환합니다. handle은 같은 엔진의
+    reader()에서 문서를 다시 읽을 때 쓰는 값(Whoosh docnum, SQLite rowid)이고,
+    generation이 바뀌면 더 이상 유효하지 않습니다.
+    """
+    name = None
+
+    def is_ready(self):
+        raise NotImplementedError
+
+    def state(self):
+        """색인이 바뀌면 달라지는 값 (검색 결과 캐시 무효화에 사용)."""
+        raise NotImplementedError
+
+    def search(self, query_string, search_fields, limit, filters=None, collapse=False):
+        """
+        filters(SearchFilters)가 있으면 조건에 맞는 문서 안에서만 검색합니다.
+        collapse=True이면 엔진 안에서 스레드(thread_id)마다 점수가 가장 높은 문서 하나만 남기므로
+        limit개의 결과가 모두 서로 다른 스레드입니다.
+        반환값: ({message_id: (score, handle)}, 최고 점수, generation)
+        """
+        raise NotImplementedError
+
+    def reader(self):
+        """병합 단계에서 사용할 reader를 여는 context manager."""
+        raise NotImplementedError
+
+class KeywordReader:
+    """
+    병합 단계에서 후보 문서의 필드를 읽습니다.
+      - resolve(candidates): handle이 None인 후보의 handle을 message_id로 찾아 채움
+      - load_fields(handle, fieldnames): 점수 계산에 필요한 일부 필드
+      - document(handle): 결과로 돌려줄 전체 필드
+    """
+    generation = None
+
+class _FieldLoader:
+    """
+    docnum으로 일부 필드만 읽습니다. 색인에 컬럼(sortable)이 있는 필드는 컬럼에서 읽고,
+    없는 경우(이전 스키마로 만든 색인)에만 저장 필드 전체를 읽습니다.
+    """
+
+    def __init__(self, searcher, fieldnames):
+        reader = searcher.reader()
+        self.searcher = searcher
+        self.columns = {name: reader.column_reader(name) for name in fieldnames if reader.has_column(name)}
+        self.missing = [name for name in fieldnames if name not in self.columns]
+
+    def load(self, docnum):
+        fields = {name: column[docnum] for name, column in self.columns.items()}
+        if self.missing:
+            stored = self.searcher.stored_fields(docnum)
+            for name in self.missing:
+                fields[name] = stored.get(name)
+        return fields
+
+class _WhooshReader(KeywordReader):
+    def __init__(self, searcher):
+        self.searcher = searcher
+        self.generation = searcher.reader().generation()
+        self.loaders = {}
+
+    def _loader(self, fieldnames):
+        fieldnames = tuple(fieldnames)
+        if fieldnames not in self.loaders:
+            self.loaders[fieldnames] = _FieldLoader(self.searcher, fieldnames)
+        return self.loaders[fieldnames]
+
+    def resolve(self, candidates):
+        """handle이 없는 후보들의 message_id를 하나의 Or 질의로 찾아 docnum을 채웁니다."""
+        unresolved = [doc_id for doc_id, scores in candidates.items() if scores['handle'] is None]
+        if not unresolved:
+            return
+        loader = self._loader(("message_id",))
+        id_query = Or([Term('message_id', doc_id) for doc_id in unresolved])
+        for docnum in self.searcher.docs_for_query(id_query):
+            doc_id = loader.load(docnum)['message_id']
+            if doc_id in candidates:
+                candidates[doc_id]['handle'] = docnum
+
+    def load_fields(self, handle, fieldnames):
+        return self._loader(fieldnames).load(handle)
+
+    def document(self, handle):
+        return self.searcher.stored_fields(handle)
+
+class WhooshKeywordEngine(KeywordEngine):
+    """Whoosh 색인(data/index)을 사용하는 키워드 엔진입니다."""
+    name = "whoosh"
+
+    def __init__(self, index_dir="data/index", filter_cache_size=32):
+        self.index_dir = index_dir
+        self.ix = None
+        # (색인 generation, 필터) -> 조건에 맞는 docnum 집합. 같은 필터로 여러 번 검색할 때 다시 계산하지 않음
+        self.filter_cache = LRUCache(filter_cache_size)
+        if not os.path.exists(self.index_dir):
+            print("오류: Whoosh 색인 디렉토리를 찾을 수 없습니다.")
+            return
+        try:
+            self.ix = open_dir(self.index_dir)
+            print("Whoosh 검색 색인을 성공적으로 열었습니다.")
+        except Exception as e:
+            print(f"Whoosh 색인 파일을 여는 중 오류가 발생했습니다: {e}")
+
+    def is_ready(self):
+        return self.ix is not None
+
+    def state(self):
+        return self.ix.latest_generation()
+
+    def _filter_query(self, filters):
+        """SearchFilters를 Whoosh filter= 질의로 바꿉니다. 색인에 필터 필드가 없으면 None."""
+        if not set(FILTER_FIELDS) <= set(self.ix.schema.names()):
+            print("Whoosh 색인에 필터 필드가 없습니다. 'index --rebuild'로 색인을 다시 만들어주세요.")
+            return None
+        conditions = []
+        if filters.sender:
+            conditions.append(Term("sender_addr", filters.sender))
+        if filters.recipient:
+            conditions.append(Term("receiver_addrs", filters.recipient))
+        if filters.date_from is not None or filters.date_to is not None:
+            if all(value is None or value.time() == datetime.time() for value in (filters.date_from, filters.date_to)):
+                # 날짜 단위 기간이면 일수 필드로 범위를 좁힘 (date_to는 미포함)
+                end_day = wall_clock_day(filters.date_to) - 1 if filters.date_to is not None else None
+                conditions.append(NumericRange("sent_day", wall_clock_day(filters.date_from), end_day))
+            else:
+                conditions.append(DateRange("sent_date", filters.date_from, filters.date_to, endexcl=True))
+        if filters.folder:
+            conditions.append(Or([Term("folder", filters.folder), Prefix("folder", filters.folder + "/")]))
+        return And(conditions)
+
+    def _filter_docs(self, searcher, filter_query, filters):
+        key = (searcher.reader().generation(), filters.cache_key())
+        docs = self.filter_cache.get(key)
+        if docs is None:
+            docs = set(filter_query.docs(searcher))
+            self.filter_cache.put(key, docs)
+        return docs
+
+    def search(self, query_string, search_fields, limit, filters=None, collapse=False):
+        # 스레드 간에 searcher를 공유하지 않도록 검색마다 자체 searcher를 엶
+        hits = {}
+        max_score = 0.0
+        filter_query = None
+        if filters:
+            filter_query = self._filter_query(filters)
+            if filter_query is None:
+                return hits, max_score, self.ix.latest_generation()
+        with self.ix.searcher() as searcher:
+            generation = searcher.reader().generation()
+            loader = _FieldLoader(searcher, ("message_id",))
+            parser = MultifieldParser(search_fields, schema=self.ix.schema)
+            query = parser.parse(query_string)
+            # 상위 limit개만 수집 (최고 점수 문서는 항상 포함되므로 정규화 기준은 그대로)
+            # 필터는 점수 계산 전에 적용되므로 조건에 맞지 않는 문서는 점수를 계산하지 않음
+            allowed = self._filter_docs(searcher, filter_query, filters) if filter_query is not None else None
+            # collapse는 수집 단계에서 thread_id 컬럼으로 같은 스레드의 낮은 점수 문서를 버림
+            # (스레드 필드가 없는 이전 색인에서는 무시)
+            collapse_facet = "thread_id" if collapse and "thread_id" in self.ix.schema.names() else None
+            results = searcher.search(query, limit=limit, filter=allowed, collapse=collapse_facet)
+            if results.scored_length() > 0:
+                max_score = results[0].score
+                # hit['message_id']는 저장 필드 전체를 읽으므로 docnum과 컬럼만 사용
+                for docnum, score in results.items():
+                    hits[loader.load(docnum)['message_id']] = (score, docnum)
+        return hits, max_score, generation
+
+    @contextmanager
+    def reader(self):
+        with self.ix.searcher() as searcher:
+            yield _WhooshReader(searcher)
+
+class _SQLiteReader(KeywordReader):
+    # rowid는 AUTOINCREMENT라 재사용되지 않으므로 색인이 바뀌어도 handle이 다른 문서를 가리키지 않음
+    generation = 0
+
+    def __init__(self, conn, fields_sql):
+        self.conn = conn
+        self.fields_sql = fields_sql
+        self.rows = {}
+
+    def resolve(self, candidates):
+        unresolved = [doc_id for doc_id, scores in candidates.items() if scores['handle'] is None]
+        if not unresolved:
+            return
+        placeholders = ", ".join("?" for _ in unresolved)
+        for rowid, doc_id in self.conn.execute(
+                f"SELECT id, message_id FROM emails WHERE message_id IN ({placeholders});", unresolved):
+            candidates[doc_id]['handle'] = rowid
+
+    def _row(self, handle):
+        if handle not in self.rows:
+            row = self.conn.execute(
+                f"SELECT {self.fields_sql} FROM emails WHERE id = ?;", (handle,)
+            ).fetchone()
+            self.rows[handle] = _document_from_row(row) if row else None
+        return self.rows[handle]
+
+    def load_fields(self, handle, fieldnames):
+        row = self._row(handle)
+        return {name: row.get(name) for name in fieldnames} if row else None
+
+    def document(self, handle):
+        row = self._row(handle)
+        return dict(row) if row else None
+
+def _document_from_row(row):
+    """emails 테이블의 행을 Whoosh 저장 필드와 같은 형식(receivers는 쉼표 구분, 날짜는 datetime)으로 바꿉니다."""
+    fields = dict(zip(DOCUMENT_FIELDS, row))
+    try:
+        fields['receivers'] = ",".join(json.loads(fields['receivers'] or "[]"))
+    except ValueError:
+        pass
+    if fields['sent_date']:
+        try:
+            fields['sent_date'] = datetime.datetime.fromisoformat(fields['sent_date'])
+        except ValueError:
+            pass
+    return fields
+
+class SQLiteFTSKeywordEngine(KeywordEngine):
+    """
+    SQLiteStorage가 emails 테이블과 함께 관리하는 FTS5(trigram) 색인을 사용하는 키워드 엔진입니다.
+    점수는 컬럼별 가중치를 준 bm25이고, 검색어의 모든 단어가 (어느 필드에서든) 일치해야 합니다.
+
+    trigram 색인은 3글자 미만의 단어를 직접 찾지 못하므로, '납기'처럼 짧은 단어는
+    그 단어로 시작하는 trigram(예: '납기일', '납기 ')들의 OR로 확장해서 검색합니다.
+    """
+    name = "fts5"
+
+    def __init__(self, db_path="data/emails.db", column_weights=None, max_expansions=64):
+        self.db_path = db_path
+        self.column_weights = dict(DEFAULT_FTS_WEIGHTS, **(column_weights or {}))
+        self.max_expansions = max_expansions
+        self._local = threading.local()
+        self.ready = False
+        self.fields_sql = ", ".join(DOCUMENT_FIELDS)
+        self.thread_sql = "coalesce(e.thread_id, e.message_id)"
+        if not os.path.exists(self.db_path):
+            print(f"오류: 데이터베이스 '{self.db_path}'를 찾을 수 없습니다.")
+            return
+        try:
+            conn = self._connect()
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?;", (FTS_TABLE,)
+            ).fetchone()
+            if not exists:
+                print(f"오류: '{self.db_path}'에 FTS5 색인이 없습니다. 'ingest --keyword-engine fts5' 또는 'index --keyword-engine fts5'로 먼저 생성해주세요.")
+                return
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(emails);")}
+            if "thread_id" not in columns:
+                # 스레드 색인 전의 DB (다음 ingest/index에서 변환됨): 모든 메일을 혼자인 스레드로 취급
+                self.fields_sql = ", ".join(name if name in columns else f"NULL AS {name}" for name in DOCUMENT_FIELDS)
+                self.thread_sql = "e.message_id"
+            self.ready = True
+            print("SQLite FTS5 검색 색인을 성공적으로 열었습니다.")
+        except sqlite3.Error as e:
+            print(f"SQLite FTS5 색인을 여는 중 오류가 발생했습니다: {e}")
+
+    def _connect(self):
+        # sqlite3 연결은 스레드 간에 공유할 수 없으므로 스레드마다 하나씩 엶
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS temp.{FTS_TABLE}_vocab USING fts5vocab(main, {FTS_TABLE}, 'row');")
+            self._local.conn = conn
+        return conn
+
+    def is_ready(self):
+        return self.ready
+
+    def state(self):
+        wal_path = self.db_path + "-wal"
+        wal_mtime = os.stat(wal_path).st_mtime_ns if os.path.exists(wal_path) else None
+        return os.stat(self.db_path).st_mtime_ns, wal_mtime
+
+    def _expand_short_term(self, conn, term):
+        rows = conn.execute(
+            f"SELECT term FROM temp.{FTS_TABLE}_vocab WHERE term >= ? AND term < ? ORDER BY doc DESC LIMIT ?;",
+            (term, term + "\U0010ffff", self.max_expansions)
+        )
+        return [row[0] for row in rows]
+
+    def _match_expression(self, conn, query_string, columns):
+        """검색어를 FTS5 MATCH 식으로 바꿉니다. 일치할 수 없는 단어가 있으면 None을 반환합니다."""
+        parts = []
+        for word in query_string.split():
+            word = word.lower()
+            if len(word) >= 3:
+                terms = [word]
+            else:
+                terms = self._expand_short_term(conn, word)
+                if not terms:
+                    return None
+            quoted = ['"' + term.replace('"', '""') + '"' for term in terms]
+            parts.append(quoted[0] if len(quoted) == 1 else "(" + " OR ".join(quoted) + ")")
+        if not parts:
+            return None
+        return "{" + " ".join(columns) + "} : (" + " AND ".join(parts) + ")"
+
+    def search(self, query_string, search_fields, limit, filters=None, collapse=False):
+        conn = self._connect()
+        columns = [name for name in search_fields if name in FTS_COLUMNS]
+        expression = self._match_expression(conn, query_string, columns) if columns else None
+        if expression is None:
+            return {}, 0.0, _SQLiteReader.generation
+
+        weights = ", ".join(str(self.column_weights.get(name, 1.0)) for name in FTS_COLUMNS)
+        # bm25()는 작을수록 관련도가 높으므로 부호를 바꿔 Whoosh 점수처럼 클수록 높게 만듦
+        if collapse:
+            # 일치하는 행을 스레드별로 묶어 bm25가 가장 좋은 행만 남긴 뒤 상위 limit개를 고름
+            # (SQLite는 MIN()과 함께 고른 나머지 컬럼을 최솟값 행에서 가져옴. 'LIMIT -1'은 bm25()를 쓰는
+            #  하위 질의가 집계 질의에 합쳐지지 않도록 함)
+            where_sql, params = filters.sql(alias="e") if filters else ("1", [])
+            rows = conn.execute(f"""
+                SELECT e.message_id, e.id, -MIN(r.bm25_score) AS score
+                FROM (
+                    SELECT rowid AS id, bm25({FTS_TABLE}, {weights}) AS bm25_score
+                    FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ? LIMIT -1
+                ) AS r JOIN emails AS e ON e.id = r.id
+                WHERE {where_sql}
+                GROUP BY {self.thread_sql}
+                ORDER BY score DESC LIMIT ?;
+            """, (expression, *params, limit))
+        elif filters:
+            # 필터 조건을 emails 조인에 넣어 조건에 맞는 행만 순위를 매김
+            where_sql, params = filters.sql(alias="e")
+            rows = conn.execute(f"""
+                SELECT e.message_id, e.id, -bm25({FTS_TABLE}, {weights}) AS score
+                FROM {FTS_TABLE} JOIN emails AS e ON e.id = {FTS_TABLE}.rowid
+                WHERE {FTS_TABLE} MATCH ? AND {where_sql}
+                ORDER BY score DESC LIMIT ?;
+            """, (expression, *params, limit))
+        else:
+            rows = conn.execute(f"""
+                SELECT e.message_id, r.id, -r.bm25_score
+                FROM (
+                    SELECT rowid AS id, bm25({FTS_TABLE}, {weights}) AS bm25_score
+                    FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?
+                    ORDER BY bm25_score LIMIT ?
+                ) AS r JOIN emails AS e ON e.id = r.id;
+            """, (expression, limit))
+        hits = {doc_id: (score, rowid) for doc_id, rowid, score in rows}
+        max_score = max((score for score, _ in hits.values()), default=0.0)
+        return hits, max_score, _SQLiteReader.generation
+
+    @contextmanager
+    def reader(self):
+        yield _SQLiteReader(self._connect(), self.fields_sql)
+
+def create_keyword_engine(name="whoosh", index_dir="data/index", db_path="data/emails.db"):
+    """이름으로 키워드 엔진을 만듭니다 ('whoosh' 또는 'fts5')."""
+    if name == WhooshKeywordEngine.name:
+        return WhooshKeywordEngine(index_dir)
+    if name == SQLiteFTSKeywordEngine.name:
+        return SQLiteFTSKeywordEngine(db_path)
+    raise ValueError(f"알 수 없는 키워드 엔진입니다: {name} (사용 가능: {', '.join(KEYWORD_ENGINES)})")
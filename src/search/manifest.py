@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import hashlib
+from src.ingestion.threads import ThreadIndex
+from src.ingestion.storage import ContactStats
+
+def file_content_hash(file_path, chunk_size=1024 * 1024):
+    """파일 내용의 SHA-256 해시를 반환합니다."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class SourceManifest:
+    """
+    색인에 반영된 원본 파일 목록(경로, 크기, 수정 시각, 내용 해시, 문서 ID)을 보관합니다.
+    EmailIndexer는 이 목록과 디렉터리를 비교해서 추가/변경/삭제된 파일만 다시 색인합니다.
+
+    vectors_pending은 키워드 색인에는 반영했지만 벡터 저장소를 쓸 수 없어 임베딩하지 못한 파일을 표시합니다.
+    벡터 저장소를 다시 쓸 수 있게 되면 EmailIndexer가 이 파일들의 임베딩만 다시 계산합니다.
+
+    target은 목록이 반영된 색인의 종류(키워드 엔진 이름)입니다. 이전에 기록된 값과 다르면
+    reset을 True로 설정하므로, EmailIndexer는 이전 목록의 문서를 지우고 색인을 처음부터 다시 만듭니다.
+
+    threads는 whoosh 엔진으로 색인한 메일의 스레드 색인(ThreadIndex, thread_nodes/thread_members 테이블)입니다.
+    contacts는 같은 메일의 연락처 통계(ContactStats)로, 메일함 소유자/중요 연락처(중요도 기준)를 계산합니다.
+    fts5 엔진은 emails.db의 SQLiteStorage가 스레드와 연락처 통계를 관리합니다.
+    """
+
+    def __init__(self, manifest_path="data/index_manifest.db", target=None):
+        self.manifest_path = manifest_path
+        self.target = target
+        self.reset = False
+        manifest_dir = os.path.dirname(manifest_path)
+        if manifest_dir and not os.path.exists(manifest_dir):
+            os.makedirs(manifest_dir)
+        # 스레드 색인은 색인 파이프라인의 Whoosh 단계 스레드에서 갱신함 (한 번에 한 스레드만 사용)
+        self.conn = sqlite3.connect(manifest_path, check_same_thread=False)
+        self.threads = ThreadIndex(self.conn)
+        self.contacts = ContactStats(self.conn)
+        with self.conn:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sources (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                content_hash TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                vectors_pending INTEGER NOT NULL DEFAULT 0
+            );
+            """)
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(sources);")}
+            if "vectors_pending" not in columns:
+                self.conn.execute("ALTER TABLE sources ADD COLUMN vectors_pending INTEGER NOT NULL DEFAULT 0;")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);")
+            self.threads.create_tables()
+            self.contacts.create_tables()
+        self._check_target()
+
+    def _check_target(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'target';").fetchone()
+        if row is not None and row[0] == self.target:
+            return
+        with self.conn:
+            # 대상을 기록하기 전(이전 버전)의 목록은 현재 대상의 것으로 간주
+            if row is not None:
+                print(f"색인 대상이 '{row[0]}'에서 '{self.target}'(으)로 바뀌어 색인을 다시 만듭니다.")
+                self.reset = True
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('target', ?);", (self.target,))
+
+    def entries(self):
+        """{path: (size, mtime, content_hash, doc_id)} 형태로 전체 목록을 반환합니다."""
+        rows = self.conn.execute("SELECT path, size, mtime, content_hash, doc_id FROM sources;")
+        return {row[0]: row[1:] for row in rows}
+
+    def diff(self, file_paths):
+        """
+        현재 파일 목록과 manifest를 비교합니다.
+        반환값: (changed, unchanged_touched, deleted)
+          - changed: 새로 추가되었거나 내용이 바뀐 파일의 {path: (size, mtime, content_hash)}
+          - unchanged_touched: 수정 시각만 바뀌고 내용은 같은 파일의 {path: (size, mtime, content_hash, doc_id)}
+          - deleted: 사라진 파일의 {path: doc_id}
+        크기와 수정 시각이 같은 파일은 해시를 다시 계산하지 않습니다.
+        """
+        known = self.entries()
+        changed = {}
+        touched = {}
+        seen = set()
+        for path in file_paths:
+            seen.add(path)
+            stat = os.stat(path)
+            entry = known.get(path)
+            if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime:
+                continue
+            content_hash = file_content_hash(path)
+            if entry is not None and entry[2] == content_hash:
+                touched[path] = (stat.st_size, stat.st_mtime, content_hash, entry[3])
+            else:
+                changed[path] = (stat.st_size, stat.st_mtime, content_hash)
+        deleted = {path: entry[3] for path, entry in known.items() if path not in seen}
+        return changed, touched, deleted
+
+    def pending_vectors(self):
+        """임베딩하지 못한 파일의 {path: (size, mtime, content_hash, doc_id)}를 반환합니다."""
+        rows = self.conn.execute("SELECT path, size, mtime, content_hash, doc_id FROM sources WHERE vectors_pending = 1;")
+        return {row[0]: row[1:] for row in rows}
+
+    def record(self, entries, vectors_pending=None):
+        """
+        [(path, size, mtime, content_hash, doc_id), ...]를 저장합니다.
+        vectors_pending이 None이면 이미 기록된 파일의 표시를 그대로 둡니다 (새 파일은 False).
+        """
+        pending = None if vectors_pending is None else int(vectors_pending)
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO sources (path, size, mtime, content_hash, doc_id, vectors_pending)
+                VALUES (?, ?, ?, ?, ?, COALESCE(?, 0))
+                ON CONFLICT (path) DO UPDATE SET
+                    size = excluded.size, mtime = excluded.mtime, content_hash = excluded.content_hash,
+                    doc_id = excluded.doc_id, vectors_pending = COALESCE(?, sources.vectors_pending);
+                """, [(*entry, pending, pending) for entry in entries]
+            )
+
+    def remove(self, paths):
+        with self.conn:
+            self.conn.executemany("DELETE FROM sources WHERE path = ?;", [(p,) for p in paths])
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?;", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?);", (key, value))
+
+    def clear(self):
+        """원본 파일 목록, 스레드 색인, 연락처 통계와 색인에 반영된 설정 값(target 제외)을 지웁니다 (색인을 새로 만들 때)."""
+        with self.conn:
+            self.conn.execute("DELETE FROM sources;")
+            self.threads.clear()
+            self.contacts.clear()
+            self.conn.execute("DELETE FROM meta WHERE key != 'target';")
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
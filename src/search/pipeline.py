@@ -0,0 +1,138 @@
+import queue
+import threading
+import time
+
+_END = object()
+
+class Pipeline:
+    """
+    색인 단계(파싱, Whoosh 쓰기, 임베딩, ChromaDB 저장)를 스레드로 실행하고
+    크기가 제한된 큐로 연결합니다. 각 단계가 동시에 진행되므로 전체 시간은
+    가장 느린 단계에 가까워집니다.
+
+    queue_size는 큐 하나에 머무를 수 있는 문서(source 항목) 수입니다. batch_size로 묶는 단계의
+    결과 하나는 입력 묶음의 문서를 모두 담는다고 보고, 그 다음 큐는 queue_size // (묶음당 문서 수)개
+    (최소 1개)의 결과만 담습니다. 따라서 큐마다 문서 약 queue_size개 (묶음 하나가 더 크면 묶음 하나)와
+    각 단계가 처리 중인 묶음만 메모리에 머무릅니다.
+
+    한 단계에서 예외가 나면 모든 단계를 멈추고 join()에서 그 예외를 다시 던집니다.
+    """
+
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self.stop_event = threading.Event()
+        self.errors = []
+        self.threads = []
+        self.busy_seconds = {}
+
+    def _queue(self, items_per_entry):
+        """항목 하나가 문서 items_per_entry개를 담는 큐 (문서 약 queue_size개까지)."""
+        q = queue.Queue(maxsize=max(1, self.queue_size // items_per_entry))
+        q.items_per_entry = items_per_entry
+        return q
+
+    def _put(self, q, item):
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _iter(self, q):
+        while True:
+            try:
+                item = q.get(timeout=0.1)
+            except queue.Empty:
+                if self.stop_event.is_set():
+                    return
+                continue
+            if item is _END:
+                return
+            yield item
+
+    def _iter_batches(self, q, batch_size):
+        batch = []
+        for item in self._iter(q):
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch and not self.stop_event.is_set():
+            yield batch
+
+    def _start(self, name, target):
+        def run():
+            try:
+                target()
+            except BaseException as e:
+                self.errors.append((name, e))
+                self.stop_event.set()
+        thread = threading.Thread(target=run, name=f"pipeline-{name}", daemon=True)
+        self.threads.append(thread)
+        self.busy_seconds[name] = 0.0
+        thread.start()
+
+    def source(self, name, iterable):
+        """iterable의 항목을 차례로 큐에 넣는 단계를 시작하고 그 큐를 반환합니다."""
+        out_q = self._queue(1)
+
+        def run():
+            iterator = iter(iterable)
+            try:
+                while not self.stop_event.is_set():
+                    start = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        break
+                    finally:
+                        self.busy_seconds[name] += time.perf_counter() - start
+                    if not self._put(out_q, item):
+                        break
+            finally:
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    close()
+                self._put(out_q, _END)
+
+        self._start(name, run)
+        return out_q
+
+    def stage(self, name, func, in_q, batch_size=None, output=True):
+        """
+        in_q의 항목(batch_size가 있으면 항목 리스트)을 func로 처리하는 단계를 시작합니다.
+        output=True이면 None이 아닌 결과를 다음 큐에 넣고 그 큐를 반환합니다.
+        결과 큐의 크기는 결과 하나가 담는 문서 수(입력 항목의 문서 수 x batch_size)로 나눠서 정합니다.
+        """
+        out_q = self._queue(in_q.items_per_entry * (batch_size or 1)) if output else None
+
+        def run():
+            items = self._iter_batches(in_q, batch_size) if batch_size else self._iter(in_q)
+            try:
+                for item in items:
+                    start = time.perf_counter()
+                    result = func(item)
+                    self.busy_seconds[name] += time.perf_counter() - start
+                    if out_q is not None and result is not None:
+                        if not self._put(out_q, result):
+                            break
+            finally:
+                if out_q is not None:
+                    self._put(out_q, _END)
+
+        self._start(name, run)
+        return out_q
+
+    def sink(self, name, func, in_q, batch_size=None):
+        """결과를 넘기지 않는 마지막 단계를 시작합니다."""
+        self.stage(name, func, in_q, batch_size=batch_size, output=False)
+
+    def join(self):
+        """모든 단계가 끝날 때까지 기다리고, 실패한 단계가 있으면 그 예외를 던집니다."""
+        for thread in self.threads:
+            thread.join()
+        if self.errors:
+            name, error = self.errors[0]
+            raise RuntimeError(f"색인 파이프라인 '{name}' 단계에서 오류 발생: {error}") from error
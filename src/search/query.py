@@ -1,170 +1,297 @@
 import sys
 import os
 import re
-import numpy as np
-import pickle
-from whoosh.index import open_dir
-from whoosh.qparser import MultifieldParser
-from collections import Counter
-from src.ingestion.parser import parse_eml_files
-import operator
-from sentence_transformers import SentenceTransformer
-import chromadb # chromadb 임포트
-
-# --- Helper function to analyze contacts from .eml files ---
-def get_important_contacts(eml_directory):
+import time
+import threading
+import concurrent.futures
+from src.common.instrumentation import instrumentation
+from src.ingestion.storage import ContactRanking, load_contact_ranking, contact_ranking_from_emails
+from src.search.cache import LRUCache
+from src.search.indexer import EMBEDDING_MODEL_NAME
+from src.search.keyword_engine import create_keyword_engine
+from src.search.filters import SearchFilters
+from src.search.vector_store import create_vector_store
+
+# 병합 단계의 점수 계산에 필요한 필드. 본문/첨부 텍스트 등 나머지 저장 필드는 최종 결과에만 로드함
+FUSION_FIELDS = ("message_id", "importance")
+# collapse_threads=True일 때 병합 단계에서 함께 읽는 스레드 필드
+THREAD_FIELDS = ("thread_id",)
+# main_user/important_contacts를 직접 지정한 경우 중요도를 계산하는 데 필요한 필드
+RANKING_FIELDS = ("message_id", "sender", "receivers")
+
+def get_important_contacts(source="data/index_manifest.db", limit=10):
     """
-    Analyzes the EML email data to identify the main user and their most frequent contacts.
-    Returns the main user (email string) and a set of important contacts (email strings).
+    메일함 소유자와 중요 연락처를 (main_user, {주소, ...})로 반환합니다 (Searcher의 main_user/important_contacts).
+    source가 연락처 통계가 있는 DB(whoosh 색인의 manifest 또는 emails.db)이면 저장된 통계를 읽고,
+    .eml 디렉터리이면 메일 헤더만 읽어서 계산합니다.
     """
-    print(".eml 파일에서 연락처 분석을 시작합니다...")
-    emails = list(parse_eml_files(eml_directory))
-    if not emails:
-        print("분석할 이메일이 없습니다.")
-        return None, set()
-
-    sender_counts = Counter(email.sender for email in emails if email.sender)
-    
-    sorted_senders = sorted(sender_counts.items(), key=operator.itemgetter(1), reverse=True)
-    main_user = None
-    for sender, count in sorted_senders:
-        if '@' in sender:
-            main_user = sender
-            break
-    if not main_user and sorted_senders:
-        main_user = sorted_senders[0][0]
-
-    if not main_user:
+    if os.path.isdir(source):
+        from src.ingestion.parser import parse_eml_headers, iter_eml_paths
+        ranking = contact_ranking_from_emails(parse_eml_headers(iter_eml_paths(source)), limit)
+    else:
+        ranking = load_contact_ranking(source, limit)
+    if not ranking.main_user:
         print("메인 사용자(발신자)를 찾을 수 없습니다.")
         return None, set()
+    print(f"메인 사용자(추정): {ranking.main_user}")
+    print(f"중요 연락처(추정): {set(ranking.important_contacts)}")
+    return ranking.main_user, set(ranking.important_contacts)
+
+class SearchResults(list):
+    """검색 결과 리스트. timings에 단계별 소요 시간(ms)을 담습니다 (encode, whoosh 또는 fts5, 벡터 저장소 이름, merge, total)."""
 
-    contact_interaction_counts = Counter()
-    for email in emails:
-        if email.sender == main_user:
-            for receiver in email.receivers:
-                contact_interaction_counts[receiver] += 1
-        elif main_user in email.receivers:
-            contact_interaction_counts[email.sender] += 1
-    
-    important_contacts = {contact for contact, _ in contact_interaction_counts.most_common(10)}
-
-    print(f"메인 사용자(추정): {main_user}")
-    print(f"중요 연락처(추정): {important_contacts}")
-    
-    return main_user, important_contacts
-# -----------------------------------------------------------------------------
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.timings = {}
+
+class _LegRun:
+    """
+    작업자 스레드에서 실행하는 검색 경로 하나. 제한 시간은 대기열에서 기다린 시간을 빼고
+    실제로 실행을 시작한 시각(start_time)부터 잽니다.
+    """
+
+    def __init__(self, executor, func, *args):
+        self.started = threading.Event()
+        self.start_time = None
+        self.future = executor.submit(self._run, func, args)
+
+    def _run(self, func, args):
+        self.start_time = time.perf_counter()
+        self.started.set()
+        return func(*args)
 
 class Searcher:
-    def __init__(self, index_dir="data/index", main_user=None, important_contacts=None, chroma_dir="data/chroma"):
+    def __init__(self, index_dir="data/index", main_user=None, important_contacts=None, chroma_dir="data/chroma",
+                 keyword_candidates=200, semantic_candidates=50, keyword_timeout=10.0, semantic_timeout=5.0,
+                 embedding_cache_size=1024, result_cache_size=256, keyword_engine="whoosh", db_path="data/emails.db",
+                 vector_store="chroma", vector_dir="data/vectors", vector_options=None):
         self.index_dir = index_dir
+        self.db_path = db_path
         self.main_user = main_user
         self.important_contacts = important_contacts if important_contacts is not None else set()
+        # 지정하지 않으면 색인할 때 연락처 통계로 계산해서 저장한 중요도(importance 필드)를 그대로 사용
+        self.ranking = None
+        if main_user is not None or important_contacts is not None:
+            self.ranking = ContactRanking(main_user, self.important_contacts)
         self.chroma_dir = chroma_dir # ChromaDB 경로 추가
+        self.vector_dir = vector_dir
+        # 각 검색 경로에서 병합 단계로 넘길 후보 수
+        self.keyword_candidates = keyword_candidates
+        self.semantic_candidates = semantic_candidates
+        # 각 검색 경로의 제한 시간(초). 초과하면 해당 경로 없이 결과를 반환
+        self.keyword_timeout = keyword_timeout
+        self.semantic_timeout = semantic_timeout
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="search-leg")
+        # 질의 임베딩 캐시는 모델에만 의존하고, 결과 캐시는 색인 상태가 바뀌면 비움
+        self.query_embedding_cache = LRUCache(embedding_cache_size)
+        self.result_cache = LRUCache(result_cache_size)
+        self._index_state = None
         
-        self.ix = None
         self.semantic_model = None
-        self.chroma_client = None
-        self.chroma_collection = None
+        self.vector_store = None
 
-        self._open_index()
-        self._load_semantic_data()
+        # 키워드 검색 엔진: 'whoosh'(data/index) 또는 'fts5'(data/emails.db의 FTS5 색인)
+        self.keyword_engine = create_keyword_engine(keyword_engine, index_dir=index_dir, db_path=db_path)
+        self._load_semantic_data(vector_store, vector_options or {})
 
-    def _open_index(self):
-        if not os.path.exists(self.index_dir):
-            print("오류: Whoosh 색인 디렉토리를 찾을 수 없습니다.")
-            return
-        try:
-            self.ix = open_dir(self.index_dir)
-            print("Whoosh 검색 색인을 성공적으로 열었습니다.")
-        except Exception as e:
-            print(f"Whoosh 색인 파일을 여는 중 오류가 발생했습니다: {e}")
-            
-    def _load_semantic_data(self):
-        if not os.path.exists(self.chroma_dir): # ChromaDB 디렉토리 존재 확인
-            print("오류: 시맨틱 검색 데이터(ChromaDB)를 찾을 수 없습니다.")
+    def _load_semantic_data(self, vector_store, vector_options):
+        # 벡터 저장소: 'chroma'(data/chroma), 'numpy'(data/vectors의 memory-map 행렬) 또는
+        # 'ivfpq'(numpy + 근사 검색 인덱스, vector_options의 nprobe/rerank로 조정)
+        self.vector_store = create_vector_store(vector_store, chroma_dir=self.chroma_dir, vector_dir=self.vector_dir,
+                                                **vector_options)
+        if not self.vector_store.is_ready():
             print("먼저 'bash -c \"source venv/bin/activate && export PYTHONPATH=$PWD && python3 src/search/indexer.py\"'를 실행하여 색인을 생성해주세요.")
             return
-        
+
         try:
-            print("시맨틱 검색 모델과 ChromaDB를 로드합니다...")
-            self.semantic_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-            self.chroma_client = chromadb.PersistentClient(path=self.chroma_dir)
-            self.chroma_collection = self.chroma_client.get_collection(name="email_embeddings")
-            print("시맨틱 데이터 로드를 완료했습니다. ChromaDB 문서 수:", self.chroma_collection.count())
+            print(f"시맨틱 검색 모델과 벡터 저장소({self.vector_store.name})를 로드합니다...")
+            # 무거운 의존성(torch)은 실제로 시맨틱 데이터를 로드할 때만 임포트
+            from sentence_transformers import SentenceTransformer
+            self.semantic_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+            print("시맨틱 데이터 로드를 완료했습니다. 저장된 벡터 수:", self.vector_store.count())
         except Exception as e:
             print(f"시맨틱 데이터를 로드하는 중 오류가 발생했습니다: {e}")
 
+    def engine_settings(self):
+        """
+        검색에 사용하는 키워드 엔진, 벡터 저장소, ivfpq 검색 인자와 데이터 경로(절대 경로)
+        (검색 서버가 요청한 설정과 비교할 때 사용).
+        """
+        return {
+            "keyword_engine": self.keyword_engine.name,
+            "vector_store": self.vector_store.name,
+            "nprobe": getattr(self.vector_store, "nprobe", None),
+            "rerank": getattr(self.vector_store, "rerank", None),
+            "index_dir": os.path.abspath(self.index_dir),
+            "db_path": os.path.abspath(self.db_path),
+            "vector_dir": os.path.abspath(self.vector_dir),
+        }
+
+    def close(self):
+        """검색 경로 작업자 스레드를 정리합니다. 아직 시작하지 않은 경로는 취소하고, 실행 중인 경로는 기다리지 않습니다."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
     def _calculate_importance_score(self, email_fields):
-        score = 0
-        sender = email_fields.get('sender')
-        receivers_str = email_fields.get('receivers', '')
-
-        if self.main_user and sender == self.main_user:
-            score += 50
-        if self.main_user and self.main_user in receivers_str:
-            score += 20
-        if sender in self.important_contacts:
-            score += 30
-        return score
-
-    def search(self, query_string, search_fields=["subject", "body_plain", "attachment_text", "sender"], limit=10, semantic_weight=0.5): # search_fields에 attachment_text 추가
-        if not self.ix or not self.semantic_model or not self.chroma_collection:
-            print("검색기가 준비되지 않았습니다. 색인 및 시맨틱 데이터가 올바르게 로드되었는지 확인하세요.")
-            return []
+        """색인에 저장된 정적 중요도. main_user/important_contacts를 직접 지정했으면 그 기준으로 계산합니다."""
+        if self.ranking is None:
+            return email_fields.get('importance') or 0
+        receivers = [receiver for receiver in (email_fields.get('receivers') or '').split(',') if receiver]
+        return self.ranking.score(email_fields.get('sender'), receivers)
 
-        # --- 1. 독립적인 검색 수행 ---
-        all_candidate_scores = {} # message_id -> {'keyword_score': score, 'semantic_score': score}
-        
-        # 1a. Keyword search (Whoosh)
-        max_kw_score = 0.0
-        print("키워드 검색 (Whoosh)을 수행합니다...")
+    def _keyword_leg(self, query_string, search_fields, keyword_candidates, filters, collapse_threads=False):
+        """
+        키워드 엔진 검색. collapse_threads=True이면 엔진이 스레드마다 한 문서만 후보로 돌려줌.
+        반환값: ({message_id: (score, handle)}, 최고 점수, 색인 generation, 소요 시간 dict)
+        """
+        start = time.perf_counter()
+        hits, max_kw_score, generation = self.keyword_engine.search(query_string, search_fields, keyword_candidates,
+                                                                    filters=filters, collapse=collapse_threads)
+        return hits, max_kw_score, generation, {self.keyword_engine.name: (time.perf_counter() - start) * 1000}
+
+    def _semantic_leg(self, query_string, semantic_candidates, filters):
+        """
+        벡터 저장소(ChromaDB 또는 numpy) 시맨틱 검색.
+        반환값: ({message_id: 정규화된 유사도}, 소요 시간 dict)
+        """
+        timings = {}
+        if self.vector_store.count() == 0:
+            return {}, timings
+
+        start = time.perf_counter()
+        query_embedding = self.query_embedding_cache.get(query_string)
+        if query_embedding is None:
+            query_embedding = self.semantic_model.encode([query_string]).tolist()
+            self.query_embedding_cache.put(query_string, query_embedding)
+        timings['encode'] = (time.perf_counter() - start) * 1000
+
+        # 벡터 저장소에서 시맨틱 검색 수행 (상위 semantic_candidates개 가져옴)
+        # 필터는 저장소에 넘겨 조건에 맞는 벡터 안에서만 이웃을 찾음
+        start = time.perf_counter()
+        ids, similarities, exact = self.vector_store.query(query_embedding[0], semantic_candidates, filters=filters)
+        if exact:
+            timings[f'{self.vector_store.name}_exact'] = True
+        timings[self.vector_store.name] = (time.perf_counter() - start) * 1000
+
+        semantic_similarities = dict(zip(ids, similarities))
+        max_sem_similarity = max(semantic_similarities.values()) if semantic_similarities else 0.0
+        return {
+            doc_id: sim_score / max_sem_similarity if max_sem_similarity > 0 else 0
+            for doc_id, sim_score in semantic_similarities.items()
+        }, timings
+
+    def _leg_result(self, run, timeout, leg, label, timings):
+        """
+        검색 경로(_LegRun)의 결과를 실행을 시작한 시각부터 timeout초까지 기다립니다.
+        이전 질의에서 시간을 넘긴 경로가 작업자 스레드를 잡고 있어 timeout초 안에 시작하지 못하면 취소합니다.
+        시간 초과나 오류가 나면 None을 반환하고 나머지 경로만으로 진행합니다.
+        """
         try:
-            parser = MultifieldParser(search_fields, schema=self.ix.schema)
-            query = parser.parse(query_string)
-            with self.ix.searcher() as searcher:
-                results = searcher.search(query, limit=None) # 모든 결과 가져오기
-                if results:
-                    max_kw_score = results[0].score
-                    for hit in results:
-                        doc_id = hit['message_id']
-                        all_candidate_scores[doc_id] = {'keyword_score': hit.score, 'semantic_score': 0.0}
+            remaining = None
+            if timeout is not None:
+                if not run.started.wait(timeout) and run.future.cancel():
+                    print(f"{label} 검색이 {timeout}초 안에 시작되지 못해 제외합니다.")
+                    timings[f'{leg}_timed_out'] = True
+                    return None
+                # 취소하지 못했으면 방금 시작된 것이므로 시작 시각이 곧 기록됨
+                run.started.wait()
+                remaining = max(0.0, run.start_time + timeout - time.perf_counter())
+            return run.future.result(timeout=remaining)
+        except concurrent.futures.TimeoutError:
+            print(f"{label} 검색이 {timeout}초 안에 끝나지 않아 제외합니다.")
+            timings[f'{leg}_timed_out'] = True
         except Exception as e:
-            print(f"키워드 검색 중 오류 발생: {e}")
+            print(f"{label} 검색 중 오류 발생: {e}")
+        return None
 
-        # 1b. Semantic search (ChromaDB)
-        print("시맨틱 검색 (ChromaDB)을 수행합니다...")
-        if self.chroma_collection.count() > 0:
-            query_embedding = self.semantic_model.encode([query_string]).tolist()
-            
-            # ChromaDB에서 시맨틱 검색 수행 (상위 50개 정도 가져옴)
-            chroma_results = self.chroma_collection.query(
-                query_embeddings=query_embedding,
-                n_results=min(50, self.chroma_collection.count()),
-                include=['distances'] # IDs와 distances만 필요
-            )
-            
-            if chroma_results and chroma_results['ids']:
-                # ChromaDB의 distance는 L2 distance. 0에 가까울수록 유사.
-                # 유사도 점수로 변환 (1 / (1 + distance))
-                semantic_similarities = {
-                    chroma_results['ids'][0][i]: 1 / (1 + chroma_results['distances'][0][i])
-                    for i in range(len(chroma_results['ids'][0]))
-                }
-                
-                max_sem_similarity = max(semantic_similarities.values()) if semantic_similarities else 0.0
-                
-                for doc_id, sim_score in semantic_similarities.items():
-                    if doc_id not in all_candidate_scores:
-                        all_candidate_scores[doc_id] = {'keyword_score': 0.0, 'semantic_score': 0.0}
-                    all_candidate_scores[doc_id]['semantic_score'] = sim_score / max_sem_similarity if max_sem_similarity > 0 else 0
+    def search(self, query_string, search_fields=["subject", "body_plain", "attachment_text", "sender"], limit=10, semantic_weight=0.5,
+               keyword_candidates=None, semantic_candidates=None, filters=None, collapse_threads=False): # search_fields에 attachment_text 추가
+        """
+        키워드(Whoosh 또는 FTS5)와 시맨틱(ChromaDB) 검색을 동시에 실행하고 결과를 병합합니다.
+        filters(SearchFilters 또는 같은 키의 dict)를 지정하면 발신자, 수신자, 기간, 폴더 조건을
+        각 엔진에 넘겨 조건에 맞는 문서 안에서만 후보를 찾습니다.
+        keyword_candidates/semantic_candidates는 각 검색에서 가져올 후보 수이며,
+        지정하지 않으면 생성자에 설정한 값을 사용합니다. 두 값 모두 limit보다 작으면 limit을 사용합니다.
+
+        collapse_threads=True이면 같은 스레드(thread_id)의 메일은 점수가 가장 높은 한 건만 결과에 넣습니다.
+        키워드 엔진이 후보를 모을 때 스레드별로 묶으므로 (Whoosh collapse, FTS5 창 함수) 후보를 더 가져오지 않아도
+        서로 다른 스레드 keyword_candidates개가 병합 단계로 넘어오고, 병합 단계에서는 시맨틱 후보와 겹치는
+        스레드만 정리합니다.
+
+        각 경로는 keyword_timeout/semantic_timeout(초) 안에 끝나지 않으면 제외됩니다.
+        반환되는 SearchResults의 timings에 단계별 소요 시간(ms)이 기록됩니다.
+        """
+        keyword_candidates = max(limit, keyword_candidates or self.keyword_candidates)
+        semantic_candidates = max(limit, semantic_candidates or self.semantic_candidates)
+        filters = SearchFilters.from_value(filters)
+
+        if not self.keyword_engine.is_ready() or not self.semantic_model or not self.vector_store.is_ready():
+            print("검색기가 준비되지 않았습니다. 색인 및 시맨틱 데이터가 올바르게 로드되었는지 확인하세요.")
+            return SearchResults()
+
+        search_start = time.perf_counter()
+        timings = {}
 
+        self._check_index_state()
+        cache_key = (query_string, tuple(search_fields), semantic_weight, limit, keyword_candidates, semantic_candidates,
+                     filters.cache_key(), collapse_threads)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            final_results = SearchResults(dict(fields) for fields in cached)
+            final_results.timings = {'result_cache_hit': True, 'total': (time.perf_counter() - search_start) * 1000}
+            instrumentation.count("search.result_cache_hit")
+            return final_results
 
-        # --- 2. 결과 병합 및 최종 점수 계산 ---
-        combined_results_list = []
-        with self.ix.searcher() as s:
+        # --- 1. 독립적인 검색을 동시에 수행 ---
+        keyword_run = _LegRun(self._executor, self._keyword_leg, query_string, search_fields, keyword_candidates, filters,
+                              collapse_threads)
+        semantic_run = _LegRun(self._executor, self._semantic_leg, query_string, semantic_candidates, filters)
+        keyword_result = self._leg_result(keyword_run, self.keyword_timeout, 'keyword', "키워드", timings)
+        semantic_result = self._leg_result(semantic_run, self.semantic_timeout, 'semantic', "시맨틱", timings)
+
+        all_candidate_scores = {} # message_id -> {'keyword_score': score, 'semantic_score': score, 'handle': handle}
+        max_kw_score = 0.0
+        keyword_generation = None
+        if keyword_result is not None:
+            keyword_hits, max_kw_score, keyword_generation, leg_timings = keyword_result
+            timings.update(leg_timings)
+            for doc_id, (score, handle) in keyword_hits.items():
+                all_candidate_scores[doc_id] = {'keyword_score': score, 'semantic_score': 0.0, 'handle': handle}
+        if semantic_result is not None:
+            semantic_scores, leg_timings = semantic_result
+            timings.update(leg_timings)
+            for doc_id, sem_score in semantic_scores.items():
+                if doc_id not in all_candidate_scores:
+                    all_candidate_scores[doc_id] = {'keyword_score': 0.0, 'semantic_score': 0.0, 'handle': None}
+                all_candidate_scores[doc_id]['semantic_score'] = sem_score
+
+        merge_start = time.perf_counter()
+        with self.keyword_engine.reader() as reader:
+            if keyword_generation is not None and reader.generation != keyword_generation:
+                # 키워드 검색 이후 색인이 바뀌었으면 handle을 다시 찾음
+                for scores in all_candidate_scores.values():
+                    scores['handle'] = None
+
+            # 시맨틱 결과에만 있는 후보의 handle을 한 번의 질의로 찾음
+            reader.resolve(all_candidate_scores)
+
+            # --- 2. 결과 병합 및 최종 점수 계산 (점수 계산에 필요한 필드만 로드) ---
+            fusion_fields = FUSION_FIELDS if self.ranking is None else RANKING_FIELDS
+            if collapse_threads:
+                fusion_fields += THREAD_FIELDS
+            combined_results_list = []
             for doc_id, scores in all_candidate_scores.items():
-                fields = s.document(message_id=doc_id)
-                if not fields:
+                handle = scores['handle']
+                if handle is None:
+                    continue
+                fields = reader.load_fields(handle, fusion_fields)
+                if fields is None:
                     continue
                 
                 normalized_kw_score = scores['keyword_score'] / max_kw_score if max_kw_score > 0 else 0
@@ -175,15 +302,55 @@ class Searcher:
                 hybrid_score = (1 - semantic_weight) * normalized_kw_score + semantic_weight * normalized_sem_score
                 final_score = hybrid_score + (importance_score / 100.0) # 중요도 점수를 보너스로 추가
                 
+                thread_id = (fields.get('thread_id') or doc_id) if collapse_threads else doc_id
+                combined_results_list.append((final_score, hybrid_score, normalized_kw_score, normalized_sem_score, handle,
+                                              thread_id))
+
+            # --- 3. 최종 결과 정렬 후 상위 limit개만 전체 필드 로드 ---
+            combined_results_list.sort(key=lambda x: x[0], reverse=True)
+            if collapse_threads:
+                # 키워드 후보는 이미 스레드마다 하나이므로, 같은 스레드의 시맨틱 후보만 여기서 빠짐
+                best_per_thread = {}
+                for result in combined_results_list:
+                    best_per_thread.setdefault(result[5], result)
+                combined_results_list = list(best_per_thread.values())
+            final_results = SearchResults()
+            for final_score, hybrid_score, normalized_kw_score, normalized_sem_score, handle, _ in combined_results_list[:limit]:
+                fields = reader.document(handle)
                 fields['keyword_score'] = normalized_kw_score
                 fields['semantic_score'] = normalized_sem_score
                 fields['hybrid_score'] = hybrid_score
                 fields['final_score'] = final_score
-                combined_results_list.append(fields)
+                final_results.append(fields)
+
+        timings['merge'] = (time.perf_counter() - merge_start) * 1000
+        timings['total'] = (time.perf_counter() - search_start) * 1000
+        final_results.timings = timings
+        if instrumentation.enabled:
+            # 검색 경로별 시간은 이미 timings에 있으므로 그대로 계측에 더함 (search.whoosh, search.encode 등)
+            for name, value in timings.items():
+                if not isinstance(value, bool):
+                    instrumentation.add(f"search.{name}", value / 1000)
+        if keyword_result is not None and semantic_result is not None:
+            # 한쪽 경로가 빠진 불완전한 결과는 캐시하지 않음
+            self.result_cache.put(cache_key, [dict(fields) for fields in final_results])
+        return final_results
+
+    def _check_index_state(self):
+        """키워드 색인이나 벡터 저장소의 상태가 바뀌었으면 결과 캐시를 비웁니다."""
+        state = (self.keyword_engine.state(), self.vector_store.state())
+        if state != self._index_state:
+            if self._index_state is not None:
+                print("색인이 변경되어 검색 결과 캐시를 비웁니다.")
+            self.result_cache.clear()
+            self._index_state = state
 
-        # --- 3. 최종 결과 정렬 및 반환 ---
-        combined_results_list.sort(key=lambda x: x['final_score'], reverse=True)
-        return combined_results_list[:limit]
+    def cache_stats(self):
+        """질의 임베딩 캐시와 결과 캐시의 크기 및 히트율을 반환합니다."""
+        return {
+            "query_embedding": self.query_embedding_cache.stats(),
+            "result": self.result_cache.stats(),
+        }
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
@@ -192,16 +359,9 @@ if __name__ == '__main__':
 
     query_text = sys.argv[1]
     weight = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
-    eml_dir = "eml_output"
-
-    main_user, important_contacts = get_important_contacts(eml_dir)
-
-    if not main_user:
-        print("메인 사용자 분석에 실패했습니다. 검색을 시작할 수 없습니다.")
-        sys.exit(1)
 
     print(f"===== '{query_text}' 하이브리드 검색 시작 (시맨틱 가중치: {weight}) =====")
-    searcher = Searcher(main_user=main_user, important_contacts=important_contacts)
+    searcher = Searcher()
     search_results = searcher.search(query_text, semantic_weight=weight)
 
     print("\n--- 검색 결과 (최종 점수 순) ---")
@@ -0,0 +1,110 @@
+import sys
+import json
+import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.search.query import Searcher
+from src.search.filters import SearchFilters
+from src.search.client import DEFAULT_HOST, DEFAULT_PORT
+
+def _to_json_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+def serialize_results(results):
+    """SearchResults를 JSON으로 보낼 수 있는 dict로 변환합니다."""
+    return {
+        "results": [{key: _to_json_value(value) for key, value in fields.items()} for fields in results],
+        "timings": getattr(results, "timings", {}),
+    }
+
+class _SearchRequestHandler(BaseHTTPRequestHandler):
+    # server.searcher는 SearchServer가 설정함
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "cache": self.server.searcher.cache_stats(),
+                                  "engine": self.server.searcher.engine_settings()})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/search":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            query_string = request["query"]
+            # 필터는 검색 전에 검사해서 잘못된 키나 날짜 형식을 400으로 알림
+            filters = SearchFilters.from_value(request.get("filters"))
+            engine = dict(request.get("engine") or {})
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"잘못된 요청입니다: {e}"})
+            return
+
+        # 클라이언트가 요청한 엔진 설정과 서버가 로드한 설정이 다르면 다른 엔진의 결과를 돌려주지 않고 거절
+        settings = self.server.searcher.engine_settings()
+        mismatched = {key: value for key, value in engine.items() if settings.get(key) != value}
+        if mismatched:
+            self._send_json(409, {"error": "검색 서버의 엔진 설정이 요청과 다릅니다.", "requested": mismatched,
+                                  "engine": settings})
+            return
+
+        kwargs = {key: request[key] for key in ("limit", "semantic_weight", "search_fields", "collapse_threads") if key in request}
+        try:
+            results = self.server.searcher.search(query_string, filters=filters, **kwargs)
+        except Exception as e:
+            self._send_json(500, {"error": f"검색 중 오류 발생: {e}"})
+            return
+        self._send_json(200, serialize_results(results))
+
+    def log_message(self, format, *args):
+        # 요청마다 로그를 출력하지 않음
+        pass
+
+class SearchServer(ThreadingHTTPServer):
+    """
+    Searcher(SentenceTransformer 모델, 벡터 저장소, 키워드 색인)를 메모리에 올려둔 채
+    localhost HTTP로 검색 요청을 처리하는 상주 서버입니다.
+    main.py search와 app.py는 SearchClient로 이 서버에 질의하고, 서버가 없으면 직접 검색합니다.
+
+      GET  /health  -> {"status": "ok", "cache": {...}}
+      POST /search  {"query": ..., "limit": ..., "semantic_weight": ..., "search_fields": [...], "collapse_threads": ...,
+                     "filters": {"sender": ..., "recipient": ..., "date_from": ..., "date_to": ..., "folder": ...},
+                     "engine": {"keyword_engine": ..., "vector_store": ..., "nprobe": ..., "rerank": ...,
+                                "index_dir": ..., "db_path": ..., "vector_dir": ...}}
+                    -> {"results": [...], "timings": {...}}
+                    engine에 지정한 값이 서버 설정(Searcher.engine_settings, 경로는 절대 경로)과 다르면 409
+    """
+    daemon_threads = True
+
+    def __init__(self, searcher, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        super().__init__((host, port), _SearchRequestHandler)
+        self.searcher = searcher
+
+def serve(index_dir="data/index", chroma_dir="data/chroma", host=DEFAULT_HOST, port=DEFAULT_PORT, **searcher_kwargs):
+    """Searcher를 한 번 로드하고 종료될 때까지 검색 요청을 처리합니다."""
+    searcher = Searcher(index_dir=index_dir, chroma_dir=chroma_dir, **searcher_kwargs)
+    server = SearchServer(searcher, host=host, port=port)
+    print(f"검색 서버가 http://{host}:{port} 에서 실행 중입니다. (종료: Ctrl+C)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n검색 서버를 종료합니다.")
+    finally:
+        server.server_close()
+        searcher.close()
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT
+    serve(port=port)
@@ -0,0 +1,727 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+import numpy as np
+from src.search.filters import wall_clock_timestamp, folder_ancestors
+from src.search.backends import VECTOR_STORES
+from src.search.ivfpq import IVFPQIndex
+
+class VectorStore:
+    """
+    시맨틱 검색용 벡터 저장소 인터페이스입니다.
+    query()의 유사도는 클수록 가까우며, Searcher가 최댓값으로 나눠 정규화합니다.
+    """
+    name = None
+
+    def is_ready(self):
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def unique_count(self):
+        """저장된 서로 다른 벡터 수 (같은 벡터를 한 번만 저장하는 저장소만 count()보다 작음)."""
+        return self.count()
+
+    def state(self):
+        """저장된 벡터가 바뀌면 달라지는 값 (검색 결과 캐시 무효화에 사용)."""
+        raise NotImplementedError
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None):
+        raise NotImplementedError
+
+    def delete(self, ids):
+        raise NotImplementedError
+
+    def update_metadata(self, ids, metadatas):
+        """저장된 벡터의 메타데이터에 metadatas의 키를 덮어씁니다 (예: 중요도가 바뀐 문서의 'importance')."""
+        raise NotImplementedError
+
+    def reset(self):
+        """저장된 벡터를 모두 지웁니다 (색인을 처음부터 다시 만들 때)."""
+        raise NotImplementedError
+
+    def query(self, embedding, n_results, filters=None):
+        """
+        filters(SearchFilters)에 맞는 벡터 중 embedding과 가장 가까운 n_results개를 찾습니다.
+        반환값: ([message_id, ...], [유사도, ...], 직접 비교로 대신했는지 여부)
+        """
+        raise NotImplementedError
+
+    def compact(self):
+        """삭제 표시된 벡터를 정리합니다 (필요한 저장소만 구현)."""
+        return False
+
+    def finish_indexing(self):
+        """색인기가 한 번의 색인을 마친 뒤 호출합니다 (기본: compact)."""
+        self.compact()
+
+class ChromaVectorStore(VectorStore):
+    """ChromaDB 컬렉션(data/chroma의 'email_embeddings')을 사용하는 벡터 저장소입니다."""
+    name = "chroma"
+    collection_name = "email_embeddings"
+
+    def __init__(self, chroma_dir="data/chroma", create=False):
+        self.chroma_dir = chroma_dir
+        self.client = None
+        self.collection = None
+        if not create and not os.path.exists(chroma_dir):
+            print("오류: 시맨틱 검색 데이터(ChromaDB)를 찾을 수 없습니다.")
+            return
+        try:
+            import chromadb
+            self.client = chromadb.PersistentClient(path=chroma_dir)
+            if create:
+                self.collection = self.client.get_or_create_collection(name=self.collection_name)
+                print(f"ChromaDB 컬렉션 '{self.collection_name}' 초기화 완료. 저장 경로: {chroma_dir}")
+            else:
+                self.collection = self.client.get_collection(name=self.collection_name)
+        except Exception as e:
+            print(f"ChromaDB 초기화 중 오류 발생: {e}")
+
+    def is_ready(self):
+        return self.collection is not None
+
+    def count(self):
+        return self.collection.count()
+
+    def state(self):
+        return self.collection.count()
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None):
+        self.collection.upsert(
+            embeddings=np.asarray(embeddings, dtype=np.float32).tolist(), # ChromaDB는 리스트 형태를 선호
+            documents=documents, # 원본 텍스트도 저장 (선택 사항이지만 유용)
+            metadatas=metadatas, # 검색 필터(where=)용 발신자/수신자/날짜/폴더
+            ids=list(ids)
+        )
+
+    def delete(self, ids):
+        if ids:
+            self.collection.delete(ids=list(ids))
+
+    def update_metadata(self, ids, metadatas):
+        # ChromaDB의 update는 지정한 키만 바꾸고 나머지 메타데이터는 유지
+        if ids:
+            self.collection.update(ids=list(ids), metadatas=list(metadatas))
+
+    def reset(self):
+        if self.collection.count() > 0:
+            self.client.delete_collection(name=self.collection_name)
+            self.collection = self.client.create_collection(name=self.collection_name)
+            print("기존 ChromaDB 컬렉션을 삭제하고 새로 생성했습니다.")
+
+    # 수신자/폴더 조건은 검색 후에 거르므로 n_results의 이 배수만큼 후보를 찾고,
+    # 거르고 남은 결과가 모자라면 후보 수를 이 배수씩 늘려 다시 찾음 (최대 max_post_filter_candidates개)
+    post_filter_factor = 4
+    max_post_filter_candidates = 10000
+
+    def query(self, embedding, n_results, filters=None):
+        where = filters.chroma_where() if filters else None
+        post_filter = filters if filters and filters.has_metadata_filter() else None
+        query_embeddings = np.asarray(embedding, dtype=np.float32).reshape(1, -1).tolist()
+        count = self.collection.count()
+        n_candidates = min(n_results * (self.post_filter_factor if post_filter else 1), count)
+        exact = False
+        while True:
+            try:
+                results = self.collection.query(
+                    query_embeddings=query_embeddings,
+                    n_results=n_candidates,
+                    where=where,
+                    include=['distances', 'metadatas'] if post_filter else ['distances'] # IDs와 distances만 필요
+                )
+            except RuntimeError:
+                # 조건에 맞는 문서가 적으면 HNSW 탐색이 n_results개를 채우지 못해 오류가 나므로
+                # 조건에 맞는 벡터만 가져와 직접 거리를 계산
+                if where is None:
+                    raise
+                results = None
+                break
+            if not post_filter or not results['ids']:
+                break
+            found = len(results['ids'][0])
+            filtered = self._post_filter(results, post_filter, n_results)
+            # 결과가 충분하거나 조건에 맞는 후보를 모두 봤으면 끝
+            if len(filtered['ids'][0]) >= n_results or found < n_candidates or n_candidates >= count:
+                results = filtered
+                break
+            if n_candidates >= self.max_post_filter_candidates:
+                # where로 좁힐 수 없는 수신자/폴더 조건만 있으면 컬렉션 전체를 읽지 않고 찾은 만큼만 반환
+                results = None if where is not None else filtered
+                break
+            n_candidates = min(n_candidates * self.post_filter_factor, self.max_post_filter_candidates, count)
+        if results is None:
+            results = self._exact_query(query_embeddings, n_results, where, post_filter)
+            exact = True
+        if not results or not results['ids']:
+            return [], [], exact
+        # ChromaDB의 distance는 (제곱) L2 distance. 0에 가까울수록 유사하므로 1 / (1 + distance)로 변환
+        return results['ids'][0], [1 / (1 + distance) for distance in results['distances'][0]], exact
+
+    @staticmethod
+    def _post_filter(results, filters, n_results):
+        """query() 결과 중 수신자/폴더 조건(filters.metadata_matches)에 맞는 상위 n_results개."""
+        kept = [i for i, metadata in enumerate(results['metadatas'][0]) if filters.metadata_matches(metadata)]
+        kept = kept[:n_results]
+        return {'ids': [[results['ids'][0][i] for i in kept]], 'distances': [[results['distances'][0][i] for i in kept]]}
+
+    def _exact_query(self, query_embeddings, n_results, where, filters=None):
+        """
+        where 조건(과 filters의 수신자/폴더 조건)에 맞는 벡터 전체와 L2 거리(ChromaDB 기본값과 같은
+        제곱 거리)를 계산해 상위 n_results개를 반환합니다.
+        where 없이 호출하면 컬렉션 전체를 읽으므로 where가 있을 때만 사용합니다.
+        """
+        records = self.collection.get(where=where, include=['embeddings', 'metadatas'] if filters else ['embeddings'])
+        rows = [i for i in range(len(records['ids']))
+                if filters is None or filters.metadata_matches(records['metadatas'][i])]
+        if not rows:
+            return {'ids': [[]], 'distances': [[]]}
+        vectors = np.asarray([records['embeddings'][i] for i in rows], dtype=np.float32)
+        distances = ((vectors - np.asarray(query_embeddings[0], dtype=np.float32)) ** 2).sum(axis=1)
+        top = np.argsort(distances)[:n_results]
+        return {'ids': [[records['ids'][rows[i]] for i in top]], 'distances': [[float(distances[i]) for i in top]]}
+
+def _unit_vector(embedding):
+    vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+class _MetadataColumns:
+    """NumpyVectorStore의 필터용 메타데이터를 열 단위 배열로 모은 것입니다."""
+    MISSING_TS = np.iinfo(np.int64).min
+
+    def __init__(self, metadatas):
+        senders = {}
+        self.sender = np.full(len(metadatas), -1, dtype=np.int32)
+        self.sent_ts = np.full(len(metadatas), self.MISSING_TS, dtype=np.int64)
+        # 'rcpt:<주소>', 'folder:<경로>'(상위 폴더 포함) -> 해당 행 번호 배열
+        postings = {}
+        for row, metadata in enumerate(metadatas):
+            for key, value in (metadata or {}).items():
+                if key == "sender":
+                    self.sender[row] = senders.setdefault(value, len(senders))
+                elif key == "sent_ts":
+                    self.sent_ts[row] = value
+                elif key == "recipients":
+                    for recipient in value.split(","):
+                        postings.setdefault(f"rcpt:{recipient}", []).append(row)
+                elif key == "folder":
+                    for folder in folder_ancestors(value):
+                        postings.setdefault(f"folder:{folder}", []).append(row)
+        self.senders = senders
+        self.postings = {key: np.asarray(rows, dtype=np.int64) for key, rows in postings.items()}
+
+    def mask(self, filters, size):
+        mask = np.ones(size, dtype=bool)
+        if filters.sender:
+            code = self.senders.get(filters.sender)
+            if code is None:
+                return np.zeros(size, dtype=bool)
+            mask &= self.sender == code
+        if filters.date_from is not None:
+            mask &= (self.sent_ts != self.MISSING_TS) & (self.sent_ts >= wall_clock_timestamp(filters.date_from))
+        if filters.date_to is not None:
+            mask &= (self.sent_ts != self.MISSING_TS) & (self.sent_ts < wall_clock_timestamp(filters.date_to))
+        for key in ([f"rcpt:{filters.recipient}"] if filters.recipient else []) + \
+                   ([f"folder:{filters.folder}"] if filters.folder else []):
+            allowed = np.zeros(size, dtype=bool)
+            allowed[self.postings.get(key, np.empty(0, dtype=np.int64))] = True
+            mask &= allowed
+        return mask
+
+class NumpyVectorStore(VectorStore):
+    """
+    임베딩을 정규화한 float16 행렬로 디스크에 두고 memory-map으로 읽는 벡터 저장소입니다.
+    전체 행렬과 질의 벡터의 내적(코사인 유사도)을 계산하고 argpartition으로 상위 n개를 고르는
+    정확한 검색이며, ChromaDB처럼 별도 DB나 원본 텍스트를 저장하지 않습니다.
+
+    store_dir 구성:
+      - meta.json      : 차원, dtype
+      - vectors.bin    : 정규화된 서로 다른 벡터 (슬롯 단위로 덧붙임)
+      - refs.bin       : 행마다 vectors.bin의 슬롯 번호 (int32)
+      - ids.txt        : 행 번호 순서의 message_id (한 줄에 하나, 마지막에 기록되므로 행 수의 기준)
+      - live.bin       : 행마다 1바이트 (0이면 삭제 표시된 행)
+      - metadata.jsonl : 행마다 필터용 메타데이터 (src.search.filters.vector_metadata)
+
+    값이 똑같은 벡터(예: 임베딩 캐시가 유사 중복 메일에 같은 벡터를 준 경우)는 슬롯 하나를 공유하므로
+    메타데이터는 메일마다 따로 두면서 벡터 파일과 내적 계산은 중복만큼 줄어듭니다.
+    같은 ID를 다시 저장하면 이전 행에 삭제 표시를 하고 새 행을 덧붙입니다.
+    삭제 표시된 행이 많아지면 compact()로 파일을 다시 씁니다.
+    """
+    name = "numpy"
+    # 한 번에 float32로 바꿔 내적을 계산할 행 수. 변환한 블록이 CPU 캐시에 남아 있을 정도로 작게 유지
+    # (임시 메모리 = chunk_rows * dim * 4바이트)
+    chunk_rows = 2048
+
+    def __init__(self, store_dir="data/vectors", create=False, dtype=np.float16):
+        """dtype은 새 저장소를 만들 때만 사용합니다 (float32로 만들면 크기는 두 배지만 변환 없이 계산)."""
+        self.store_dir = store_dir
+        self.dtype = np.dtype(dtype)
+        self.meta_path = os.path.join(store_dir, "meta.json")
+        self.vectors_path = os.path.join(store_dir, "vectors.bin")
+        self.refs_path = os.path.join(store_dir, "refs.bin")
+        self.ids_path = os.path.join(store_dir, "ids.txt")
+        self.live_path = os.path.join(store_dir, "live.bin")
+        self.metadata_path = os.path.join(store_dir, "metadata.jsonl")
+        self._lock = threading.Lock()
+        self._ready = False
+        self._loaded_state = None
+        self.dim = None
+        self.ids = []
+        self.id_to_row = {}
+        self.vectors = None
+        self.refs = None
+        self.live = None
+        self._columns = None
+        self._slots = None
+
+        if not os.path.exists(store_dir):
+            if not create:
+                print(f"오류: 벡터 저장소 디렉토리를 찾을 수 없습니다: {store_dir}")
+                return
+            os.makedirs(store_dir)
+        if create:
+            self._load(repair=True)
+            print(f"벡터 저장소 초기화 완료. 저장 경로: {store_dir}")
+        else:
+            self._load()
+        self._ready = True
+
+    def _load(self, repair=False):
+        meta = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        self.dim = meta.get("dim") if meta else None
+        if meta and meta.get("dtype"):
+            # 기존 저장소는 만들 때 기록한 dtype을 따름
+            self.dtype = np.dtype(meta["dtype"])
+        ids = []
+        if self.dim is not None and os.path.exists(self.ids_path):
+            with open(self.ids_path, "r", encoding="utf-8") as f:
+                ids = f.read().splitlines()
+
+        # ids.txt는 마지막에 기록되므로, 쓰기 도중 중단되었으면 다른 파일을 ids.txt의 행 수에 맞춤
+        row_bytes = (self.dim or 0) * self.dtype.itemsize
+        slots = os.path.getsize(self.vectors_path) // row_bytes if row_bytes and os.path.exists(self.vectors_path) else 0
+        refs = self._read_refs(slots)
+        lives = os.path.getsize(self.live_path) if os.path.exists(self.live_path) else 0
+        count = min(len(ids), len(refs), lives)
+        # 슬롯이 아직 기록되지 않은 행부터는 버림
+        invalid = np.flatnonzero(refs[:count] >= slots)
+        count = int(invalid[0]) if len(invalid) else count
+        used = int(refs[:count].max()) + 1 if count else 0
+        if repair and (count != len(ids) or len(refs) != count or slots != used or lives != count
+                       or self._metadata_lines() != count or not os.path.exists(self.refs_path)):
+            self._truncate(count, ids[:count], refs[:count], used)
+            slots = used
+        self.ids = ids[:count]
+        self._map(count, slots)
+        self.id_to_row = {doc_id: row for row, doc_id in enumerate(self.ids) if self.live[row]}
+        self._columns = None
+        self._slots = None
+        self._loaded_state = self.state()
+
+    def _read_refs(self, slots):
+        if os.path.exists(self.refs_path):
+            return np.fromfile(self.refs_path, dtype="<i4")
+        # refs.bin이 없는 이전 형식의 저장소는 행과 슬롯이 일대일
+        return np.arange(slots, dtype="<i4")
+
+    def _metadata_lines(self):
+        if not os.path.exists(self.metadata_path):
+            return 0
+        with open(self.metadata_path, "rb") as f:
+            return sum(1 for _ in f)
+
+    def _truncate(self, count, ids, refs, slots):
+        row_bytes = (self.dim or 0) * self.dtype.itemsize
+        for path, size in ((self.vectors_path, slots * row_bytes), (self.live_path, count)):
+            with open(path, "ab") as f:
+                f.truncate(size)
+        with open(self.refs_path, "wb") as f:
+            f.write(np.asarray(refs, dtype="<i4").tobytes())
+        with open(self.ids_path, "w", encoding="utf-8") as f:
+            f.write("".join(f"{doc_id}\n" for doc_id in ids))
+        lines = []
+        if os.path.exists(self.metadata_path):
+            with open(self.metadata_path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()[:count]
+        lines += ["null"] * (count - len(lines))
+        with open(self.metadata_path, "w", encoding="utf-8") as f:
+            f.write("".join(f"{line}\n" for line in lines))
+
+    def _map(self, count, slots):
+        if count:
+            self.vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(slots, self.dim))
+            self.refs = np.memmap(self.refs_path, dtype="<i4", mode="r", shape=(count,)) \
+                if os.path.exists(self.refs_path) else np.arange(count, dtype="<i4")
+            self.live = np.memmap(self.live_path, dtype=np.uint8, mode="r+", shape=(count,))
+        else:
+            self.vectors = None
+            self.refs = np.zeros(0, dtype="<i4")
+            self.live = np.zeros(0, dtype=np.uint8)
+
+    def _write_meta(self):
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype.name}, f)
+
+    def _refresh(self):
+        """다른 프로세스(색인기)가 파일을 바꿨으면 다시 읽습니다."""
+        if self.state() != self._loaded_state:
+            with self._lock:
+                if self.state() != self._loaded_state:
+                    self._load()
+
+    def is_ready(self):
+        return self._ready
+
+    def count(self):
+        return len(self.id_to_row)
+
+    def unique_count(self):
+        return len(np.unique(self.refs[np.asarray(self.live, dtype=bool)]))
+
+    def state(self):
+        stats = []
+        for path in (self.ids_path, self.live_path):
+            try:
+                stat = os.stat(path)
+                stats.append((stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                stats.append(None)
+        return tuple(stats)
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(embeddings) == 0:
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+                self._write_meta()
+            elif embeddings.shape[1] != self.dim:
+                raise ValueError(f"임베딩 차원이 저장소({self.dim})와 다릅니다: {embeddings.shape[1]}")
+            # 이전 행에 삭제 표시 (같은 배치에 같은 ID가 있으면 마지막 것만 남김)
+            self._mark_deleted([doc_id for doc_id in ids if doc_id in self.id_to_row])
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            vectors = (embeddings / np.where(norms > 0, norms, 1)).astype(self.dtype)
+            metadatas = metadatas if metadatas is not None else [None] * len(ids)
+            last = {doc_id: i for i, doc_id in enumerate(ids)}
+            live = np.array([last[doc_id] == i for i, doc_id in enumerate(ids)], dtype=np.uint8)
+            refs, new_slots = self._assign_slots(vectors)
+
+            with open(self.metadata_path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(metadata, ensure_ascii=False) + "\n" for metadata in metadatas))
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors[new_slots].tobytes())
+            with open(self.refs_path, "ab") as f:
+                f.write(refs.tobytes())
+            with open(self.live_path, "ab") as f:
+                f.write(live.tobytes())
+            with open(self.ids_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{doc_id}\n" for doc_id in ids))
+
+            start = len(self.ids)
+            self.ids.extend(ids)
+            for i, doc_id in enumerate(ids):
+                if live[i]:
+                    self.id_to_row[doc_id] = start + i
+            self._map(len(self.ids), len(self._slots))
+            self._columns = None
+            self._loaded_state = self.state()
+
+    @staticmethod
+    def _vector_key(vector):
+        return hashlib.blake2b(vector.tobytes(), digest_size=16).digest()
+
+    def _assign_slots(self, vectors):
+        """
+        저장할 벡터(저장 dtype)마다 슬롯 번호를 정합니다. 이미 저장된 벡터와 값이 같으면 그 슬롯을 씁니다.
+        반환값: (행마다 슬롯 번호, 새로 덧붙일 vectors의 위치)
+        """
+        if self._slots is None:
+            # 벡터 값 -> 슬롯 번호. 저장하는 프로세스(색인기)에서 처음 필요할 때 한 번 만듦
+            stored = self.vectors if self.vectors is not None else np.zeros((0, self.dim), dtype=self.dtype)
+            self._slots = {self._vector_key(np.asarray(vector)): slot for slot, vector in enumerate(stored)}
+        refs = np.empty(len(vectors), dtype="<i4")
+        new_slots = []
+        for i, vector in enumerate(vectors):
+            key = self._vector_key(vector)
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = len(self._slots)
+                new_slots.append(i)
+            refs[i] = slot
+        return refs, new_slots
+
+    def _mark_deleted(self, ids):
+        rows = [self.id_to_row.pop(doc_id) for doc_id in ids if doc_id in self.id_to_row]
+        if rows:
+            self.live[rows] = 0
+            self.live.flush()
+
+    def delete(self, ids):
+        with self._lock:
+            self._mark_deleted(ids)
+            # memory-map 쓰기는 mtime을 바로 바꾸지 않을 수 있으므로 검색 프로세스가 알아채도록 갱신
+            if os.path.exists(self.live_path):
+                os.utime(self.live_path)
+            self._loaded_state = self.state()
+
+    def update_metadata(self, ids, metadatas):
+        with self._lock:
+            updates = {self.id_to_row[doc_id]: metadata for doc_id, metadata in zip(ids, metadatas)
+                       if doc_id in self.id_to_row}
+            if not updates:
+                return
+            lines = self._read_metadata()
+            for row, metadata in updates.items():
+                lines[row] = dict(lines[row] or {}, **metadata)
+            # 임시 파일에 쓴 뒤 교체하고, 검색 프로세스가 다시 읽도록 live.bin의 mtime을 갱신
+            with open(self.metadata_path + ".tmp", "w", encoding="utf-8") as f:
+                f.write("".join(json.dumps(metadata, ensure_ascii=False) + "\n" for metadata in lines))
+            os.replace(self.metadata_path + ".tmp", self.metadata_path)
+            os.utime(self.live_path)
+            self._columns = None
+            self._loaded_state = self.state()
+
+    def reset(self):
+        with self._lock:
+            for path in (self.vectors_path, self.refs_path, self.ids_path, self.live_path, self.metadata_path,
+                         self.meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.vectors = None
+            self._load()
+        print("기존 벡터 저장소를 비웠습니다.")
+
+    def compact(self, min_deleted_ratio=0.25):
+        """삭제 표시된 행이 min_deleted_ratio 이상이면 살아 있는 행만 남기고 파일을 다시 씁니다."""
+        with self._lock:
+            if not self._needs_compact(min_deleted_ratio):
+                return False
+            total = len(self.ids)
+            rows = np.flatnonzero(np.asarray(self.live, dtype=bool))
+            # 남은 행이 참조하는 슬롯만 남기고 슬롯 번호를 다시 매김
+            slots, refs = np.unique(self.refs[rows], return_inverse=True)
+            vectors = np.asarray(self.vectors[slots])
+            metadatas = self._read_metadata()
+            ids = [self.ids[row] for row in rows]
+            # 임시 파일에 쓴 뒤 교체 (ids.txt를 마지막에 교체해서 중단되어도 _load가 행 수를 맞춤)
+            replacements = (
+                (self.metadata_path, "".join(json.dumps(metadatas[row], ensure_ascii=False) + "\n" for row in rows).encode("utf-8")),
+                (self.vectors_path, vectors.tobytes()),
+                (self.refs_path, refs.astype("<i4").tobytes()),
+                (self.live_path, np.ones(len(rows), dtype=np.uint8).tobytes()),
+                (self.ids_path, "".join(f"{doc_id}\n" for doc_id in ids).encode("utf-8")),
+            )
+            self.vectors = self.refs = self.live = None
+            for path, data in replacements:
+                with open(path + ".tmp", "wb") as f:
+                    f.write(data)
+                os.replace(path + ".tmp", path)
+            self._load()
+        print(f"벡터 저장소를 정리했습니다: {total}행 -> {len(rows)}행")
+        return True
+
+    def _needs_compact(self, min_deleted_ratio):
+        total = len(self.ids)
+        return bool(total) and (total - len(self.id_to_row)) / total >= min_deleted_ratio
+
+    def _read_metadata(self):
+        with open(self.metadata_path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for _, line in zip(range(len(self.ids)), f)]
+
+    def _filter_mask(self, filters):
+        if self._columns is None:
+            self._columns = _MetadataColumns(self._read_metadata())
+        return self._columns.mask(filters, len(self.ids))
+
+    def query(self, embedding, n_results, filters=None):
+        self._refresh()
+        # 다시 읽기/덧붙이기와 겹치지 않도록 현재 배열만 잠금 안에서 가져오고, 계산은 잠금 밖에서 수행
+        with self._lock:
+            vectors, refs, ids = self.vectors, self.refs, self.ids
+            if vectors is None or n_results <= 0:
+                return [], [], False
+            live = np.asarray(self.live, dtype=bool)
+            if filters:
+                live &= self._filter_mask(filters)
+
+        query_vector = _unit_vector(embedding)
+        if filters:
+            # 조건에 맞는 행의 슬롯만 (공유하는 슬롯은 한 번) 읽어서 비교
+            rows = np.flatnonzero(live)
+            scores = self._slot_scores(vectors, refs[rows], query_vector)
+        else:
+            rows = None
+            slot_scores = np.empty(len(vectors), dtype=np.float32)
+            for start in range(0, len(vectors), self.chunk_rows):
+                chunk = np.asarray(vectors[start:start + self.chunk_rows], dtype=np.float32)
+                slot_scores[start:start + len(chunk)] = chunk @ query_vector
+            scores = slot_scores[refs]
+            scores[~live] = -np.inf
+
+        k = min(n_results, int(live.sum()))
+        if k <= 0:
+            return [], [], False
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        positions = rows[top] if rows is not None else top
+        # 코사인 유사도(-1~1)를 0~1로 옮겨서 반환
+        return [ids[row] for row in positions], ((scores[top] + 1) / 2).tolist(), False
+
+    @staticmethod
+    def _slot_scores(vectors, slots, query_vector):
+        """slots(행마다 슬롯 번호)의 벡터와 질의 벡터의 내적. 같은 슬롯은 한 번만 읽어서 계산합니다."""
+        unique_slots, inverse = np.unique(slots, return_inverse=True)
+        return (np.asarray(vectors[unique_slots], dtype=np.float32) @ query_vector)[inverse]
+
+class IVFPQVectorStore(NumpyVectorStore):
+    """
+    NumpyVectorStore에 IVF-PQ 근사 검색 인덱스(src.search.ivfpq.IVFPQIndex)를 더한 벡터 저장소입니다.
+    수백만 건 규모에서 전체 행렬을 매번 읽지 않도록, 메모리에는 메일당 m바이트 PQ 코드와
+    목록 번호/순서(8바이트)만 두고 nprobe개 목록의 후보만 근사 점수로 비교합니다.
+    근사 점수 상위 rerank개는 memory-map의 원본 벡터로 다시 계산해서 순위를 정합니다.
+
+    인덱스는 store_dir/ivfpq/에 저장되며 색인기가 finish_indexing()에서 만듭니다.
+      - 살아 있는 행이 min_train_rows 미만이면 만들지 않음 (정확한 검색)
+      - 처음이거나 살아 있는 행이 학습 때의 두 배 이상이면 다시 학습
+      - 그 외에는 새로 덧붙인 행만 기존 코드북으로 인코딩
+    아직 인코딩되지 않은 행과 조건에 맞는 행이 exact_filter_rows개 이하인 필터 검색은 정확하게 비교합니다.
+    """
+    name = "ivfpq"
+    min_train_rows = 1000
+    train_sample_rows = 100000
+    exact_filter_rows = 20000
+
+    def __init__(self, store_dir="data/vectors", create=False, nprobe=8, rerank=100, nlist=None, m=16):
+        """
+        nprobe: 질의마다 살펴볼 목록 수 (클수록 정확하고 느림)
+        rerank: 근사 점수 상위 몇 개를 원본 벡터로 다시 계산할지 (0이면 근사 점수 그대로, 최소 n_results)
+        nlist, m: 학습할 때의 목록 수(기본: sqrt(행 수))와 부분 공간 수 (벡터 차원의 약수)
+        """
+        self.index_dir = os.path.join(store_dir, "ivfpq")
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.nlist = nlist
+        self.m = m
+        self.index = None
+        super().__init__(store_dir, create=create)
+
+    def _load(self, repair=False):
+        super()._load(repair)
+        index = IVFPQIndex.load(self.index_dir) if self.ids else None
+        # 저장소보다 행이 많은 인덱스는 정리(compact) 전의 것이므로 사용하지 않음
+        self.index = index if index is not None and index.rows <= len(self.ids) else None
+
+    def state(self):
+        try:
+            stat = os.stat(os.path.join(self.index_dir, "meta.json"))
+            index_state = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            index_state = None
+        return super().state() + (index_state,)
+
+    def reset(self):
+        if os.path.exists(self.index_dir):
+            shutil.rmtree(self.index_dir)
+        super().reset()
+
+    def compact(self, min_deleted_ratio=0.25):
+        with self._lock:
+            if not self._needs_compact(min_deleted_ratio):
+                return False
+            index, rows = self.index, np.flatnonzero(np.asarray(self.live, dtype=bool))
+            # 정리 중에 검색 프로세스가 행 번호가 맞지 않는 인덱스를 읽지 않도록 먼저 무효화
+            if os.path.exists(os.path.join(self.index_dir, "meta.json")):
+                os.remove(os.path.join(self.index_dir, "meta.json"))
+        super().compact(min_deleted_ratio)
+        if index is not None:
+            # 다시 인코딩하지 않고 남은 행의 코드만 옮김
+            with self._lock:
+                index.select(rows)
+                index.save(self.index_dir)
+                self.index = index
+                self._loaded_state = self.state()
+        return True
+
+    def finish_indexing(self):
+        self.compact()
+        with self._lock:
+            live_rows = len(self.id_to_row)
+            index = self.index
+            if live_rows < self.min_train_rows:
+                return
+            if index is None or live_rows >= 2 * index.trained_rows:
+                index = self._train(live_rows)
+                action = "학습"
+            elif index.rows < len(self.ids):
+                action = "갱신"
+            else:
+                return
+            index.add(self.vectors, self.refs[index.rows:])
+            index.save(self.index_dir)
+            self.index = index
+            self._loaded_state = self.state()
+        print(f"IVF-PQ 인덱스 {action} 완료: {index.rows}행, 목록 {index.nlist}개, "
+              f"코드 {index.m}바이트/행 (행 단위 메모리 {index.nbytes() / 1024 / 1024:.1f}MB)")
+
+    def _train(self, live_rows):
+        rows = np.flatnonzero(np.asarray(self.live, dtype=bool))
+        if len(rows) > self.train_sample_rows:
+            rows = np.sort(np.random.default_rng(0).choice(rows, self.train_sample_rows, replace=False))
+        sample = np.asarray(self.vectors[self.refs[rows]], dtype=np.float32)
+        nlist = self.nlist or int(np.clip(np.sqrt(live_rows), 1, 4096))
+        return IVFPQIndex.train(sample, nlist, self.m, trained_rows=live_rows)
+
+    def query(self, embedding, n_results, filters=None):
+        self._refresh()
+        with self._lock:
+            vectors, refs, ids, index = self.vectors, self.refs, self.ids, self.index
+            if vectors is not None and index is not None and n_results > 0:
+                allowed = np.asarray(self.live, dtype=bool)
+                if filters:
+                    allowed &= self._filter_mask(filters)
+        if vectors is None or index is None or n_results <= 0:
+            # 인덱스가 아직 없으면 (작은 저장소) 정확한 검색
+            return super().query(embedding, n_results, filters=filters)
+        if filters and allowed.sum() <= self.exact_filter_rows:
+            # 조건에 맞는 행이 적으면 목록 몇 개만 보는 것보다 전부 비교하는 편이 빠르고 정확함
+            result_ids, similarities, _ = super().query(embedding, n_results, filters=filters)
+            return result_ids, similarities, True
+
+        query_vector = _unit_vector(embedding)
+        depth = max(self.rerank, n_results)
+        rows, scores = index.search(query_vector, self.nprobe, depth, allowed[:index.rows])
+        if self.rerank > 0 and len(rows):
+            scores = self._slot_scores(vectors, refs[rows], query_vector)
+        # 인덱스 이후에 덧붙인 (아직 인코딩하지 않은) 행은 직접 비교
+        tail = np.flatnonzero(allowed[index.rows:]) + index.rows
+        if len(tail):
+            rows = np.concatenate([rows, tail])
+            scores = np.concatenate([scores, self._slot_scores(vectors, refs[tail], query_vector)])
+
+        k = min(n_results, len(rows))
+        if k <= 0:
+            return [], [], False
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [ids[row] for row in rows[top]], ((scores[top] + 1) / 2).tolist(), False
+
+def create_vector_store(name, chroma_dir="data/chroma", vector_dir="data/vectors", create=False, **options):
+    """
+    이름으로 벡터 저장소를 만듭니다. create=True이면 저장소가 없을 때 새로 만듭니다 (색인기).
+    options는 ivfpq 저장소의 검색/학습 인자(nprobe, rerank, nlist, m)이며 다른 저장소에서는 무시합니다.
+    """
+    if name == "chroma":
+        return ChromaVectorStore(chroma_dir, create=create)
+    if name == "numpy":
+        return NumpyVectorStore(vector_dir, create=create)
+    if name == "ivfpq":
+        return IVFPQVectorStore(vector_dir, create=create, **options)
+    raise ValueError(f"알 수 없는 벡터 저장소입니다: {name} (사용 가능: {', '.join(VECTOR_STORES)})")
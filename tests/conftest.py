@@ -0,0 +1,78 @@
+import os
+import sys
+import zlib
+
+import numpy as np
+import pytest
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from generate_eml_files import build_eml_message
+from src.ingestion import parser
+
+OWNER = "pm@shipyard.com"
+
+@pytest.fixture(autouse=True)
+def attachment_cache(tmp_path):
+    """첨부파일 캐시를 테스트마다 임시 디렉터리에 둠 (data/attachment_cache.db를 건드리지 않음)."""
+    parser.configure_attachment_cache(str(tmp_path / "attachment_cache.db"))
+    yield
+    parser.configure_attachment_cache()
+
+@pytest.fixture
+def write_emls(tmp_path):
+    """[(상대 경로, email dict), ...]를 tmp_path/eml 아래 .eml 파일로 씁니다. 반환값: 디렉터리 경로"""
+    eml_dir = tmp_path / "eml"
+
+    def write(emails):
+        for relative_path, email_dict in emails:
+            path = eml_dir / relative_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(build_eml_message(email_dict).as_bytes())
+        return str(eml_dir)
+
+    return write
+
+def fake_encode(texts, dim=16):
+    """모델 없이 쓰는 인코더: 토큰 해시로 만든 정규화된 벡터."""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for token in text.lower().split():
+            vectors[i, zlib.crc32(token.encode("utf-8")) % dim] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+@pytest.fixture
+def make_indexer(tmp_path):
+    """tmp_path 아래에 색인/manifest/벡터 저장소를 두는 EmailIndexer (numpy 저장소, fake_encode)."""
+    from src.search.indexer import EmailIndexer
+
+    def make(eml_dir, keyword_engine="whoosh", **options):
+        indexer = EmailIndexer(eml_dir=eml_dir, index_dir=str(tmp_path / "index"),
+                               manifest_path=str(tmp_path / "manifest.db"),
+                               embedding_cache_dir=str(tmp_path / "embedding_cache"),
+                               keyword_engine=keyword_engine, db_path=str(tmp_path / "emails.db"),
+                               vector_store="numpy", vector_dir=str(tmp_path / "vectors"), **options)
+        indexer._encode = fake_encode
+        return indexer
+
+    return make
+
+def mailbox(count=12):
+    """메일함 소유자(OWNER)가 대부분의 메일을 주고받는 작은 메일함: [(상대 경로, email dict), ...]"""
+    contacts = ["kim@yard.com", "lee@yard.com", "park@class.org"]
+    emails = []
+    for i in range(count):
+        contact = contacts[i % len(contacts)]
+        sent = i % 2 == 0
+        emails.append((f"Inbox/mail_{i:03d}.eml", {
+            "subject": f"H-{1001 + i % 3} 블록 검사 일정 {i}",
+            "sender": OWNER if sent else contact,
+            "receiver": [contact] if sent else [OWNER],
+            "date": f"2024-03-{1 + i:02d}",
+            "body": f"블록 {i}의 검사 일정을 공유드립니다. NDT 결과는 다음 주에 나옵니다.",
+            "message_id": f"m{i}@yard.com",
+        }))
+    return emails
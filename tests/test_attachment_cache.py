@@ -0,0 +1,86 @@
+import sqlite3
+
+from src.ingestion import attachment_cache, parser
+from conftest import OWNER
+from src.ingestion.attachment_cache import AttachmentTextCache
+
+def last_access(path, key):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT last_access FROM attachment_text WHERE content_hash = ?;", (key,)).fetchone()[0]
+
+def test_failed_extraction_is_not_cached(tmp_path):
+    cache = AttachmentTextCache(str(tmp_path / "cache.db"))
+    calls = []
+
+    def flaky(content_bytes):
+        calls.append(content_bytes)
+        return None if len(calls) == 1 else "복구된 텍스트"
+
+    assert cache.get_or_extract("pdf", b"%PDF", flaky) is None
+    assert cache.stats()["entries"] == 0
+    # 다음 시도에서 다시 추출하고, 성공한 결과만 저장
+    assert cache.get_or_extract("pdf", b"%PDF", flaky) == "복구된 텍스트"
+    assert cache.get_or_extract("pdf", b"%PDF", flaky) == "복구된 텍스트"
+    assert len(calls) == 2
+    cache.close()
+
+def test_extract_attachment_text_retries_failures(monkeypatch):
+    results = [None, "견적서 내용"]
+    monkeypatch.setitem(parser._ATTACHMENT_EXTRACTORS, "pdf", lambda content_bytes: results.pop(0))
+    assert parser._extract_attachment_text(parser.PDF_MIME_TYPE, b"%PDF") == ""
+    assert parser._extract_attachment_text(parser.PDF_MIME_TYPE, b"%PDF") == "견적서 내용"
+    assert parser._extract_attachment_text(parser.PDF_MIME_TYPE, b"%PDF") == "견적서 내용"
+    assert results == []
+
+def test_hits_are_flushed_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(attachment_cache, "ACCESS_FLUSH_SIZE", 3)
+    monkeypatch.setattr(attachment_cache, "ACCESS_FLUSH_SECONDS", 3600)
+    path = str(tmp_path / "cache.db")
+    cache = AttachmentTextCache(path)
+    keys = [cache.make_key("pdf", bytes([i])) for i in range(3)]
+    for key in keys:
+        cache.put(key, "text")
+    stored = {key: last_access(path, key) for key in keys}
+
+    # 히트는 모아 두기만 하고 기준 개수가 차면 한 번에 반영
+    cache.get(keys[0])
+    cache.get(keys[1])
+    assert {key: last_access(path, key) for key in keys} == stored
+    cache.get(keys[2])
+    assert all(last_access(path, key) > stored[key] for key in keys)
+
+    cache.get(keys[0])
+    cache.get("pdf:missing")
+    cache.close()
+    reopened = AttachmentTextCache(path)
+    stats = reopened.stats()
+    assert (stats["hits"], stats["misses"]) == (4, 1)
+    reopened.close()
+
+def test_eviction_uses_pending_access_times(tmp_path, monkeypatch):
+    monkeypatch.setattr(attachment_cache, "ACCESS_FLUSH_SECONDS", 3600)
+    cache = AttachmentTextCache(str(tmp_path / "cache.db"), max_bytes=10)
+    cache.put("old", "aaaa")
+    cache.put("new", "bbbb")
+    cache.get("old")
+    # 아직 반영되지 않은 히트도 LRU 순서에 포함되어 'new'가 먼저 제거됨
+    cache.put("third", "cccc")
+    assert cache.get("old") == "aaaa"
+    assert cache.get("new") is None
+    cache.close()
+
+def test_pool_workers_flush_pending_stats(tmp_path, write_emls, monkeypatch):
+    monkeypatch.setattr(attachment_cache, "ACCESS_FLUSH_SIZE", 10 ** 6)
+    monkeypatch.setattr(attachment_cache, "ACCESS_FLUSH_SECONDS", 3600)
+    eml_dir = write_emls([(f"Inbox/mail_{i:03d}.eml", {
+        "subject": f"견적 {i}", "sender": "kim@yard.com", "receiver": [OWNER], "date": "2024-03-01",
+        "body": "견적서를 첨부합니다.", "attachments": [("quote.pdf", b"%PDF-1.4 quote")]}) for i in range(40)])
+    paths = list(parser.iter_eml_paths(eml_dir))
+    # 작업자에서 모아 둔 갱신은 작업자가 끝날 때 반영됨
+    for _ in range(2):
+        emails = list(parser.parse_eml_paths(paths, workers=2))
+        assert len(emails) == len(paths)
+
+    cache = parser.get_attachment_cache()
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == 2 * len(paths)
@@ -0,0 +1,56 @@
+import sqlite3
+from datetime import datetime
+
+from src.common.models import Email
+from src.ingestion.storage import ContactStats, SQLiteStorage, contact_ranking_from_emails, load_contact_ranking
+from src.ingestion.parser import parse_eml_headers, parse_eml_paths, iter_eml_paths
+from src.search.query import get_important_contacts
+from conftest import OWNER, mailbox
+
+def email(message_id, sender, receivers, day=1):
+    return Email(message_id=message_id, subject="s", body_plain="b", body_html=None, sender=sender,
+                 receivers=receivers, sent_date=datetime(2024, 1, day), folder_path="Inbox")
+
+def stats(conn):
+    return dict(conn.execute("""
+    SELECT a.address, s.sent_count || '/' || s.received_count FROM contact_stats AS s
+    JOIN addresses AS a ON a.id = s.address_id WHERE s.sent_count + s.received_count > 0;
+    """))
+
+def test_contact_stats_add_update_remove():
+    conn = sqlite3.connect(":memory:")
+    contacts = ContactStats(conn)
+    contacts.create_tables()
+    contacts.add([email("1", "A@x.com", ["b@x.com"]), email("2", "a@x.com", ["b@x.com", "c@x.com"])])
+    assert stats(conn) == {"a@x.com": "2/0", "b@x.com": "0/2", "c@x.com": "0/1"}
+
+    # 다시 색인된 메일은 이전 값을 빼고 새 값을 더함
+    contacts.add([email("2", "c@x.com", ["a@x.com"])])
+    assert stats(conn) == {"a@x.com": "1/1", "b@x.com": "0/1", "c@x.com": "1/0"}
+
+    contacts.remove(["1", "2"])
+    assert stats(conn) == {}
+
+def test_ranking_matches_sqlite_storage(tmp_path, write_emls):
+    eml_dir = write_emls(mailbox())
+    emails = list(parse_eml_paths(iter_eml_paths(eml_dir), workers=1))
+
+    storage = SQLiteStorage(str(tmp_path / "emails.db"))
+    storage.connect()
+    storage.create_table()
+    assert storage.insert_emails(emails)
+    storage.close()
+
+    expected = load_contact_ranking(str(tmp_path / "emails.db"))
+    assert expected.main_user == OWNER
+    assert contact_ranking_from_emails(emails) == expected
+    # 헤더만 읽어도 같은 기준
+    assert contact_ranking_from_emails(parse_eml_headers(iter_eml_paths(eml_dir))) == expected
+
+def test_get_important_contacts_from_directory_and_db(tmp_path, write_emls):
+    eml_dir = write_emls(mailbox())
+    main_user, contacts = get_important_contacts(eml_dir)
+    assert main_user == OWNER
+    assert contacts == {"kim@yard.com", "lee@yard.com", "park@class.org"}
+
+    assert get_important_contacts(str(tmp_path / "missing.db")) == (None, set())
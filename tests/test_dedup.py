@@ -0,0 +1,103 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.ingestion.dedup import SimHashIndex, detail_hash, hamming_distances, simhash, strip_quoted_text
+from src.search.embedding_cache import EmbeddingCache
+from conftest import fake_encode
+
+NOTICE = ("안녕하세요, 생산관리팀입니다. {ship}호선 블록 탑재 일정 관련하여 공유드립니다. 도장 검사는 {date}에 "
+          "진행되며 검사 결과에 따라 후속 공정이 조정될 수 있습니다. 협력사 인원 투입 계획과 크레인 사용 일정을 "
+          "함께 확인 부탁드립니다. 추가 비용은 {amount}원으로 산정되었으며 세부 내역은 첨부 자료를 참고해 "
+          "주시기 바랍니다. {closing}")
+
+def notice(ship="H-1001", date="2024-03-05", amount="1,200,000", closing="감사합니다."):
+    return NOTICE.format(ship=ship, date=date, amount=amount, closing=closing)
+
+KEY_DETAIL_VARIANTS = [notice(ship="H-1002"), notice(date="2024-03-06"), notice(amount="1,300,000")]
+
+class CountingEncoder:
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return fake_encode(texts)
+
+def test_key_details_change_detail_hash_but_not_simhash():
+    for variant in KEY_DETAIL_VARIANTS:
+        # SimHash로는 유사 중복 거리 안
+        assert hamming_distances([simhash(notice())], simhash(variant))[0] <= 5
+        assert detail_hash(variant) != detail_hash(notice())
+    assert detail_hash(notice(closing="고맙습니다.")) == detail_hash(notice())
+    assert detail_hash("H-1001  호선") == detail_hash("h-1001 호선.")
+
+def test_simhash_index_requires_same_detail():
+    index = SimHashIndex(max_distance=3)
+    index.add([0b1011, 0b1111 << 40], [7, 8], [1, 2])
+    assert index.find(0b1001, 1) == 7
+    assert index.find(0b1001, 2) is None
+    # 거리 4는 max_distance 밖
+    assert index.find(0b1011 ^ 0b11110000, 1) is None
+    assert index.find(None, 1) is None
+
+def test_simhash_index_finds_after_sorting():
+    rng = np.random.default_rng(0)
+    signatures = rng.integers(0, 2 ** 63, size=SimHashIndex.recent_limit + 10, dtype=np.uint64)
+    index = SimHashIndex()
+    index.add(signatures, np.arange(len(signatures)), np.zeros(len(signatures), dtype=np.uint64))
+    assert index._bands and not index._recent
+    assert index.find(int(signatures[123]) ^ 0b101, 0) == 123
+    index.add([5], [-1], [0])
+    assert index.find(4, 0) == -1
+
+def test_near_duplicates_with_different_key_details_keep_distinct_vectors(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache"), model_name="test")
+    encoder = CountingEncoder()
+    texts = [notice()] + KEY_DETAIL_VARIANTS
+    vectors = cache.encode(texts, encoder)
+    assert len(encoder.texts) == len(texts)
+    assert cache.stats()["near_duplicates"] == 0
+    assert len({vector.tobytes() for vector in vectors}) == len(texts)
+
+    # 인사말만 다른 사본은 이미 인코딩한 벡터를 함께 씀
+    shared = cache.encode([notice(closing="고맙습니다.")], encoder)
+    assert len(encoder.texts) == len(texts)
+    assert np.array_equal(shared[0], vectors[0])
+
+def test_old_near_duplicate_clusters_are_discarded(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    cache = EmbeddingCache(cache_dir, model_name="test")
+    cache.encode([notice()], CountingEncoder())
+    cache._add_aliases({"stale": 0})
+    # 이전 기준으로 만든 캐시
+    with open(cache.meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    del meta["near_duplicate_format"]
+    with open(cache.meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    reopened = EmbeddingCache(cache_dir, model_name="test")
+    assert "stale" not in reopened.key_to_row
+    assert len(reopened) == 1 and len(reopened.simhash_index) == 0
+    encoder = CountingEncoder()
+    reopened.encode([notice()], encoder)
+    assert encoder.texts == []
+
+@pytest.mark.parametrize("reply", [
+    "확인했습니다.\n\n-----Original Message-----\nFrom: kim\n이전 내용",
+    "확인했습니다.\n\nOn Mon, Mar 4, 2024 kim wrote:\n> 이전 내용",
+    "확인했습니다.\n> 이전 내용\n-- \n김 과장",
+    "확인했습니다.\n\niPhone에서 보냄",
+    "확인했습니다.\nGalaxy S23에서 보냄\n\n-----Original Message-----\nFrom: kim\n이전 내용",
+])
+def test_strip_quoted_text(reply):
+    assert strip_quoted_text(reply) == "확인했습니다."
+
+def test_sentence_ending_in_sent_from_is_not_a_signature():
+    body = "자료는 어제 서울 사무소에서 보냄\n도면은 내일 공유드리겠습니다.\n검토 부탁드립니다.\n\n김 과장"
+    assert strip_quoted_text(body) == body
+    # 메일 앱 이름이 들어가도 본문 중간이면 서명이 아님
+    body = "메일 끝에 이 문구가 붙습니다.\n모바일에서 보냄\n첫째, 첨부가 빠집니다.\n둘째, 서명이 깨집니다.\n셋째, 느립니다."
+    assert strip_quoted_text(body) == body
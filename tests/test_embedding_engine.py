@@ -0,0 +1,43 @@
+import pytest
+
+from src.search import embedding_engine
+from src.search.embedding_engine import padded_tokens, plan_batches
+
+@pytest.mark.parametrize("lengths, budget, max_batch_size", [
+    ([5, 300, 12, 12, 128, 7, 0, 64] * 20, 1024, 32),
+    ([512] * 10, 1000, 256),
+    ([1] * 1000, 8192, 256),
+])
+def test_plan_batches_respects_budget(lengths, budget, max_batch_size):
+    batches = plan_batches(lengths, token_budget=budget, max_batch_size=max_batch_size)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) <= max_batch_size
+        # 텍스트 하나가 예산보다 긴 경우만 예산을 넘음
+        longest = max(max(1, lengths[i]) for i in batch)
+        assert len(batch) * longest <= budget or len(batch) == 1
+
+def test_plan_batches_groups_similar_lengths():
+    lengths = [100, 5, 100, 5, 100, 5]
+    batches = plan_batches(lengths, token_budget=300, max_batch_size=256)
+    assert batches == [[1, 3, 5], [0, 2, 4]]
+    # 길이순으로 묶으면 입력 순서대로 묶을 때보다 패딩이 적음
+    naive = [[0, 1], [2, 3], [4, 5]]
+    assert padded_tokens(batches, lengths) < padded_tokens(naive, lengths)
+
+def test_padded_tokens():
+    assert padded_tokens([[0, 1], [2]], [3, 10, 4]) == 2 * 10 + 4
+    assert padded_tokens([], []) == 0
+
+class WordTokenizer:
+    def __call__(self, texts, add_special_tokens=True, truncation=True, max_length=None):
+        return {"input_ids": [["[CLS]", *text.split(), "[SEP]"][:max_length] for text in texts]}
+
+def test_pool_engine_loads_only_the_tokenizer(monkeypatch):
+    loaded = []
+    monkeypatch.setattr(embedding_engine, "load_tokenizer", lambda name: loaded.append(name) or (WordTokenizer(), 4))
+    engine = embedding_engine.EmbeddingEngine("test-model", processes=2)
+    monkeypatch.setattr(engine, "load", lambda: pytest.fail("모델을 부모 프로세스에 로드함"))
+    assert engine.token_lengths(["a b", "a b c d e f"]).tolist() == [4, 4]
+    assert engine.token_lengths(["a"]).tolist() == [3]
+    assert loaded == ["test-model"]
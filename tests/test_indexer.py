@@ -0,0 +1,111 @@
+import os
+
+import pytest
+from whoosh.index import open_dir
+
+from src.ingestion.storage import ContactRanking
+from src.search.keyword_engine import SQLiteFTSKeywordEngine
+from conftest import OWNER, mailbox
+
+def stored_fields(index_dir):
+    with open_dir(index_dir).searcher() as searcher:
+        return {fields["message_id"]: fields for fields in searcher.all_stored_fields()}
+
+def test_whoosh_index_scores_frequent_contacts(tmp_path, write_emls, make_indexer):
+    emails = mailbox()
+    indexer = make_indexer(write_emls(emails))
+    indexer.index_emails(rebuild=True, parse_workers=1)
+
+    ranking = indexer.manifest.contacts.ranking()
+    assert ranking.main_user == OWNER
+    assert ranking.important_contacts == {"kim@yard.com", "lee@yard.com", "park@class.org"}
+
+    fields = stored_fields(str(tmp_path / "index"))
+    assert len(fields) == len(emails)
+    for relative_path, email_dict in emails:
+        importance = fields[os.path.basename(relative_path)]["importance"]
+        if email_dict["sender"] == OWNER:
+            assert importance == ContactRanking.SENT_BY_MAIN_USER
+        else:
+            # 중요 연락처가 소유자에게 보낸 메일
+            assert importance == ContactRanking.RECEIVED_BY_MAIN_USER + ContactRanking.SENT_BY_IMPORTANT_CONTACT
+
+def test_whoosh_importance_follows_ranking_changes(tmp_path, write_emls, make_indexer):
+    emails = mailbox()
+    eml_dir = write_emls(emails)
+    make_indexer(eml_dir).index_emails(rebuild=True, parse_workers=1)
+
+    # 다른 주소가 소유자보다 많이 보내면 메일함 소유자(추정)가 바뀌고 기존 문서의 중요도도 다시 계산됨
+    boss = "boss@yard.com"
+    write_emls([(f"Inbox/boss_{i}.eml", {"subject": f"지시 {i}", "sender": boss, "receiver": [OWNER],
+                                         "date": "2024-04-01", "body": "확인 바랍니다."}) for i in range(10)])
+    indexer = make_indexer(eml_dir)
+    indexer.index_emails(parse_workers=1)
+    assert indexer.manifest.contacts.ranking().main_user == boss
+
+    fields = stored_fields(str(tmp_path / "index"))
+    assert fields["boss_0.eml"]["importance"] == ContactRanking.SENT_BY_MAIN_USER
+    for relative_path, email_dict in emails:
+        if email_dict["sender"] == OWNER:
+            # 이제 소유자는 새 소유자와 메일을 주고받은 중요 연락처
+            assert fields[os.path.basename(relative_path)]["importance"] == ContactRanking.SENT_BY_IMPORTANT_CONTACT
+
+@pytest.mark.parametrize("keyword_engine", ["whoosh", "fts5"])
+def test_vectors_embedded_once_store_is_ready(tmp_path, write_emls, make_indexer, capsys, keyword_engine):
+    emails = mailbox()
+    eml_dir = write_emls(emails)
+    indexer = make_indexer(eml_dir, keyword_engine=keyword_engine)
+    ready = indexer.vector_store.is_ready
+    indexer.vector_store.is_ready = lambda: False
+    indexer.index_emails(rebuild=True, parse_workers=1)
+    assert len(indexer.manifest.entries()) == len(emails)
+    assert len(indexer.manifest.pending_vectors()) == len(emails)
+
+    # 벡터 저장소를 쓸 수 있게 되면 키워드 색인은 그대로 두고 임베딩만 계산
+    indexer.vector_store.is_ready = ready
+    capsys.readouterr()
+    indexer.index_emails(parse_workers=1)
+    out = capsys.readouterr().out
+    assert f"임베딩하지 못했던 파일 {len(emails)}개" in out
+    assert "0개의 이메일이 키워드 색인에 반영되고" in out
+    assert indexer.vector_store.count() == len(emails)
+    assert indexer.manifest.pending_vectors() == {}
+    if keyword_engine == "whoosh":
+        # 연락처 통계를 두 번 세지 않음
+        assert indexer.manifest.conn.execute("SELECT SUM(sent_count) FROM contact_stats;").fetchone()[0] == len(emails)
+
+    indexer.index_emails(parse_workers=1)
+    assert "색인이 이미 최신 상태입니다." in capsys.readouterr().out
+
+@pytest.mark.parametrize("keyword_engine", ["whoosh", "fts5"])
+def test_incremental_index_applies_only_changes(tmp_path, write_emls, make_indexer, capsys, keyword_engine):
+    emails = mailbox()
+    eml_dir = write_emls(emails)
+    indexer = make_indexer(eml_dir, keyword_engine=keyword_engine)
+    indexer.index_emails(rebuild=True, parse_workers=1)
+    assert indexer.vector_store.count() == len(emails)
+
+    # 1개 수정, 1개 삭제, 1개 추가
+    edited_path, edited = emails[1]
+    write_emls([(edited_path, dict(edited, body="검사 결과 재도장이 필요합니다."))])
+    os.remove(os.path.join(eml_dir, emails[2][0]))
+    write_emls([("Inbox/new.eml", {"subject": "크레인 배치", "sender": OWNER, "receiver": ["kim@yard.com"],
+                                   "date": "2024-04-01", "body": "골리앗 크레인 점검 일정입니다."})])
+    capsys.readouterr()
+    indexer = make_indexer(eml_dir, keyword_engine=keyword_engine)
+    indexer.index_emails(parse_workers=1)
+    assert "2개의 이메일이 키워드 색인에 반영되고 1개가 삭제되었습니다." in capsys.readouterr().out
+
+    expected = {os.path.basename(path) for path, _ in emails} - {"mail_002.eml"} | {"new.eml"}
+    assert set(indexer.manifest.entries()) == {os.path.join(eml_dir, "Inbox", name) for name in expected}
+    assert indexer.vector_store.count() == len(expected)
+    if keyword_engine == "whoosh":
+        fields = stored_fields(str(tmp_path / "index"))
+        assert set(fields) == expected
+        assert "재도장" in fields["mail_001.eml"]["body_plain"]
+    else:
+        engine = SQLiteFTSKeywordEngine(str(tmp_path / "emails.db"))
+        hits, _, _ = engine.search("재도장", ["body_plain"], 10)
+        assert set(hits) == {"mail_001.eml"}
+        hits, _, _ = engine.search("블록", ["body_plain"], 20)
+        assert set(hits) == expected - {"new.eml", "mail_001.eml"}
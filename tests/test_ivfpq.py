@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from src.search.ivfpq import IVFPQIndex, kmeans
+
+def unit_rows(rows, dim, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+@pytest.fixture(scope="module")
+def vectors():
+    return unit_rows(2000, 32)
+
+@pytest.fixture(scope="module")
+def index(vectors):
+    index = IVFPQIndex.train(vectors, nlist=16, m=8, trained_rows=len(vectors))
+    index.add(vectors)
+    return index
+
+def test_kmeans_separates_clusters():
+    points = np.concatenate([np.zeros((50, 2)), np.full((50, 2), 10.0)]).astype(np.float32)
+    centroids = kmeans(points, 2)
+    assert sorted(centroids[:, 0].round(3).tolist()) == [0.0, 10.0]
+
+def test_train_rejects_indivisible_dimension(vectors):
+    with pytest.raises(ValueError):
+        IVFPQIndex.train(vectors[:, :30], nlist=4, m=8)
+
+def test_encode_reconstructs_vectors(index, vectors):
+    assign, codes = index.encode(vectors[:100])
+    assert codes.shape == (100, index.m) and codes.dtype == np.uint8
+    dsub = index.codebooks.shape[2]
+    decoded = index.centroids[assign] + np.concatenate(
+        [index.codebooks[j][codes[:, j]] for j in range(index.m)], axis=1)
+    # 양자화 오차는 벡터 길이(1)보다 훨씬 작음
+    assert np.linalg.norm(decoded - vectors[:100], axis=1).mean() < 0.5
+    assert decoded.shape[1] == index.m * dsub
+
+def test_search_recall_and_allowed(index, vectors):
+    queries = unit_rows(20, 32, seed=1)
+    recall = 0
+    for query in queries:
+        exact = set(np.argsort(-(vectors @ query))[:10].tolist())
+        rows, scores = index.search(query, nprobe=16, depth=100)
+        assert np.all(np.diff(scores) <= 1e-6)
+        recall += len(exact & set(rows.tolist())) / 10
+    assert recall / len(queries) >= 0.9
+
+    allowed = np.zeros(len(vectors), dtype=bool)
+    allowed[::7] = True
+    rows, _ = index.search(queries[0], nprobe=16, depth=50, allowed=allowed)
+    assert len(rows) and np.all(rows % 7 == 0)
+
+def test_save_load_and_select(tmp_path, index, vectors):
+    index.save(str(tmp_path / "ivfpq"))
+    loaded = IVFPQIndex.load(str(tmp_path / "ivfpq"))
+    assert loaded.rows == index.rows and loaded.trained_rows == len(vectors)
+    assert np.array_equal(loaded.codes, index.codes)
+    assert IVFPQIndex.load(str(tmp_path / "missing")) is None
+
+    loaded.select(np.arange(0, len(vectors), 2))
+    assert loaded.rows == len(vectors) // 2
+    assert np.array_equal(loaded.codes[1], index.codes[2])
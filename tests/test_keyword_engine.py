@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+
+from src.common.models import Email
+from src.ingestion.storage import SQLiteStorage
+from src.search.filters import SearchFilters
+from src.search.keyword_engine import SQLiteFTSKeywordEngine
+
+FIELDS = ["subject", "body_plain", "attachment_text"]
+
+def email(message_id, subject, body, sender="kim@yard.com", day=1):
+    return Email(message_id=message_id, subject=subject, body_plain=body, body_html=None, sender=sender,
+                 receivers=["pm@shipyard.com"], sent_date=datetime(2024, 3, day), folder_path="Inbox")
+
+@pytest.fixture(params=[False, True], ids=["incremental", "bulk"])
+def engine(request, tmp_path):
+    db_path = str(tmp_path / "emails.db")
+    storage = SQLiteStorage(db_path, bulk_load=request.param, fts=True)
+    storage.connect()
+    storage.create_table()
+    assert storage.insert_emails([
+        email("m1", "H-1001 납기일 변경", "도장 검사 후 납기를 조정합니다."),
+        email("m2", "H-1002 도장 검사", "검사 결과 이상 없음", sender="lee@yard.com", day=2),
+        email("m3", "회의록", "납품 일정과 크레인 배치 논의", day=3),
+    ])
+    if request.param:
+        storage.finish_bulk_load()
+    storage.close()
+    return SQLiteFTSKeywordEngine(db_path)
+
+def search(engine, query, filters=None):
+    hits, _, _ = engine.search(query, FIELDS, 10, filters=SearchFilters.from_value(filters))
+    return set(hits)
+
+def test_short_terms_expand_through_vocabulary(engine):
+    assert engine.is_ready()
+    # '납기'는 trigram보다 짧으므로 '납기일', '납기를' 등으로 확장
+    conn = engine._connect()
+    assert {"납기일", "납기를"} <= set(engine._expand_short_term(conn, "납기"))
+    assert search(engine, "납기") == {"m1"}
+    assert search(engine, "납") == {"m1", "m3"}
+    assert engine._match_expression(conn, "없는말", FIELDS) is not None
+    assert engine._match_expression(conn, "뷁", FIELDS) is None
+
+def test_all_words_must_match(engine):
+    assert search(engine, "도장 검사") == {"m1", "m2"}
+    assert search(engine, "h-1002 검사") == {"m2"}
+    assert search(engine, "도장 크레인") == set()
+
+def test_filters_apply_in_sql(engine):
+    assert search(engine, "검사", {"sender": "lee@yard.com"}) == {"m2"}
+    assert search(engine, "검사", {"date_to": "2024-03-02"}) == {"m1"}
@@ -0,0 +1,54 @@
+import os
+
+from src.search.manifest import SourceManifest, file_content_hash
+
+def write(path, text, mtime=None):
+    path.write_text(text, encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return str(path)
+
+def recorded(manifest, paths):
+    entries = []
+    for path in paths:
+        stat = os.stat(path)
+        entries.append((path, stat.st_size, stat.st_mtime, file_content_hash(path), os.path.basename(path)))
+    manifest.record(entries)
+
+def test_diff_reports_added_changed_touched_and_deleted(tmp_path):
+    manifest = SourceManifest(str(tmp_path / "manifest.db"), target="whoosh+numpy:1")
+    same = write(tmp_path / "same.eml", "a", 1000)
+    touched = write(tmp_path / "touched.eml", "b", 1000)
+    edited = write(tmp_path / "edited.eml", "c", 1000)
+    gone = write(tmp_path / "gone.eml", "d", 1000)
+    changed, _, deleted = manifest.diff([same, touched, edited, gone])
+    assert set(changed) == {same, touched, edited, gone} and deleted == {}
+    recorded(manifest, [same, touched, edited, gone])
+
+    os.utime(touched, (2000, 2000))
+    write(tmp_path / "edited.eml", "c2", 1000)
+    os.remove(gone)
+    added = write(tmp_path / "added.eml", "e")
+    changed, touched_entries, deleted = manifest.diff([same, touched, edited, added])
+    assert set(changed) == {edited, added}
+    assert changed[edited][2] == file_content_hash(edited)
+    # 수정 시각만 바뀐 파일은 다시 색인하지 않고 기존 문서 ID를 유지
+    assert touched_entries == {touched: (1, 2000, file_content_hash(touched), "touched.eml")}
+    assert deleted == {gone: "gone.eml"}
+    manifest.close()
+
+def test_target_change_resets_and_clear_keeps_target(tmp_path):
+    path = str(tmp_path / "manifest.db")
+    manifest = SourceManifest(path, target="whoosh+chroma:7")
+    assert not manifest.reset
+    manifest.record([("a.eml", 1, 1.0, "h", "a.eml")])
+    manifest.set_meta("contact_ranking", "{}")
+    manifest.close()
+
+    assert not SourceManifest(path, target="whoosh+chroma:7").reset
+    manifest = SourceManifest(path, target="whoosh+chroma:8")
+    assert manifest.reset
+    manifest.clear()
+    assert manifest.entries() == {} and manifest.get_meta("contact_ranking") is None
+    assert manifest.get_meta("target") == "whoosh+chroma:8"
+    manifest.close()
@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+from src.search.pipeline import Pipeline
+
+def test_queues_are_bounded_by_document_count():
+    produced = []
+    consumed = []
+    release = threading.Event()
+
+    def documents():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    def store(batch):
+        release.wait()
+        consumed.extend(batch)
+
+    pipeline = Pipeline(queue_size=8)
+    parsed_q = pipeline.source("parse", documents())
+    batch_q = pipeline.stage("batch", lambda batch: batch, parsed_q, batch_size=4)
+    assert batch_q.maxsize == 2
+    pipeline.sink("store", store, batch_q)
+    # 마지막 단계가 멈춰 있으면 각 큐에는 문서 약 queue_size개와 처리 중인 묶음만 쌓임
+    release.wait(0.5)
+    assert len(produced) <= 8 + 8 + 4 + 4 + 1
+    release.set()
+    pipeline.join()
+    assert consumed == list(range(1000))
+
+def test_stage_error_stops_pipeline():
+    closed = []
+
+    def documents():
+        try:
+            for i in range(10 ** 6):
+                yield i
+        finally:
+            closed.append(True)
+
+    def fail(batch):
+        if batch[0] >= 20:
+            raise ValueError("잘못된 문서")
+        return batch
+
+    pipeline = Pipeline(queue_size=4)
+    parsed_q = pipeline.source("parse", documents())
+    pipeline.sink("store", lambda batch: None, pipeline.stage("index", fail, parsed_q, batch_size=10))
+    with pytest.raises(RuntimeError, match="'index'") as excinfo:
+        pipeline.join()
+    assert isinstance(excinfo.value.__cause__, ValueError)
+    # 앞 단계도 멈추고 원본 iterator를 닫음
+    assert closed == [True]
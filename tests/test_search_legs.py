@@ -0,0 +1,44 @@
+import time
+import concurrent.futures
+
+import pytest
+
+from src.search.query import Searcher, _LegRun
+
+def bare_searcher(workers=1):
+    """모델/색인 없이 검색 경로 대기 로직만 쓰는 Searcher."""
+    searcher = Searcher.__new__(Searcher)
+    searcher._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    return searcher
+
+def sleep_then(seconds, value):
+    time.sleep(seconds)
+    return value
+
+def test_timeout_counts_from_leg_start():
+    searcher = bare_searcher()
+    first = _LegRun(searcher._executor, sleep_then, 0.15, "first")
+    second = _LegRun(searcher._executor, sleep_then, 0.15, "second")
+    timings = {}
+    assert searcher._leg_result(first, 0.5, "keyword", "키워드", timings) == "first"
+    # 대기열에서 0.15초를 기다렸지만 실행 시간은 제한 시간 안
+    assert searcher._leg_result(second, 0.25, "semantic", "시맨틱", timings) == "second"
+    assert timings == {}
+    searcher.close()
+
+def test_leg_that_cannot_start_is_cancelled():
+    searcher = bare_searcher()
+    stuck = _LegRun(searcher._executor, sleep_then, 0.5, "stuck")
+    timings = {}
+    assert searcher._leg_result(stuck, 0.05, "keyword", "키워드", timings) is None
+    queued = _LegRun(searcher._executor, sleep_then, 0, "queued")
+    assert searcher._leg_result(queued, 0.05, "semantic", "시맨틱", timings) is None
+    assert timings == {"keyword_timed_out": True, "semantic_timed_out": True}
+    assert queued.future.cancelled()
+    searcher.close()
+
+def test_close_shuts_down_executor():
+    with bare_searcher() as searcher:
+        pass
+    with pytest.raises(RuntimeError):
+        searcher._executor.submit(time.sleep, 0)
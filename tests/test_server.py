@@ -0,0 +1,55 @@
+import os
+import threading
+
+import pytest
+
+from src.search.client import SearchClient
+from src.search.query import SearchResults
+from src.search.server import SearchServer
+
+class StubSearcher:
+    """모델/색인 없이 요청 처리만 확인하는 검색기."""
+
+    def __init__(self):
+        self.queries = []
+
+    def engine_settings(self):
+        return {"keyword_engine": "whoosh", "vector_store": "ivfpq", "nprobe": 8, "rerank": 100,
+                "index_dir": os.path.abspath("data/index"), "db_path": os.path.abspath("data/emails.db"),
+                "vector_dir": os.path.abspath("data/vectors")}
+
+    def cache_stats(self):
+        return {}
+
+    def search(self, query_string, filters=None, **kwargs):
+        self.queries.append(query_string)
+        results = SearchResults([{"message_id": "m1", "subject": query_string}])
+        results.timings = {"total": 1.0}
+        return results
+
+@pytest.fixture
+def server():
+    server = SearchServer(StubSearcher(), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def client_for(server):
+    host, port = server.server_address[:2]
+    return SearchClient(host=host, port=port)
+
+def test_matching_engine_is_served(server):
+    results = client_for(server).search("납기", engine={"keyword_engine": "whoosh", "nprobe": 8,
+                                                         "index_dir": os.path.abspath("data/index")})
+    assert [result["message_id"] for result in results] == ["m1"]
+
+def test_mismatched_engine_is_rejected(server, capsys):
+    client = client_for(server)
+    assert client.search("납기", engine={"keyword_engine": "fts5"}) is None
+    assert client.search("납기", engine={"vector_store": "ivfpq", "rerank": 0}) is None
+    # 다른 색인을 지정한 검색은 서버의 색인 결과를 돌려주지 않음
+    assert client.search("납기", engine={"index_dir": os.path.abspath("other/index")}) is None
+    assert "엔진 설정" in capsys.readouterr().out
+    assert server.searcher.queries == []
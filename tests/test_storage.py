@@ -0,0 +1,127 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from main import use_bulk_load
+from src.common.models import Email
+from src.ingestion.storage import SCHEMA_VERSION, SQLiteStorage, email_filter_sql
+
+def email(message_id, sender="kim@yard.com", receivers=("pm@shipyard.com",)):
+    return Email(message_id=message_id, subject="검사 일정", body_plain="본문", body_html=None, sender=sender,
+                 receivers=list(receivers), sent_date=datetime(2024, 3, 1), folder_path="Inbox")
+
+@pytest.fixture(params=[False, True], ids=["incremental", "bulk"])
+def storage(request, tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "emails.db"), bulk_load=request.param)
+    storage.connect()
+    storage.create_table()
+    yield storage
+    storage.close()
+
+def count(storage, sql):
+    return storage.conn.execute(sql).fetchone()[0]
+
+def test_failed_batch_is_rolled_back(storage):
+    assert storage.insert_emails([email("m1")])
+    # message_id가 없는 행에서 실패: 같은 배치에서 먼저 기록된 주소/통계도 되돌림
+    assert not storage.insert_emails([email("m2", sender="new@yard.com"), email(None)])
+    assert storage.insert_emails([email("m3")])
+    storage.conn.commit()
+
+    assert count(storage, "SELECT COUNT(*) FROM emails;") == 2
+    assert count(storage, "SELECT COUNT(*) FROM addresses WHERE address = 'new@yard.com';") == 0
+    assert count(storage, "SELECT SUM(sent_count) FROM contact_stats;") == 2
+
+def test_use_bulk_load(tmp_path):
+    pst = tmp_path / "mail.pst"
+    pst.write_bytes(b"\0" * 1024)
+    db_path = str(tmp_path / "emails.db")
+    assert use_bulk_load(db_path, str(pst))
+
+    storage = SQLiteStorage(db_path)
+    storage.connect()
+    storage.create_table()
+    # 테이블만 있는 빈 DB
+    assert use_bulk_load(db_path, str(pst))
+    assert storage.insert_emails([email("m1")])
+    storage.close()
+    # 기존 DB보다 작은 증분 수집은 행마다 인덱스를 갱신
+    assert not use_bulk_load(db_path, str(pst))
+
+    pst.write_bytes(b"\0" * (1024 * 1024))
+    assert use_bulk_load(db_path, str(pst))
+
+def filtered(storage, **filters):
+    where_sql, params = email_filter_sql(**filters)
+    return {row[0] for row in storage.conn.execute(f"SELECT e.message_id FROM emails AS e WHERE {where_sql};", params)}
+
+def test_email_filter_sql(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "emails.db"))
+    storage.connect()
+    storage.create_table()
+    emails = [
+        email("m1", sender="Kim@Yard.com", receivers=("pm@shipyard.com", "lee@yard.com")),
+        email("m2", sender="lee@yard.com", receivers=("kim@yard.com",)),
+        email("m3", receivers=("lee@yard.com",)),
+    ]
+    emails[0].cc = ["lee@yard.com"]
+    emails[1].sent_date = datetime(2024, 3, 5, 9, 30)
+    emails[1].folder_path = "Inbox/H-1001"
+    emails[2].folder_path = "Inbox2"
+    assert storage.insert_emails(emails)
+
+    assert filtered(storage) == {"m1", "m2", "m3"}
+    assert filtered(storage, sender="KIM@yard.com ") == {"m1", "m3"}
+    assert filtered(storage, recipient="lee@yard.com") == {"m1", "m3"}
+    assert filtered(storage, recipient="lee@yard.com", recipient_role="cc") == {"m1"}
+    assert filtered(storage, date_from=datetime(2024, 3, 2).date()) == {"m2"}
+    assert filtered(storage, date_from="2024-03-01", date_to="2024-03-05T09:30:00") == {"m1", "m3"}
+    # 하위 폴더는 포함하고 이름이 같은 글자로 시작하는 다른 폴더는 제외
+    assert filtered(storage, folder="Inbox/") == {"m1", "m2"}
+    assert filtered(storage, sender="kim@yard.com", folder="Inbox") == {"m1"}
+    assert filtered(storage, sender="nobody@yard.com") == set()
+    storage.close()
+
+def test_migrates_version_0_database(tmp_path):
+    db_path = str(tmp_path / "emails.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript("""
+        CREATE TABLE emails (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, message_id TEXT NOT NULL, subject TEXT, body_plain TEXT,
+            body_html TEXT, sender TEXT, receivers TEXT, sent_date TIMESTAMP, folder_path TEXT,
+            thread_topic TEXT, ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX idx_message_id ON emails (message_id);
+        """)
+        conn.executemany(
+            "INSERT INTO emails (message_id, subject, sender, receivers, sent_date, folder_path) VALUES (?, ?, ?, ?, ?, ?);", [
+                ("m1", "검사 일정", "<Kim@Yard.com>", '["pm@shipyard.com"]', "2024-03-01T00:00:00", "Inbox"),
+                ("m1", "검사 일정", "kim@yard.com", '["pm@shipyard.com", "lee@yard.com"]', "2024-03-01T00:00:00", "Inbox"),
+                ("m2", "RE: 검사 일정", "pm@shipyard.com", '["kim@yard.com"]', "2024-03-02T00:00:00", "Sent"),
+            ])
+
+    storage = SQLiteStorage(db_path)
+    storage.connect()
+    storage.create_table()
+    conn = storage.conn
+    assert conn.execute("PRAGMA user_version;").fetchone()[0] == SCHEMA_VERSION
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(emails);")}
+    assert {"attachment_text", "sender_id", "importance", "thread_id"} <= columns
+    # 중복된 message_id는 마지막 행만 남김
+    assert conn.execute("SELECT COUNT(*) FROM emails;").fetchone()[0] == 2
+    assert filtered(storage, recipient="lee@yard.com", recipient_role="to") == {"m1"}
+    assert filtered(storage, sender="kim@yard.com") == {"m1"}
+    assert count(storage, "SELECT COUNT(DISTINCT thread_id) FROM emails;") == 1
+    assert count(storage, "SELECT COUNT(*) FROM emails WHERE thread_id IS NULL;") == 0
+    assert count(storage, """
+        SELECT s.sent_count FROM contact_stats AS s JOIN addresses AS a ON a.id = s.address_id
+        WHERE a.address = 'kim@yard.com';""") == 1
+    storage.close()
+
+    # 다시 열어도 변환을 반복하지 않음
+    storage = SQLiteStorage(db_path)
+    storage.connect()
+    storage.create_table()
+    assert count(storage, "SELECT COUNT(*) FROM message_recipients;") == 3
+    storage.close()
@@ -0,0 +1,63 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from src.common.models import Email
+from src.ingestion.threads import ThreadIndex, normalize_subject, thread_nodes
+
+def email(message_id, subject="납기 확인", internet_message_id=None, in_reply_to=None, references=()):
+    return Email(message_id=message_id, subject=subject, body_plain="b", body_html=None, sender="kim@yard.com",
+                 receivers=[], sent_date=datetime(2024, 3, 1), folder_path="Inbox",
+                 internet_message_id=internet_message_id, in_reply_to=in_reply_to, references=list(references))
+
+@pytest.fixture
+def threads():
+    conn = sqlite3.connect(":memory:")
+    index = ThreadIndex(conn)
+    index.create_tables()
+    return index
+
+@pytest.mark.parametrize("subject, expected", [
+    ("RE: FW: 납기  확인", "납기 확인"),
+    ("Re[2]: 회신: 납기 확인", "납기 확인"),
+    ("(제목 없음)", ""),
+    (None, ""),
+])
+def test_normalize_subject(subject, expected):
+    assert normalize_subject(subject) == expected
+
+def test_thread_nodes_prefer_reply_headers():
+    reply = email("r.eml", internet_message_id="r@x", in_reply_to="a@x", references=["root@x", "a@x"])
+    assert thread_nodes(reply) == ("<r@x>", ["<root@x>", "<a@x>"])
+    assert thread_nodes(email("n.eml", subject="RE: 납기")) == ("doc:n.eml", ["subject:납기"])
+
+def test_replies_before_original_are_merged(threads):
+    # 원본보다 먼저 들어온 두 답장은 서로 다른 스레드였다가 원본이 들어오면 합쳐짐
+    first = email("a.eml", "RE: 도면", "a@x", in_reply_to="root@x")
+    threads.assign([first])
+    second = email("b.eml", "RE: 다른 제목", "b@x", references=["other@x"])
+    third = email("c.eml", "RE: 다른 제목", "c@x", in_reply_to="other@x")
+    threads.assign([second, third])
+    assert second.thread_id == third.thread_id != first.thread_id
+
+    root = email("root.eml", "도면", "root@x", references=["other@x"])
+    relabeled = threads.assign([root])
+    # 메일이 더 많은 스레드의 ID를 유지
+    assert root.thread_id == second.thread_id
+    assert relabeled == {"a.eml": second.thread_id}
+    assert sorted(threads.members(root.thread_id)) == ["a.eml", "b.eml", "c.eml", "root.eml"]
+
+def test_subject_fallback_and_removed_members(threads):
+    emails = [email("1.eml", "검사 일정"), email("2.eml", "RE: 검사 일정"), email("3.eml", "(no subject)"),
+              email("4.eml", "")]
+    threads.assign(emails)
+    assert emails[0].thread_id == emails[1].thread_id
+    assert len({e.thread_id for e in emails}) == 3
+
+    threads.remove(["2.eml"])
+    assert threads.members(emails[0].thread_id) == ["1.eml"]
+    # 노드는 남아 있어 나중에 들어온 메일도 같은 스레드로 묶임
+    later = email("5.eml", "FW: 검사 일정")
+    threads.assign([later])
+    assert later.thread_id == emails[0].thread_id
@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.common.models import Email
+from src.search.filters import SearchFilters, vector_metadata
+from src.search.vector_store import create_vector_store
+
+def email(index, receivers, folder):
+    return Email(message_id=f"m{index}", subject="s", body_plain="b", body_html=None, sender="Kim@Yard.com",
+                 receivers=receivers, sent_date=datetime(2024, 3, 1 + index), folder_path=folder)
+
+EMAILS = [
+    email(0, ["pm@shipyard.com", "lee@yard.com"], "/Top/Inbox"),
+    email(1, ["lee@yard.com"], "/Top/Inbox/H-1001"),
+    email(2, ["pm@shipyard.com"], "/Top/Inbox2"),
+    email(3, [f"crew{i}@yard.com" for i in range(50)], "/Top/Sent"),
+]
+
+def test_metadata_keys_do_not_grow_with_recipients():
+    metadata = vector_metadata(EMAILS[3], importance=20)
+    assert set(metadata) == {"importance", "sender", "sent_ts", "recipients", "folder"}
+    assert metadata["sender"] == "kim@yard.com"
+    assert metadata["folder"] == "/Top/Sent"
+    assert len(metadata["recipients"].split(",")) == 50
+
+@pytest.mark.parametrize("filters, expected", [
+    ({"recipient": "LEE@yard.com"}, {"m0", "m1"}),
+    ({"recipient": "yard.com"}, set()),
+    ({"folder": "/Top/Inbox"}, {"m0", "m1"}),
+    ({"folder": "/Top/Inbox/"}, {"m0", "m1"}),
+    ({"folder": "/Top"}, {"m0", "m1", "m2", "m3"}),
+    ({"recipient": "pm@shipyard.com", "folder": "/Top/Inbox"}, {"m0"}),
+])
+def test_metadata_matches(filters, expected):
+    filters = SearchFilters(**filters)
+    assert filters.chroma_where() is None and filters.has_metadata_filter()
+    assert {e.message_id for e in EMAILS if filters.metadata_matches(vector_metadata(e))} == expected
+
+@pytest.fixture(params=["numpy", "chroma"])
+def store(request, tmp_path):
+    store = create_vector_store(request.param, chroma_dir=str(tmp_path / "chroma"),
+                                vector_dir=str(tmp_path / "vectors"), create=True)
+    rng = np.random.default_rng(0)
+    store.upsert([e.message_id for e in EMAILS], rng.normal(size=(len(EMAILS), 8)),
+                 [vector_metadata(e) for e in EMAILS])
+    return store
+
+@pytest.mark.parametrize("filters, expected", [
+    ({"recipient": "lee@yard.com"}, {"m0", "m1"}),
+    ({"recipient": "crew7@yard.com", "sender": "kim@yard.com"}, {"m3"}),
+    ({"folder": "/Top/Inbox"}, {"m0", "m1"}),
+    ({"folder": "/Top/Inbox", "date_from": "2024-03-02"}, {"m1"}),
+    ({"recipient": "nobody@yard.com"}, set()),
+])
+def test_store_filters_recipients_and_folders(store, filters, expected):
+    ids, similarities, _ = store.query(np.ones(8), 10, filters=SearchFilters(**filters))
+    assert set(ids) == expected
+    assert len(similarities) == len(ids)
+
+@pytest.fixture
+def far_match_store(tmp_path):
+    store = create_vector_store("chroma", chroma_dir=str(tmp_path / "chroma"), create=True)
+    vectors = np.tile(np.eye(1, 8), (40, 1)) + np.arange(40)[:, None] * 0.01
+    metadatas = [{"recipients": "kim@yard.com", "sender": "kim@yard.com"} for _ in range(39)]
+    metadatas.append({"recipients": "lee@yard.com", "sender": "lee@yard.com"})
+    store.upsert([f"m{i}" for i in range(40)], vectors, metadatas)
+    return store
+
+def test_chroma_widens_candidates_when_post_filter_leaves_too_few(far_match_store, monkeypatch):
+    store = far_match_store
+    # 수신자 조건만 있으면 컬렉션 전체를 읽지 않음
+    monkeypatch.setattr(store, "_exact_query", lambda *args: pytest.fail("where 없이 전체 벡터를 읽음"))
+    # 가장 먼 문서만 조건에 맞아 처음 후보(n_results의 4배) 안에 없음
+    ids, _, exact = store.query(np.eye(1, 8)[0], 1, filters=SearchFilters(recipient="lee@yard.com"))
+    assert ids == ["m39"] and not exact
+    ids, _, exact = store.query(np.eye(1, 8)[0], 1, filters=SearchFilters(recipient="kim@yard.com"))
+    assert ids == ["m0"] and not exact
+
+    # 후보 수 상한에 닿으면 찾은 만큼만 반환
+    monkeypatch.setattr(store, "max_post_filter_candidates", 16)
+    ids, _, exact = store.query(np.eye(1, 8)[0], 1, filters=SearchFilters(recipient="lee@yard.com"))
+    assert ids == [] and not exact
+
+def test_chroma_applies_where_before_post_filter(far_match_store, monkeypatch):
+    monkeypatch.setattr(far_match_store, "max_post_filter_candidates", 16)
+    filters = SearchFilters(recipient="lee@yard.com", sender="lee@yard.com")
+    ids, _, exact = far_match_store.query(np.eye(1, 8)[0], 1, filters=filters)
+    assert ids == ["m39"]